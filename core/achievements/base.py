@@ -32,6 +32,8 @@ class BaseAchievement(ABC):
     description: str
     # 奖励定义: (类型, 值, 数量) e.g., ('coins', 500, 1) or ('title', 3, 1)
     reward: Tuple[str, int, int]
+    # 可能使进度变化的领域事件，收到这些事件时立即重新检查；为空时仅由定期全量检查覆盖
+    trigger_events: Tuple[str, ...] = ()
 
     @abstractmethod
     def get_progress(self, context: UserContext) -> int:
@@ -1,10 +1,12 @@
 from .base import BaseAchievement, UserContext
+from ..services.event_bus import EQUIPMENT_ACQUIRED, FISH_CAUGHT, FISH_INVENTORY_CHANGED
 class UniqueFishSpecies10(BaseAchievement):
     id = 5
     name = "图鉴收集者I"
     description = "收集10种不同的鱼"
     target_value = 10
     reward = ("bait", 3, 5)
+    trigger_events = (FISH_CAUGHT, FISH_INVENTORY_CHANGED)
 
     def get_progress(self, context: UserContext) -> int:
         """返回用户收集到的不同鱼种数量作为当前进度。"""
@@ -19,6 +21,7 @@ class UniqueFishSpecies25(BaseAchievement):
     description = "收集25种不同的鱼"
     target_value = 25
     reward = ("title", 10, 1)
+    trigger_events = (FISH_CAUGHT, FISH_INVENTORY_CHANGED)
 
     def get_progress(self, context: UserContext) -> int:
         """返回用户收集到的不同鱼种数量作为当前进度。"""
@@ -33,6 +36,7 @@ class UniqueFishSpecies50(BaseAchievement):
     description = "收集50种不同的鱼"
     target_value = 50
     reward = ("title", 11, 1)
+    trigger_events = (FISH_CAUGHT, FISH_INVENTORY_CHANGED)
 
     def get_progress(self, context: UserContext) -> int:
         """返回用户收集到的不同鱼种数量作为当前进度。"""
@@ -47,6 +51,7 @@ class GarbageCollector50(BaseAchievement):
     description = "累计钓上50个垃圾物品"
     target_value = 50
     reward = ("title", 9, 1) # 奖励 "回收大师" 称号
+    trigger_events = (FISH_CAUGHT, FISH_INVENTORY_CHANGED)
 
     def get_progress(self, context: UserContext) -> int:
         """返回用户钓到的垃圾总数作为当前进度。"""
@@ -61,6 +66,7 @@ class RareRodCollected(BaseAchievement):
     description = "获得一个稀有度为3的鱼竿"
     target_value = 1
     reward = ("bait", 8, 3) # 奖励3个活虾
+    trigger_events = (EQUIPMENT_ACQUIRED,)
 
     def get_progress(self, context: UserContext) -> int:
         """如果拥有稀有度为3的鱼竿，则返回1，否则返回0。"""
@@ -75,6 +81,7 @@ class LegendaryAccessoryCollected(BaseAchievement):
     description = "获得一个稀有度为5的饰品"
     target_value = 1
     reward = ("premium_currency", 100, 1) # 假设奖励类型
+    trigger_events = (EQUIPMENT_ACQUIRED,)
 
     def get_progress(self, context: UserContext) -> int:
         """如果拥有稀有度为5的饰品，则返回1，否则返回0。"""
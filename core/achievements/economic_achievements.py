@@ -1,4 +1,5 @@
 from .base import BaseAchievement, UserContext
+from ..services.event_bus import FISH_CAUGHT, WIPE_BOMB_PLAYED
 
 class TotalCoinsEarned1M(BaseAchievement):
     id = 12 # 对应原数据库中的 achievement_id
@@ -6,6 +7,7 @@ class TotalCoinsEarned1M(BaseAchievement):
     description = "累计赚取1,000,000金币"
     target_value = 1000000
     reward = ("title", 5, 1) # 奖励 "百万富翁" 称号
+    trigger_events = (FISH_CAUGHT,)
 
     def get_progress(self, context: UserContext) -> int:
         """返回用户累计获得的金币数作为当前进度。"""
@@ -20,6 +22,7 @@ class WipeBomb10xMultiplier(BaseAchievement):
     description = "在擦弹中获得10倍或以上奖励"
     target_value = 10.0
     reward = ("title", 6, 1) # 奖励 "擦弹之王" 称号
+    trigger_events = (WIPE_BOMB_PLAYED,)
 
     def get_progress(self, context: UserContext) -> float:
         """返回用户擦弹获得过的最大倍率作为当前进度。"""
@@ -34,6 +37,7 @@ class WipeBomb25xMultiplier(BaseAchievement):
     description = "在擦弹中获得20倍或以上奖励"
     target_value = 25.0
     reward = ("title", 20, 1) # 奖励 "Lucky☆Star" 称号
+    trigger_events = (WIPE_BOMB_PLAYED,)
 
     def get_progress(self, context: UserContext) -> float:
         """返回用户擦弹获得过的最大倍率作为当前进度。"""
@@ -48,6 +52,7 @@ class WipeBomb50xMultiplier(BaseAchievement):
     description = "在擦弹中获得50倍或以上奖励，一切尽在掌握!"
     target_value = 50.0
     reward = ("title", 21, 1) # 奖励 "計画通り" 称号
+    trigger_events = (WIPE_BOMB_PLAYED,)
 
     def get_progress(self, context: UserContext) -> float:
         """返回用户擦弹获得过的最大倍率作为当前进度。"""
@@ -62,6 +67,7 @@ class WipeBomb100xMultiplier(BaseAchievement):
     description = "在擦弹中获得100倍或以上奖励"
     target_value = 100.0
     reward = ("title", 22, 1) # 奖励 "这就是我的逃跑路线！" 称号
+    trigger_events = (WIPE_BOMB_PLAYED,)
 
     def get_progress(self, context: UserContext) -> float:
         """返回用户擦弹获得过的最大倍率作为当前进度。"""
@@ -76,6 +82,7 @@ class WipeBomb150xMultiplier(BaseAchievement):
     description = "在擦弹中获得150倍或以上奖励"
     target_value = 150.0
     reward = ("title", 23, 1) # 奖励 "超高校级的幸运" 称号
+    trigger_events = (WIPE_BOMB_PLAYED,)
 
     def get_progress(self, context: UserContext) -> float:
         """返回用户擦弹获得过的最大倍率作为当前进度。"""
@@ -90,6 +97,7 @@ class WipeBomb200xMultiplier(BaseAchievement):
     description = "在擦弹中获得200倍或以上奖励，NO GAME NO LIFE!"
     target_value = 200.0
     reward = ("title", 24, 1) # 奖励 "「 」" 称号
+    trigger_events = (WIPE_BOMB_PLAYED,)
 
     def get_progress(self, context: UserContext) -> float:
         """返回用户擦弹获得过的最大倍率作为当前进度。"""
@@ -104,6 +112,7 @@ class WipeBomb0002xMultiplier(BaseAchievement):
     description = "在擦弹中获得0.002倍或以下奖励，杂鱼~杂鱼~"
     target_value = 0.002
     reward = ("title", 25, 1) # 奖励 "杂鱼~杂鱼~" 称号
+    trigger_events = (WIPE_BOMB_PLAYED,)
 
     def get_progress(self, context: UserContext) -> float:
         """返回用户擦弹获得过的最大倍率作为当前进度。"""
@@ -1,4 +1,5 @@
 from .base import BaseAchievement, UserContext
+from ..services.event_bus import FISH_CAUGHT, FISH_INVENTORY_CHANGED
 
 
 class TotalFishCount100(BaseAchievement):
@@ -7,6 +8,7 @@ class TotalFishCount100(BaseAchievement):
     description = "累计钓到100条鱼"
     target_value = 100
     reward = ("coins", 500, 1)
+    trigger_events = (FISH_CAUGHT,)
 
     def get_progress(self, context: UserContext) -> int:
         """返回用户总钓鱼数作为当前进度。"""
@@ -22,6 +24,7 @@ class FirstFishCaught(BaseAchievement):
     description = "第一次钓鱼"
     target_value = 1
     reward = ("coins", 50, 1) # 奖励50个金币
+    trigger_events = (FISH_CAUGHT, FISH_INVENTORY_CHANGED)
 
     def get_progress(self, context: UserContext) -> int:
         """返回用户是否已经钓过鱼。"""
@@ -37,6 +40,7 @@ class TenThousandFishCaught(BaseAchievement):
     description = "累计钓上10000条鱼"
     target_value = 10000
     reward = ("coins", 10000, 1) # 奖励10000金币
+    trigger_events = (FISH_CAUGHT,)
 
     def get_progress(self, context: UserContext) -> int:
         """返回用户钓到的鱼总数作为当前进度。"""
@@ -50,6 +54,7 @@ class TotalFishCount1000(BaseAchievement):
     description = "累计钓到1000条鱼"
     target_value = 1000
     reward = ("title", 3, 1)  # 奖励 "钓鱼大师" 称号
+    trigger_events = (FISH_CAUGHT,)
 
     def get_progress(self, context: UserContext) -> int:
         """返回用户总钓鱼数作为当前进度。"""
@@ -65,6 +70,7 @@ class TotalWeight10000kg(BaseAchievement):
     description = "累计钓鱼总重量达到10,000公斤"
     target_value = 10000 * 1000  # 目标值统一使用g作为单位
     reward = ("title", 16, 1)
+    trigger_events = (FISH_CAUGHT,)
 
     def get_progress(self, context: UserContext) -> int:
         """返回用户总钓鱼重量作为当前进度。"""
@@ -80,6 +86,7 @@ class HeavyFishCaught(BaseAchievement):
     description = "单次钓上重量超过100公斤的鱼"
     target_value = True  # 对于布尔类型的检查，目标值可以设为True
     reward = ("bait", 14, 1)
+    trigger_events = (FISH_CAUGHT,)
 
     def get_progress(self, context: UserContext) -> int:
         """对于布尔类型的成就，返回1代表已完成，0代表未完成。"""
@@ -1,92 +1,437 @@
 import sqlite3
 import threading
 import time
-from typing import Optional
+from typing import Optional, Dict, Any, List, Callable
 from contextlib import contextmanager
 
 from astrbot.api import logger
 
 
+class ConnectionPoolTimeoutError(sqlite3.OperationalError):
+    """连接池在等待超时后仍无可用连接"""
+    pass
+
+
+class _PooledConnection(sqlite3.Connection):
+    """
+    连接池中的连接
+
+    处于 ``transaction()`` 作用域内时，仓储方法中的 commit/rollback 以及
+    ``with conn`` 的自动提交都会被推迟，由最外层事务统一提交或回滚。
+    """
+
+    txn_depth = 0
+    # (注册时的事务深度, 回调)，所在层级回滚时调用
+    rollback_hooks = ()
+    # 最外层事务提交后调用的回调
+    commit_hooks = ()
+
+    def commit(self):
+        if self.txn_depth:
+            return
+        super().commit()
+
+    def rollback(self):
+        if self.txn_depth:
+            return
+        super().rollback()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.txn_depth:
+            return False
+        return super().__exit__(exc_type, exc_value, traceback)
+
+
+class _Lease:
+    """记录某个线程当前借出的连接及其重入深度"""
+
+    __slots__ = ("conn", "depth")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.depth = 0
+
+
 class DatabaseConnectionManager:
-    """数据库连接管理器，提供线程安全的连接管理和重试机制"""
-    
-    def __init__(self, db_path: str, timeout: int = 30, max_retries: int = 3, retry_delay: float = 0.1):
+    """
+    数据库连接管理器（共享连接池）
+
+    - 所有仓储共享同一个实例，整个插件对 fish.db 只维护一组有上限的连接
+    - 同一线程内的嵌套获取会复用已借出的连接（可重入），最外层退出时归还
+    - PRAGMA 统一在创建连接时设置，归还前保证事务已提交或回滚
+    - 空闲连接在再次借出前做健康检查，失效的连接会被丢弃并重建
+    """
+
+    # 统一的连接级 PRAGMA 设置（journal_mode 为数据库级，设置一次即持久化）
+    DEFAULT_PRAGMAS = {
+        "journal_mode": "WAL",        # 使用WAL模式提高并发性能
+        "synchronous": "NORMAL",      # 平衡性能和安全
+        "cache_size": -16000,         # 每个连接约 16MB 页缓存
+        "mmap_size": 268435456,       # 256MB 内存映射读取
+        "temp_store": "MEMORY",
+    }
+
+    def __init__(
+        self,
+        db_path: str,
+        timeout: int = 30,
+        max_retries: int = 3,
+        retry_delay: float = 0.1,
+        pool_size: int = 8,
+        health_check_interval: float = 60.0,
+        pragmas: Optional[Dict[str, Any]] = None,
+    ):
         self.db_path = db_path
         self.timeout = timeout
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.pool_size = max(1, int(pool_size))
+        self.health_check_interval = health_check_interval
+        self.pragmas = dict(self.DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        # busy_timeout 与 sqlite3.connect 的 timeout 保持一致
+        self.pragmas["busy_timeout"] = int(self.timeout * 1000)
+
         self._local = threading.local()
-    
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取一个线程安全的数据库连接"""
-        conn = getattr(self._local, "connection", None)
-        if conn is None:
-            conn = self._create_connection()
-            self._local.connection = conn
-        return conn
-    
+        self._cond = threading.Condition(threading.Lock())
+        self._idle: List[sqlite3.Connection] = []
+        self._last_used: Dict[int, float] = {}
+        self._foreign_keys: Dict[int, bool] = {}
+        self._total = 0
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "errors": 0,
+            "peak_in_use": 0,
+        }
+
+    # --- 连接创建与健康检查 ---
     def _create_connection(self) -> sqlite3.Connection:
-        """创建新的数据库连接"""
+        """创建新的数据库连接，并应用统一的 PRAGMA 设置"""
         conn = sqlite3.connect(
-            self.db_path, 
+            self.db_path,
             detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
-            timeout=self.timeout
+            timeout=self.timeout,
+            check_same_thread=False,
+            factory=_PooledConnection,
         )
         conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value};")
         conn.execute("PRAGMA foreign_keys = ON;")
-        conn.execute("PRAGMA journal_mode = WAL;")  # 使用WAL模式提高并发性能
-        conn.execute("PRAGMA synchronous = NORMAL;")  # 平衡性能和安全
         return conn
-    
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """空闲时间超过阈值的连接在借出前执行一次轻量检查"""
+        last_used = self._last_used.get(id(conn), 0.0)
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"数据库连接健康检查失败，将重建连接: {e}")
+            return False
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        """关闭并丢弃一个连接（调用方需持有锁）"""
+        self._last_used.pop(id(conn), None)
+        self._foreign_keys.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._total -= 1
+        self._stats["closed"] += 1
+        self._cond.notify()
+
+    # --- 借出与归还 ---
+    def _acquire(self) -> sqlite3.Connection:
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        wait_start = time.monotonic()
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("连接池已关闭")
+                conn = None
+                while self._idle and conn is None:
+                    candidate = self._idle.pop()
+                    if self._is_healthy(candidate):
+                        conn = candidate
+                    else:
+                        self._stats["health_check_failures"] += 1
+                        self._discard(candidate)
+                if conn is not None:
+                    return self._checkout(conn, waited, wait_start)
+                if self._total < self.pool_size:
+                    # 在锁内预留名额，连接在锁外创建，PRAGMA 设置不阻塞其他线程的借出与归还
+                    self._total += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise ConnectionPoolTimeoutError(
+                        f"等待数据库连接超时 ({self.timeout}s)，连接池大小: {self.pool_size}"
+                    )
+                if not waited:
+                    waited = True
+                    self._stats["waits"] += 1
+                self._cond.wait(remaining)
+
+        try:
+            conn = self._create_connection()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            if self._closed:
+                # 创建期间连接池已关闭，交还预留的名额
+                self._total -= 1
+                self._cond.notify()
+                conn.close()
+                raise sqlite3.ProgrammingError("连接池已关闭")
+            self._foreign_keys[id(conn)] = True
+            self._stats["created"] += 1
+            return self._checkout(conn, waited, wait_start)
+
+    def _checkout(self, conn: sqlite3.Connection, waited: bool, wait_start: float) -> sqlite3.Connection:
+        """记录一次借出（调用方需持有锁）"""
+        self._stats["checkouts"] += 1
+        in_use = self._total - len(self._idle)
+        if in_use > self._stats["peak_in_use"]:
+            self._stats["peak_in_use"] = in_use
+        if waited:
+            self._stats["wait_time_total"] += time.monotonic() - wait_start
+        return conn
+
+    def _release(self, conn: sqlite3.Connection, broken: bool = False) -> None:
+        with self._cond:
+            if broken or self._closed:
+                self._discard(conn)
+                return
+            self._last_used[id(conn)] = time.monotonic()
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _set_foreign_keys(self, conn: sqlite3.Connection, enabled: bool) -> None:
+        """按需切换外键约束（只能在事务外切换，因此仅在最外层借出时调用）"""
+        if self._foreign_keys.get(id(conn)) != enabled:
+            conn.execute(f"PRAGMA foreign_keys = {'ON' if enabled else 'OFF'};")
+            self._foreign_keys[id(conn)] = enabled
+
     @contextmanager
-    def get_connection(self):
-        """获取数据库连接的上下文管理器，支持重试机制"""
-        conn = self._get_connection()
+    def get_connection(self, row_factory=sqlite3.Row, foreign_keys: bool = True):
+        """
+        获取数据库连接的上下文管理器。
+
+        语义与 ``with sqlite3.Connection`` 一致：正常退出时提交，异常时回滚。
+        同一线程内的嵌套调用复用同一个连接，最外层退出时归还到连接池。
+
+        Args:
+            row_factory: 行工厂，默认 sqlite3.Row
+            foreign_keys: 是否启用外键约束（仅在最外层借出时生效）
+        """
+        lease: Optional[_Lease] = getattr(self._local, "lease", None)
+        outermost = lease is None
+        if outermost:
+            conn = self._acquire()
+            lease = _Lease(conn)
+            self._local.lease = lease
+            try:
+                self._set_foreign_keys(conn, foreign_keys)
+            except Exception:
+                self._local.lease = None
+                self._release(conn, broken=True)
+                raise
+        conn = lease.conn
+        previous_factory = conn.row_factory
+        conn.row_factory = row_factory
+        lease.depth += 1
+        broken = False
         try:
-            yield conn
+            with conn:
+                yield conn
         except sqlite3.OperationalError as e:
             if "database is locked" in str(e).lower():
                 logger.warning(f"数据库锁定，操作无法在超时 ({self.timeout}s) 内完成: {e}")
-            
-            # 发生严重错误时，关闭并移除线程中的无效连接
-            if conn:
-                try:
-                    conn.close()
-                except:
-                    pass
-            if hasattr(self._local, "connection"):
-                delattr(self._local, "connection")
+            with self._cond:
+                self._stats["errors"] += 1
+            # 发生严重错误时，丢弃该连接而不是放回连接池
+            broken = True
             raise
-        except Exception as e:
+        except sqlite3.Error as e:
             logger.error(f"数据库操作发生未知错误: {e}")
+            with self._cond:
+                self._stats["errors"] += 1
             raise
-    
-    def close_connection(self):
-        """关闭当前线程的数据库连接"""
-        if hasattr(self._local, "connection"):
+        finally:
+            lease.depth -= 1
+            conn.row_factory = previous_factory
+            if lease.depth == 0:
+                self._local.lease = None
+                if conn.in_transaction:
+                    try:
+                        conn.rollback()
+                    except sqlite3.Error:
+                        broken = True
+                self._release(conn, broken=broken)
+
+    @contextmanager
+    def transaction(self):
+        """
+        将多个仓储操作合并到同一个事务中。
+
+        作用域内同一线程的所有 ``get_connection`` 复用同一连接，仓储方法中的
+        提交被推迟到最外层退出时统一提交；异常时整体回滚。
+        嵌套调用使用 SAVEPOINT，内层异常只回滚内层的写入。
+        """
+        with self.get_connection() as conn:
+            depth = conn.txn_depth
+            if depth == 0:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                savepoint = None
+            else:
+                savepoint = f"sp_{depth}"
+                conn.execute(f"SAVEPOINT {savepoint}")
+            conn.txn_depth = depth + 1
             try:
-                self._local.connection.close()
-            except:
-                pass
-            finally:
-                delattr(self._local, "connection")
-    
+                yield conn
+            except BaseException:
+                conn.txn_depth = depth
+                if savepoint:
+                    try:
+                        conn.execute(f"ROLLBACK TO {savepoint}")
+                        conn.execute(f"RELEASE {savepoint}")
+                    except sqlite3.Error as e:
+                        logger.error(f"回滚保存点 {savepoint} 失败: {e}")
+                else:
+                    sqlite3.Connection.rollback(conn)
+                self._run_rollback_hooks(conn, depth)
+                raise
+            conn.txn_depth = depth
+            if savepoint:
+                conn.execute(f"RELEASE {savepoint}")
+            else:
+                try:
+                    sqlite3.Connection.commit(conn)
+                except BaseException:
+                    self._run_rollback_hooks(conn, depth)
+                    raise
+                conn.rollback_hooks = ()
+                commit_hooks, conn.commit_hooks = conn.commit_hooks, ()
+                for _, callback in commit_hooks:
+                    try:
+                        callback()
+                    except Exception as e:
+                        logger.error(f"执行事务提交回调失败: {e}")
+
+    def in_transaction(self) -> bool:
+        """当前线程是否处于 ``transaction()`` 作用域内"""
+        lease: Optional[_Lease] = getattr(self._local, "lease", None)
+        return lease is not None and lease.conn.txn_depth > 0
+
+    def on_rollback(self, callback: Callable[[], None]) -> None:
+        """
+        注册当前事务回滚时的回调，用于撤销与事务写入对应的内存状态。
+        只在 ``transaction()`` 作用域内有效；事务提交后回调被丢弃。
+        """
+        lease: Optional[_Lease] = getattr(self._local, "lease", None)
+        if lease is None or lease.conn.txn_depth == 0:
+            return
+        conn = lease.conn
+        conn.rollback_hooks = tuple(conn.rollback_hooks) + ((conn.txn_depth, callback),)
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """
+        注册最外层事务提交后的回调；不在事务内时立即调用。
+        所在层级回滚时回调被丢弃。
+        """
+        lease: Optional[_Lease] = getattr(self._local, "lease", None)
+        if lease is None or lease.conn.txn_depth == 0:
+            callback()
+            return
+        conn = lease.conn
+        conn.commit_hooks = tuple(conn.commit_hooks) + ((conn.txn_depth, callback),)
+
+    @staticmethod
+    def _run_rollback_hooks(conn: sqlite3.Connection, depth: int) -> None:
+        if conn.commit_hooks:
+            conn.commit_hooks = tuple(h for h in conn.commit_hooks if h[0] <= depth)
+        hooks = conn.rollback_hooks
+        if not hooks:
+            return
+        # 回滚到 depth 层，撤销的是注册深度大于 depth 的写入
+        conn.rollback_hooks = tuple(h for h in hooks if h[0] <= depth)
+        for hook_depth, callback in reversed(hooks):
+            if hook_depth > depth:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"执行事务回滚回调失败: {e}")
+
+    # --- 统计与生命周期 ---
+    def get_stats(self) -> Dict[str, Any]:
+        """返回连接池统计信息"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pool_size"] = self.pool_size
+            stats["total"] = self._total
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._total - len(self._idle)
+        return stats
+
+    def health_check(self) -> bool:
+        """借出一个连接执行轻量查询，用于外部探活"""
+        try:
+            with self.get_connection() as conn:
+                conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"数据库健康检查失败: {e}")
+            return False
+
+    def close_all(self) -> None:
+        """关闭所有空闲连接，借出中的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
     def execute_with_retry(self, query: str, params: tuple = (), fetch: str = "none"):
-        """执行SQL查询，支持重试机制
-        
+        """执行SQL查询，遇到数据库锁定时按 retry_delay 退避重试
+
         Args:
             query: SQL查询语句
             params: 查询参数
             fetch: 获取结果的方式 ("none", "one", "all")
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            
-            if fetch == "one":
-                return cursor.fetchone()
-            elif fetch == "all":
-                return cursor.fetchall()
-            else:
-                conn.commit()
-                return cursor.lastrowid if cursor.lastrowid else None
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(query, params)
+
+                    if fetch == "one":
+                        return cursor.fetchone()
+                    elif fetch == "all":
+                        return cursor.fetchall()
+                    else:
+                        conn.commit()
+                        return cursor.lastrowid if cursor.lastrowid else None
+            except sqlite3.OperationalError as e:
+                if "database is locked" not in str(e).lower() or attempt >= self.max_retries:
+                    raise
+                time.sleep(self.retry_delay * (attempt + 1))
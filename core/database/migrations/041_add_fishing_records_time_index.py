@@ -0,0 +1,37 @@
+"""
+迁移041：为钓鱼记录添加时间索引
+钓鱼记录的过期清理改为后台分批执行，按 timestamp 单列索引定位过期行，避免全表扫描
+"""
+
+from astrbot.api import logger
+
+def up(cursor):
+    """创建 fishing_records(timestamp) 索引"""
+
+    try:
+        logger.info("[迁移041] 创建钓鱼记录时间索引")
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_fishing_records_time
+            ON fishing_records(timestamp)
+        """)
+
+        logger.info("[迁移041] 钓鱼记录时间索引创建成功")
+
+    except Exception as e:
+        logger.error(f"[迁移041] 迁移失败: {e}")
+        raise
+
+def down(cursor):
+    """回滚：删除钓鱼记录时间索引"""
+
+    try:
+        logger.info("[迁移041-回滚] 删除钓鱼记录时间索引")
+
+        cursor.execute("DROP INDEX IF EXISTS idx_fishing_records_time")
+
+        logger.info("[迁移041-回滚] 钓鱼记录时间索引删除成功")
+
+    except Exception as e:
+        logger.error(f"[迁移041-回滚] 回滚失败: {e}")
+        raise
@@ -0,0 +1,70 @@
+"""
+迁移042：持久化骰宝对局
+创建骰宝对局表和下注表，插件重载后可恢复未结算的对局并继续结算
+"""
+
+from astrbot.api import logger
+
+def up(cursor):
+    """创建骰宝对局与下注表"""
+
+    try:
+        logger.info("[迁移042] 创建骰宝对局表")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sicbo_games (
+                game_id TEXT PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                start_time TIMESTAMP NOT NULL,
+                end_time TIMESTAMP NOT NULL,
+                total_pot INTEGER NOT NULL DEFAULT 0,
+                is_settled INTEGER NOT NULL DEFAULT 0,
+                dice_result TEXT,
+                total_payout INTEGER NOT NULL DEFAULT 0,
+                session_info TEXT,
+                settled_at TIMESTAMP,
+                settle_duration_ms REAL
+            )
+        """)
+
+        # 结算后下注明细随对局一起删除，只保留对局汇总
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sicbo_bets (
+                bet_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                game_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                bet_type TEXT NOT NULL,
+                amount INTEGER NOT NULL,
+                odds REAL NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                UNIQUE (game_id, user_id, bet_type),
+                FOREIGN KEY (game_id) REFERENCES sicbo_games(game_id)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sicbo_games_unsettled
+            ON sicbo_games(is_settled, end_time)
+        """)
+
+        logger.info("[迁移042] 骰宝对局表创建成功")
+
+    except Exception as e:
+        logger.error(f"[迁移042] 迁移失败: {e}")
+        raise
+
+def down(cursor):
+    """回滚：删除骰宝对局与下注表"""
+
+    try:
+        logger.info("[迁移042-回滚] 删除骰宝对局表")
+
+        cursor.execute("DROP INDEX IF EXISTS idx_sicbo_games_unsettled")
+        cursor.execute("DROP TABLE IF EXISTS sicbo_bets")
+        cursor.execute("DROP TABLE IF EXISTS sicbo_games")
+
+        logger.info("[迁移042-回滚] 骰宝对局表删除成功")
+
+    except Exception as e:
+        logger.error(f"[迁移042-回滚] 回滚失败: {e}")
+        raise
@@ -0,0 +1,77 @@
+"""
+迁移043：红包预拆分
+新增红包份额表，发红包时预先拆分好每一份的金额，领取时用一条条件更新抢占一份；
+为进行中的旧红包按剩余金额补齐份额
+"""
+
+import random
+
+from astrbot.api import logger
+
+def up(cursor):
+    """创建红包份额表并为进行中的红包生成份额"""
+
+    try:
+        logger.info("[迁移043] 创建红包份额表")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS red_packet_slots (
+                packet_id INTEGER NOT NULL,
+                slot_index INTEGER NOT NULL,
+                amount INTEGER NOT NULL,
+                claimed_by TEXT,
+                claimed_at TIMESTAMP,
+                PRIMARY KEY (packet_id, slot_index),
+                FOREIGN KEY (packet_id) REFERENCES red_packets(packet_id)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_red_packets_expiry
+            ON red_packets(is_expired, expires_at)
+        """)
+
+        cursor.execute("""
+            SELECT packet_id, packet_type, total_amount, total_count, remaining_amount, remaining_count
+            FROM red_packets
+            WHERE is_expired = 0 AND remaining_count > 0
+              AND packet_id NOT IN (SELECT DISTINCT packet_id FROM red_packet_slots)
+        """)
+        packets = cursor.fetchall()
+        for packet_id, packet_type, total_amount, total_count, remaining_amount, remaining_count in packets:
+            if packet_type == "lucky":
+                amounts = []
+                left = remaining_amount
+                for left_count in range(remaining_count, 1, -1):
+                    amount = random.randint(1, max(1, left - (left_count - 1)))
+                    amounts.append(amount)
+                    left -= amount
+                amounts.append(left)
+            else:
+                amounts = [total_amount // total_count] * remaining_count
+            start = total_count - remaining_count
+            cursor.executemany(
+                "INSERT INTO red_packet_slots (packet_id, slot_index, amount) VALUES (?, ?, ?)",
+                [(packet_id, start + i, amount) for i, amount in enumerate(amounts)],
+            )
+
+        logger.info(f"[迁移043] 红包份额表创建成功，为 {len(packets)} 个进行中的红包生成了份额")
+
+    except Exception as e:
+        logger.error(f"[迁移043] 迁移失败: {e}")
+        raise
+
+def down(cursor):
+    """回滚：删除红包份额表"""
+
+    try:
+        logger.info("[迁移043-回滚] 删除红包份额表")
+
+        cursor.execute("DROP INDEX IF EXISTS idx_red_packets_expiry")
+        cursor.execute("DROP TABLE IF EXISTS red_packet_slots")
+
+        logger.info("[迁移043-回滚] 红包份额表删除成功")
+
+    except Exception as e:
+        logger.error(f"[迁移043-回滚] 回滚失败: {e}")
+        raise
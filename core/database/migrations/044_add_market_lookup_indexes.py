@@ -0,0 +1,48 @@
+"""
+迁移044：为市场挂单添加查找索引
+按展示编号购买/下架时按 (物品类型, 实例ID) 或 (物品类型, 物品ID) 定位挂单，
+查看自己的挂单时按卖家定位，均不再扫描整个市场
+"""
+
+from astrbot.api import logger
+
+def up(cursor):
+    """创建市场挂单查找索引"""
+
+    try:
+        logger.info("[迁移044] 创建市场挂单查找索引")
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_market_type_instance
+            ON market(item_type, item_instance_id)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_market_type_item_listed
+            ON market(item_type, item_id, listed_at)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_market_user_listed
+            ON market(user_id, listed_at)
+        """)
+
+        logger.info("[迁移044] 市场挂单查找索引创建成功")
+
+    except Exception as e:
+        logger.error(f"[迁移044] 迁移失败: {e}")
+        raise
+
+def down(cursor):
+    """回滚：删除市场挂单查找索引"""
+
+    try:
+        logger.info("[迁移044-回滚] 删除市场挂单查找索引")
+
+        cursor.execute("DROP INDEX IF EXISTS idx_market_type_instance")
+        cursor.execute("DROP INDEX IF EXISTS idx_market_type_item_listed")
+        cursor.execute("DROP INDEX IF EXISTS idx_market_user_listed")
+
+        logger.info("[迁移044-回滚] 市场挂单查找索引删除成功")
+
+    except Exception as e:
+        logger.error(f"[迁移044-回滚] 回滚失败: {e}")
+        raise
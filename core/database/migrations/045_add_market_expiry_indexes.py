@@ -0,0 +1,42 @@
+"""
+迁移045：为市场挂单添加过期索引
+后台清理任务按上架时间定位超期挂单、按腐败时间定位腐败的大宗商品，只读取过期的行
+"""
+
+from astrbot.api import logger
+
+def up(cursor):
+    """创建市场挂单过期索引"""
+
+    try:
+        logger.info("[迁移045] 创建市场挂单过期索引")
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_market_listed_at
+            ON market(listed_at)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_market_type_expires
+            ON market(item_type, expires_at)
+        """)
+
+        logger.info("[迁移045] 市场挂单过期索引创建成功")
+
+    except Exception as e:
+        logger.error(f"[迁移045] 迁移失败: {e}")
+        raise
+
+def down(cursor):
+    """回滚：删除市场挂单过期索引"""
+
+    try:
+        logger.info("[迁移045-回滚] 删除市场挂单过期索引")
+
+        cursor.execute("DROP INDEX IF EXISTS idx_market_listed_at")
+        cursor.execute("DROP INDEX IF EXISTS idx_market_type_expires")
+
+        logger.info("[迁移045-回滚] 市场挂单过期索引删除成功")
+
+    except Exception as e:
+        logger.error(f"[迁移045-回滚] 回滚失败: {e}")
+        raise
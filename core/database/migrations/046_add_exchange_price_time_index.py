@@ -0,0 +1,37 @@
+"""
+迁移046：为交易所价格表添加 (日期, 时间) 索引
+价格历史按日期区间一次性读取并按时间排序，该索引可直接按序扫描，无需额外排序
+"""
+
+from astrbot.api import logger
+
+def up(cursor):
+    """创建交易所价格时间索引"""
+
+    try:
+        logger.info("[迁移046] 创建交易所价格时间索引")
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_exchange_prices_date_time
+            ON exchange_prices(date, time)
+        """)
+
+        logger.info("[迁移046] 交易所价格时间索引创建成功")
+
+    except Exception as e:
+        logger.error(f"[迁移046] 迁移失败: {e}")
+        raise
+
+def down(cursor):
+    """回滚：删除交易所价格时间索引"""
+
+    try:
+        logger.info("[迁移046-回滚] 删除交易所价格时间索引")
+
+        cursor.execute("DROP INDEX IF EXISTS idx_exchange_prices_date_time")
+
+        logger.info("[迁移046-回滚] 交易所价格时间索引删除成功")
+
+    except Exception as e:
+        logger.error(f"[迁移046-回滚] 回滚失败: {e}")
+        raise
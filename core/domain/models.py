@@ -1,7 +1,9 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 
+from ..utils import get_now
+
 # ---------------------------------
 # 游戏配置实体 (Configuration Entities)
 # ---------------------------------
@@ -253,10 +255,38 @@ class User:
     wipe_bomb_attempts_today: int = 0
     last_wipe_bomb_date: Optional[str] = None # YYYY-MM-DD 格式
 
+    # 以增量形式写回的累加字段，避免并发读改写时丢失更新
+    COUNTER_FIELDS = frozenset({
+        "coins", "premium_currency", "total_fishing_count",
+        "total_weight_caught", "total_coins_earned",
+    })
+
+    def __setattr__(self, name, value):
+        tracker = self.__dict__.get("_dirty")
+        # 仓储加载或写入后才开始追踪；未追踪的对象由仓储整行写入
+        if tracker is not None and name in _USER_FIELD_NAMES:
+            if name not in tracker:
+                tracker[name] = self.__dict__.get(name)
+        object.__setattr__(self, name, value)
+
     def can_afford(self, cost: int) -> bool:
         """判断用户金币是否足够"""
         return self.coins >= cost
 
+    def is_tracked(self) -> bool:
+        """是否已与数据库行同步并开始追踪修改"""
+        return "_dirty" in self.__dict__
+
+    def get_dirty_fields(self) -> Dict[str, Any]:
+        """返回自上次同步以来被修改的字段及其原始值"""
+        return dict(self.__dict__.get("_dirty") or {})
+
+    def mark_clean(self) -> None:
+        """标记当前状态已与数据库一致"""
+        object.__setattr__(self, "_dirty", {})
+
+_USER_FIELD_NAMES = frozenset(f.name for f in fields(User))
+
 # ---------------------------------
 # 关联与日志实体 (Association & Log Entities)
 # ---------------------------------
@@ -569,3 +599,34 @@ class RedPacketRecord:
     user_id: str
     amount: int
     claimed_at: datetime = None
+
+# ---------------------------------
+# 骰宝系统实体 (Sicbo Entities)
+# ---------------------------------
+
+@dataclass
+class SicboBet:
+    """骰宝下注记录"""
+    user_id: str
+    bet_type: str  # 下注类型：大、小、豹子、一点、二点等
+    amount: int  # 下注金额
+    odds: float  # 赔率
+    created_at: datetime = field(default_factory=get_now)
+
+
+@dataclass
+class SicboGame:
+    """骰宝游戏房间"""
+    game_id: str
+    start_time: datetime
+    end_time: datetime
+    bets: List[SicboBet] = field(default_factory=list)
+    total_pot: int = 0  # 总奖池
+    is_active: bool = True
+    is_settled: bool = False
+    dice_result: Optional[List[int]] = None
+    # 保存游戏相关的上下文信息
+    platform: Optional[str] = None  # 平台信息
+    session_id: Optional[str] = None  # 会话ID
+    session_info: Optional[Dict[str, Any]] = None  # 完整会话信息用于主动发送
+    chat_id: Optional[str] = None  # 群聊ID
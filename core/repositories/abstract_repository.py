@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 from datetime import date, datetime
 
 # 从领域模型导入所有需要的实体
@@ -22,6 +22,9 @@ class AbstractUserRepository(ABC):
     # 根据ID获取用户
     @abstractmethod
     def get_by_id(self, user_id: str) -> Optional[User]: pass
+    # 批量根据ID获取用户
+    @abstractmethod
+    def get_by_ids(self, user_ids: List[str]) -> Dict[str, User]: pass
     # 检查用户是否存在
     @abstractmethod
     def check_exists(self, user_id: str) -> bool: pass
@@ -32,8 +35,20 @@ class AbstractUserRepository(ABC):
     @abstractmethod
     def update(self, user: User) -> None: pass
     # 获取所有用户ID
+    @abstractmethod
+    def increment_counters(self, user_id: str, deltas: Dict[str, int]) -> bool: pass
+
+    @abstractmethod
+    def increment_counter_for_users(self, field_name: str, amounts: Dict[str, int]) -> int: pass
+
     @abstractmethod
     def get_all_user_ids(self, auto_fishing_only: bool = False) -> List[str]: pass
+    # 给所有用户增加货币（coins / premium_currency），返回受影响的用户数
+    @abstractmethod
+    def add_currency_to_all(self, currency: str, amount: int) -> int: pass
+    # 从所有用户扣除货币（不低于0），返回 (受影响的用户数, 实际扣除总额)
+    @abstractmethod
+    def deduct_currency_from_all(self, currency: str, amount: int) -> Tuple[int, int]: pass
 
     # 修改：用三个更具体的方法替换旧的 get_leaderboard_data
     @abstractmethod
@@ -176,6 +191,9 @@ class AbstractItemTemplateRepository(ABC):
     # 通过名称查找称号模板
     @abstractmethod
     def get_title_by_name(self, name: str) -> Optional[Title]: pass
+    # 获取区域限定鱼中指定稀有度的鱼类模板（rarity 为 None 时返回全部）
+    @abstractmethod
+    def get_zone_fishes(self, fish_ids: List[int], rarity: Optional[int] = None) -> List[Fish]: pass
 
 class AbstractInventoryRepository(ABC):
     """用户库存仓储接口"""
@@ -194,6 +212,9 @@ class AbstractInventoryRepository(ABC):
     # 更新用户鱼类库存数量
     @abstractmethod
     def update_fish_quantity(self, user_id: str, fish_id: int, delta: int, quality_level: int = 0) -> None: pass
+    # 随机移除鱼塘中的 count 条鱼（每条独立随机选择一个鱼种堆叠），返回实际移除数量
+    @abstractmethod
+    def remove_random_fish(self, user_id: str, count: int) -> int: pass
     
     # --- 水族箱相关方法 ---
     # 获取用户水族箱中的鱼
@@ -253,6 +274,9 @@ class AbstractInventoryRepository(ABC):
     # 为用户添加一个鱼竿实例
     @abstractmethod
     def add_rod_instance(self, user_id: str, rod_id: int, durability: Optional[int], refine_level: int = 1) -> UserRodInstance: pass
+    # 给所有用户发放物品（item / bait / rod / accessory），返回受影响的用户数
+    @abstractmethod
+    def grant_item_to_all(self, item_type: str, item_id: int, quantity: int, durability: Optional[int] = None) -> int: pass
     # 删除一个鱼竿实例
     @abstractmethod
     def delete_rod_instance(self, rod_instance_id: int) -> None: pass
@@ -274,6 +298,18 @@ class AbstractInventoryRepository(ABC):
     # 获取用户当前装备的饰品
     @abstractmethod
     def get_user_equipped_accessory(self, user_id: str) -> Optional[UserAccessoryInstance]: pass
+    # 批量获取多个用户当前装备的鱼竿
+    @abstractmethod
+    def get_equipped_rods_by_users(self, user_ids: List[str]) -> Dict[str, UserRodInstance]: pass
+    # 批量获取多个用户当前装备的饰品
+    @abstractmethod
+    def get_equipped_accessories_by_users(self, user_ids: List[str]) -> Dict[str, UserAccessoryInstance]: pass
+    # 批量获取多个用户的鱼饵库存
+    @abstractmethod
+    def get_bait_inventories_by_users(self, user_ids: List[str]) -> Dict[str, Dict[int, int]]: pass
+    # 批量获取多个用户鱼塘中的鱼总数
+    @abstractmethod
+    def get_fish_counts_by_users(self, user_ids: List[str]) -> Dict[str, int]: pass
     # 统一设置用户的装备状态
     @abstractmethod
     def set_equipment_status(self, user_id: str, rod_instance_id: Optional[int] = None, accessory_instance_id: Optional[int] = None) -> None: pass
@@ -369,6 +405,11 @@ class AbstractExchangeRepository(ABC):
         """获取指定日期的所有商品价格"""
         pass
 
+    @abstractmethod
+    def get_prices_between(self, start_date: str, end_date: str) -> List[Exchange]:
+        """获取日期区间（含首尾）内的所有商品价格，按时间升序"""
+        pass
+
     @abstractmethod
     def add_exchange_price(self, price: Exchange) -> None:
         """新增一条交易所价格记录"""
@@ -453,17 +494,39 @@ class AbstractMarketRepository(ABC):
     # 获取单个市场商品
     @abstractmethod
     def get_listing_by_id(self, market_id: int) -> Optional[MarketListing]: pass
+    # 按物品类型和实例ID查找挂单ID（鱼竿/饰品）
+    @abstractmethod
+    def find_market_id_by_instance(self, item_type: str, item_instance_id: int) -> Optional[int]: pass
+    # 按物品类型和模板ID查找最新的挂单ID（鱼/道具）
+    @abstractmethod
+    def find_market_id_by_item(self, item_type: str, item_id: int) -> Optional[int]: pass
+    # 获取某个用户的所有挂单
+    @abstractmethod
+    def get_listings_by_user(self, user_id: str) -> List[MarketListing]: pass
+    # 删除已腐败的大宗商品挂单，返回删除数量
+    @abstractmethod
+    def delete_rotten_commodity_listings(self, now: datetime, limit: int) -> int: pass
+    # 按上架时间升序获取 cutoff 之前上架的挂单
+    @abstractmethod
+    def get_listings_listed_before(self, cutoff: datetime, limit: int, offset: int = 0) -> List[MarketListing]: pass
     # 获取所有市场商品
     @abstractmethod
     def get_all_listings(self, page: int = None, per_page: int = None, 
                         item_type: str = None, min_price: int = None, 
-                        max_price: int = None, search: str = None) -> tuple: pass
+                        max_price: int = None, search: str = None,
+                        rarity: int = None, quality_level: int = None) -> tuple: pass
+    # 按物品类型统计挂单数量
+    @abstractmethod
+    def count_listings_by_type(self) -> Dict[str, int]: pass
     # 添加一个市场商品
     @abstractmethod
     def add_listing(self, listing: MarketListing) -> None: pass
     # 移除一个市场商品
     @abstractmethod
     def remove_listing(self, market_id: int) -> None: pass
+    # 删除挂单以抢占它，返回是否由本次调用删除（并发购买/下架时只有一方成功）
+    @abstractmethod
+    def claim_listing(self, market_id: int) -> bool: pass
     # 更新市场商品
     @abstractmethod
     def update_listing(self, listing: MarketListing) -> None: pass
@@ -479,9 +542,18 @@ class AbstractLogRepository(ABC):
     # 获取用户钓鱼日志
     @abstractmethod
     def get_fishing_records(self, user_id: str, limit: int) -> List[FishingRecord]: pass
+    # 每个用户仅保留最近 keep 条钓鱼日志，返回删除行数
+    @abstractmethod
+    def trim_fishing_records_per_user(self, keep: int, batch_size: int = 100) -> int: pass
+    # 分批删除 cutoff 之前的钓鱼日志，返回删除行数
+    @abstractmethod
+    def delete_fishing_records_before(self, cutoff: datetime, batch_size: int = 1000) -> int: pass
     # 记录一条抽卡日志
     @abstractmethod
     def add_gacha_record(self, record: GachaRecord) -> None: pass
+    # 批量记录抽卡日志
+    @abstractmethod
+    def add_gacha_records(self, records: List[GachaRecord]) -> None: pass
     # 获取用户抽卡日志
     @abstractmethod
     def get_gacha_records(self, user_id: str, limit: int) -> List[GachaRecord]: pass
@@ -568,6 +640,26 @@ class AbstractAchievementRepository(ABC):
     @abstractmethod
     def has_item_of_rarity(self, user_id: str, item_type: str, rarity: int) -> bool: pass
 
+    # --- 批量检查（全量扫描使用） ---
+    # 所有用户的不同鱼种数量
+    @abstractmethod
+    def get_all_unique_fish_counts(self) -> Dict[str, int]: pass
+    # 所有用户的垃圾物品总数
+    @abstractmethod
+    def get_all_garbage_counts(self) -> Dict[str, int]: pass
+    # 所有用户拥有的鱼竿/饰品稀有度集合
+    @abstractmethod
+    def get_all_owned_rarities(self, item_type: str) -> Dict[str, Set[int]]: pass
+    # 钓到过超过特定重量的鱼的用户
+    @abstractmethod
+    def get_heavy_fish_user_ids(self, weight: int) -> Set[str]: pass
+    # 所有用户已完成的成就ID集合
+    @abstractmethod
+    def get_all_completed_achievements(self) -> Dict[str, Set[int]]: pass
+    # 批量标记成就完成：(user_id, achievement_id, progress, completed_at)
+    @abstractmethod
+    def complete_achievements(self, records: List[Tuple[str, int, Any, datetime]]) -> None: pass
+
 class AbstractUserBuffRepository(ABC):
     @abstractmethod
     def add(self, buff: UserBuff):
@@ -587,6 +679,10 @@ class AbstractUserBuffRepository(ABC):
     def get_all_active_by_user(self, user_id: str) -> List["UserBuff"]:
         pass
 
+    @abstractmethod
+    def get_all_active_by_users(self, user_ids: List[str]) -> Dict[str, List["UserBuff"]]:
+        pass
+
     @abstractmethod
     def delete_expired(self):
         pass
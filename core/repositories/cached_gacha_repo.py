@@ -0,0 +1,111 @@
+import copy
+import threading
+from typing import Optional, List, Dict, Any, Callable
+
+from .sqlite_gacha_repo import SqliteGachaRepository
+from ..domain.models import GachaPool
+from ..database.connection_manager import DatabaseConnectionManager
+
+
+class CachedGachaRepository(SqliteGachaRepository):
+    """
+    带内存缓存的抽卡仓储
+
+    卡池及其奖品只会通过后台管理修改，读取时一次性加载全部卡池并缓存，
+    之后的按ID查询、免费池查询直接命中内存。
+    所有卡池/奖品的写入方法在写库后使缓存失效，并通知监听器（如抽卡服务的抽样表）。
+    返回的卡池均为副本，调用方可以自由修改。
+    """
+
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
+        super().__init__(db_path, connection_manager)
+        self._lock = threading.RLock()
+        self._table: Optional[Dict[str, Any]] = None
+        # 缓存失效监听器：签名 (pool_id: Optional[int]) -> None，pool_id 为 None 表示全部卡池
+        self._invalidation_listeners: List[Callable[[Optional[int]], None]] = []
+
+    # --- 缓存加载与失效 ---
+    def _load_table(self) -> Dict[str, Any]:
+        pools = super().get_all_pools()
+        return {
+            "all": pools,
+            "by_id": {p.gacha_pool_id: p for p in pools},
+            # 奖品ID -> 所属卡池ID，用于按卡池失效
+            "item_pool": {i.gacha_pool_item_id: p.gacha_pool_id for p in pools for i in p.items},
+        }
+
+    def _get_table(self) -> Dict[str, Any]:
+        table = self._table
+        if table is None:
+            # 加载与失效共用一把锁，避免失效后又写回旧数据
+            with self._lock:
+                table = self._table
+                if table is None:
+                    table = self._table = self._load_table()
+        return table
+
+    @staticmethod
+    def _copy_pool(pool: GachaPool) -> GachaPool:
+        pool_copy = copy.copy(pool)
+        pool_copy.items = [copy.copy(item) for item in pool.items]
+        return pool_copy
+
+    def invalidate(self, pool_id: Optional[int] = None) -> None:
+        """使缓存失效；pool_id 用于通知监听器只重建对应卡池"""
+        with self._lock:
+            self._table = None
+        for listener in self._invalidation_listeners:
+            listener(pool_id)
+
+    def register_invalidation_listener(self, listener: Callable[[Optional[int]], None]) -> None:
+        """注册缓存失效回调，卡池写入后调用"""
+        self._invalidation_listeners.append(listener)
+
+    def _pool_id_of_item(self, item_pool_id: int) -> Optional[int]:
+        return self._get_table()["item_pool"].get(item_pool_id)
+
+    # --- Gacha Read Methods ---
+    def get_pool_by_id(self, pool_id: int) -> Optional[GachaPool]:
+        pool = self._get_table()["by_id"].get(pool_id)
+        return self._copy_pool(pool) if pool else None
+
+    def get_all_pools(self) -> List[GachaPool]:
+        return [self._copy_pool(p) for p in self._get_table()["all"]]
+
+    def get_free_pools(self) -> List[GachaPool]:
+        return [
+            self._copy_pool(p) for p in self._get_table()["all"]
+            if p.cost_coins == 0 and p.cost_premium_currency == 0
+        ]
+
+    # --- Admin Panel CRUD Methods ---
+    def add_pool_template(self, data: Dict[str, Any]) -> None:
+        super().add_pool_template(data)
+        self.invalidate()
+
+    def update_pool_template(self, pool_id: int, data: Dict[str, Any]) -> None:
+        super().update_pool_template(pool_id, data)
+        self.invalidate(pool_id)
+
+    def delete_pool_template(self, pool_id: int) -> None:
+        super().delete_pool_template(pool_id)
+        self.invalidate(pool_id)
+
+    def copy_pool_template(self, pool_id: int) -> int:
+        new_pool_id = super().copy_pool_template(pool_id)
+        self.invalidate(new_pool_id)
+        return new_pool_id
+
+    def add_item_to_pool(self, pool_id: int, data: Dict[str, Any]) -> None:
+        super().add_item_to_pool(pool_id, data)
+        self.invalidate(pool_id)
+
+    def update_pool_item(self, item_pool_id: int, data: Dict[str, Any]) -> None:
+        pool_id = self._pool_id_of_item(item_pool_id)
+        super().update_pool_item(item_pool_id, data)
+        self.invalidate(pool_id)
+
+    def delete_pool_item(self, item_pool_id: int) -> None:
+        pool_id = self._pool_id_of_item(item_pool_id)
+        super().delete_pool_item(item_pool_id)
+        self.invalidate(pool_id)
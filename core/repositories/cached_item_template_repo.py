@@ -0,0 +1,229 @@
+import random
+import threading
+from typing import Optional, List, Dict, Any, Tuple, Callable
+
+from .sqlite_item_template_repo import SqliteItemTemplateRepository
+from ..domain.models import Fish, Rod, Bait, Accessory, Title, Item
+from ..database.connection_manager import DatabaseConnectionManager
+
+
+class CachedItemTemplateRepository(SqliteItemTemplateRepository):
+    """
+    带内存缓存的物品模板仓储
+
+    模板数据只会通过后台管理或初始化流程修改，因此读取时按类别整表加载并缓存，
+    之后的按ID、按稀有度、按区域的查询都直接命中内存。
+    所有 add/update/delete 模板方法在写库后使对应类别的缓存失效。
+    返回的列表均为副本，模板对象本身为共享实例，调用方不应修改。
+    """
+
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
+        super().__init__(db_path, connection_manager)
+        self._lock = threading.RLock()
+        self._tables: Dict[str, Dict[str, Any]] = {}
+        # 区域限定鱼列表：按区域鱼ID集合缓存，rarity -> 鱼列表（None 为全部）
+        self._zone_fish: Dict[Tuple[int, ...], Dict[Optional[int], List[Fish]]] = {}
+        # 缓存失效监听器：签名 (kind: Optional[str]) -> None，用于同步清理依赖模板的派生缓存
+        self._invalidation_listeners: List[Callable[[Optional[str]], None]] = []
+
+    # --- 缓存加载与失效 ---
+    def _load_table(self, kind: str) -> Dict[str, Any]:
+        if kind == "fish":
+            rows = super().get_all_fish()
+            by_rarity: Dict[int, List[Fish]] = {}
+            for fish in rows:
+                by_rarity.setdefault(fish.rarity, []).append(fish)
+            return {"all": rows, "by_id": {f.fish_id: f for f in rows}, "by_rarity": by_rarity}
+        if kind == "rod":
+            rows = super().get_all_rods()
+            return {"all": rows, "by_id": {r.rod_id: r for r in rows}}
+        if kind == "bait":
+            rows = super().get_all_baits()
+            return {"all": rows, "by_id": {b.bait_id: b for b in rows}}
+        if kind == "accessory":
+            rows = super().get_all_accessories()
+            return {"all": rows, "by_id": {a.accessory_id: a for a in rows}}
+        if kind == "title":
+            rows = super().get_all_titles()
+            return {
+                "all": rows,
+                "by_id": {t.title_id: t for t in rows},
+                "by_name": {t.name: t for t in rows},
+            }
+        if kind == "item":
+            rows = super().get_all_items()
+            return {"all": rows, "by_id": {i.item_id: i for i in rows}}
+        raise ValueError(f"未知的模板类别: {kind}")
+
+    def _table(self, kind: str) -> Dict[str, Any]:
+        table = self._tables.get(kind)
+        if table is None:
+            # 加载与失效共用一把锁，避免失效后又写回旧数据
+            with self._lock:
+                table = self._tables.get(kind)
+                if table is None:
+                    table = self._load_table(kind)
+                    self._tables[kind] = table
+        return table
+
+    def invalidate(self, kind: Optional[str] = None) -> None:
+        """使缓存失效；kind 为 None 时清空全部类别"""
+        with self._lock:
+            if kind is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(kind, None)
+            if kind in (None, "fish"):
+                self._zone_fish.clear()
+        for listener in self._invalidation_listeners:
+            listener(kind)
+
+    def register_invalidation_listener(self, listener: Callable[[Optional[str]], None]) -> None:
+        """注册缓存失效回调，模板写入后调用"""
+        self._invalidation_listeners.append(listener)
+
+    # --- Fish Read Methods ---
+    def get_fish_by_id(self, fish_id: int) -> Optional[Fish]:
+        return self._table("fish")["by_id"].get(fish_id)
+
+    def get_all_fish(self) -> List[Fish]:
+        return list(self._table("fish")["all"])
+
+    def get_random_fish(self, rarity: Optional[int] = None) -> Optional[Fish]:
+        table = self._table("fish")
+        candidates = table["all"] if rarity is None else table["by_rarity"].get(rarity, [])
+        return random.choice(candidates) if candidates else None
+
+    def get_fishes_by_rarity(self, rarity: int) -> List[Fish]:
+        return list(self._table("fish")["by_rarity"].get(rarity, []))
+
+    def get_zone_fishes(self, fish_ids: List[int], rarity: Optional[int] = None) -> List[Fish]:
+        key = tuple(sorted(set(fish_ids)))
+        grouped = self._zone_fish.get(key)
+        if grouped is None:
+            by_id = self._table("fish")["by_id"]
+            grouped = {None: []}
+            for fish_id in key:
+                fish = by_id.get(fish_id)
+                if fish:
+                    grouped[None].append(fish)
+                    grouped.setdefault(fish.rarity, []).append(fish)
+            with self._lock:
+                self._zone_fish[key] = grouped
+        return list(grouped.get(rarity, []))
+
+    # --- Rod / Bait / Accessory Read Methods ---
+    def get_rod_by_id(self, rod_id: int) -> Optional[Rod]:
+        return self._table("rod")["by_id"].get(rod_id)
+
+    def get_all_rods(self) -> List[Rod]:
+        return list(self._table("rod")["all"])
+
+    def get_bait_by_id(self, bait_id: int) -> Optional[Bait]:
+        return self._table("bait")["by_id"].get(bait_id)
+
+    def get_all_baits(self) -> List[Bait]:
+        return list(self._table("bait")["all"])
+
+    def get_accessory_by_id(self, accessory_id: int) -> Optional[Accessory]:
+        return self._table("accessory")["by_id"].get(accessory_id)
+
+    def get_all_accessories(self) -> List[Accessory]:
+        return list(self._table("accessory")["all"])
+
+    # --- Title / Item Read Methods ---
+    def get_title_by_id(self, title_id: int) -> Optional[Title]:
+        return self._table("title")["by_id"].get(title_id)
+
+    def get_all_titles(self) -> List[Title]:
+        return list(self._table("title")["all"])
+
+    def get_title_by_name(self, name: str) -> Optional[Title]:
+        return self._table("title")["by_name"].get(name)
+
+    def get_item_by_id(self, item_id: int) -> Optional[Item]:
+        return self._table("item")["by_id"].get(item_id)
+
+    def get_all_items(self) -> List[Item]:
+        return list(self._table("item")["all"])
+
+    # --- 写操作：写库后使缓存失效 ---
+    def add(self, item: Item):
+        super().add(item)
+        self.invalidate("item")
+
+    def update(self, item: Item):
+        super().update(item)
+        self.invalidate("item")
+
+    def add_fish_template(self, data: Dict[str, Any]) -> None:
+        super().add_fish_template(data)
+        self.invalidate("fish")
+
+    def update_fish_template(self, fish_id: int, data: Dict[str, Any]) -> None:
+        super().update_fish_template(fish_id, data)
+        self.invalidate("fish")
+
+    def delete_fish_template(self, fish_id: int) -> None:
+        super().delete_fish_template(fish_id)
+        self.invalidate("fish")
+
+    def add_rod_template(self, data: Dict[str, Any]) -> None:
+        super().add_rod_template(data)
+        self.invalidate("rod")
+
+    def update_rod_template(self, rod_id: int, data: Dict[str, Any]) -> None:
+        super().update_rod_template(rod_id, data)
+        self.invalidate("rod")
+
+    def delete_rod_template(self, rod_id: int) -> None:
+        super().delete_rod_template(rod_id)
+        self.invalidate("rod")
+
+    def add_bait_template(self, data: Dict[str, Any]) -> None:
+        super().add_bait_template(data)
+        self.invalidate("bait")
+
+    def update_bait_template(self, bait_id: int, data: Dict[str, Any]) -> None:
+        super().update_bait_template(bait_id, data)
+        self.invalidate("bait")
+
+    def delete_bait_template(self, bait_id: int) -> None:
+        super().delete_bait_template(bait_id)
+        self.invalidate("bait")
+
+    def add_accessory_template(self, data: Dict[str, Any]) -> None:
+        super().add_accessory_template(data)
+        self.invalidate("accessory")
+
+    def update_accessory_template(self, accessory_id: int, data: Dict[str, Any]) -> None:
+        super().update_accessory_template(accessory_id, data)
+        self.invalidate("accessory")
+
+    def delete_accessory_template(self, accessory_id: int) -> None:
+        super().delete_accessory_template(accessory_id)
+        self.invalidate("accessory")
+
+    def add_item_template(self, data: Dict[str, Any]) -> None:
+        super().add_item_template(data)
+        self.invalidate("item")
+
+    def update_item_template(self, item_id: int, data: Dict[str, Any]) -> None:
+        super().update_item_template(item_id, data)
+        self.invalidate("item")
+
+    def delete_item_template(self, item_id: int) -> None:
+        super().delete_item_template(item_id)
+        self.invalidate("item")
+
+    def add_title_template(self, data: Dict[str, Any]) -> None:
+        super().add_title_template(data)
+        self.invalidate("title")
+
+    def update_title_template(self, title_id: int, data: Dict[str, Any]) -> None:
+        super().update_title_template(title_id, data)
+        self.invalidate("title")
+
+    def delete_title_template(self, title_id: int) -> None:
+        super().delete_title_template(title_id)
+        self.invalidate("title")
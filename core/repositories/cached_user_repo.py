@@ -0,0 +1,386 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Set, Tuple
+
+from astrbot.api import logger
+
+from .sqlite_user_repo import SqliteUserRepository
+from ..domain.models import User
+from ..database.connection_manager import DatabaseConnectionManager
+
+
+class CachedUserRepository(SqliteUserRepository):
+    """
+    带写回缓存的用户仓储
+
+    每个 user_id 在内存中只保留一个主对象（身份映射），读取时返回它的快照，
+    update 时把快照上修改过的字段合并回主对象（累加字段按增量合并），
+    由后台线程按固定间隔把脏用户批量写回数据库，同一用户的多次修改合并为一次写入。
+    事务内的更新直接写库，事务回滚时主对象会被标记为过期并重新加载。
+    排行榜、搜索等直接查询数据库的方法最多滞后一个写回周期。
+    """
+
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None,
+                 flush_interval_seconds: float = 2.0, max_cached_users: int = 10000):
+        super().__init__(db_path, connection_manager)
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_cached_users = max_cached_users
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, User]" = OrderedDict()
+        self._user_locks: Dict[str, threading.RLock] = {}
+        self._dirty_ids: Set[str] = set()
+        # 内存状态可能与数据库不一致的用户，下次访问时先写回再重新加载
+        self._stale_ids: Set[str] = set()
+
+        self.flush_thread: Optional[threading.Thread] = None
+        self.flush_running = False
+        self._stop_event = threading.Event()
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "merged_updates": 0,
+            "write_through_updates": 0,
+            "flushes": 0,
+            "flushed_users": 0,
+            "flush_errors": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    # --- 缓存内部方法 ---
+    def _user_lock(self, user_id: str) -> threading.RLock:
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.RLock()
+            return lock
+
+    @staticmethod
+    def _snapshot(master: User) -> User:
+        # copy.copy 直接复制 __dict__，不经过 __setattr__；快照拥有独立的修改记录
+        snapshot = copy.copy(master)
+        snapshot.mark_clean()
+        return snapshot
+
+    def _store(self, user: User) -> User:
+        """放入新加载的主对象；已有主对象时保留已有的"""
+        with self._lock:
+            master = self._entries.get(user.user_id)
+            if master is None:
+                master = self._entries[user.user_id] = user
+            self._entries.move_to_end(user.user_id)
+            self._evict_overflow()
+            return master
+
+    def _evict_overflow(self) -> None:
+        # 只淘汰没有待写回修改的用户
+        overflow = len(self._entries) - self.max_cached_users
+        if overflow <= 0:
+            return
+        for user_id in list(self._entries.keys()):
+            if overflow <= 0:
+                break
+            if user_id in self._dirty_ids:
+                continue
+            self._entries.pop(user_id, None)
+            self._user_locks.pop(user_id, None)
+            self._stale_ids.discard(user_id)
+            overflow -= 1
+
+    def _get_master(self, user_id: str) -> Optional[User]:
+        with self._lock:
+            master = self._entries.get(user_id)
+            stale = user_id in self._stale_ids
+            if master is not None and not stale:
+                self._entries.move_to_end(user_id)
+                self._stats["hits"] += 1
+                return master
+            self._stats["misses"] += 1
+        if stale:
+            self._reload(user_id)
+            with self._lock:
+                master = self._entries.get(user_id)
+            if master is not None:
+                return master
+        user = super().get_by_id(user_id)
+        return self._store(user) if user else None
+
+    def _reload(self, user_id: str) -> None:
+        """写回过期用户的待写修改并移出缓存"""
+        self._flush_users([user_id])
+        with self._lock:
+            if user_id not in self._dirty_ids:
+                self._entries.pop(user_id, None)
+                self._stale_ids.discard(user_id)
+
+    def _mark_stale(self, user_id: str) -> None:
+        with self._lock:
+            if user_id in self._entries:
+                self._stale_ids.add(user_id)
+
+    def _invalidate_all(self) -> None:
+        with self._lock:
+            self._stale_ids.update(self._entries.keys())
+
+    # --- 读取 ---
+    def get_by_id(self, user_id: str) -> Optional[User]:
+        master = self._get_master(user_id)
+        if master is None:
+            return None
+        with self._user_lock(user_id):
+            return self._snapshot(master)
+
+    def get_by_ids(self, user_ids: List[str]) -> Dict[str, User]:
+        if not user_ids:
+            return {}
+        masters: Dict[str, User] = {}
+        missing: List[str] = []
+        with self._lock:
+            for user_id in user_ids:
+                master = self._entries.get(user_id)
+                if master is None or user_id in self._stale_ids:
+                    missing.append(user_id)
+                else:
+                    self._entries.move_to_end(user_id)
+                    masters[user_id] = master
+            self._stats["hits"] += len(masters)
+            self._stats["misses"] += len(missing)
+            stale = [uid for uid in missing if uid in self._stale_ids]
+        for user_id in stale:
+            self._reload(user_id)
+        if missing:
+            for user_id, user in super().get_by_ids(missing).items():
+                masters[user_id] = self._store(user)
+        result = {}
+        for user_id, master in masters.items():
+            with self._user_lock(user_id):
+                result[user_id] = self._snapshot(master)
+        return result
+
+    def check_exists(self, user_id: str) -> bool:
+        with self._lock:
+            if user_id in self._entries:
+                return True
+        return super().check_exists(user_id)
+
+    # --- 写入 ---
+    def add(self, user: User) -> None:
+        super().add(user)
+        with self._lock:
+            if user.user_id not in self._dirty_ids:
+                self._entries.pop(user.user_id, None)
+                self._stale_ids.discard(user.user_id)
+
+    def update(self, user: User) -> None:
+        if not user.is_tracked():
+            # 非仓储加载的对象按整行写入，缓存随后重新加载
+            self._flush_users([user.user_id])
+            super().update(user)
+            self._mark_stale(user.user_id)
+            # 事务内写入时，提交前被其他线程重新加载的旧值同样需要失效
+            self._connection_manager.after_commit(lambda: self._mark_stale(user.user_id))
+            return
+        if not user.get_dirty_fields():
+            return
+        if self._connection_manager.in_transaction():
+            self._write_through(user)
+        elif not self._merge(user):
+            super().update(user)
+
+    # 用户锁只保护主对象的内存状态，持有期间不做数据库操作，避免与事务互相等待
+    def _merge(self, user: User) -> bool:
+        """把快照上的修改合并到主对象，等待后台写回；用户不在缓存中时返回 False"""
+        with self._user_lock(user.user_id):
+            with self._lock:
+                master = self._entries.get(user.user_id)
+                if master is None or user.user_id in self._stale_ids:
+                    return False
+            self._apply_changes(master, user)
+            user.mark_clean()
+            with self._lock:
+                self._dirty_ids.add(user.user_id)
+                self._stats["merged_updates"] += 1
+        return True
+
+    def _write_through(self, user: User) -> None:
+        """事务内直接写库，主对象同步更新但不记为待写回"""
+        dirty = user.get_dirty_fields()
+        deltas: Dict[str, int] = {}
+        values: Dict[str, Any] = {}
+        for name, original in dirty.items():
+            if name in User.COUNTER_FIELDS and original is not None:
+                deltas[name] = getattr(user, name) - original
+            else:
+                values[name] = getattr(user, name)
+        super().update(user)
+        self._apply_persisted(user.user_id, deltas, values)
+        with self._lock:
+            self._stats["write_through_updates"] += 1
+
+    def _apply_persisted(self, user_id: str, deltas: Dict[str, int], values: Dict[str, Any]) -> None:
+        """把已写入数据库的修改同步到主对象，不计入待写回的修改"""
+        with self._user_lock(user_id):
+            with self._lock:
+                master = self._entries.get(user_id)
+            if master is not None:
+                pending = master.__dict__.get("_dirty")
+                for name, delta in deltas.items():
+                    object.__setattr__(master, name, getattr(master, name) + delta)
+                    # 已写库的增量从待写回基准中扣除
+                    if name in pending:
+                        pending[name] += delta
+                for name, value in values.items():
+                    if name in pending:
+                        setattr(master, name, value)
+                    else:
+                        object.__setattr__(master, name, value)
+                if master.coins > master.max_coins:
+                    object.__setattr__(master, "max_coins", master.coins)
+        # 事务回滚后内存状态与数据库不一致，下次访问时重新加载
+        self._connection_manager.on_rollback(lambda: self._mark_stale(user_id))
+
+    @staticmethod
+    def _apply_changes(master: User, user: User) -> None:
+        for name, original in user.get_dirty_fields().items():
+            value = getattr(user, name)
+            if name in User.COUNTER_FIELDS and original is not None:
+                setattr(master, name, getattr(master, name) + (value - original))
+            elif name == "max_coins":
+                setattr(master, name, max(master.max_coins, value))
+            else:
+                setattr(master, name, value)
+        if master.coins > master.max_coins:
+            master.max_coins = master.coins
+
+    def increment_counters(self, user_id: str, deltas: Dict[str, int]) -> bool:
+        updated = super().increment_counters(user_id, deltas)
+        self._apply_persisted(user_id, {name: delta for name, delta in deltas.items() if delta}, {})
+        return updated
+
+    def increment_counter_for_users(self, field_name: str, amounts: Dict[str, int]) -> int:
+        updated = super().increment_counter_for_users(field_name, amounts)
+        for user_id, amount in amounts.items():
+            if amount:
+                self._apply_persisted(user_id, {field_name: amount}, {})
+        return updated
+
+    def add_currency_to_all(self, currency: str, amount: int) -> int:
+        self.flush()
+        affected = super().add_currency_to_all(currency, amount)
+        self._invalidate_all()
+        return affected
+
+    def deduct_currency_from_all(self, currency: str, amount: int) -> Tuple[int, int]:
+        # 扣除数量取决于当前余额，先写回待写修改
+        self.flush()
+        result = super().deduct_currency_from_all(currency, amount)
+        self._invalidate_all()
+        return result
+
+    def delete_user(self, user_id: str) -> bool:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._dirty_ids.discard(user_id)
+            self._stale_ids.discard(user_id)
+        return super().delete_user(user_id)
+
+    # --- 写回 ---
+    def flush(self) -> int:
+        """立即写回所有待写修改，返回写回的用户数"""
+        with self._lock:
+            user_ids = list(self._dirty_ids)
+        if not user_ids:
+            return 0
+        return self._flush_users(user_ids)
+
+    def _flush_users(self, user_ids: List[str]) -> int:
+        started = time.perf_counter()
+        # 在用户锁内取出待写修改，写库时不持有用户锁
+        pending: List[Tuple[User, User]] = []
+        for user_id in user_ids:
+            with self._user_lock(user_id):
+                with self._lock:
+                    master = self._entries.get(user_id) if user_id in self._dirty_ids else None
+                    self._dirty_ids.discard(user_id)
+                if master is None or not master.get_dirty_fields():
+                    continue
+                flush_copy = copy.copy(master)
+                object.__setattr__(flush_copy, "_dirty", master.get_dirty_fields())
+                master.mark_clean()
+                pending.append((master, flush_copy))
+        if not pending:
+            return 0
+
+        outer_transaction = self._connection_manager.in_transaction()
+        try:
+            with self._connection_manager.transaction():
+                for _, flush_copy in pending:
+                    SqliteUserRepository.update(self, flush_copy)
+        except Exception as e:
+            self._restore_pending(pending)
+            with self._lock:
+                self._stats["flush_errors"] += 1
+            logger.error(f"写回用户缓存失败: {e}")
+            raise
+        if outer_transaction:
+            # 在外层事务中写回时，外层回滚需要恢复待写修改
+            self._connection_manager.on_rollback(lambda: self._restore_pending(pending))
+
+        with self._lock:
+            self._stats["flushes"] += 1
+            self._stats["flushed_users"] += len(pending)
+            self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            if not outer_transaction:
+                # 已写回的过期用户不再需要保留
+                for master, _ in pending:
+                    if master.user_id in self._stale_ids and master.user_id not in self._dirty_ids:
+                        self._entries.pop(master.user_id, None)
+                        self._stale_ids.discard(master.user_id)
+                self._evict_overflow()
+        return len(pending)
+
+    def _restore_pending(self, pending: List[Tuple[User, User]]) -> None:
+        """写回失败时恢复修改记录，等待下次写回（更早的原始值优先）"""
+        for master, flush_copy in pending:
+            with self._user_lock(master.user_id):
+                object.__setattr__(master, "_dirty", {**master.get_dirty_fields(), **flush_copy.get_dirty_fields()})
+            with self._lock:
+                self._entries.setdefault(master.user_id, master)
+                self._dirty_ids.add(master.user_id)
+
+    def start_flush_task(self):
+        """启动用户缓存写回的后台线程。"""
+        if self.flush_thread and self.flush_thread.is_alive():
+            return
+        self.flush_running = True
+        self._stop_event.clear()
+        self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+
+    def stop_flush_task(self):
+        """停止后台写回线程，并写回剩余的修改。"""
+        self.flush_running = False
+        self._stop_event.set()
+        if self.flush_thread:
+            self.flush_thread.join(timeout=1.0)
+        self.flush()
+
+    def _flush_loop(self):
+        """用户缓存写回循环任务。"""
+        while self.flush_running:
+            self._stop_event.wait(self.flush_interval_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"用户缓存写回任务出错: {e}")
+                logger.error("堆栈信息:", exc_info=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_users"] = len(self._entries)
+            stats["dirty_users"] = len(self._dirty_ids)
+            return stats
@@ -1,27 +1,22 @@
 import sqlite3
-import threading
-from typing import Optional, List
+from typing import Optional, List, Dict, Set, Tuple, Any
 from datetime import datetime
 
 # 导入抽象基类和领域模型
 from .abstract_repository import AbstractAchievementRepository, UserAchievementProgress
 from ..domain.models import Achievement
+from ..database.connection_manager import DatabaseConnectionManager
 
 class SqliteAchievementRepository(AbstractAchievementRepository):
     """成就数据仓储的SQLite实现"""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
         self.db_path = db_path
-        self._local = threading.local()
+        self._connection_manager = connection_manager or DatabaseConnectionManager(db_path)
 
-    def _get_connection(self) -> sqlite3.Connection:
-        conn = getattr(self._local, "connection", None)
-        if conn is None:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON;")
-            self._local.connection = conn
-        return conn
+    def _get_connection(self):
+        """从共享连接池获取一个数据库连接（上下文管理器）。"""
+        return self._connection_manager.get_connection()
 
     def _row_to_achievement(self, row: sqlite3.Row) -> Optional[Achievement]:
         if not row:
@@ -150,3 +145,76 @@ class SqliteAchievementRepository(AbstractAchievementRepository):
             cursor = conn.cursor()
             cursor.execute(query, (user_id, rarity))
             return cursor.fetchone() is not None
+
+    # --- 批量检查方法（全量扫描时一次取出所有用户的数据） ---
+
+    def get_all_unique_fish_counts(self) -> Dict[str, int]:
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT user_id, COUNT(DISTINCT fish_id) FROM user_fish_inventory GROUP BY user_id")
+            return {row[0]: row[1] for row in cursor.fetchall()}
+
+    def get_all_garbage_counts(self) -> Dict[str, int]:
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # 垃圾定义：稀有度为1且基础价值<=2
+            cursor.execute("""
+                SELECT ufi.user_id, SUM(ufi.quantity) FROM user_fish_inventory ufi
+                JOIN fish f ON ufi.fish_id = f.fish_id
+                WHERE f.rarity = 1 AND f.base_value <= 2
+                GROUP BY ufi.user_id
+            """)
+            return {row[0]: row[1] or 0 for row in cursor.fetchall()}
+
+    def get_all_owned_rarities(self, item_type: str) -> Dict[str, Set[int]]:
+        if item_type == "rod":
+            query = """
+                SELECT DISTINCT ur.user_id, r.rarity FROM user_rods ur JOIN rods r ON ur.rod_id = r.rod_id
+            """
+        elif item_type == "accessory":
+            query = """
+                SELECT DISTINCT ua.user_id, a.rarity FROM user_accessories ua JOIN accessories a ON ua.accessory_id = a.accessory_id
+            """
+        else:
+            return {}
+
+        rarities: Dict[str, Set[int]] = {}
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            for user_id, rarity in cursor.fetchall():
+                rarities.setdefault(user_id, set()).add(rarity)
+        return rarities
+
+    def get_heavy_fish_user_ids(self, weight: int) -> Set[str]:
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT DISTINCT user_id FROM fishing_records WHERE weight >= ?", (weight,))
+            return {row[0] for row in cursor.fetchall()}
+
+    def get_all_completed_achievements(self) -> Dict[str, Set[int]]:
+        completed: Dict[str, Set[int]] = {}
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT user_id, achievement_id FROM user_achievement_progress
+                WHERE completed_at IS NOT NULL
+            """)
+            for user_id, achievement_id in cursor.fetchall():
+                completed.setdefault(user_id, set()).add(achievement_id)
+        return completed
+
+    def complete_achievements(self, records: List[Tuple[str, int, Any, datetime]]) -> None:
+        """批量写入成就完成记录；已有完成时间的记录保留原完成时间"""
+        if not records:
+            return
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO user_achievement_progress (user_id, achievement_id, current_progress, completed_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id, achievement_id) DO UPDATE SET
+                    current_progress = excluded.current_progress,
+                    completed_at = COALESCE(user_achievement_progress.completed_at, excluded.completed_at)
+            """, records)
+            conn.commit()
@@ -1,5 +1,5 @@
+import random
 import sqlite3
-import threading
 from typing import Optional, List, Dict, Any, Set
 from datetime import datetime
 import json
@@ -19,12 +19,12 @@ class InsufficientFishQuantityError(Exception):
 class SqliteInventoryRepository(AbstractInventoryRepository):
     """用户库存仓储的SQLite实现"""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
         self.db_path = db_path
-        self._connection_manager = DatabaseConnectionManager(db_path)
+        self._connection_manager = connection_manager or DatabaseConnectionManager(db_path)
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取一个线程安全的数据库连接。"""
+    def _get_connection(self):
+        """从共享连接池获取一个数据库连接（上下文管理器）。"""
         return self._connection_manager.get_connection()
 
     # --- 私有映射辅助方法 ---
@@ -88,6 +88,20 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
             cursor.execute("SELECT user_id, fish_id, quality_level, quantity FROM user_fish_inventory WHERE user_id = ? AND quantity > 0", (user_id,))
             return [self._row_to_fish_item(row) for row in cursor.fetchall()]
 
+    def get_fish_counts_by_users(self, user_ids: List[str]) -> Dict[str, int]:
+        """批量统计多个用户鱼塘中的鱼总数，返回 user_id -> 数量"""
+        if not user_ids:
+            return {}
+        placeholders = ", ".join(["?"] * len(user_ids))
+        with self._connection_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT user_id, SUM(quantity) AS total FROM user_fish_inventory
+                WHERE user_id IN ({placeholders}) AND quantity > 0
+                GROUP BY user_id
+            """, tuple(user_ids))
+            return {row["user_id"]: row["total"] or 0 for row in cursor.fetchall()}
+
     def get_fish_inventory_value(self, user_id: str, rarity: Optional[int] = None) -> int:
         query = """
             SELECT SUM(f.base_value * ufi.quantity * (1 + ufi.quality_level))
@@ -241,6 +255,32 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
             row = cursor.fetchone()
             return self._row_to_accessory_instance(row) if row else None
 
+    def get_equipped_rods_by_users(self, user_ids: List[str]) -> Dict[str, UserRodInstance]:
+        """批量获取多个用户当前装备的钓竿实例，返回 user_id -> 实例"""
+        if not user_ids:
+            return {}
+        placeholders = ", ".join(["?"] * len(user_ids))
+        with self._connection_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT * FROM user_rods
+                WHERE user_id IN ({placeholders}) AND is_equipped = 1
+            """, tuple(user_ids))
+            return {row["user_id"]: self._row_to_rod_instance(row) for row in cursor.fetchall()}
+
+    def get_equipped_accessories_by_users(self, user_ids: List[str]) -> Dict[str, UserAccessoryInstance]:
+        """批量获取多个用户当前装备的配件实例，返回 user_id -> 实例"""
+        if not user_ids:
+            return {}
+        placeholders = ", ".join(["?"] * len(user_ids))
+        with self._connection_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT * FROM user_accessories
+                WHERE user_id IN ({placeholders}) AND is_equipped = 1
+            """, tuple(user_ids))
+            return {row["user_id"]: self._row_to_accessory_instance(row) for row in cursor.fetchall()}
+
     def set_equipment_status(self, user_id: str, rod_instance_id: Optional[int] = None, accessory_instance_id: Optional[int] = None) -> None:
         """
         设置用户的装备状态。
@@ -316,6 +356,22 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
             cursor.execute("SELECT bait_id, quantity FROM user_bait_inventory WHERE user_id = ?", (user_id,))
             return {row["bait_id"]: row["quantity"] for row in cursor.fetchall()}
 
+    def get_bait_inventories_by_users(self, user_ids: List[str]) -> Dict[str, Dict[int, int]]:
+        """批量获取多个用户的诱饵库存，返回 user_id -> {bait_id: quantity}"""
+        result: Dict[str, Dict[int, int]] = {}
+        if not user_ids:
+            return result
+        placeholders = ", ".join(["?"] * len(user_ids))
+        with self._connection_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT user_id, bait_id, quantity FROM user_bait_inventory WHERE user_id IN ({placeholders})",
+                tuple(user_ids),
+            )
+            for row in cursor.fetchall():
+                result.setdefault(row["user_id"], {})[row["bait_id"]] = row["quantity"]
+        return result
+
     def update_bait_quantity(self, user_id: str, bait_id: int, delta: int) -> None:
         """更新用户诱饵库存中特定诱饵的数量（可增可减），并确保数量不小于0。"""
         with self._connection_manager.get_connection() as conn:
@@ -382,6 +438,47 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
                 is_equipped=False, obtained_at=now, current_durability=durability, refine_level=refine_level, is_locked=False
             )
 
+    def grant_item_to_all(self, item_type: str, item_id: int, quantity: int, durability: Optional[int] = None) -> int:
+        """
+        用集合操作给所有用户发放物品，在一个事务内完成。
+
+        道具和鱼饵使用 INSERT ... SELECT ... ON CONFLICT 累加数量；
+        鱼竿和饰品为每个用户插入 quantity 个实例。
+        """
+        now = datetime.now()
+        with self._connection_manager.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM users")
+            user_count = cursor.fetchone()[0]
+            if item_type == "item":
+                # WHERE true 用于消除 INSERT ... SELECT ... ON CONFLICT 的语法歧义
+                cursor.execute("""
+                    INSERT INTO user_items (user_id, item_id, quantity)
+                    SELECT user_id, ?, ? FROM users WHERE true
+                    ON CONFLICT(user_id, item_id) DO UPDATE SET quantity = quantity + excluded.quantity
+                """, (item_id, quantity))
+            elif item_type == "bait":
+                cursor.execute("""
+                    INSERT INTO user_bait_inventory (user_id, bait_id, quantity)
+                    SELECT user_id, ?, ? FROM users WHERE true
+                    ON CONFLICT(user_id, bait_id) DO UPDATE SET quantity = quantity + excluded.quantity
+                """, (item_id, quantity))
+            elif item_type == "rod":
+                cursor.execute("""
+                    WITH RECURSIVE copies(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM copies WHERE n < ?)
+                    INSERT INTO user_rods (user_id, rod_id, current_durability, obtained_at, refine_level, is_equipped, is_locked)
+                    SELECT u.user_id, ?, ?, ?, 1, 0, 0 FROM users u CROSS JOIN copies
+                """, (quantity, item_id, durability, now))
+            elif item_type == "accessory":
+                cursor.execute("""
+                    WITH RECURSIVE copies(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM copies WHERE n < ?)
+                    INSERT INTO user_accessories (user_id, accessory_id, obtained_at, refine_level, is_equipped, is_locked)
+                    SELECT u.user_id, ?, ?, 1, 0, 0 FROM users u CROSS JOIN copies
+                """, (quantity, item_id, now))
+            else:
+                raise ValueError(f"不支持的物品类型: {item_type}")
+            return user_count
+
     def delete_rod_instance(self, rod_instance_id: int) -> None:
         with self._connection_manager.get_connection() as conn:
             cursor = conn.cursor()
@@ -429,6 +526,48 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
             cursor.execute("DELETE FROM user_fish_inventory WHERE user_id = ? AND quantity <= 0", (user_id,))
             conn.commit()
 
+    def remove_random_fish(self, user_id: str, count: int) -> int:
+        """
+        随机移除用户鱼塘中的 count 条鱼，返回实际移除的数量。
+
+        每移除一条都在当前仍有鱼的堆叠（鱼种+品质）中等概率选择一个，堆叠清空后不再参与选择，
+        与逐条移除的语义一致；选择在内存中完成，最后一次性批量写回。
+        """
+        if count <= 0:
+            return 0
+        with self._connection_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT fish_id, quality_level, quantity FROM user_fish_inventory WHERE user_id = ? AND quantity > 0",
+                (user_id,),
+            )
+            stacks = [[row["fish_id"], row["quality_level"], row["quantity"]] for row in cursor.fetchall()]
+            remaining = list(range(len(stacks)))
+            removed: Dict[int, int] = {}
+            for _ in range(count):
+                if not remaining:
+                    break  # 鱼塘已经空了
+                pos = random.randrange(len(remaining))
+                idx = remaining[pos]
+                removed[idx] = removed.get(idx, 0) + 1
+                stacks[idx][2] -= 1
+                if stacks[idx][2] <= 0:
+                    # 与末尾交换后弹出，O(1) 移除已清空的堆叠
+                    remaining[pos] = remaining[-1]
+                    remaining.pop()
+
+            if removed:
+                cursor.executemany(
+                    """
+                    UPDATE user_fish_inventory SET quantity = MAX(0, quantity - ?)
+                    WHERE user_id = ? AND fish_id = ? AND quality_level = ?
+                    """,
+                    [(n, user_id, stacks[idx][0], stacks[idx][1]) for idx, n in removed.items()],
+                )
+                cursor.execute("DELETE FROM user_fish_inventory WHERE user_id = ? AND quantity <= 0", (user_id,))
+                conn.commit()
+            return sum(removed.values())
+
     def get_zone_by_id(self, zone_id: int) -> FishingZone:
         """根据ID获取钓鱼区域信息"""
         with self._connection_manager.get_connection() as conn:
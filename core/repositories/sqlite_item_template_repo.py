@@ -1,26 +1,21 @@
 import sqlite3
-import threading
 from typing import Optional, List, Dict, Any
 
 # 导入抽象基类和领域模型
 from .abstract_repository import AbstractItemTemplateRepository
 from ..domain.models import Fish, Rod, Bait, Accessory, Title, Item
+from ..database.connection_manager import DatabaseConnectionManager
 
 class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
     """物品模板仓储的SQLite实现"""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
         self.db_path = db_path
-        self._local = threading.local()
+        self._connection_manager = connection_manager or DatabaseConnectionManager(db_path)
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取一个线程安全的数据库连接。"""
-        conn = getattr(self._local, "connection", None)
-        if conn is None:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            self._local.connection = conn
-        return conn
+    def _get_connection(self):
+        """从共享连接池获取一个数据库连接（上下文管理器），该仓储沿用不启用外键约束的行为。"""
+        return self._connection_manager.get_connection(foreign_keys=False)
 
     # --- 私有映射辅助方法 ---
     def _row_to_fish(self, row: sqlite3.Row) -> Optional[Fish]:
@@ -175,10 +170,13 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
             cursor.execute("SELECT * FROM fish ORDER BY rarity DESC, base_value DESC")
             return [self._row_to_fish(row) for row in cursor.fetchall()]
 
-    def get_random_fish(self) -> Optional[Fish]:
+    def get_random_fish(self, rarity: Optional[int] = None) -> Optional[Fish]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM fish ORDER BY RANDOM() LIMIT 1")
+            if rarity is None:
+                cursor.execute("SELECT * FROM fish ORDER BY RANDOM() LIMIT 1")
+            else:
+                cursor.execute("SELECT * FROM fish WHERE rarity = ? ORDER BY RANDOM() LIMIT 1", (rarity,))
             row = cursor.fetchone()
             return self._row_to_fish(row) if row else None
 
@@ -188,6 +186,20 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
             cursor.execute("SELECT * FROM fish WHERE rarity = ?", (rarity,))
             return [self._row_to_fish(row) for row in cursor.fetchall()]
 
+    def get_zone_fishes(self, fish_ids: List[int], rarity: Optional[int] = None) -> List[Fish]:
+        if not fish_ids:
+            return []
+        placeholders = ", ".join(["?"] * len(fish_ids))
+        query = f"SELECT * FROM fish WHERE fish_id IN ({placeholders})"
+        params = list(fish_ids)
+        if rarity is not None:
+            query += " AND rarity = ?"
+            params.append(rarity)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return [self._row_to_fish(row) for row in cursor.fetchall()]
+
     # --- Rod Read Methods ---
     def get_rod_by_id(self, rod_id: int) -> Optional[Rod]:
         with self._get_connection() as conn:
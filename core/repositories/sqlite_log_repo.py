@@ -1,29 +1,23 @@
 import sqlite3
-import threading
 from typing import Optional, List, Dict
 from datetime import date, datetime, timedelta, timezone
 # 导入抽象基类和领域模型
 from .abstract_repository import AbstractLogRepository
 from ..domain.models import FishingRecord, GachaRecord, WipeBombLog, TaxRecord, UserFishStat
+from ..database.connection_manager import DatabaseConnectionManager
 
 class SqliteLogRepository(AbstractLogRepository):
     """日志类数据仓储的SQLite实现"""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
         self.db_path = db_path
-        self._local = threading.local()
+        self._connection_manager = connection_manager or DatabaseConnectionManager(db_path)
         # 定义UTC+8时区
         self.UTC8 = timezone(timedelta(hours=8))
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取一个线程安全的数据库连接。"""
-        conn = getattr(self._local, "connection", None)
-        if conn is None:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON;")
-            self._local.connection = conn
-        return conn
+    def _get_connection(self):
+        """从共享连接池获取一个数据库连接（上下文管理器）。"""
+        return self._connection_manager.get_connection()
 
     # --- 私有映射辅助方法 ---
     def _row_to_fishing_record(self, row: sqlite3.Row) -> Optional[FishingRecord]:
@@ -105,34 +99,73 @@ class SqliteLogRepository(AbstractLogRepository):
                 ),
             )
 
-            # 2) 仅保留当前用户最近10条记录（按时间倒序，时间相同按record_id倒序）
-            cursor.execute(
-                """
-                DELETE FROM fishing_records
-                WHERE user_id = ?
-                  AND record_id NOT IN (
-                    SELECT record_id FROM fishing_records
-                    WHERE user_id = ?
-                    ORDER BY timestamp DESC, record_id DESC
-                    LIMIT 50
-                  )
-                """,
-                (record.user_id, record.user_id),
-            )
+            conn.commit()
+            return True
 
-            # 3) 清理30天前的历史记录（全局）
-            cutoff_time = datetime.now(self.UTC8) - timedelta(days=30)
+
+    def trim_fishing_records_per_user(self, keep: int, batch_size: int = 100) -> int:
+        """
+        每个用户只保留最近 keep 条钓鱼记录（按时间倒序，时间相同按record_id倒序）。
+
+        先找出超出上限的用户，再按 batch_size 个用户一个事务分批删除，避免长时间占用写锁。
+        返回删除的行数。
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
             cursor.execute(
                 """
-                DELETE FROM fishing_records
-                WHERE timestamp < ?
+                SELECT user_id FROM fishing_records
+                GROUP BY user_id
+                HAVING COUNT(*) > ?
                 """,
-                (cutoff_time,),
+                (keep,),
             )
-
-            conn.commit()
-            return True
-
+            user_ids = [row[0] for row in cursor.fetchall()]
+
+        removed = 0
+        for i in range(0, len(user_ids), batch_size):
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                for user_id in user_ids[i:i + batch_size]:
+                    cursor.execute(
+                        """
+                        DELETE FROM fishing_records
+                        WHERE user_id = ?
+                          AND record_id NOT IN (
+                            SELECT record_id FROM fishing_records
+                            WHERE user_id = ?
+                            ORDER BY timestamp DESC, record_id DESC
+                            LIMIT ?
+                          )
+                        """,
+                        (user_id, user_id, keep),
+                    )
+                    removed += cursor.rowcount
+                conn.commit()
+        return removed
+
+    def delete_fishing_records_before(self, cutoff: datetime, batch_size: int = 1000) -> int:
+        """分批删除 cutoff 之前的钓鱼记录，每批一个事务，返回删除的行数"""
+        removed = 0
+        while True:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    DELETE FROM fishing_records
+                    WHERE record_id IN (
+                        SELECT record_id FROM fishing_records
+                        WHERE timestamp < ?
+                        LIMIT ?
+                    )
+                    """,
+                    (cutoff, batch_size),
+                )
+                deleted = cursor.rowcount
+                conn.commit()
+            removed += deleted
+            if deleted < batch_size:
+                return removed
 
     def get_unlocked_fish_ids(self, user_id: str) -> Dict[int, datetime]:
         """
@@ -164,30 +197,39 @@ class SqliteLogRepository(AbstractLogRepository):
 
     # --- Gacha Log Methods ---
     def add_gacha_record(self, record: GachaRecord) -> None:
+        self.add_gacha_records([record])
+
+    def add_gacha_records(self, records: List[GachaRecord]) -> None:
+        """批量写入抽卡记录，写入后对涉及的用户统一裁剪一次"""
+        if not records:
+            return
         with self._get_connection() as conn:
             cursor = conn.cursor()
             # 1) 写入抽卡记录
-            cursor.execute(
+            cursor.executemany(
                 """
                 INSERT INTO gacha_records (
                     user_id, gacha_pool_id, item_type, item_id,
                     item_name, quantity, rarity, timestamp
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 """,
-                (
-                    record.user_id,
-                    record.gacha_pool_id,
-                    record.item_type,
-                    record.item_id,
-                    record.item_name,
-                    record.quantity,
-                    record.rarity,
-                    record.timestamp or datetime.now(self.UTC8),
-                ),
+                [
+                    (
+                        record.user_id,
+                        record.gacha_pool_id,
+                        record.item_type,
+                        record.item_id,
+                        record.item_name,
+                        record.quantity,
+                        record.rarity,
+                        record.timestamp or datetime.now(self.UTC8),
+                    )
+                    for record in records
+                ],
             )
 
-            # 2) 仅保留当前用户最近10条抽卡记录
-            cursor.execute(
+            # 2) 仅保留每个用户最近50条抽卡记录
+            cursor.executemany(
                 """
                 DELETE FROM gacha_records
                 WHERE user_id = ?
@@ -198,7 +240,7 @@ class SqliteLogRepository(AbstractLogRepository):
                     LIMIT 50
                   )
                 """,
-                (record.user_id, record.user_id),
+                [(user_id, user_id) for user_id in dict.fromkeys(r.user_id for r in records)],
             )
 
             # 3) 清理30天前的抽卡记录（全局）
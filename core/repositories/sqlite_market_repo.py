@@ -1,6 +1,5 @@
 import sqlite3
-import threading
-from typing import Optional, List, Tuple, Any
+from typing import Optional, List, Tuple, Any, Dict, FrozenSet
 from datetime import datetime
 
 from astrbot.api import logger
@@ -14,23 +13,71 @@ from ..database.connection_manager import DatabaseConnectionManager
 class SqliteMarketRepository(AbstractMarketRepository):
     """市场仓储的SQLite实现"""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
         self.db_path = db_path
-        self.db_manager = DatabaseConnectionManager(db_path)
-        self._local = threading.local()
+        self._connection_manager = connection_manager or DatabaseConnectionManager(db_path)
+        # market 表的列名，首次使用时探测一次；表结构只在启动迁移时变化
+        self._market_columns: Optional[FrozenSet[str]] = None
+        self._listing_select_sql: Optional[str] = None
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取一个线程安全的数据库连接。"""
-        conn = getattr(self._local, "connection", None)
-        if conn is None:
-            conn = sqlite3.connect(
-                self.db_path, 
-                detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
-            )
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON;")
-            self._local.connection = conn
-        return conn
+    def _get_connection(self):
+        """从共享连接池获取一个数据库连接（上下文管理器）。"""
+        return self._connection_manager.get_connection()
+
+    def _get_market_columns(self, cursor) -> FrozenSet[str]:
+        """获取 market 表的列名（缓存）"""
+        if self._market_columns is None:
+            cursor.execute("PRAGMA table_info(market)")
+            self._market_columns = frozenset(row[1] for row in cursor.fetchall())
+        return self._market_columns
+
+    def _get_listing_select(self, cursor) -> str:
+        """构建带物品名称和卖家昵称的挂单查询（不含 WHERE，缓存）"""
+        if self._listing_select_sql is None:
+            cols = self._get_market_columns(cursor)
+            select_instance_id = "m.item_instance_id" if "item_instance_id" in cols else "NULL AS item_instance_id"
+            select_is_anonymous = "m.is_anonymous" if "is_anonymous" in cols else "0 AS is_anonymous"
+            select_quality_level = "m.quality_level" if "quality_level" in cols else "0 AS quality_level"
+            self._listing_select_sql = f"""
+                SELECT
+                    m.market_id,
+                    m.user_id,
+                    u.nickname AS seller_nickname,
+                    m.item_type,
+                    m.item_id,
+                    {select_instance_id},
+                    m.quantity,
+                    m.price,
+                    m.refine_level,
+                    m.listed_at,
+                    {select_is_anonymous},
+                    {select_quality_level},
+                    CASE
+                        WHEN m.item_type = 'rod' THEN r.name
+                        WHEN m.item_type = 'accessory' THEN a.name
+                        WHEN m.item_type = 'item' THEN i.name
+                        WHEN m.item_type = 'fish' THEN f.name
+                        WHEN m.item_type = 'commodity' THEN c.name
+                        ELSE '未知物品'
+                    END AS item_name,
+                    CASE
+                        WHEN m.item_type = 'rod' THEN r.description
+                        WHEN m.item_type = 'accessory' THEN a.description
+                        WHEN m.item_type = 'item' THEN i.description
+                        WHEN m.item_type = 'fish' THEN f.description
+                        WHEN m.item_type = 'commodity' THEN c.description
+                        ELSE ''
+                    END AS item_description,
+                    m.expires_at
+                FROM market m
+                JOIN users u ON m.user_id = u.user_id
+                LEFT JOIN rods r ON m.item_type = 'rod' AND m.item_id = r.rod_id
+                LEFT JOIN accessories a ON m.item_type = 'accessory' AND m.item_id = a.accessory_id
+                LEFT JOIN items i ON m.item_type = 'item' AND m.item_id = i.item_id
+                LEFT JOIN fish f ON m.item_type = 'fish' AND m.item_id = f.fish_id
+                LEFT JOIN commodities c ON m.item_type = 'commodity' AND m.item_id = c.commodity_id
+            """
+        return self._listing_select_sql
 
     def _row_to_market_listing(self, row: sqlite3.Row) -> Optional[MarketListing]:
         """将数据库行对象映射到 MarketListing 领域模型。"""
@@ -84,82 +131,88 @@ class SqliteMarketRepository(AbstractMarketRepository):
 
     def get_listing_by_id(self, market_id: int) -> Optional[MarketListing]:
         """获取单个市场商品"""
-        with self.db_manager.get_connection() as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
-
-            # 检查表结构
-            cursor.execute("PRAGMA table_info(market)")
-            cols = [row[1] for row in cursor.fetchall()]
-            
-            # 动态构建查询
-            select_instance_id = "m.item_instance_id" if "item_instance_id" in cols else "NULL AS item_instance_id"
-            select_is_anonymous = "m.is_anonymous" if "is_anonymous" in cols else "0 AS is_anonymous"
-            select_quality_level = "m.quality_level" if "quality_level" in cols else "0 AS quality_level"
-
-            query = f"""
-                SELECT
-                    m.market_id,
-                    m.user_id,
-                    u.nickname AS seller_nickname,
-                    m.item_type,
-                    m.item_id,
-                    {select_instance_id},
-                    m.quantity,
-                    m.price,
-                    m.refine_level,
-                    m.listed_at,
-                    {select_is_anonymous},
-                    {select_quality_level},
-                    CASE
-                        WHEN m.item_type = 'rod' THEN r.name
-                        WHEN m.item_type = 'accessory' THEN a.name
-                        WHEN m.item_type = 'item' THEN i.name
-                        WHEN m.item_type = 'fish' THEN f.name
-                        WHEN m.item_type = 'commodity' THEN c.name
-                        ELSE '未知物品'
-                    END AS item_name,
-                    CASE
-                        WHEN m.item_type = 'rod' THEN r.description
-                        WHEN m.item_type = 'accessory' THEN a.description
-                        WHEN m.item_type = 'item' THEN i.description
-                        WHEN m.item_type = 'fish' THEN f.description
-                        WHEN m.item_type = 'commodity' THEN c.description
-                        ELSE ''
-                    END AS item_description,
-                    m.expires_at
-                FROM market m
-                JOIN users u ON m.user_id = u.user_id
-                LEFT JOIN rods r ON m.item_type = 'rod' AND m.item_id = r.rod_id
-                LEFT JOIN accessories a ON m.item_type = 'accessory' AND m.item_id = a.accessory_id
-                LEFT JOIN items i ON m.item_type = 'item' AND m.item_id = i.item_id
-                LEFT JOIN fish f ON m.item_type = 'fish' AND m.item_id = f.fish_id
-                LEFT JOIN commodities c ON m.item_type = 'commodity' AND m.item_id = c.commodity_id
-                WHERE m.market_id = ?
-            """
-            
+            query = self._get_listing_select(cursor) + " WHERE m.market_id = ?"
             cursor.execute(query, (market_id,))
             row = cursor.fetchone()
             return self._row_to_market_listing(row)
 
+    def find_market_id_by_instance(self, item_type: str, item_instance_id: int) -> Optional[int]:
+        """按物品类型和实例ID查找挂单ID"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT market_id FROM market WHERE item_type = ? AND item_instance_id = ? LIMIT 1",
+                (item_type, item_instance_id),
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def find_market_id_by_item(self, item_type: str, item_id: int) -> Optional[int]:
+        """按物品类型和模板ID查找最新的挂单ID"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT market_id FROM market
+                WHERE item_type = ? AND item_id = ?
+                ORDER BY listed_at DESC
+                LIMIT 1
+                """,
+                (item_type, item_id),
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def get_listings_by_user(self, user_id: str) -> List[MarketListing]:
+        """获取某个用户的所有挂单，按上架时间倒序"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            query = self._get_listing_select(cursor) + " WHERE m.user_id = ? ORDER BY m.listed_at DESC"
+            cursor.execute(query, (user_id,))
+            return [self._row_to_market_listing(row) for row in cursor.fetchall()]
+
+    def delete_rotten_commodity_listings(self, now: datetime, limit: int) -> int:
+        """删除最多 limit 条已腐败的大宗商品挂单，返回删除数量"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                DELETE FROM market WHERE market_id IN (
+                    SELECT market_id FROM market
+                    WHERE item_type = 'commodity' AND expires_at < ?
+                    LIMIT ?
+                )
+                """,
+                (now, limit),
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def get_listings_listed_before(self, cutoff: datetime, limit: int, offset: int = 0) -> List[MarketListing]:
+        """按上架时间升序获取 cutoff 之前上架的挂单"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            query = self._get_listing_select(cursor) + """
+                WHERE m.listed_at < ?
+                ORDER BY m.listed_at, m.market_id
+                LIMIT ? OFFSET ?
+            """
+            cursor.execute(query, (cutoff, limit, offset))
+            return [self._row_to_market_listing(row) for row in cursor.fetchall()]
+
     def get_all_listings(self, page: int = None, per_page: int = None, 
                         item_type: str = None, min_price: int = None, 
-                        max_price: int = None, search: str = None) -> tuple:
+                        max_price: int = None, search: str = None,
+                        rarity: int = None, quality_level: int = None) -> tuple:
         """
         获取市场商品，支持筛选和分页。
         返回 (listings, total_count) 元组。
         """
-        with self.db_manager.get_connection() as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
 
-            # 检查表结构
-            cursor.execute("PRAGMA table_info(market)")
-            cols = [row[1] for row in cursor.fetchall()]
-
-            # 动态构建查询
-            select_instance_id = "m.item_instance_id" if "item_instance_id" in cols else "NULL AS item_instance_id"
-            select_is_anonymous = "m.is_anonymous" if "is_anonymous" in cols else "0 AS is_anonymous"
-            select_quality_level = "m.quality_level" if "quality_level" in cols else "0 AS quality_level"
-            
             # 构建WHERE条件
             where_conditions = []
             params = []
@@ -175,6 +228,15 @@ class SqliteMarketRepository(AbstractMarketRepository):
             if max_price is not None:
                 where_conditions.append("m.price <= ?")
                 params.append(max_price)
+
+            if rarity is not None:
+                # 各模板表按物品类型连接，最多只有一个非空
+                where_conditions.append("COALESCE(r.rarity, a.rarity, i.rarity, f.rarity) = ?")
+                params.append(rarity)
+
+            if quality_level is not None and "quality_level" in self._get_market_columns(cursor):
+                where_conditions.append("m.quality_level = ?")
+                params.append(quality_level)
                 
             if search:
                 # 搜索商品名称和卖家昵称
@@ -208,44 +270,7 @@ class SqliteMarketRepository(AbstractMarketRepository):
             total_count = cursor.fetchone()[0]
             
             # 构建主查询
-            query = f"""
-                SELECT
-                    m.market_id,
-                    m.user_id,
-                    u.nickname AS seller_nickname,
-                    m.item_type,
-                    m.item_id,
-                    {select_instance_id},
-                    m.quantity,
-                    m.price,
-                    m.refine_level,
-                    m.listed_at,
-                    {select_is_anonymous},
-                    {select_quality_level},
-                    CASE
-                        WHEN m.item_type = 'rod' THEN r.name
-                        WHEN m.item_type = 'accessory' THEN a.name
-                        WHEN m.item_type = 'item' THEN i.name
-                        WHEN m.item_type = 'fish' THEN f.name
-                        WHEN m.item_type = 'commodity' THEN c.name
-                        ELSE '未知物品'
-                    END AS item_name,
-                    CASE
-                        WHEN m.item_type = 'rod' THEN r.description
-                        WHEN m.item_type = 'accessory' THEN a.description
-                        WHEN m.item_type = 'item' THEN i.description
-                        WHEN m.item_type = 'fish' THEN f.description
-                        WHEN m.item_type = 'commodity' THEN c.description
-                        ELSE ''
-                    END AS item_description,
-                    m.expires_at
-                FROM market m
-                JOIN users u ON m.user_id = u.user_id
-                LEFT JOIN rods r ON m.item_type = 'rod' AND m.item_id = r.rod_id
-                LEFT JOIN accessories a ON m.item_type = 'accessory' AND m.item_id = a.accessory_id
-                LEFT JOIN items i ON m.item_type = 'item' AND m.item_id = i.item_id
-                LEFT JOIN fish f ON m.item_type = 'fish' AND m.item_id = f.fish_id
-                LEFT JOIN commodities c ON m.item_type = 'commodity' AND m.item_id = c.commodity_id
+            query = self._get_listing_select(cursor) + f"""
                 WHERE {where_clause}
                 ORDER BY m.listed_at DESC
             """
@@ -262,14 +287,20 @@ class SqliteMarketRepository(AbstractMarketRepository):
             
             return listings, total_count
 
+    def count_listings_by_type(self) -> Dict[str, int]:
+        """按物品类型统计挂单数量"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT item_type, COUNT(*) FROM market GROUP BY item_type")
+            return {row[0]: row[1] for row in cursor.fetchall()}
+
     def add_listing(self, listing: MarketListing) -> None:
         """添加一个市场商品"""
-        with self.db_manager.get_connection() as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
             # 检查表结构，确定哪些字段存在
-            cursor.execute("PRAGMA table_info(market)")
-            cols = [row[1] for row in cursor.fetchall()]
+            cols = self._get_market_columns(cursor)
             
             # 构建动态的INSERT语句
             if "is_anonymous" in cols and "item_instance_id" in cols and "quality_level" in cols:
@@ -368,14 +399,22 @@ class SqliteMarketRepository(AbstractMarketRepository):
 
     def remove_listing(self, market_id: int) -> None:
         """移除一个市场商品（通常在购买成功或下架后调用）"""
-        with self.db_manager.get_connection() as conn:
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM market WHERE market_id = ?", (market_id,))
+            conn.commit()
+
+    def claim_listing(self, market_id: int) -> bool:
+        """删除挂单并返回是否由本次调用删除；应在处理货款和物品的同一事务中调用"""
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM market WHERE market_id = ?", (market_id,))
             conn.commit()
+            return cursor.rowcount == 1
 
     def update_listing(self, listing: MarketListing) -> None:
         """更新市场商品信息"""
-        with self.db_manager.get_connection() as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE market 
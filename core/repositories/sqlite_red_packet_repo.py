@@ -3,30 +3,25 @@
 """
 
 import sqlite3
-import threading
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 from astrbot.api import logger
 
 from ..domain.models import RedPacket, RedPacketRecord
+from ..database.connection_manager import DatabaseConnectionManager
 
 
 class SqliteRedPacketRepository:
     """红包数据仓储的SQLite实现"""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
         self.db_path = db_path
-        self._local = threading.local()
+        self._connection_manager = connection_manager or DatabaseConnectionManager(db_path)
 
-    def _get_connection(self) -> sqlite3.Connection:
-        conn = getattr(self._local, "connection", None)
-        if conn is None:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON;")
-            self._local.connection = conn
-        return conn
+    def _get_connection(self):
+        """从共享连接池获取一个数据库连接（上下文管理器）。"""
+        return self._connection_manager.get_connection()
 
     def _parse_datetime(self, dt_val):
         """解析日期时间"""
@@ -96,6 +91,94 @@ class SqliteRedPacketRepository:
             conn.commit()
             return cursor.lastrowid
 
+    def create_red_packet_slots(self, packet_id: int, amounts: List[int]) -> None:
+        """写入预先拆分好的红包份额"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT INTO red_packet_slots (packet_id, slot_index, amount) VALUES (?, ?, ?)",
+                [(packet_id, index, amount) for index, amount in enumerate(amounts)],
+            )
+            conn.commit()
+
+    def claim_slot(self, packet_id: int, user_id: str, now: datetime) -> Optional[Tuple[int, int]]:
+        """
+        抢占红包的下一份。
+
+        第一条语句就是条件更新，事务一开始即持有写锁，避免读后升级写锁时的锁冲突；
+        红包已过期、已抢光或用户已领取过时不更新任何行。
+
+        Returns:
+            (领取金额, 红包剩余份数)，未抢到时返回 None。
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE red_packet_slots SET claimed_by = ?, claimed_at = ?
+                WHERE packet_id = ? AND claimed_by IS NULL
+                  AND slot_index = (
+                      SELECT MIN(slot_index) FROM red_packet_slots
+                      WHERE packet_id = ? AND claimed_by IS NULL
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM red_packet_records WHERE packet_id = ? AND user_id = ?
+                  )
+                  AND EXISTS (
+                      SELECT 1 FROM red_packets
+                      WHERE packet_id = ? AND is_expired = 0 AND expires_at > ?
+                  )
+            """, (user_id, now, packet_id, packet_id, packet_id, user_id, packet_id, now))
+            if cursor.rowcount == 0:
+                return None
+            cursor.execute(
+                "SELECT amount FROM red_packet_slots WHERE packet_id = ? AND claimed_by = ?",
+                (packet_id, user_id),
+            )
+            amount = cursor.fetchone()[0]
+            cursor.execute("""
+                INSERT INTO red_packet_records (packet_id, user_id, amount, claimed_at)
+                VALUES (?, ?, ?, ?)
+            """, (packet_id, user_id, amount, now))
+            cursor.execute("""
+                UPDATE red_packets SET
+                    remaining_amount = remaining_amount - ?,
+                    remaining_count = remaining_count - 1,
+                    is_expired = CASE WHEN remaining_count <= 1 THEN 1 ELSE is_expired END
+                WHERE packet_id = ?
+            """, (amount, packet_id))
+            cursor.execute("SELECT remaining_count FROM red_packets WHERE packet_id = ?", (packet_id,))
+            remaining_count = cursor.fetchone()[0]
+            conn.commit()
+            return amount, remaining_count
+
+    def revoke_red_packet(self, packet_id: int) -> Optional[int]:
+        """
+        撤回红包：标记过期并删除未领取的份额。
+
+        Returns:
+            应退还的金额；红包已过期或已抢光时返回 None。
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE red_packets SET is_expired = 1
+                WHERE packet_id = ? AND is_expired = 0 AND remaining_count > 0
+            """, (packet_id,))
+            if cursor.rowcount == 0:
+                return None
+            cursor.execute("SELECT remaining_amount FROM red_packets WHERE packet_id = ?", (packet_id,))
+            refund_amount = cursor.fetchone()[0]
+            cursor.execute(
+                "UPDATE red_packets SET remaining_count = 0, remaining_amount = 0 WHERE packet_id = ?",
+                (packet_id,),
+            )
+            cursor.execute(
+                "DELETE FROM red_packet_slots WHERE packet_id = ? AND claimed_by IS NULL",
+                (packet_id,),
+            )
+            conn.commit()
+            return refund_amount
+
     def get_red_packet_by_id(self, packet_id: int) -> Optional[RedPacket]:
         """根据ID获取红包"""
         with self._get_connection() as conn:
@@ -104,15 +187,15 @@ class SqliteRedPacketRepository:
             row = cursor.fetchone()
             return self._row_to_red_packet(row)
 
-    def get_active_red_packets_in_group(self, group_id: str) -> List[RedPacket]:
+    def get_active_red_packets_in_group(self, group_id: str, now: Optional[datetime] = None) -> List[RedPacket]:
         """获取群组中的活跃红包"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM red_packets 
-                WHERE group_id = ? AND is_expired = 0 AND remaining_count > 0
+                WHERE group_id = ? AND is_expired = 0 AND remaining_count > 0 AND expires_at > ?
                 ORDER BY created_at DESC
-            """, (group_id,))
+            """, (group_id, now or datetime.now()))
             return [self._row_to_red_packet(row) for row in cursor.fetchall()]
 
     def update_red_packet(self, packet: RedPacket) -> None:
@@ -205,12 +288,16 @@ class SqliteRedPacketRepository:
             if not packet_ids:
                 return 0
             
-            # 删除这些红包的领取记录
+            # 删除这些红包的领取记录与份额
             placeholders = ','.join('?' * len(packet_ids))
             cursor.execute(f"""
                 DELETE FROM red_packet_records 
                 WHERE packet_id IN ({placeholders})
             """, packet_ids)
+            cursor.execute(f"""
+                DELETE FROM red_packet_slots
+                WHERE packet_id IN ({placeholders})
+            """, packet_ids)
             
             # 删除红包本身
             cursor.execute(f"""
@@ -276,6 +363,10 @@ class SqliteRedPacketRepository:
                 SET is_expired = 1, remaining_count = 0, remaining_amount = 0
                 WHERE packet_id IN ({placeholders})
             """, packet_ids)
+            cursor.execute(f"""
+                DELETE FROM red_packet_slots
+                WHERE packet_id IN ({placeholders}) AND claimed_by IS NULL
+            """, packet_ids)
             
             conn.commit()
             
@@ -313,6 +404,7 @@ class SqliteRedPacketRepository:
                 SET is_expired = 1, remaining_count = 0, remaining_amount = 0
                 WHERE is_expired = 0 AND remaining_amount > 0
             """)
+            cursor.execute("DELETE FROM red_packet_slots WHERE claimed_by IS NULL")
             
             conn.commit()
             
@@ -341,12 +433,16 @@ class SqliteRedPacketRepository:
             if not packet_ids:
                 return 0
             
-            # 删除领取记录
+            # 删除领取记录与份额
             placeholders = ','.join('?' * len(packet_ids))
             cursor.execute(f"""
                 DELETE FROM red_packet_records 
                 WHERE packet_id IN ({placeholders})
             """, packet_ids)
+            cursor.execute(f"""
+                DELETE FROM red_packet_slots
+                WHERE packet_id IN ({placeholders})
+            """, packet_ids)
             
             # 删除红包
             cursor.execute("""
@@ -382,8 +478,9 @@ class SqliteRedPacketRepository:
             cursor.execute("SELECT COUNT(*) FROM red_packets")
             count = cursor.fetchone()[0]
             
-            # 删除所有领取记录
+            # 删除所有领取记录与份额
             cursor.execute("DELETE FROM red_packet_records")
+            cursor.execute("DELETE FROM red_packet_slots")
             
             # 删除所有红包
             cursor.execute("DELETE FROM red_packets")
@@ -399,44 +496,13 @@ class SqliteRedPacketRepository:
             
             return count
 
-    def cleanup_expired_red_packets(self) -> int:
+    def cleanup_expired_red_packets(self, days_to_keep: int = 1) -> int:
         """
-        清理所有过期红包（已过期24小时以上的）
+        清理过期红包：标记已到期的红包，并删除过期超过保留天数的红包及其记录
         
         Returns:
-            清理的红包数量
+            本次标记为过期的红包数量
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # 查找过期红包（已过期24小时以上）
-            from datetime import datetime, timedelta
-            expired_time = datetime.now() - timedelta(hours=24)
-            
-            cursor.execute("""
-                SELECT id FROM red_packets
-                WHERE expired_at < ? AND status IN ('active', 'expired')
-            """, (expired_time,))
-            
-            expired_packets = cursor.fetchall()
-            
-            if not expired_packets:
-                return 0
-            
-            # 删除过期红包及其领取记录
-            packet_ids = [p[0] for p in expired_packets]
-            placeholders = ','.join(['?'] * len(packet_ids))
-            
-            cursor.execute(f"""
-                DELETE FROM red_packet_records WHERE red_packet_id IN ({placeholders})
-            """, packet_ids)
-            
-            cursor.execute(f"""
-                DELETE FROM red_packets WHERE id IN ({placeholders})
-            """, packet_ids)
-            
-            conn.commit()
-            
-            logger.info(f"已清理 {len(packet_ids)} 个过期红包")
-            
-            return len(packet_ids)
+        expired_count = self.expire_old_packets(datetime.now())
+        self.clean_old_red_packets(days_to_keep)
+        return expired_count
@@ -0,0 +1,123 @@
+"""
+骰宝对局数据仓储层
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from typing import Optional, List
+
+from ..domain.models import SicboBet, SicboGame
+from ..database.connection_manager import DatabaseConnectionManager
+
+
+class SqliteSicboRepository:
+    """骰宝对局数据仓储的SQLite实现"""
+
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
+        self.db_path = db_path
+        self._connection_manager = connection_manager or DatabaseConnectionManager(db_path)
+
+    def _get_connection(self):
+        """从共享连接池获取一个数据库连接（上下文管理器）。"""
+        return self._connection_manager.get_connection()
+
+    def _parse_datetime(self, dt_val):
+        """解析日期时间"""
+        if isinstance(dt_val, datetime):
+            return dt_val
+        if isinstance(dt_val, str):
+            try:
+                return datetime.fromisoformat(dt_val.replace("Z", "+00:00"))
+            except ValueError:
+                try:
+                    return datetime.strptime(dt_val, "%Y-%m-%d %H:%M:%S.%f")
+                except ValueError:
+                    return None
+        return None
+
+    def _row_to_game(self, row: sqlite3.Row) -> SicboGame:
+        return SicboGame(
+            game_id=row["game_id"],
+            start_time=self._parse_datetime(row["start_time"]),
+            end_time=self._parse_datetime(row["end_time"]),
+            total_pot=row["total_pot"],
+            is_active=not row["is_settled"],
+            is_settled=bool(row["is_settled"]),
+            dice_result=json.loads(row["dice_result"]) if row["dice_result"] else None,
+            session_id=row["session_id"],
+            session_info=json.loads(row["session_info"]) if row["session_info"] else None,
+        )
+
+    def create_game(self, game: SicboGame) -> None:
+        """保存新开的对局"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO sicbo_games
+                (game_id, session_id, start_time, end_time, total_pot, is_settled, session_info)
+                VALUES (?, ?, ?, ?, ?, 0, ?)
+            """, (
+                game.game_id, game.session_id, game.start_time, game.end_time, game.total_pot,
+                json.dumps(game.session_info, ensure_ascii=False) if game.session_info else None,
+            ))
+            conn.commit()
+
+    def add_bet(self, game_id: str, bet: SicboBet) -> None:
+        """记录一笔下注；同一用户同一类型的下注合并金额"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO sicbo_bets (game_id, user_id, bet_type, amount, odds, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(game_id, user_id, bet_type) DO UPDATE SET
+                    amount = amount + excluded.amount,
+                    created_at = excluded.created_at
+            """, (game_id, bet.user_id, bet.bet_type, bet.amount, bet.odds, bet.created_at))
+            cursor.execute(
+                "UPDATE sicbo_games SET total_pot = total_pot + ? WHERE game_id = ?",
+                (bet.amount, game_id),
+            )
+            conn.commit()
+
+    def get_unsettled_games(self) -> List[SicboGame]:
+        """获取所有未结算的对局（含下注明细），用于启动时恢复"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM sicbo_games WHERE is_settled = 0 ORDER BY end_time")
+            games = {row["game_id"]: self._row_to_game(row) for row in cursor.fetchall()}
+            if not games:
+                return []
+            cursor.execute("""
+                SELECT b.* FROM sicbo_bets b
+                JOIN sicbo_games g ON g.game_id = b.game_id
+                WHERE g.is_settled = 0
+                ORDER BY b.bet_id
+            """)
+            for row in cursor.fetchall():
+                games[row["game_id"]].bets.append(SicboBet(
+                    user_id=row["user_id"],
+                    bet_type=row["bet_type"],
+                    amount=row["amount"],
+                    odds=row["odds"],
+                    created_at=self._parse_datetime(row["created_at"]),
+                ))
+            return list(games.values())
+
+    def mark_game_settled(self, game: SicboGame, total_payout: int, duration_ms: float) -> bool:
+        """
+        标记对局已结算并删除其下注明细。
+        只有仍未结算的对局会被更新，返回 False 表示对局已被结算过。
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE sicbo_games
+                SET is_settled = 1, dice_result = ?, total_payout = ?, settled_at = ?, settle_duration_ms = ?
+                WHERE game_id = ? AND is_settled = 0
+            """, (json.dumps(game.dice_result), total_payout, datetime.now(), duration_ms, game.game_id))
+            if cursor.rowcount == 0:
+                return False
+            cursor.execute("DELETE FROM sicbo_bets WHERE game_id = ?", (game.game_id,))
+            conn.commit()
+            return True
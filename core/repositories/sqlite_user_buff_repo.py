@@ -1,30 +1,24 @@
 import sqlite3
-import threading
 import json
-from typing import List, Optional
+from typing import List, Optional, Dict
 from datetime import datetime
 
 from ..domain.models import UserBuff
 from .abstract_repository import AbstractUserBuffRepository
 from ..utils import get_now
+from ..database.connection_manager import DatabaseConnectionManager
 
 DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
 class SqliteUserBuffRepository(AbstractUserBuffRepository):
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
         self.db_path = db_path
-        self._local = threading.local()
+        self._connection_manager = connection_manager or DatabaseConnectionManager(db_path)
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取一个线程安全的数据库连接。"""
-        conn = getattr(self._local, "connection", None)
-        if conn is None:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON;")
-            self._local.connection = conn
-        return conn
+    def _get_connection(self):
+        """从共享连接池获取一个数据库连接（上下文管理器）。"""
+        return self._connection_manager.get_connection()
 
     def _to_domain(self, row: sqlite3.Row) -> UserBuff:
         # 处理 started_at 字段
@@ -114,6 +108,26 @@ class SqliteUserBuffRepository(AbstractUserBuffRepository):
             rows = cursor.fetchall()
             return [self._to_domain(row) for row in rows]
 
+    def get_all_active_by_users(self, user_ids: List[str]) -> Dict[str, List[UserBuff]]:
+        """批量获取多个用户的有效 Buff，返回 user_id -> Buff 列表"""
+        result: Dict[str, List[UserBuff]] = {}
+        if not user_ids:
+            return result
+        placeholders = ", ".join(["?"] * len(user_ids))
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT id, user_id, buff_type, payload, started_at, expires_at
+                FROM user_buffs
+                WHERE user_id IN ({placeholders}) AND (expires_at IS NULL OR expires_at > ?)
+                """,
+                (*user_ids, get_now().strftime(DATETIME_FORMAT)),
+            )
+            for row in cursor.fetchall():
+                result.setdefault(row["user_id"], []).append(self._to_domain(row))
+        return result
+
     def delete_expired(self):
         with self._get_connection() as conn:
             cursor = conn.cursor()
@@ -1,29 +1,24 @@
 import dataclasses
 import sqlite3
-import threading
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 from astrbot.api import logger
 
 from ..domain.models import User, TaxRecord
 from .abstract_repository import AbstractUserRepository
+from ..database.connection_manager import DatabaseConnectionManager
 
 class SqliteUserRepository(AbstractUserRepository):
     """用户数据仓储的SQLite实现"""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, connection_manager: Optional[DatabaseConnectionManager] = None):
         self.db_path = db_path
-        self._local = threading.local()
+        self._connection_manager = connection_manager or DatabaseConnectionManager(db_path)
 
-    def _get_connection(self) -> sqlite3.Connection:
-        conn = getattr(self._local, "connection", None)
-        if conn is None:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON;")
-            self._local.connection = conn
-        return conn
+    def _get_connection(self):
+        """从共享连接池获取一个数据库连接（上下文管理器）。"""
+        return self._connection_manager.get_connection()
 
     def _row_to_user(self, row: sqlite3.Row) -> Optional[User]:
         """
@@ -52,7 +47,7 @@ class SqliteUserRepository(AbstractUserRepository):
         # 使用 .keys() 检查字段是否存在，确保向后兼容性
         row_keys = row.keys()
         
-        return User(
+        user = User(
             user_id=row["user_id"],
             nickname=row["nickname"],
             coins=row["coins"],
@@ -104,6 +99,8 @@ class SqliteUserRepository(AbstractUserRepository):
             # --- [新功能] 添加交易所账户状态字段的读取 ---
             exchange_account_status=bool(row["exchange_account_status"]) if "exchange_account_status" in row_keys else False,
         )
+        user.mark_clean()
+        return user
 
     def get_by_id(self, user_id: str) -> Optional[User]:
         with self._get_connection() as conn:
@@ -112,6 +109,16 @@ class SqliteUserRepository(AbstractUserRepository):
             row = cursor.fetchone()
             return self._row_to_user(row)
 
+    def get_by_ids(self, user_ids: List[str]) -> Dict[str, User]:
+        """批量获取用户，返回 user_id -> User 的字典（不存在的用户不包含在内）"""
+        if not user_ids:
+            return {}
+        placeholders = ", ".join(["?"] * len(user_ids))
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM users WHERE user_id IN ({placeholders})", tuple(user_ids))
+            return {row["user_id"]: self._row_to_user(row) for row in cursor.fetchall()}
+
     def check_exists(self, user_id: str) -> bool:
         with self._get_connection() as conn:
             cursor = conn.cursor()
@@ -131,24 +138,63 @@ class SqliteUserRepository(AbstractUserRepository):
             cursor = conn.cursor()
             cursor.execute(sql, tuple(values))
             conn.commit()
+        user.mark_clean()
 
     def update(self, user: User) -> None:
         """
-        [已修正] 更新一个现有的用户记录。
-        这个版本是动态的，可以处理 User 模型中的所有字段，未来扩展也无需修改。
-        自动更新 max_coins 如果当前金币数超过历史最高。
+        更新一个现有的用户记录，只写回被修改过的字段。
+        累加字段以 col = col + 增量 的形式写入，max_coins 只增不减；
+        未被追踪的对象（非仓储加载）按整行写入。
         """
         # 自动更新历史最高金币数
         if user.coins > user.max_coins:
             user.max_coins = user.coins
-        
+
+        if not user.is_tracked():
+            self._update_all_fields(user)
+            return
+
+        dirty = user.get_dirty_fields()
+        if not dirty:
+            return
+
+        assignments = []
+        values: List[Any] = []
+        for field_name, original in dirty.items():
+            if field_name in ("user_id", "max_coins"):
+                continue
+            current = getattr(user, field_name)
+            if field_name in User.COUNTER_FIELDS and original is not None:
+                delta = current - original
+                if delta:
+                    assignments.append(f"{field_name} = {field_name} + ?")
+                    values.append(delta)
+            elif current != original:
+                assignments.append(f"{field_name} = ?")
+                values.append(current)
+
+        coins_delta = user.coins - dirty["coins"] if dirty.get("coins") is not None else 0
+        if coins_delta > 0 or "max_coins" in dirty:
+            # 右侧表达式读取的是更新前的行，MAX 保证并发下历史最高值不回退
+            assignments.append("max_coins = MAX(max_coins, ?, coins + ?)")
+            values.extend([user.max_coins, coins_delta])
+
+        if not assignments:
+            user.mark_clean()
+            return
+
+        values.append(user.user_id)
+        sql = f"UPDATE users SET {', '.join(assignments)} WHERE user_id = ?"
+        self._execute_update(user, sql, values)
+
+    def _update_all_fields(self, user: User) -> None:
         fields = [f.name for f in dataclasses.fields(User) if f.name != 'user_id']
         set_clause = ", ".join([f"{field} = ?" for field in fields])
         values = [getattr(user, field) for field in fields]
         values.append(user.user_id)
-        
-        sql = f"UPDATE users SET {set_clause} WHERE user_id = ?"
+        self._execute_update(user, f"UPDATE users SET {set_clause} WHERE user_id = ?", values)
 
+    def _execute_update(self, user: User, sql: str, values: List[Any]) -> None:
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
@@ -158,10 +204,50 @@ class SqliteUserRepository(AbstractUserRepository):
                     self.add(user) # 如果更新失败（比如用户不存在），则尝试添加
                 else:
                     conn.commit()
+                    user.mark_clean()
         except sqlite3.Error as e:
             logger.error(f"更新用户 {user.user_id} 数据时发生数据库错误: {e}")
             raise
 
+    def increment_counters(self, user_id: str, deltas: Dict[str, int]) -> bool:
+        """以 col = col + ? 的形式原子地累加计数字段，无需先读取用户"""
+        invalid = set(deltas) - User.COUNTER_FIELDS
+        if invalid:
+            raise ValueError(f"不支持增量更新的字段: {', '.join(sorted(invalid))}")
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return True
+        assignments = [f"{name} = {name} + ?" for name in deltas]
+        values: List[Any] = list(deltas.values())
+        if deltas.get("coins", 0) > 0:
+            assignments.append("max_coins = MAX(max_coins, coins + ?)")
+            values.append(deltas["coins"])
+        values.append(user_id)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"UPDATE users SET {', '.join(assignments)} WHERE user_id = ?", tuple(values))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def increment_counter_for_users(self, field_name: str, amounts: Dict[str, int]) -> int:
+        """一次 executemany 给多个用户累加同一个计数字段，返回更新的用户数"""
+        if field_name not in User.COUNTER_FIELDS:
+            raise ValueError(f"不支持增量更新的字段: {field_name}")
+        amounts = {user_id: amount for user_id, amount in amounts.items() if amount}
+        if not amounts:
+            return 0
+        if field_name == "coins":
+            sql = "UPDATE users SET coins = coins + ?, max_coins = MAX(max_coins, coins + ?) WHERE user_id = ?"
+            params = [(amount, amount, user_id) for user_id, amount in amounts.items()]
+        else:
+            sql = f"UPDATE users SET {field_name} = {field_name} + ? WHERE user_id = ?"
+            params = [(amount, user_id) for user_id, amount in amounts.items()]
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(sql, params)
+            conn.commit()
+            return cursor.rowcount
+
     def get_all_user_ids(self, auto_fishing_only: bool = False) -> List[str]:
         query = "SELECT user_id FROM users"
         if auto_fishing_only:
@@ -171,6 +257,43 @@ class SqliteUserRepository(AbstractUserRepository):
             cursor.execute(query)
             return [row["user_id"] for row in cursor.fetchall()]
 
+    # 批量操作允许修改的货币字段
+    _CURRENCY_COLUMNS = ("coins", "premium_currency")
+
+    def add_currency_to_all(self, currency: str, amount: int) -> int:
+        """一条 UPDATE 给所有用户增加货币；金币同时维护历史最高金币数"""
+        if currency not in self._CURRENCY_COLUMNS:
+            raise ValueError(f"不支持的货币类型: {currency}")
+        if currency == "coins":
+            sql = "UPDATE users SET coins = coins + ?, max_coins = MAX(max_coins, coins + ?)"
+            params = (amount, amount)
+        else:
+            sql = f"UPDATE users SET {currency} = {currency} + ?"
+            params = (amount,)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            affected = cursor.rowcount
+            conn.commit()
+            return affected
+
+    def deduct_currency_from_all(self, currency: str, amount: int) -> Tuple[int, int]:
+        """在一个事务内统计并扣除所有用户的货币，每人至多扣除 amount，不低于0"""
+        if currency not in self._CURRENCY_COLUMNS:
+            raise ValueError(f"不支持的货币类型: {currency}")
+        with self._connection_manager.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(MIN({currency}, ?)), 0) FROM users WHERE {currency} > 0",
+                (amount,),
+            )
+            affected, total = cursor.fetchone()
+            cursor.execute(
+                f"UPDATE users SET {currency} = {currency} - MIN({currency}, ?) WHERE {currency} > 0",
+                (amount,),
+            )
+            return affected, total
+
     def _get_top_users_base_query(self, order_by_column: str, limit: int) -> List[User]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
@@ -1,8 +1,11 @@
 import threading
 import time
+import queue
 import pkgutil
 import inspect
 import sqlite3
+from collections import OrderedDict
+from contextlib import nullcontext
 from typing import Dict, Any, List, Optional, Set
 from datetime import datetime
 from astrbot.api import logger
@@ -16,7 +19,24 @@ from ..repositories.abstract_repository import (
     AbstractLogRepository
 )
 from ..domain.models import User
+from ..database.connection_manager import DatabaseConnectionManager
 from ..achievements.base import BaseAchievement, UserContext
+from .event_bus import EventBus, DomainEvent, FISH_CAUGHT, FISH_INVENTORY_CHANGED, EQUIPMENT_ACQUIRED
+
+# 「庞然大物」成就的重量阈值（克）
+HEAVY_FISH_WEIGHT = 100000
+
+
+class _UserAchievementState:
+    """事件驱动检查时缓存的用户状态：成就上下文、鱼塘中的鱼种集合与已完成的成就"""
+
+    __slots__ = ("context", "fish_ids", "completed")
+
+    def __init__(self, context: UserContext, fish_ids: Set[int], completed: Set[int]):
+        self.context = context
+        self.fish_ids = fish_ids
+        self.completed = completed
+
 
 class AchievementService:
     """实现可插拔的成就系统"""
@@ -27,7 +47,9 @@ class AchievementService:
         user_repo: AbstractUserRepository,
         inventory_repo: AbstractInventoryRepository,
         item_template_repo: AbstractItemTemplateRepository,
-        log_repo: AbstractLogRepository
+        log_repo: AbstractLogRepository,
+        event_bus: Optional[EventBus] = None,
+        connection_manager: Optional[DatabaseConnectionManager] = None,
     ):
         self.achievement_repo = achievement_repo
         self.user_repo = user_repo
@@ -36,10 +58,28 @@ class AchievementService:
         self.log_repo = log_repo
 
         self.achievements: List[BaseAchievement] = self._load_achievements()
+        self.event_bus = event_bus or EventBus()
+        self.connection_manager = connection_manager
 
         self.achievement_check_thread: Optional[threading.Thread] = None
         self.achievement_check_running = False
 
+        # 事件驱动检查：服务发布的事件入队，由后台线程按用户合并后只检查订阅了这些事件的成就
+        self._event_queue: "queue.Queue[Optional[DomainEvent]]" = queue.Queue()
+        self._achievements_by_event: Dict[str, List[BaseAchievement]] = {}
+        for ach in self.achievements:
+            for event_name in ach.trigger_events:
+                self._achievements_by_event.setdefault(event_name, []).append(ach)
+        for event_name in self._achievements_by_event:
+            self.event_bus.subscribe(event_name, self._event_queue.put)
+        # 最近活跃用户的状态缓存（LRU），计数随事件增量更新
+        self._states: "OrderedDict[str, _UserAchievementState]" = OrderedDict()
+        self.max_cached_states = 2048
+        self.max_events_per_batch = 1000
+        # 兜底全量检查间隔，覆盖后台管理修改数据等不发布事件的途径
+        self.full_scan_interval_seconds = 3600
+        self.full_scan_batch_size = 500
+
     def _load_achievements(self) -> List[BaseAchievement]:
         """动态扫描并加载所有成就类。"""
         loaded_achievements = []
@@ -54,6 +94,18 @@ class AchievementService:
         logger.info(f"成功加载 {len(loaded_achievements)} 个成就模块。")
         return loaded_achievements
 
+    def _transaction(self):
+        if self.connection_manager is None:
+            return nullcontext()
+        return self.connection_manager.transaction()
+
+    def _publish_after_commit(self, name: str, user_id: str, **data) -> None:
+        """奖励与完成记录在同一事务中写入，事件在事务提交后发布"""
+        if self.connection_manager is None:
+            self.event_bus.publish(name, user_id, **data)
+            return
+        self.connection_manager.after_commit(lambda: self.event_bus.publish(name, user_id, **data))
+
     def _build_user_context(self, user_id: str) -> Optional[UserContext]:
         """为用户构建一个包含所有检查所需数据的上下文对象。"""
         user = self.user_repo.get_by_id(user_id)
@@ -80,7 +132,7 @@ class AchievementService:
             min_wipe_bomb_multiplier=user.min_wipe_bomb_multiplier, # <--- 采用优化后的实现
             owned_rod_rarities=owned_rod_rarities,
             owned_accessory_rarities=owned_accessory_rarities,
-            has_heavy_fish=self.achievement_repo.has_caught_heavy_fish(user_id, 100000)
+            has_heavy_fish=self.achievement_repo.has_caught_heavy_fish(user_id, HEAVY_FISH_WEIGHT)
         )
 
     def _grant_reward(self, user: User, achievement: BaseAchievement) -> bool:
@@ -173,6 +225,9 @@ class AchievementService:
         
         for _ in range(reward_quantity):
             self.inventory_repo.add_rod_instance(user.user_id, reward_value, rod_template.durability)
+        self._publish_after_commit(
+            EQUIPMENT_ACQUIRED, user.user_id, item_type="rod", item_id=reward_value, rarity=rod_template.rarity
+        )
         logger.info(f"已为用户 {user.user_id} 添加 {reward_quantity} 个 {rod_template.name} (ID: {reward_value})。")
         return True
 
@@ -185,6 +240,10 @@ class AchievementService:
         
         for _ in range(reward_quantity):
             self.inventory_repo.add_accessory_instance(user.user_id, reward_value)
+        self._publish_after_commit(
+            EQUIPMENT_ACQUIRED, user.user_id,
+            item_type="accessory", item_id=reward_value, rarity=accessory_template.rarity
+        )
         logger.info(f"已为用户 {user.user_id} 添加 {reward_quantity} 个 {accessory_template.name} (ID: {reward_value})。")
         return True
             
@@ -201,48 +260,217 @@ class AchievementService:
     def stop_achievement_check_task(self):
         """停止成就检查的后台线程。"""
         self.achievement_check_running = False
+        # 放入空事件唤醒阻塞在队列上的线程
+        self._event_queue.put(None)
         if self.achievement_check_thread:
             self.achievement_check_thread.join(timeout=1.0)
 
     def _achievement_check_loop(self):
-        """成就检查循环任务。"""
+        """成就检查循环任务：等待事件并即时检查，定期执行一次兜底全量检查。"""
+        next_full_scan = time.monotonic()  # 启动时先全量检查一次，覆盖停机期间的变化
         while self.achievement_check_running:
             try:
-                all_user_ids = self.user_repo.get_all_user_ids()
-                for user_id in all_user_ids:
-                    self._process_user_achievements(user_id)
-                time.sleep(600) # 10分钟检查一次
+                timeout = max(0.0, next_full_scan - time.monotonic())
+                try:
+                    first_event = self._event_queue.get(timeout=timeout)
+                except queue.Empty:
+                    first_event = None
+                if not self.achievement_check_running:
+                    break
+                if first_event is not None:
+                    self._process_events(self._drain_events(first_event))
+                if time.monotonic() >= next_full_scan:
+                    self._run_full_scan()
+                    next_full_scan = time.monotonic() + self.full_scan_interval_seconds
             except Exception as e:
                 logger.error(f"成就检查任务出错: {e}")
                 logger.error("堆栈信息:", exc_info=True)
                 time.sleep(60)
 
-    def _process_user_achievements(self, user_id: str):
-        """处理单个用户的成就检查和发放流程。"""
-        user_context = self._build_user_context(user_id)
-        if not user_context:
-            return
+    def _run_full_scan(self):
+        """
+        兜底全量检查所有用户。
 
-        user_progress = self.achievement_repo.get_user_progress(user_id)
+        各项统计通过少量 GROUP BY 查询一次取出，用户数据按批读取。
+        每批用户的奖励与成就完成记录在同一事务中写入（完成记录使用 executemany），
+        单个用户出错时只回滚该用户的奖励。
+        """
+        started = time.perf_counter()
+        unique_fish_counts = self.achievement_repo.get_all_unique_fish_counts()
+        garbage_counts = self.achievement_repo.get_all_garbage_counts()
+        rod_rarities = self.achievement_repo.get_all_owned_rarities("rod")
+        accessory_rarities = self.achievement_repo.get_all_owned_rarities("accessory")
+        heavy_fish_users = self.achievement_repo.get_heavy_fish_user_ids(HEAVY_FISH_WEIGHT)
+        completed_by_user = self.achievement_repo.get_all_completed_achievements()
+        all_achievement_ids = {ach.id for ach in self.achievements}
 
-        for ach in self.achievements:
-            # 如果成就已完成，则跳过
-            if user_progress.get(ach.id, {}).get("completed_at"):
+        all_user_ids = self.user_repo.get_all_user_ids()
+        unlocked_count = 0
+        for i in range(0, len(all_user_ids), self.full_scan_batch_size):
+            # 已完成全部成就的用户无需读取用户数据
+            batch_ids = [
+                user_id for user_id in all_user_ids[i:i + self.full_scan_batch_size]
+                if not all_achievement_ids <= completed_by_user.get(user_id, set())
+            ]
+            if not batch_ids:
                 continue
-            # 调用每个成就自己的检查方法
-            if ach.check(user_context):
-                # 如果成就完成，发放奖励并更新进度
-                # 无论奖励是否成功，成就都会解锁；如果奖励失败，记录错误信息供管理员处理
-                reward_success = self._grant_reward(user_context.user, ach)
-                if not reward_success:
-                    logger.error(
-                        f"【成就奖励发放失败，需要管理员手动处理】"
-                        f"用户ID: {user_id}, "
-                        f"成就名称: '{ach.name}' (ID: {ach.id}), "
-                        f"奖励信息: {ach.reward if hasattr(ach, 'reward') and ach.reward else '无奖励'}"
+            completions = []
+            with self._transaction():
+                for user_id, user in self.user_repo.get_by_ids(batch_ids).items():
+                    completed = completed_by_user.get(user_id, set())
+                    user_context = UserContext(
+                        user=user,
+                        unique_fish_count=unique_fish_counts.get(user_id, 0),
+                        garbage_count=garbage_counts.get(user_id, 0),
+                        max_wipe_bomb_multiplier=user.max_wipe_bomb_multiplier,
+                        min_wipe_bomb_multiplier=user.min_wipe_bomb_multiplier,
+                        owned_rod_rarities=rod_rarities.get(user_id, set()),
+                        owned_accessory_rarities=accessory_rarities.get(user_id, set()),
+                        has_heavy_fish=user_id in heavy_fish_users,
                     )
-                # 无论奖励是否成功，成就都会解锁
-                self.achievement_repo.update_user_progress(user_id, ach.id, ach.get_progress(user_context), completed_at=datetime.now())
+                    completion_mark = len(completions)
+                    try:
+                        with self._transaction():
+                            for ach in self.achievements:
+                                if ach.id in completed or not ach.check(user_context):
+                                    continue
+                                self._grant_reward_or_report(user_context, ach)
+                                completions.append((user_id, ach.id, ach.get_progress(user_context), datetime.now()))
+                    except Exception as e:
+                        # 该用户的奖励已回滚，不写入其完成记录，下次全量检查时重试
+                        del completions[completion_mark:]
+                        logger.error(f"全量检查用户 {user_id} 的成就出错，已回滚该用户的奖励: {e}", exc_info=True)
+                # 完成记录与本批奖励一同提交
+                self.achievement_repo.complete_achievements(completions)
+            unlocked_count += len(completions)
+
+        # 全量检查可能解锁了成就，缓存的状态作废
+        self._states.clear()
+        logger.info(
+            f"成就全量检查完成: {len(all_user_ids)} 个用户，解锁 {unlocked_count} 个成就，"
+            f"耗时 {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+
+    def _drain_events(self, first_event: DomainEvent) -> Dict[str, List[DomainEvent]]:
+        """取出队列中已有的事件（最多 max_events_per_batch 条），按用户分组"""
+        grouped: Dict[str, List[DomainEvent]] = {}
+        event = first_event
+        count = 0
+        while True:
+            if event is not None:
+                grouped.setdefault(event.user_id, []).append(event)
+                count += 1
+            if count >= self.max_events_per_batch:
+                break
+            try:
+                event = self._event_queue.get_nowait()
+            except queue.Empty:
+                break
+        return grouped
+
+    def _process_events(self, grouped: Dict[str, List[DomainEvent]]):
+        for user_id, events in grouped.items():
+            try:
+                self._process_user_events(user_id, events)
+            except Exception as e:
+                # 单个用户出错不影响其他用户，丢弃其缓存状态以便下次重建
+                self._states.pop(user_id, None)
+                logger.error(f"处理用户 {user_id} 的成就事件出错: {e}", exc_info=True)
+
+    def _process_user_events(self, user_id: str, events: List[DomainEvent]):
+        """根据一批事件增量更新用户状态，并只检查订阅了这些事件的未完成成就。"""
+        event_names = {event.name for event in events}
+        state = self._states.get(user_id)
+        if state is not None and FISH_INVENTORY_CHANGED in event_names:
+            # 出售、被偷等会减少鱼种和垃圾数量，无法增量推导，重新读取
+            state = None
+        if state is None:
+            # 事件在写入提交后发布，新建的状态已包含这些事件的影响，无需再叠加
+            state = self._build_state(user_id)
+            if state is None:
+                self._states.pop(user_id, None)
+                return
+        else:
+            user = self.user_repo.get_by_id(user_id)
+            if not user:
+                self._states.pop(user_id, None)
+                return
+            self._refresh_user(state.context, user)
+            for event in events:
+                self._apply_event(state, event)
+        self._remember_state(user_id, state)
+
+        checked: Set[int] = set()
+        for event_name in event_names:
+            for ach in self._achievements_by_event.get(event_name, ()):
+                if ach.id in checked or ach.id in state.completed:
+                    continue
+                checked.add(ach.id)
+                if ach.check(state.context):
+                    self._unlock_achievement(state.context, ach)
+                    state.completed.add(ach.id)
+
+    def _build_state(self, user_id: str) -> Optional[_UserAchievementState]:
+        context = self._build_user_context(user_id)
+        if not context:
+            return None
+        fish_ids = {item.fish_id for item in self.inventory_repo.get_fish_inventory(user_id)}
+        completed = {
+            achievement_id
+            for achievement_id, progress in self.achievement_repo.get_user_progress(user_id).items()
+            if progress.get("completed_at")
+        }
+        return _UserAchievementState(context, fish_ids, completed)
+
+    def _remember_state(self, user_id: str, state: _UserAchievementState):
+        self._states[user_id] = state
+        self._states.move_to_end(user_id)
+        while len(self._states) > self.max_cached_states:
+            self._states.popitem(last=False)
+
+    @staticmethod
+    def _refresh_user(context: UserContext, user: User):
+        context.user = user
+        context.max_wipe_bomb_multiplier = user.max_wipe_bomb_multiplier
+        context.min_wipe_bomb_multiplier = user.min_wipe_bomb_multiplier
+
+    @staticmethod
+    def _apply_event(state: _UserAchievementState, event: DomainEvent):
+        context = state.context
+        data = event.data
+        if event.name == FISH_CAUGHT:
+            state.fish_ids.add(data["fish_id"])
+            context.unique_fish_count = len(state.fish_ids)
+            # 垃圾定义：稀有度为1且基础价值<=2
+            if data["rarity"] == 1 and data["base_value"] <= 2:
+                context.garbage_count += data.get("quantity", 1)
+            if data["weight"] >= HEAVY_FISH_WEIGHT:
+                context.has_heavy_fish = True
+        elif event.name == EQUIPMENT_ACQUIRED:
+            if data["item_type"] == "rod":
+                context.owned_rod_rarities.add(data["rarity"])
+            elif data["item_type"] == "accessory":
+                context.owned_accessory_rarities.add(data["rarity"])
+
+    def _unlock_achievement(self, user_context: UserContext, ach: BaseAchievement):
+        """在同一事务中发放奖励并将成就标记为完成。"""
+        with self._transaction():
+            self._grant_reward_or_report(user_context, ach)
+            # 无论奖励是否成功，成就都会解锁
+            self.achievement_repo.update_user_progress(
+                user_context.user.user_id, ach.id, ach.get_progress(user_context), completed_at=datetime.now()
+            )
+
+    def _grant_reward_or_report(self, user_context: UserContext, ach: BaseAchievement):
+        """发放成就奖励；失败时记录错误信息供管理员处理（成就仍会解锁）"""
+        reward_success = self._grant_reward(user_context.user, ach)
+        if not reward_success:
+            logger.error(
+                f"【成就奖励发放失败，需要管理员手动处理】"
+                f"用户ID: {user_context.user.user_id}, "
+                f"成就名称: '{ach.name}' (ID: {ach.id}), "
+                f"奖励信息: {ach.reward if hasattr(ach, 'reward') and ach.reward else '无奖励'}"
+            )
                 
     # --- 成就相关的API接口 ---
 
@@ -3,6 +3,7 @@ from datetime import datetime
 
 from ..repositories.abstract_repository import AbstractInventoryRepository, AbstractUserRepository, AbstractItemTemplateRepository
 from ..domain.models import User, UserAquariumItem, AquariumUpgrade, Fish
+from .event_bus import EventBus, FISH_INVENTORY_CHANGED
 
 
 class AquariumService:
@@ -10,10 +11,12 @@ class AquariumService:
 
     def __init__(self, inventory_repo: AbstractInventoryRepository, 
                  user_repo: AbstractUserRepository, 
-                 item_template_repo: AbstractItemTemplateRepository):
+                 item_template_repo: AbstractItemTemplateRepository,
+                 event_bus: Optional[EventBus] = None):
         self.inventory_repo = inventory_repo
         self.user_repo = user_repo
         self.item_template_repo = item_template_repo
+        self.event_bus = event_bus or EventBus()
 
     def get_user_aquarium(self, user_id: str) -> Dict[str, Any]:
         """获取用户水族箱信息"""
@@ -85,6 +88,7 @@ class AquariumService:
         # 从鱼塘移除鱼，添加到水族箱（保持品质）
         self.inventory_repo.update_fish_quantity(user_id, fish_id, -quantity, quality_level)
         self.inventory_repo.add_fish_to_aquarium(user_id, fish_id, quantity, quality_level)
+        self.event_bus.publish(FISH_INVENTORY_CHANGED, user_id)
 
         quality_label = "✨高品质" if quality_level == 1 else "普通"
         return {
@@ -114,6 +118,7 @@ class AquariumService:
         # 从水族箱移除鱼，添加到鱼塘（保持品质）
         self.inventory_repo.remove_fish_from_aquarium(user_id, fish_id, quantity, quality_level)
         self.inventory_repo.add_fish_to_inventory(user_id, fish_id, quantity, quality_level)
+        self.event_bus.publish(FISH_INVENTORY_CHANGED, user_id)
 
         quality_label = "✨高品质" if quality_level == 1 else "普通"
         return {
@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class AutoFishingScheduler:
+    """
+    自动钓鱼调度器
+
+    以最小堆维护每个自动钓鱼用户的下一次可钓时间，每轮只弹出已到期的用户，
+    避免每次轮询都全表扫描。重新调度或移除采用惰性删除：
+    堆中过期的条目在弹出时与 ``_due`` 中的最新时间比对后丢弃。
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, str]] = []
+        self._due: Dict[str, float] = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+
+    def schedule(self, user_id: str, due_ts: float) -> None:
+        """设置（或覆盖）用户的下一次可钓时间"""
+        with self._cond:
+            self._due[user_id] = due_ts
+            heapq.heappush(self._heap, (due_ts, next(self._counter), user_id))
+            # 新的时间早于当前堆顶时唤醒等待中的调度线程
+            if self._heap[0][2] == user_id:
+                self._cond.notify_all()
+            self._compact_if_needed()
+
+    def remove(self, user_id: str) -> None:
+        """取消用户的调度（堆中的旧条目惰性丢弃）"""
+        with self._cond:
+            self._due.pop(user_id, None)
+            self._compact_if_needed()
+
+    def clear(self) -> None:
+        with self._cond:
+            self._heap.clear()
+            self._due.clear()
+
+    def __contains__(self, user_id: str) -> bool:
+        with self._cond:
+            return user_id in self._due
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._due)
+
+    def pop_due(self, now_ts: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """弹出所有（最多 limit 个）到期的用户ID，按到期时间先后排列"""
+        if now_ts is None:
+            now_ts = time.time()
+        due_users = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now_ts:
+                if limit is not None and len(due_users) >= limit:
+                    break
+                due_ts, _, user_id = heapq.heappop(self._heap)
+                if self._due.get(user_id) != due_ts:
+                    continue  # 已被重新调度或移除的旧条目
+                del self._due[user_id]
+                due_users.append(user_id)
+        return due_users
+
+    def next_due_in(self, now_ts: Optional[float] = None) -> Optional[float]:
+        """距离最近一个到期用户的秒数；没有待调度用户时返回 None"""
+        if now_ts is None:
+            now_ts = time.time()
+        with self._cond:
+            self._drop_stale_head()
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - now_ts)
+
+    def wait(self, max_wait: float) -> None:
+        """阻塞直到最近的用户到期、有更早的调度插入、被唤醒或超过 max_wait 秒"""
+        with self._cond:
+            self._drop_stale_head()
+            timeout = max_wait
+            if self._heap:
+                timeout = min(timeout, max(0.0, self._heap[0][0] - time.time()))
+            if timeout > 0:
+                self._cond.wait(timeout)
+
+    def wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _drop_stale_head(self) -> None:
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _compact_if_needed(self) -> None:
+        # 旧条目过多时重建堆，防止频繁重新调度导致堆无限增长
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [
+                (due_ts, next(self._counter), user_id) for user_id, due_ts in self._due.items()
+            ]
+            heapq.heapify(self._heap)
@@ -0,0 +1,56 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+from astrbot.api import logger
+
+# --- 领域事件类型 ---
+# 钓到鱼：fish_id, rarity, base_value, weight, quantity
+FISH_CAUGHT = "fish_caught"
+# 鱼类库存发生非钓鱼导致的变化（出售、上架、被偷、鱼塘溢出等），派生计数需要重新读取
+FISH_INVENTORY_CHANGED = "fish_inventory_changed"
+# 获得鱼竿/饰品：item_type ("rod" / "accessory"), item_id, rarity
+EQUIPMENT_ACQUIRED = "equipment_acquired"
+# 完成一次擦弹：multiplier
+WIPE_BOMB_PLAYED = "wipe_bomb_played"
+
+
+@dataclass
+class DomainEvent:
+    """一条领域事件"""
+    name: str
+    user_id: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+class EventBus:
+    """
+    进程内事件总线
+
+    服务在写入提交后发布事件，订阅者同步收到回调。
+    回调在发布者线程中执行，应只做入队等轻量操作；单个订阅者出错不影响其他订阅者和发布者。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Callable[[DomainEvent], None]]] = {}
+
+    def subscribe(self, name: str, handler: Callable[[DomainEvent], None]) -> None:
+        with self._lock:
+            # 复制后替换，发布时无需加锁遍历
+            handlers = list(self._subscribers.get(name, []))
+            handlers.append(handler)
+            self._subscribers[name] = handlers
+
+    def publish(self, name: str, user_id: str, **data) -> None:
+        handlers = self._subscribers.get(name)
+        if not handlers:
+            return
+        self.dispatch(DomainEvent(name, user_id, data))
+
+    def dispatch(self, event: DomainEvent) -> None:
+        for handler in self._subscribers.get(event.name, ()):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"处理事件 {event.name} 出错: {e}", exc_info=True)
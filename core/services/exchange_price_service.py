@@ -29,6 +29,11 @@ class ExchangePriceService:
         self._price_update_thread: Optional[threading.Thread] = None
         self._price_update_running = False
 
+        # 价格历史缓存：(天数, 当天日期) -> 结果，写入价格时清空
+        self._history_lock = threading.Lock()
+        self._history_cache: Dict[tuple, Dict[str, Any]] = {}
+        self._history_version = 0
+
     def get_market_status(self) -> Dict[str, Any]:
         """获取市场状态"""
         try:
@@ -81,93 +86,95 @@ class ExchangePriceService:
             return {"success": False, "message": f"获取市场状态失败: {e}"}
 
     def get_price_history(self, days: int = 7) -> Dict[str, Any]:
-        """获取价格历史"""
+        """获取价格历史（结果缓存到下一次写入价格）"""
         try:
             end_date = datetime.now()
-            start_date = end_date - timedelta(days=days-1)  # 包含今天
-            
-            history = {}
-            labels = []
-            all_updates = []  # 存储所有价格更新点
-            
-            # 获取所有价格更新记录
-            current_date = start_date
-            while current_date <= end_date:
-                date_str = current_date.strftime("%Y-%m-%d")
-                prices = self.exchange_repo.get_prices_for_date(date_str)
-                
-                for price_obj in prices:
-                    all_updates.append({
-                        'date': price_obj.date,
-                        'time': price_obj.time,
-                        'commodity_id': price_obj.commodity_id,
-                        'price': price_obj.price,
-                        'update_type': price_obj.update_type,
-                        'datetime': f"{price_obj.date} {price_obj.time}"
-                    })
-                
-                current_date += timedelta(days=1)
-            
-            # 按时间排序
-            all_updates.sort(key=lambda x: x['datetime'])
-            
-            # 生成标签（显示日期和时间）
-            for update in all_updates:
-                date_obj = datetime.strptime(update['date'], "%Y-%m-%d")
-                time_obj = datetime.strptime(update['time'], "%H:%M:%S")
-                # 统一到秒，避免 "HH:MM:SS" 与 "HH:MM" 的字符串比较问题
-                label = f"{date_obj.strftime('%m-%d')} {time_obj.strftime('%H:%M:%S')}"
-                if label not in labels:
-                    labels.append(label)
-            
-            # 为每种商品生成价格序列
-            for commodity_id in self.commodities.keys():
-                history[commodity_id] = []
-                commodity_updates = [u for u in all_updates if u['commodity_id'] == commodity_id]
-                
-                # 为安全起见确保按时间升序（all_updates 已排序，这里等同于稳定过滤）
-                # commodity_updates 已按 all_updates 的顺序排列
-
-                last_known_price: Optional[int] = None  # 跨 label 继承用
-
-                # 为每个标签点找到对应的价格
-                for label in labels:
-                    # 找到该时间点之前的最新价格
-                    label_time = label.split(' ')[1]  # 提取时间部分
-                    label_date = label.split(' ')[0]  # 提取日期部分
-                    
-                    # 找到该时间点之前（含该时刻）的最新价格（同一天）
-                    latest_price = None
-                    for update in commodity_updates:
-                        update_date = datetime.strptime(update['date'], "%Y-%m-%d").strftime('%m-%d')
-                        if update_date == label_date and update['time'] <= label_time:
-                            latest_price = update['price']
-                        # 这里不 break，确保拿到“该时刻之前”的最后一条
-
-                    if latest_price is not None:
-                        last_known_price = latest_price
-                        history[commodity_id].append(latest_price)
-                    else:
-                        # 没有同日早于该时刻的记录，则延续上一个 label 的价格
-                        if last_known_price is not None:
-                            history[commodity_id].append(last_known_price)
-                        else:
-                            # 序列开头仍未知时，才使用初始价格
-                            initial_price = self.config.get("initial_prices", {}).get(commodity_id, 1000)
-                            last_known_price = initial_price
-                            history[commodity_id].append(initial_price)
-            
+            end_str = end_date.strftime("%Y-%m-%d")
+            # 缓存按当天日期区分，跨天后窗口自然滚动
+            cache_key = (days, end_str)
+            with self._history_lock:
+                cached = self._history_cache.get(cache_key)
+                version = self._history_version
+            if cached is None:
+                cached = self._build_price_history(days, end_date)
+                with self._history_lock:
+                    # 构建期间有新价格写入时不回填，避免缓存旧数据
+                    if version == self._history_version:
+                        self._history_cache[cache_key] = cached
             return {
-                "success": True,
-                "history": history,
-                "labels": labels,
-                "days": days,
-                "updates": all_updates  # 包含所有更新信息
+                **cached,
+                "history": {cid: list(series) for cid, series in cached["history"].items()},
+                "labels": list(cached["labels"]),
+                "updates": list(cached["updates"]),
             }
         except Exception as e:
             logger.error(f"获取价格历史失败: {e}")
             return {"success": False, "message": str(e)}
 
+    def _build_price_history(self, days: int, end_date: datetime) -> Dict[str, Any]:
+        """一次区间查询取出窗口内全部价格，单次遍历按时间点前向填充各商品价格"""
+        start_date = end_date - timedelta(days=days-1)  # 包含今天
+        prices = self.exchange_repo.get_prices_between(
+            start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        )
+
+        initial_prices = self.config.get("initial_prices", {})
+        commodity_ids = list(self.commodities.keys())
+        # 序列开头仍未知时使用初始价格
+        last_known = {cid: initial_prices.get(cid, 1000) for cid in commodity_ids}
+        history: Dict[str, List[int]] = {cid: [] for cid in commodity_ids}
+        labels: List[str] = []
+        all_updates: List[Dict[str, Any]] = []
+        label_of: Dict[tuple, str] = {}
+        current_label: Optional[str] = None
+
+        # 查询结果已按日期、时间升序；同一时间点的多条更新合并为一个标签，取最后一条
+        for price_obj in prices:
+            key = (price_obj.date, price_obj.time)
+            label = label_of.get(key)
+            if label is None:
+                # 统一到秒，避免 "HH:MM:SS" 与 "HH:MM" 的差异
+                time_str = price_obj.time if len(price_obj.time) == 8 else f"{price_obj.time}:00"
+                label = label_of[key] = f"{price_obj.date[5:]} {time_str}"
+            if label != current_label:
+                if current_label is not None:
+                    for cid in commodity_ids:
+                        history[cid].append(last_known[cid])
+                labels.append(label)
+                current_label = label
+            if price_obj.commodity_id in last_known:
+                last_known[price_obj.commodity_id] = price_obj.price
+            all_updates.append({
+                'date': price_obj.date,
+                'time': price_obj.time,
+                'commodity_id': price_obj.commodity_id,
+                'price': price_obj.price,
+                'update_type': price_obj.update_type,
+                'datetime': f"{price_obj.date} {price_obj.time}"
+            })
+        if current_label is not None:
+            for cid in commodity_ids:
+                history[cid].append(last_known[cid])
+
+        return {
+            "success": True,
+            "history": history,
+            "labels": labels,
+            "days": days,
+            "updates": all_updates  # 包含所有更新信息
+        }
+
+    def invalidate_price_history(self) -> None:
+        """写入价格后清空价格历史缓存"""
+        with self._history_lock:
+            self._history_version += 1
+            self._history_cache.clear()
+
+    def _add_price(self, price: Exchange) -> None:
+        """写入一条价格并使价格历史缓存失效"""
+        self.exchange_repo.add_exchange_price(price)
+        self.invalidate_price_history()
+
     def manual_update_prices(self) -> Dict[str, Any]:
         """手动更新价格（管理员）"""
         try:
@@ -213,7 +220,7 @@ class ExchangePriceService:
                 change_percent = ((new_price - last_price) / last_price) * 100
                 logger.info(f"价格变化 {commodity_id}: {last_price} -> {new_price} ({change_percent:+.2f}%)")
                 # 使用统一的批次时间写入，避免同一批次内不同商品 time 不一致
-                self.exchange_repo.add_exchange_price(Exchange(
+                self._add_price(Exchange(
                     date=today_str,
                     time=batch_time_str,
                     commodity_id=commodity_id,
@@ -244,6 +251,7 @@ class ExchangePriceService:
             
             # 删除今日现有价格
             self.exchange_repo.delete_prices_for_date(today_str)
+            self.invalidate_price_history()
             
             # 设置初始价格
             initial_prices = self.config.get("initial_prices", {
@@ -253,7 +261,7 @@ class ExchangePriceService:
             })
             
             for commodity_id, price in initial_prices.items():
-                self.exchange_repo.add_exchange_price(Exchange(
+                self._add_price(Exchange(
                     date=today_str,
                     time=batch_time_str,
                     commodity_id=commodity_id,
@@ -514,7 +522,7 @@ class ExchangePriceService:
                 new_price = self._calculate_new_price(commodity_id, last_price)
                 new_prices[commodity_id] = new_price
                 
-                self.exchange_repo.add_exchange_price(Exchange(
+                self._add_price(Exchange(
                     date=today_str,
                     time=batch_time_str,
                     commodity_id=commodity_id,
@@ -0,0 +1,150 @@
+import random
+import threading
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from ..domain.models import Fish
+from ..repositories.abstract_repository import AbstractItemTemplateRepository
+
+
+class AliasTable:
+    """
+    Walker/Vose 别名表
+
+    构建一次 O(n)，之后每次加权抽样 O(1)：两次 random() 与一次下标访问，不分配新对象。
+    """
+
+    __slots__ = ("weights", "_n", "_prob", "_alias")
+
+    def __init__(self, weights: Sequence[float]):
+        total = float(sum(weights))
+        if not weights or total <= 0:
+            raise ValueError("Total of weights must be greater than zero")
+        self.weights = list(weights)
+        n = len(weights)
+        self._n = n
+        scaled = [w * n / total for w in weights]
+        prob = [0.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 剩余项（含浮点误差）概率为 1
+        for i in large + small:
+            prob[i] = 1.0
+        self._prob = prob
+        self._alias = alias
+
+    def sample(self, rng: Callable[[], float] = random.random) -> int:
+        """抽取一个下标"""
+        u = rng() * self._n
+        i = int(u)
+        if i >= self._n:
+            i = self._n - 1
+        return i if (u - i) < self._prob[i] else self._alias[i]
+
+    def sample_many(self, k: int) -> List[int]:
+        """批量抽取 k 个下标，安装了 numpy 时使用向量化实现"""
+        if k <= 0:
+            return []
+        try:
+            import numpy as np
+            # 向量化：一次生成所有随机数并查表
+            u = np.random.random(k) * self._n
+            idx = np.minimum(u.astype(np.int64), self._n - 1)
+            accept = (u - idx) < np.asarray(self._prob)[idx]
+            return np.where(accept, idx, np.asarray(self._alias)[idx]).tolist()
+        except ImportError:
+            return [self.sample() for _ in range(k)]
+
+
+class FishSampler:
+    """
+    钓鱼抽样表缓存
+
+    - 稀有度表：按 (区域策略, 稀有鱼配额是否可用, 稀有度加成) 缓存别名表
+    - 鱼类表：按 (区域限定鱼集合, 稀有度) 缓存候选鱼及按价值加权的别名表
+
+    区域配置或模板变更时调用 ``invalidate()`` 清空，之后按需重建。
+    """
+
+    def __init__(self, item_template_repo: AbstractItemTemplateRepository, max_rarity_tables: int = 512):
+        self.item_template_repo = item_template_repo
+        self.max_rarity_tables = max_rarity_tables
+        self._lock = threading.Lock()
+        self._rarity_tables: Dict[Hashable, AliasTable] = {}
+        self._fish_tables: Dict[Tuple[Optional[Tuple[int, ...]], int], Tuple[List[Fish], Optional[AliasTable]]] = {}
+        self._high_rarities: Dict[Optional[Tuple[int, ...]], List[int]] = {}
+
+    def invalidate(self, *_args) -> None:
+        with self._lock:
+            self._rarity_tables.clear()
+            self._fish_tables.clear()
+            self._high_rarities.clear()
+
+    # --- 稀有度 ---
+    def get_rarity_table(self, key: Hashable, build: Callable[[], List[float]]) -> AliasTable:
+        """获取稀有度别名表，未命中时调用 build() 生成分布并缓存"""
+        table = self._rarity_tables.get(key)
+        if table is None:
+            table = AliasTable(build())
+            with self._lock:
+                if len(self._rarity_tables) >= self.max_rarity_tables:
+                    # 加成组合有限，超过上限说明配置频繁变化，直接清空重建
+                    self._rarity_tables.clear()
+                self._rarity_tables[key] = table
+        return table
+
+    # --- 鱼类 ---
+    @staticmethod
+    def _zone_key(specific_fish_ids: Optional[Sequence[int]]) -> Optional[Tuple[int, ...]]:
+        return tuple(sorted(set(specific_fish_ids))) if specific_fish_ids else None
+
+    def _get_fish_table(self, rarity: int, specific_fish_ids: Optional[Sequence[int]]):
+        key = (self._zone_key(specific_fish_ids), rarity)
+        entry = self._fish_tables.get(key)
+        if entry is None:
+            if key[0]:
+                # 区域限定鱼，只在限定的鱼里面抽
+                fish_list = self.item_template_repo.get_zone_fishes(list(key[0]), rarity)
+            else:
+                fish_list = self.item_template_repo.get_fishes_by_rarity(rarity)
+            # 价值越高被选中的概率越大，基础权重至少为1
+            table = AliasTable([max(f.base_value, 1) for f in fish_list]) if fish_list else None
+            entry = (fish_list, table)
+            with self._lock:
+                self._fish_tables[key] = entry
+        return entry
+
+    def sample_fish(self, rarity: int, specific_fish_ids: Optional[Sequence[int]] = None) -> Optional[Fish]:
+        """按价值加权抽取一条指定稀有度的鱼；没有候选鱼时返回 None"""
+        fish_list, table = self._get_fish_table(rarity, specific_fish_ids)
+        if table is None:
+            return None
+        return fish_list[table.sample()]
+
+    def sample_fish_many(self, rarity: int, k: int, specific_fish_ids: Optional[Sequence[int]] = None) -> List[Fish]:
+        """批量抽取 k 条鱼（批量钓鱼与模拟使用）"""
+        fish_list, table = self._get_fish_table(rarity, specific_fish_ids)
+        if table is None:
+            return []
+        return [fish_list[i] for i in table.sample_many(k)]
+
+    def get_high_rarities(self, specific_fish_ids: Optional[Sequence[int]] = None) -> List[int]:
+        """区域内所有 6 星及以上的稀有度（升序）"""
+        key = self._zone_key(specific_fish_ids)
+        rarities = self._high_rarities.get(key)
+        if rarities is None:
+            if key:
+                fish_list = self.item_template_repo.get_zone_fishes(list(key))
+            else:
+                fish_list = self.item_template_repo.get_all_fish()
+            rarities = sorted({fish.rarity for fish in fish_list if fish.rarity >= 6})
+            with self._lock:
+                self._high_rarities[key] = rarities
+        return rarities
@@ -3,7 +3,8 @@ import math
 import random
 import threading
 import time
-from typing import Dict, Any, Optional
+from contextlib import nullcontext
+from typing import Dict, Any, Optional, List
 from datetime import timedelta
 from astrbot.api import logger
 
@@ -16,8 +17,66 @@ from ..repositories.abstract_repository import (
     AbstractUserBuffRepository,
 )
 from ..domain.models import FishingRecord, TaxRecord, FishingZone
+from ..database.connection_manager import DatabaseConnectionManager
 from ..services.fishing_zone_service import FishingZoneService
-from ..utils import get_now, get_fish_template, get_today, get_last_reset_time, calculate_after_refine
+from ..services.auto_fishing_scheduler import AutoFishingScheduler
+from ..services.event_bus import EventBus, DomainEvent, FISH_CAUGHT, FISH_INVENTORY_CHANGED
+from ..utils import get_now, get_today, get_last_reset_time, calculate_after_refine
+
+
+class _FishingContext:
+    """
+    一次（批量）钓鱼所需的预取数据。
+
+    用户、装备、Buff、鱼饵库存和鱼塘数量通过批量查询一次取出，
+    钓鱼区域按需读取并在本批次内共享（稀有鱼计数在内存中同步累加）。
+    """
+
+    def __init__(self, service: "FishingService", user_ids: List[str]):
+        self._inventory_repo = service.inventory_repo
+        self.users = service.user_repo.get_by_ids(user_ids)
+        found = list(self.users.keys())
+        self.rods = self._inventory_repo.get_equipped_rods_by_users(found)
+        self.accessories = self._inventory_repo.get_equipped_accessories_by_users(found)
+        self.buffs = service.buff_repo.get_all_active_by_users(found)
+        self.bait_inventories = self._inventory_repo.get_bait_inventories_by_users(found)
+        self.fish_counts = self._inventory_repo.get_fish_counts_by_users(found)
+        self.zones: Dict[int, FishingZone] = {}
+        # 待发布的领域事件，写入提交后统一发布
+        self.events: List[DomainEvent] = []
+
+    def get_zone(self, zone_id: int) -> FishingZone:
+        zone = self.zones.get(zone_id)
+        if zone is None:
+            zone = self._inventory_repo.get_zone_by_id(zone_id)
+            self.zones[zone_id] = zone
+        return zone
+
+    def get_rod_instance(self, user_id: str, rod_instance_id: int):
+        rod = self.rods.get(user_id)
+        if rod and rod.rod_instance_id == rod_instance_id:
+            return rod
+        return self._inventory_repo.get_user_rod_instance_by_id(user_id, rod_instance_id)
+
+    def get_accessory_instance(self, user_id: str, accessory_instance_id: int):
+        accessory = self.accessories.get(user_id)
+        if accessory and accessory.accessory_instance_id == accessory_instance_id:
+            return accessory
+        return self._inventory_repo.get_user_accessory_instance_by_id(user_id, accessory_instance_id)
+
+    def update_bait_quantity(self, user_id: str, bait_id: int, delta: int) -> None:
+        """写库并同步内存中的鱼饵库存"""
+        self._inventory_repo.update_bait_quantity(user_id, bait_id, delta)
+        baits = self.bait_inventories.setdefault(user_id, {})
+        quantity = max(0, baits.get(bait_id, 0) + delta)
+        if quantity > 0:
+            baits[bait_id] = quantity
+        else:
+            baits.pop(bait_id, None)
+
+    def get_random_bait(self, user_id: str) -> Optional[int]:
+        available = [bait_id for bait_id, qty in self.bait_inventories.get(user_id, {}).items() if qty > 0]
+        return random.choice(available) if available else None
 
 
 class FishingService:
@@ -32,6 +91,8 @@ class FishingService:
         buff_repo: AbstractUserBuffRepository,
         fishing_zone_service: FishingZoneService,
         config: Dict[str, Any],
+        connection_manager: Optional[DatabaseConnectionManager] = None,
+        event_bus: Optional[EventBus] = None,
     ):
         self.user_repo = user_repo
         self.inventory_repo = inventory_repo
@@ -40,6 +101,9 @@ class FishingService:
         self.buff_repo = buff_repo
         self.fishing_zone_service = fishing_zone_service
         self.config = config
+        # 共享连接池，用于批量钓鱼时将多个仓储写入合并为一个事务
+        self.connection_manager = connection_manager
+        self.event_bus = event_bus or EventBus()
 
         # 获取每日刷新时间配置
         self.daily_reset_hour = self.config.get("daily_reset_hour", 0)
@@ -47,6 +111,11 @@ class FishingService:
         # 自动钓鱼线程相关属性
         self.auto_fishing_thread: Optional[threading.Thread] = None
         self.auto_fishing_running = False
+        # 按下一次可钓时间调度自动钓鱼用户，每轮只处理到期的用户
+        self.auto_fishing_scheduler = AutoFishingScheduler()
+        # 兜底同步间隔：收录通过其他途径（如后台管理）开启自动钓鱼的用户
+        self.auto_fishing_resync_seconds = 300
+        self._last_auto_fishing_resync = 0.0
         # 税收线程相关属性
         self.tax_thread: Optional[threading.Thread] = None
         self.tax_running = False
@@ -88,6 +157,11 @@ class FishingService:
         user.auto_fishing_enabled = not user.auto_fishing_enabled
         self.user_repo.update(user)
 
+        if user.auto_fishing_enabled:
+            self.schedule_auto_fishing(user)
+        else:
+            self.auto_fishing_scheduler.remove(user_id)
+
         if user.auto_fishing_enabled:
             return {"success": True, "message": "🎣 自动钓鱼已开启！"}
         else:
@@ -105,13 +179,59 @@ class FishingService:
         """
         # 在执行钓鱼前，先检查并执行每日重置（如果需要）
         self._reset_rare_fish_daily_quota()
-        
-        user = self.user_repo.get_by_id(user_id)
+        context = _FishingContext(self, [user_id])
+        result = self._go_fish_with_context(user_id, context)
+        self._publish_events(context)
+        return result
+
+    def go_fish_batch(self, user_ids: List[str], context: Optional[_FishingContext] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        批量执行钓鱼（自动钓鱼使用）。
+
+        所有用户的装备、区域、Buff、鱼饵库存一次性批量预取，整批写入在同一个事务中完成；
+        每个用户使用独立的保存点，单个用户出错只回滚该用户的写入。
+
+        Returns:
+            user_id -> 与 go_fish 相同格式的结果字典。
+        """
+        self._reset_rare_fish_daily_quota()
+        if context is None:
+            context = _FishingContext(self, user_ids)
+        results: Dict[str, Dict[str, Any]] = {}
+        with self._transaction():
+            for user_id in user_ids:
+                event_mark = len(context.events)
+                try:
+                    with self._transaction():
+                        results[user_id] = self._go_fish_with_context(user_id, context)
+                except Exception as e:
+                    logger.error(f"用户 {user_id} 批量钓鱼出错，已回滚该用户的写入: {e}")
+                    # 内存中的区域计数可能已与数据库不一致，后续用户重新读取
+                    context.zones.clear()
+                    del context.events[event_mark:]
+                    results[user_id] = {"success": False, "message": "钓鱼失败，请稍后再试"}
+        self._publish_events(context)
+        return results
+
+    def _publish_events(self, context: _FishingContext) -> None:
+        """写入提交后发布本次钓鱼产生的事件"""
+        for event in context.events:
+            self.event_bus.dispatch(event)
+        context.events.clear()
+
+    def _transaction(self):
+        if self.connection_manager is None:
+            return nullcontext()
+        return self.connection_manager.transaction()
+
+    def _go_fish_with_context(self, user_id: str, context: _FishingContext) -> Dict[str, Any]:
+        """使用预取数据执行一次钓鱼"""
+        user = context.users.get(user_id)
         if not user:
             return {"success": False, "message": "用户不存在，无法钓鱼。"}
 
         # 1. 检查成本（从区域配置中读取）
-        zone = self.inventory_repo.get_zone_by_id(user.fishing_zone_id)
+        zone = context.get_zone(user.fishing_zone_id)
         if not zone:
             return {"success": False, "message": "钓鱼区域不存在"}
         
@@ -129,7 +249,7 @@ class FishingService:
             user.fishing_zone_id = 1
             self.user_repo.update(user)
             # 获取初始区域的名字
-            first_zone = self.inventory_repo.get_zone_by_id(1)
+            first_zone = context.get_zone(1)
             first_zone_name = first_zone.name if first_zone else "初始区域"
             return {"success": False, "message": f"该钓鱼区域已于 {zone.available_until.strftime('%Y-%m-%d %H:%M')} 关闭，已自动传送回{first_zone_name}"}
         
@@ -148,7 +268,7 @@ class FishingService:
         coins_chance = 0.0 # 增加同稀有度高金币出现几率
 
         # --- 新增：应用 Buff 效果 ---
-        active_buffs = self.buff_repo.get_all_active_by_user(user_id)
+        active_buffs = context.buffs.get(user_id, [])
         for buff in active_buffs:
             if buff.buff_type == "RARE_FISH_BOOST":
                 try:
@@ -169,7 +289,7 @@ class FishingService:
             f"当前钓鱼概率： base_success_rate={base_success_rate}, quality_modifier={quality_modifier}, quantity_modifier={quantity_modifier}, rare_chance={rare_chance}, coins_chance={coins_chance}"
         )
         # 获取装备鱼竿并应用加成
-        equipped_rod_instance = self.inventory_repo.get_user_equipped_rod(user.user_id)
+        equipped_rod_instance = context.rods.get(user.user_id)
         if equipped_rod_instance:
             rod_template = self.item_template_repo.get_rod_by_id(equipped_rod_instance.rod_id)
             if rod_template:
@@ -178,7 +298,7 @@ class FishingService:
                 rare_chance += calculate_after_refine(rod_template.bonus_rare_fish_chance, refine_level= equipped_rod_instance.refine_level, rarity=rod_template.rarity)
         logger.debug(f"装备鱼竿加成后： quality_modifier={quality_modifier}, quantity_modifier={quantity_modifier}, rare_chance={rare_chance}")
         # 获取装备饰品并应用加成
-        equipped_accessory_instance = self.inventory_repo.get_user_equipped_accessory(user.user_id)
+        equipped_accessory_instance = context.accessories.get(user.user_id)
         if equipped_accessory_instance:
             acc_template = self.item_template_repo.get_accessory_by_id(equipped_accessory_instance.accessory_id)
             if acc_template:
@@ -209,15 +329,15 @@ class FishingService:
                         # 鱼饵已过期，清除当前鱼饵
                         user.current_bait_id = None
                         user.bait_start_time = None
-                        self.inventory_repo.update_bait_quantity(user_id, cur_bait_id, -1)
+                        context.update_bait_quantity(user_id, cur_bait_id, -1)
                         self.user_repo.update(user)
                         logger.warning(f"用户 {user_id} 的当前鱼饵{bait_template}已过期，已被清除。")
             else:
                 if bait_template:
                     # 如果鱼饵没有设置持续时间, 是一次性鱼饵，消耗一个鱼饵
-                    user_bait_inventory = self.inventory_repo.get_user_bait_inventory(user_id)
-                    if user_bait_inventory is not None and user_bait_inventory.get(user.current_bait_id, 0) > 0:
-                        self.inventory_repo.update_bait_quantity(user_id, user.current_bait_id, -1)
+                    user_bait_inventory = context.bait_inventories.get(user_id, {})
+                    if user_bait_inventory.get(user.current_bait_id, 0) > 0:
+                        context.update_bait_quantity(user_id, user.current_bait_id, -1)
                     else:
                         # 如果用户没有库存鱼饵，清除当前鱼饵
                         user.current_bait_id = None
@@ -233,7 +353,7 @@ class FishingService:
 
         if user.current_bait_id is None:
             # 随机获取一个库存鱼饵
-            random_bait_id = self.inventory_repo.get_random_bait(user.user_id)
+            random_bait_id = context.get_random_bait(user.user_id)
             if random_bait_id:
                 user.current_bait_id = random_bait_id
 
@@ -255,39 +375,45 @@ class FishingService:
             return {"success": False, "message": "💨 什么都没钓到..."}
 
         # 4. 成功，生成渔获
-        # 使用区域策略获取基础稀有度分布
+        # 使用区域策略获取基础稀有度分布（按区域、配额状态与稀有度加成缓存为别名表）
         strategy = self.fishing_zone_service.get_strategy(user.fishing_zone_id)
-        rarity_distribution = strategy.get_fish_rarity_distribution(user)
+        sampler = self.fishing_zone_service.fish_sampler
         
-        zone = self.inventory_repo.get_zone_by_id(user.fishing_zone_id)
+        zone = context.get_zone(user.fishing_zone_id)
         is_rare_fish_available = zone.rare_fish_caught_today < zone.daily_rare_fish_quota
-        
-        if not is_rare_fish_available:
-            # 稀有鱼定义：4星及以上（包括5星和6+星组合）
-            # 若达到配额，屏蔽4星、5星和6+星概率，其它星级不受影响
-            if len(rarity_distribution) >= 4:
-                rarity_distribution[3] = 0.0  # 4星
-            if len(rarity_distribution) >= 5:
-                rarity_distribution[4] = 0.0  # 5星
-            if len(rarity_distribution) >= 6:
-                rarity_distribution[5] = 0.0  # 6+星
-            # 重新归一化概率分布
-            total = sum(rarity_distribution)
-            if total > 0:
-                rarity_distribution = [x / total for x in rarity_distribution]
+
+        def build_rarity_distribution():
+            rarity_distribution = list(strategy.get_fish_rarity_distribution(user))
+            if not is_rare_fish_available:
+                # 稀有鱼定义：4星及以上（包括5星和6+星组合）
+                # 若达到配额，屏蔽4星、5星和6+星概率，其它星级不受影响
+                if len(rarity_distribution) >= 4:
+                    rarity_distribution[3] = 0.0  # 4星
+                if len(rarity_distribution) >= 5:
+                    rarity_distribution[4] = 0.0  # 5星
+                if len(rarity_distribution) >= 6:
+                    rarity_distribution[5] = 0.0  # 6+星
+                # 重新归一化概率分布
+                total = sum(rarity_distribution)
+                if total > 0:
+                    rarity_distribution = [x / total for x in rarity_distribution]
+            return rarity_distribution
+
+        rarity_table = sampler.get_rarity_table((id(strategy), is_rare_fish_available, 0.0), build_rarity_distribution)
         
         # 应用稀有度加成（rare_chance）调整分布权重
         # 如果玩家有装备/Buff/鱼饵提供的稀有度加成，会提升 4-5 星鱼的概率
         # 6+ 星鱼的概率不受影响，保持其作为"运气时刻"的设计
         if rare_chance > 0:
-            adjusted_distribution = self._apply_rare_chance_to_distribution(
-                rarity_distribution, rare_chance
+            adjusted_table = sampler.get_rarity_table(
+                (id(strategy), is_rare_fish_available, rare_chance),
+                lambda: self._apply_rare_chance_to_distribution(rarity_table.weights, rare_chance),
             )
         else:
-            adjusted_distribution = rarity_distribution
+            adjusted_table = rarity_table
         
         # 根据调整后的分布加权随机抽取稀有度
-        rarity_index = random.choices(range(len(adjusted_distribution)), weights=adjusted_distribution, k=1)[0]
+        rarity_index = adjusted_table.sample()
         
         if rarity_index == 5:  # 抽中6+星组合
             # 从6星及以上的鱼中随机选择，兼容区域限定鱼
@@ -305,8 +431,8 @@ class FishingService:
         if garbage_reduction_modifier is not None and fish_template.base_value < 5:
             # 根据垃圾鱼减少修正值决定是否重新选择一次
             if random.random() < garbage_reduction_modifier:
-                # 重新选择一条鱼
-                new_rarity = random.choices(range(1, len(rarity_distribution) + 1), weights=rarity_distribution, k=1)[0]
+                # 重新选择一条鱼（使用未叠加稀有度加成的分布）
+                new_rarity = rarity_table.sample() + 1
                 new_fish_template = self._get_fish_template(new_rarity, zone, coins_chance)
 
                 if new_fish_template:
@@ -356,38 +482,26 @@ class FishingService:
                 total_catches += 1
 
         # 5. 处理鱼塘容量（在确定总渔获量后）
-        user_fish_inventory = self.inventory_repo.get_fish_inventory(user.user_id)
-        current_fish_count = sum(item.quantity for item in user_fish_inventory)
+        current_fish_count = context.fish_counts.get(user.user_id, 0)
         
         # 计算放入新鱼后是否会溢出，以及溢出多少
         overflow_amount = (current_fish_count + total_catches) - user.fish_pond_capacity
 
         if overflow_amount > 0:
-            # 鱼塘空间不足，需要移除 `overflow_amount` 条鱼
-            # 采用循环随机移除的策略，确保腾出足够空间
-            for _ in range(overflow_amount):
-                # 每次循环都重新获取一次库存，防止某个种类的鱼被移除完
-                current_inventory_for_removal = self.inventory_repo.get_fish_inventory(user.user_id)
-                if not current_inventory_for_removal:
-                    break # 如果鱼塘已经空了，就停止移除
-                
-                # 随机选择一个鱼种（堆叠）来移除
-                random_fish_stack = random.choice(current_inventory_for_removal)
-                self.inventory_repo.update_fish_quantity(
-                    user.user_id,
-                    random_fish_stack.fish_id,
-                    -1
-                )
+            # 鱼塘空间不足，随机移除 `overflow_amount` 条鱼腾出空间
+            current_fish_count -= self.inventory_repo.remove_random_fish(user.user_id, overflow_amount)
+            context.events.append(DomainEvent(FISH_INVENTORY_CHANGED, user.user_id))
 
         if fish_template.rarity >= 4:
             # 如果是4星及以上稀有鱼，增加用户的稀有鱼捕获计数
-            zone = self.inventory_repo.get_zone_by_id(user.fishing_zone_id)
+            zone = context.get_zone(user.fishing_zone_id)
             if zone:
                 zone.rare_fish_caught_today += 1
                 self.inventory_repo.update_fishing_zone(zone)
 
         # 6. 更新数据库
         self.inventory_repo.add_fish_to_inventory(user.user_id, fish_template.fish_id, quantity=total_catches, quality_level=quality_level)
+        context.fish_counts[user.user_id] = current_fish_count + total_catches
 
         # 更新用户统计数据
         user.total_fishing_count += total_catches
@@ -404,7 +518,7 @@ class FishingService:
 
         # 判断用户的鱼竿是否存在并处理耐久度
         if user.equipped_rod_instance_id:
-            rod_instance = self.inventory_repo.get_user_rod_instance_by_id(user.user_id, user.equipped_rod_instance_id)
+            rod_instance = context.get_rod_instance(user.user_id, user.equipped_rod_instance_id)
             if not rod_instance:
                 user.equipped_rod_instance_id = None
             else:
@@ -429,7 +543,7 @@ class FishingService:
         
         # 判断用户的饰品是否存在（饰品暂时不消耗耐久度）
         if user.equipped_accessory_instance_id:
-            accessory_instance = self.inventory_repo.get_user_accessory_instance_by_id(user.user_id, user.equipped_accessory_instance_id)
+            accessory_instance = context.get_accessory_instance(user.user_id, user.equipped_accessory_instance_id)
             if not accessory_instance:
                 user.equipped_accessory_instance_id = None
 
@@ -449,6 +563,13 @@ class FishingService:
             bait_id=user.current_bait_id
         )
         self.log_repo.add_fishing_record(record)
+        context.events.append(DomainEvent(FISH_CAUGHT, user.user_id, {
+            "fish_id": fish_template.fish_id,
+            "rarity": fish_template.rarity,
+            "base_value": fish_template.base_value,
+            "weight": weight,
+            "quantity": total_catches,
+        }))
 
         # 7. 构建成功返回结果
         result = {
@@ -670,50 +791,34 @@ class FishingService:
         return new_distribution
 
     def _get_fish_template(self, rarity: int, zone: FishingZone, coins_chance: float):
-        """根据稀有度和区域配置获取鱼类模板"""
-        
+        """
+        根据稀有度和区域配置获取鱼类模板。
+
+        价值越高的鱼被选中的概率越大；coins_chance 对所有候选鱼的权重做同比例放大，
+        不改变相对概率，因此抽样表只按区域与稀有度缓存。
+        """
         # 检查 FishingZone 对象是否有 'specific_fish_ids' 属性
         specific_fish_ids = getattr(zone, 'specific_fish_ids', [])
 
-        if specific_fish_ids:
-            # 如果是区域限定鱼，那么就在限定的鱼里面抽
-            fish_list = [self.item_template_repo.get_fish_by_id(fish_id) for fish_id in specific_fish_ids]
-            fish_list = [fish for fish in fish_list if fish and fish.rarity == rarity]
-        else:
-            # 否则就在全局鱼里面抽
-            fish_list = self.item_template_repo.get_fishes_by_rarity(rarity)
-
-        if not fish_list:
+        # 区域限定鱼在限定的鱼里面抽，否则在全局鱼里面抽
+        fish_template = self.fishing_zone_service.fish_sampler.sample_fish(rarity, specific_fish_ids)
+        if fish_template is None:
             # 如果限定鱼或全局鱼列表为空，则从所有鱼中随机抽取一条
             return self.item_template_repo.get_random_fish(rarity)
-
-        return get_fish_template(fish_list, coins_chance)
+        return fish_template
 
     def _get_random_high_rarity(self, zone: FishingZone = None) -> int:
         """从6星及以上鱼类中随机选择一个稀有度，兼容区域限定鱼"""
         # 检查是否有区域限定鱼
         specific_fish_ids = getattr(zone, 'specific_fish_ids', []) if zone else []
-        
-        if specific_fish_ids:
-            # 如果是区域限定鱼，只在限定鱼中查找高星级
-            fish_list = [self.item_template_repo.get_fish_by_id(fish_id) for fish_id in specific_fish_ids]
-            fish_list = [fish for fish in fish_list if fish]
-        else:
-            # 否则在全局鱼池中查找
-            fish_list = self.item_template_repo.get_all_fish()
-        
-        # 找出所有6星及以上的稀有度
-        high_rarities = set()
-        for fish in fish_list:
-            if fish.rarity >= 6:
-                high_rarities.add(fish.rarity)
-        
+        high_rarities = self.fishing_zone_service.fish_sampler.get_high_rarities(specific_fish_ids)
+
         if not high_rarities:
             # 如果没有6星及以上的鱼，返回5星
             return 5
             
         # 从高稀有度中随机选择一个
-        return random.choice(list(high_rarities))
+        return random.choice(high_rarities)
 
     def set_user_fishing_zone(self, user_id: str, zone_id: int) -> Dict[str, Any]:
         """
@@ -976,6 +1081,7 @@ class FishingService:
     def stop_auto_fishing_task(self):
         """停止自动钓鱼的后台线程。"""
         self.auto_fishing_running = False
+        self.auto_fishing_scheduler.wake()
         if self.auto_fishing_thread:
             self.auto_fishing_thread.join(timeout=1.0)
             logger.info("自动钓鱼线程已停止")
@@ -1054,11 +1160,136 @@ class FishingService:
         
         logger.info("[税收线程] 线程循环已退出")
 
+    def _get_auto_fishing_cooldown(self, user_id: str, equipped_accessory=None, prefetched: bool = False) -> float:
+        """计算用户的自动钓鱼冷却时间（秒），装备海洋之心时减半"""
+        cooldown = self.config.get("fishing", {}).get("cooldown_seconds", 180)
+        if not prefetched:
+            equipped_accessory = self.inventory_repo.get_user_equipped_accessory(user_id)
+        if equipped_accessory:
+            accessory_template = self.item_template_repo.get_accessory_by_id(equipped_accessory.accessory_id)
+            if accessory_template and accessory_template.name == "海洋之心":
+                cooldown /= 2
+        return cooldown
+
+    def schedule_auto_fishing(self, user, cooldown: Optional[float] = None) -> float:
+        """
+        根据上次钓鱼时间与冷却时间，将用户放入自动钓鱼调度器。
+
+        Returns:
+            下一次可钓的时间戳。
+        """
+        if cooldown is None:
+            cooldown = self._get_auto_fishing_cooldown(user.user_id)
+        now_ts = get_now().timestamp()
+        if user.last_fishing_time and user.last_fishing_time.year > 1:
+            due_ts = user.last_fishing_time.timestamp() + cooldown
+        else:
+            # 从未钓鱼或 last_fishing_time 被重置为极早时间，立即可钓
+            due_ts = now_ts
+        self.auto_fishing_scheduler.schedule(user.user_id, due_ts)
+        return due_ts
+
+    def on_equipment_changed(self, user_id: str) -> None:
+        """装备变更回调：冷却时间可能变化，重新调度已开启自动钓鱼的用户"""
+        if user_id not in self.auto_fishing_scheduler:
+            return
+        user = self.user_repo.get_by_id(user_id)
+        if user and user.auto_fishing_enabled:
+            self.schedule_auto_fishing(user)
+        else:
+            self.auto_fishing_scheduler.remove(user_id)
+
+    def _resync_auto_fishing_schedule(self) -> None:
+        """收录调度器中尚不存在的自动钓鱼用户（启动时及每隔一段时间执行一次）"""
+        self._last_auto_fishing_resync = time.monotonic()
+        added = 0
+        for user_id in self.user_repo.get_all_user_ids(auto_fishing_only=True):
+            if user_id in self.auto_fishing_scheduler:
+                continue
+            user = self.user_repo.get_by_id(user_id)
+            if user and user.auto_fishing_enabled:
+                self.schedule_auto_fishing(user)
+                added += 1
+        if added:
+            logger.info(f"自动钓鱼调度器新增 {added} 个用户，当前共 {len(self.auto_fishing_scheduler)} 个")
+
+    def _run_auto_fishing_batch(self, user_ids: List[str]) -> None:
+        """处理一批到期的自动钓鱼用户，并按新的冷却时间重新调度"""
+        context = _FishingContext(self, user_ids)
+        ready: List[str] = []
+        cooldowns: Dict[str, float] = {}
+
+        for user_id in user_ids:
+            user = context.users.get(user_id)
+            if not user or not user.auto_fishing_enabled:
+                continue  # 已注销或已关闭自动钓鱼，不再调度
+
+            # 到期时重新核对CD：用户可能刚手动钓过鱼，或卸下了海洋之心
+            cooldown = self._get_auto_fishing_cooldown(user_id, context.accessories.get(user_id), prefetched=True)
+            cooldowns[user_id] = cooldown
+            if self.schedule_auto_fishing(user, cooldown) > get_now().timestamp():
+                continue # CD中，已按实际可钓时间重新调度
+
+            # 检查成本（从区域配置中读取）
+            try:
+                zone = context.get_zone(user.fishing_zone_id)
+            except ValueError:
+                continue
+            fishing_cost = zone.fishing_cost
+            if not user.can_afford(fishing_cost):
+                # 金币不足，关闭其自动钓鱼
+                user.auto_fishing_enabled = False
+                self.user_repo.update(user)
+                self.auto_fishing_scheduler.remove(user_id)
+                logger.warning(f"用户 {user_id} 金币不足（需要 {fishing_cost} 金币），已关闭自动钓鱼")
+                continue
+            ready.append(user_id)
+
+        if not ready:
+            return
+
+        # 执行钓鱼：整批在一个事务中写入
+        results = self.go_fish_batch(ready, context)
+
+        # 无论成功与否，下一次最早在一个冷却周期之后
+        now_ts = get_now().timestamp()
+        for user_id in ready:
+            self.auto_fishing_scheduler.schedule(user_id, now_ts + cooldowns[user_id])
+
+        # 事务提交后再推送通知
+        for user_id in ready:
+            result = results.get(user_id)
+            # 检查是否因为区域关闭被传送
+            if result and not result.get("success") and "已自动传送回" in result.get("message", ""):
+                # 区域关闭，给用户发送通知
+                try:
+                    if self._notifier:
+                        self._notifier(user_id, f"🌅 {result['message']}")
+                except Exception:
+                    # 通知失败不影响主流程
+                    pass
+
+            # 自动钓鱼时，如装备损坏，尝试进行消息推送
+            if result and result.get("equipment_broken_messages"):
+                for msg in result["equipment_broken_messages"]:
+                    try:
+                        if self._notifier:
+                            self._notifier(user_id, msg)
+                    except Exception:
+                        # 通知失败不影响主流程
+                        pass
+
     def _auto_fishing_loop(self):
         """自动钓鱼循环任务，由后台线程执行。"""
-        fishing_config = self.config.get("fishing", {})
-        cooldown = fishing_config.get("cooldown_seconds", 180)
-        cost = fishing_config.get("cost", 10)
+        # 每轮最长等待时间，保证每日重置等检查仍能按时执行
+        max_wait = 40
+        batch_size = max(1, int(self.config.get("fishing", {}).get("auto_batch_size", 50)))
+
+        self.auto_fishing_scheduler.clear()
+        try:
+            self._resync_auto_fishing_schedule()
+        except Exception as e:
+            logger.error(f"初始化自动钓鱼调度失败: {e}")
 
         while self.auto_fishing_running:
             try:
@@ -1071,84 +1302,31 @@ class FishingService:
                     
                     # 每日检查：需要通行证的区域玩家是否仍持有通行证
                     self.enforce_zone_pass_requirements_for_all_users()
-                
-                # 获取所有开启自动钓鱼的用户
-                auto_users_ids = self.user_repo.get_all_user_ids(auto_fishing_only=True)
-
-                for user_id in auto_users_ids:
-                    user = self.user_repo.get_by_id(user_id)
-                    if not user:
-                        continue
-
-                    # 检查CD
-                    now_ts = get_now().timestamp()
-                    last_ts = 0
-                    if user.last_fishing_time and user.last_fishing_time.year > 1:
-                        last_ts = user.last_fishing_time.timestamp()
-                    elif user.last_fishing_time and user.last_fishing_time.year <= 1:
-                        # 若 last_fishing_time 被重置为极早时间，将时间设为当前时间减去冷却时间，
-                        # 这样下一轮自动钓鱼就能正常工作了
-                        cooldown = fishing_config.get("cooldown_seconds", 180)
-                        user.last_fishing_time = get_now() - timedelta(seconds=cooldown)
-                        self.user_repo.update(user)
-                        last_ts = user.last_fishing_time.timestamp()
-                    # 检查用户是否装备了海洋之心
-                    _cooldown = cooldown
-                    equipped_accessory = self.inventory_repo.get_user_equipped_accessory(user_id)
-                    if equipped_accessory:
-                        accessory_template = self.item_template_repo.get_accessory_by_id(equipped_accessory.accessory_id)
-                        if accessory_template and accessory_template.name == "海洋之心":
-                            # 海洋之心装备时，CD时间减半
-                            _cooldown /= 2
-                    if now_ts - last_ts < _cooldown:
-                        continue # CD中，跳过
-
-                    # 检查成本（从区域配置中读取）
-                    zone = self.inventory_repo.get_zone_by_id(user.fishing_zone_id)
-                    if not zone:
-                        continue
-                    fishing_cost = zone.fishing_cost
-                    if not user.can_afford(fishing_cost):
-                        # 金币不足，关闭其自动钓鱼
-                        user.auto_fishing_enabled = False
-                        self.user_repo.update(user)
-                        logger.warning(f"用户 {user_id} 金币不足（需要 {fishing_cost} 金币），已关闭自动钓鱼")
-                        continue
 
-                    # 执行钓鱼
-                    result = self.go_fish(user_id)
-                    
-                    # 检查是否因为区域关闭被传送
-                    if result and not result.get("success") and "已自动传送回" in result.get("message", ""):
-                        # 区域关闭，给用户发送通知
-                        try:
-                            if self._notifier:
-                                self._notifier(user_id, f"🌅 {result['message']}")
-                        except Exception:
-                            # 通知失败不影响主流程
-                            pass
-                    
-                    # 自动钓鱼时，如装备损坏，尝试进行消息推送
-                    if result and result.get("equipment_broken_messages"):
-                        for msg in result["equipment_broken_messages"]:
-                            try:
-                                if self._notifier:
-                                    self._notifier(user_id, msg)
-                            except Exception:
-                                # 通知失败不影响主流程
-                                pass
-                    # if result['success']:
-                    #     fish = result["fish"]
-                    #     logger.info(f"用户 {user_id} 自动钓鱼成功: {fish['name']}")
-                    # else:
-                    #      logger.info(f"用户 {user_id} 自动钓鱼失败: {result['message']}")
-
-                # 每轮检查间隔
-                time.sleep(40)
+                if time.monotonic() - self._last_auto_fishing_resync >= self.auto_fishing_resync_seconds:
+                    self._resync_auto_fishing_schedule()
+
+                # 只处理已到期的用户，按批次执行
+                while self.auto_fishing_running:
+                    due_user_ids = self.auto_fishing_scheduler.pop_due(get_now().timestamp(), limit=batch_size)
+                    if not due_user_ids:
+                        break
+                    try:
+                        self._run_auto_fishing_batch(due_user_ids)
+                    except Exception as e:
+                        # 本批次出错不影响后续批次，稍后重试
+                        logger.error(f"自动钓鱼批次（{len(due_user_ids)} 人）执行出错: {e}")
+                        retry_ts = get_now().timestamp() + max_wait
+                        for user_id in due_user_ids:
+                            if user_id not in self.auto_fishing_scheduler:
+                                self.auto_fishing_scheduler.schedule(user_id, retry_ts)
+
+                # 等待到下一个用户到期（或被新的调度唤醒）
+                self.auto_fishing_scheduler.wait(max_wait)
 
             except Exception as e:
                 logger.error(f"自动钓鱼任务出错: {e}")
                 # 打印堆栈信息
                 import traceback
                 logger.error(traceback.format_exc())
-                time.sleep(60)
\ No newline at end of file
+                time.sleep(max_wait)
@@ -5,6 +5,7 @@ from datetime import datetime
 
 from ..domain.models import User, FishingZone
 from ..repositories.abstract_repository import AbstractItemTemplateRepository, AbstractInventoryRepository
+from .fish_sampler import FishSampler
 
 
 class FishingZoneStrategy(ABC):
@@ -93,9 +94,12 @@ class FishingZoneService:
         self.item_template_repo = item_template_repo
         self.inventory_repo = inventory_repo
         self.config = config
+        # 稀有度与鱼类抽样表缓存，区域配置重新加载时一并清空
+        self.fish_sampler = FishSampler(item_template_repo)
         self.strategies = self._load_strategies()
 
     def _load_strategies(self) -> Dict[int, FishingZoneStrategy]:
+        self.fish_sampler.invalidate()
         zones = self.inventory_repo.get_all_zones()
         strategies = {}
         for zone in zones:
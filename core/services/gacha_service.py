@@ -1,5 +1,7 @@
-import random
-from typing import Dict, Any, Optional
+import threading
+from collections import Counter
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone, timedelta
 
 from astrbot.api import logger
@@ -12,21 +14,11 @@ from ..repositories.abstract_repository import (
     AbstractLogRepository,
     AbstractAchievementRepository
 )
-from ..domain.models import GachaPool, GachaPoolItem, GachaRecord
+from ..domain.models import GachaPool, GachaPoolItem, GachaRecord, User
 from ..utils import get_now
-
-
-def _perform_single_weighted_draw(pool: GachaPool) -> GachaPoolItem:
-    """执行一次加权随机抽奖。"""
-    total_weight = sum(item.weight for item in pool.items)
-    rand_val = random.uniform(0, total_weight)
-
-    current_weight = 0
-    for item in pool.items:
-        current_weight += item.weight
-        if rand_val <= current_weight:
-            return item
-    return None # 理论上不会发生
+from ..database.connection_manager import DatabaseConnectionManager
+from .event_bus import EventBus, EQUIPMENT_ACQUIRED
+from .fish_sampler import AliasTable
 
 
 class GachaService:
@@ -39,7 +31,9 @@ class GachaService:
         inventory_repo: AbstractInventoryRepository,
         item_template_repo: AbstractItemTemplateRepository,
         log_repo: AbstractLogRepository,
-        achievement_repo: AbstractAchievementRepository
+        achievement_repo: AbstractAchievementRepository,
+        event_bus: Optional[EventBus] = None,
+        connection_manager: Optional[DatabaseConnectionManager] = None,
     ):
         self.gacha_repo = gacha_repo
         self.user_repo = user_repo
@@ -47,6 +41,40 @@ class GachaService:
         self.item_template_repo = item_template_repo
         self.achievement_repo = achievement_repo
         self.log_repo = log_repo
+        self.event_bus = event_bus or EventBus()
+        self.connection_manager = connection_manager
+        # 卡池抽样表缓存：pool_id -> (卡池, 按权重构建的别名表)，卡池编辑后由仓储通知失效
+        self._sampler_lock = threading.RLock()
+        self._pool_samplers: Dict[int, Tuple[GachaPool, Optional[AliasTable]]] = {}
+
+    def _transaction(self):
+        if self.connection_manager is None:
+            return nullcontext()
+        return self.connection_manager.transaction()
+
+    def invalidate_pool_samplers(self, pool_id: Optional[int] = None) -> None:
+        """清除卡池抽样表；pool_id 为 None 时清空全部"""
+        with self._sampler_lock:
+            if pool_id is None:
+                self._pool_samplers.clear()
+            else:
+                self._pool_samplers.pop(pool_id, None)
+
+    def _get_pool_sampler(self, pool_id: int) -> Tuple[Optional[GachaPool], Optional[AliasTable]]:
+        """获取卡池及其别名表，未命中时加载并构建；权重全为0时别名表为 None"""
+        entry = self._pool_samplers.get(pool_id)
+        if entry is None:
+            # 加载与失效共用一把锁，避免失效后又写回旧数据
+            with self._sampler_lock:
+                entry = self._pool_samplers.get(pool_id)
+                if entry is None:
+                    pool = self.gacha_repo.get_pool_by_id(pool_id)
+                    if not pool:
+                        return None, None
+                    weights = [max(item.weight or 0, 0) for item in pool.items]
+                    table = AliasTable(weights) if sum(weights) > 0 else None
+                    entry = self._pool_samplers[pool_id] = (pool, table)
+        return entry
 
     def get_all_pools(self) -> Dict[str, Any]:
         """提供查看所有卡池信息的功能。"""
@@ -124,7 +152,7 @@ class GachaService:
         if not user:
             return {"success": False, "message": "用户不存在"}
 
-        pool = self.gacha_repo.get_pool_by_id(pool_id)
+        pool, table = self._get_pool_sampler(pool_id)
         if not pool or not pool.items:
             return {"success": False, "message": "卡池不存在或卡池为空"}
 
@@ -179,125 +207,118 @@ class GachaService:
             if not user.can_afford(total_coin_cost):
                 return {"success": False, "message": f"金币不足，需要 {total_coin_cost} 金币"}
 
-        # 1. 执行抽卡
-        draw_results = []
-        for _ in range(num_draws):
-            drawn_item = _perform_single_weighted_draw(pool)
-            if drawn_item:
-                draw_results.append(drawn_item)
-
-        if not draw_results:
+        # 1. 执行抽卡：别名表一次批量抽取全部结果
+        if table is None:
             return {"success": False, "message": "抽卡失败，请检查卡池配置"}
+        draw_results = [pool.items[i] for i in table.sample_many(num_draws)]
+
+        # 2. 扣除费用、发放奖励并记录日志，在同一事务中完成
+        with self._transaction():
+            if use_premium_currency:
+                user.premium_currency -= total_premium_cost
+            else:
+                user.coins -= total_coin_cost
+            granted_rewards, equipment_events = self._grant_rewards(user, draw_results)
+            self.user_repo.update(user)
+
+        # 写入提交后再发布事件
+        for item_type, item_id, rarity in equipment_events:
+            self.event_bus.publish(
+                EQUIPMENT_ACQUIRED, user_id, item_type=item_type, item_id=item_id, rarity=rarity
+            )
+
+        return {"success": True, "results": granted_rewards}
+
+    def _get_reward_template(self, item: GachaPoolItem):
+        if item.item_type == "rod":
+            return self.item_template_repo.get_rod_by_id(item.item_id)
+        if item.item_type == "accessory":
+            return self.item_template_repo.get_accessory_by_id(item.item_id)
+        if item.item_type == "bait":
+            return self.item_template_repo.get_bait_by_id(item.item_id)
+        if item.item_type == "item":
+            return self.item_template_repo.get_by_id(item.item_id)
+        if item.item_type == "titles":
+            return self.item_template_repo.get_title_by_id(item.item_id)
+        return None
+
+    def _grant_rewards(
+        self, user: User, items: List[GachaPoolItem]
+    ) -> Tuple[List[Dict[str, Any]], List[Tuple[str, int, int]]]:
+        """
+        为用户批量发放抽到的奖励并记录日志。
+
+        道具、鱼饵按ID合并数量后各写一次，金币奖励累加到 user 上由调用方写回，
+        称号去重后授予。返回用户可见的奖励列表和待发布的装备获得事件。
+        """
+        user_id = user.user_id
+        now = get_now()
+        granted_rewards: List[Dict[str, Any]] = []
+        records: List[GachaRecord] = []
+        equipment_events: List[Tuple[str, int, int]] = []
+        bait_deltas: Counter = Counter()
+        item_deltas: Counter = Counter()
+        title_ids: Dict[int, None] = {}
+
+        for item in items:
+            template = self._get_reward_template(item)
+            item_name = "未知物品"
+            item_rarity = 1
+            if template:
+                item_name = template.name
+                item_rarity = template.rarity if hasattr(template, "rarity") else 1
 
-        # 2. 扣除费用
-        if use_premium_currency:
-            user.premium_currency -= total_premium_cost
-        else:
-            user.coins -= total_coin_cost
-        self.user_repo.update(user)
-
-        # 3. 发放奖励并记录日志
-        granted_rewards = []
-        for item in draw_results:
-            self._grant_reward(user_id, item)
-            # 将抽奖结果 => 转换为用户可见的奖励格式
             if item.item_type == "rod":
-                get_rod = self.item_template_repo.get_rod_by_id(item.item_id)
-                granted_rewards.append({
-                    "type": "rod",
-                    "id": item.item_id,
-                    "name": get_rod.name,
-                    "rarity": get_rod.rarity
-                })
+                # 新获得的鱼竿应使用模板耐久度（允许为0；None代表无上限/未定义）
+                durability = template.durability if template else None
+                self.inventory_repo.add_rod_instance(user_id, item.item_id, durability)
+                equipment_events.append(("rod", item.item_id, item_rarity))
+                granted_rewards.append({"type": "rod", "id": item.item_id, "name": item_name, "rarity": item_rarity})
             elif item.item_type == "accessory":
-                get_accessory = self.item_template_repo.get_accessory_by_id(item.item_id)
-                granted_rewards.append({
-                    "type": "accessory",
-                    "id": item.item_id,
-                    "name": get_accessory.name,
-                    "rarity": get_accessory.rarity
-                })
+                self.inventory_repo.add_accessory_instance(user_id, item.item_id)
+                equipment_events.append(("accessory", item.item_id, item_rarity))
+                granted_rewards.append({"type": "accessory", "id": item.item_id, "name": item_name, "rarity": item_rarity})
             elif item.item_type == "bait":
-                get_bait = self.item_template_repo.get_bait_by_id(item.item_id)
+                bait_deltas[item.item_id] += item.quantity
                 granted_rewards.append({
-                    "type": "bait",
-                    "id": item.item_id,
-                    "name": get_bait.name,
-                    "rarity": get_bait.rarity,
-                    "quantity": item.quantity
+                    "type": "bait", "id": item.item_id, "name": item_name,
+                    "rarity": item_rarity, "quantity": item.quantity,
                 })
             elif item.item_type == "item":
-                get_item = self.item_template_repo.get_by_id(item.item_id)
+                item_deltas[item.item_id] += item.quantity
                 granted_rewards.append({
-                    "type": "item",
-                    "id": item.item_id,
-                    "name": get_item.name,
-                    "rarity": get_item.rarity,
-                    "quantity": item.quantity,
+                    "type": "item", "id": item.item_id, "name": item_name,
+                    "rarity": item_rarity, "quantity": item.quantity,
                 })
             elif item.item_type == "coins":
-                granted_rewards.append({
-                    "type": "coins",
-                    "quantity": item.quantity
-                })
+                user.coins += item.quantity
+                item_name = f"{item.quantity} 金币"
+                granted_rewards.append({"type": "coins", "quantity": item.quantity})
             elif item.item_type == "titles":
-                granted_rewards.append({
-                    "type": "title",
-                    "id": item.item_id,
-                    "name": self.item_template_repo.get_title_by_id(item.item_id).name
-                })
-
-        return {"success": True, "results": granted_rewards}
-
-    def _grant_reward(self, user_id: str, item: GachaPoolItem):
-        """根据抽到的物品，为用户发放具体奖励并记录日志。"""
-        item_name = "未知物品"
-        item_rarity = 1
-        template = None
-
-        if item.item_type == "rod":
-            # 新获得的鱼竿应使用模板耐久度（允许为0；None代表无上限/未定义）
-            template = self.item_template_repo.get_rod_by_id(item.item_id)
-            durability = template.durability if template else None
-            self.inventory_repo.add_rod_instance(user_id, item.item_id, durability)
-        elif item.item_type == "accessory":
-            self.inventory_repo.add_accessory_instance(user_id, item.item_id)
-            template = self.item_template_repo.get_accessory_by_id(item.item_id)
-        elif item.item_type == "bait":
-            self.inventory_repo.update_bait_quantity(user_id, item.item_id, item.quantity)
-            template = self.item_template_repo.get_bait_by_id(item.item_id)
-        elif item.item_type == "item":
-            self.inventory_repo.update_item_quantity(
-                user_id, item.item_id, item.quantity
-            )
-            template = self.item_template_repo.get_by_id(item.item_id)
-        elif item.item_type == "coins":
-            user = self.user_repo.get_by_id(user_id)
-            user.coins += item.quantity
-            self.user_repo.update(user)
-            item_name = f"{item.quantity} 金币"
-        elif item.item_type == "titles":
-            # 注意：成就仓储负责授予称号
-            self.achievement_repo.grant_title_to_user(user_id, item.item_id)
-            template = self.item_template_repo.get_title_by_id(item.item_id)
-
-        if template:
-            item_name = template.name
-            item_rarity = template.rarity if hasattr(template, "rarity") else 1
-
-        # 记录日志
-        log_entry = GachaRecord(
-            record_id=0, # DB自增
-            user_id=user_id,
-            gacha_pool_id=item.gacha_pool_id,
-            item_type=item.item_type,
-            item_id=item.item_id,
-            item_name=item_name,
-            quantity=item.quantity,
-            rarity=item_rarity,
-            timestamp=get_now()
-        )
-        self.log_repo.add_gacha_record(log_entry)
+                # 注意：成就仓储负责授予称号
+                title_ids[item.item_id] = None
+                granted_rewards.append({"type": "title", "id": item.item_id, "name": item_name})
+
+            records.append(GachaRecord(
+                record_id=0, # DB自增
+                user_id=user_id,
+                gacha_pool_id=item.gacha_pool_id,
+                item_type=item.item_type,
+                item_id=item.item_id,
+                item_name=item_name,
+                quantity=item.quantity,
+                rarity=item_rarity,
+                timestamp=now
+            ))
+
+        for bait_id, quantity in bait_deltas.items():
+            self.inventory_repo.update_bait_quantity(user_id, bait_id, quantity)
+        for item_id, quantity in item_deltas.items():
+            self.inventory_repo.update_item_quantity(user_id, item_id, quantity)
+        for title_id in title_ids:
+            self.achievement_repo.grant_title_to_user(user_id, title_id)
+        self.log_repo.add_gacha_records(records)
+        return granted_rewards, equipment_events
 
     def get_user_gacha_history(self, user_id: str, limit: int = 10) -> Dict[str, Any]:
         """提供查询抽卡历史记录的功能。"""
@@ -14,6 +14,7 @@ from ..repositories.abstract_repository import (
     AbstractUserBuffRepository,
 )
 from ..domain.models import WipeBombLog, User
+from .event_bus import EventBus, FISH_INVENTORY_CHANGED, WIPE_BOMB_PLAYED
 from ...core.utils import get_now, get_today
 
 if TYPE_CHECKING:
@@ -82,7 +83,8 @@ class GameMechanicsService:
         inventory_repo: AbstractInventoryRepository,
         item_template_repo: AbstractItemTemplateRepository,
         buff_repo: AbstractUserBuffRepository,
-        config: Dict[str, Any]
+        config: Dict[str, Any],
+        event_bus: Optional[EventBus] = None,
     ):
         self.user_repo = user_repo
         self.log_repo = log_repo
@@ -90,6 +92,7 @@ class GameMechanicsService:
         self.item_template_repo = item_template_repo
         self.buff_repo = buff_repo
         self.config = config
+        self.event_bus = event_bus or EventBus()
         # 服务器级别的抑制状态
         self._server_suppressed = False
         self._last_suppression_date = None
@@ -397,6 +400,7 @@ class GameMechanicsService:
             timestamp=get_now()
         )
         self.log_repo.add_wipe_bomb_log(log_entry)
+        self.event_bus.publish(WIPE_BOMB_PLAYED, user_id, multiplier=reward_multiplier)
 
         # 上传非敏感数据到服务器
         def upload_data_async():
@@ -687,6 +691,8 @@ class GameMechanicsService:
         # 4. 执行偷窃事务（保持品质属性）
         self.inventory_repo.update_fish_quantity(victim_id, stolen_fish_item.fish_id, delta=-1, quality_level=stolen_fish_item.quality_level)
         self.inventory_repo.add_fish_to_inventory(thief_id, stolen_fish_item.fish_id, quantity=1, quality_level=stolen_fish_item.quality_level)
+        self.event_bus.publish(FISH_INVENTORY_CHANGED, victim_id)
+        self.event_bus.publish(FISH_INVENTORY_CHANGED, thief_id)
 
         # 5. 更新偷窃者的CD时间
         thief.last_steal_time = now
@@ -925,6 +931,9 @@ class GameMechanicsService:
                 stolen_summary.append(f"【{template.name}】x{count}")
                 total_value_stolen += template.base_value * count
     
+        self.event_bus.publish(FISH_INVENTORY_CHANGED, victim_id)
+        self.event_bus.publish(FISH_INVENTORY_CHANGED, thief_id)
+
         # 10. 更新电鱼的CD时间并保存
         thief.last_electric_fish_time = now
         self.user_repo.update(thief)
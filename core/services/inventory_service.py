@@ -1,6 +1,7 @@
 import json
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
+from astrbot.api import logger
 
 # 导入仓储接口和领域模型
 from ..repositories.abstract_repository import (
@@ -11,6 +12,7 @@ from ..repositories.abstract_repository import (
 from .effect_manager import EffectManager
 from ..utils import calculate_after_refine
 from .game_mechanics_service import GameMechanicsService
+from .event_bus import EventBus, FISH_INVENTORY_CHANGED
 
 
 class InventoryService:
@@ -24,6 +26,7 @@ class InventoryService:
         effect_manager: EffectManager,
         game_mechanics_service: GameMechanicsService,
         config: Dict[str, Any],
+        event_bus: Optional[EventBus] = None,
     ):
         self.inventory_repo = inventory_repo
         self.user_repo = user_repo
@@ -31,6 +34,20 @@ class InventoryService:
         self.effect_manager = effect_manager
         self.game_mechanics_service = game_mechanics_service
         self.config = config
+        self.event_bus = event_bus or EventBus()
+        # 装备变更监听器：签名 (user_id: str) -> None，如自动钓鱼调度需重新计算冷却
+        self._equipment_listeners = []
+
+    def register_equipment_listener(self, listener) -> None:
+        """注册装备变更回调，在用户更换鱼竿或饰品后调用"""
+        self._equipment_listeners.append(listener)
+
+    def _notify_equipment_changed(self, user_id: str) -> None:
+        for listener in self._equipment_listeners:
+            try:
+                listener(user_id)
+            except Exception as e:
+                logger.error(f"装备变更回调执行失败: {e}")
 
     # === 短码解析 ===
     def _to_base36(self, n: int) -> str:
@@ -280,6 +297,7 @@ class InventoryService:
         else:
             sold_value = total_value
             self.inventory_repo.clear_fish_inventory(user_id)
+        self.event_bus.publish(FISH_INVENTORY_CHANGED, user_id)
 
         # 更新用户金币
         user.coins += sold_value
@@ -328,6 +346,7 @@ class InventoryService:
         
         # 删除该稀有度的所有鱼（包括普通和高品质）
         self.inventory_repo.clear_fish_inventory(user_id, rarity=rarity)
+        self.event_bus.publish(FISH_INVENTORY_CHANGED, user_id)
         
         # 更新用户金币
         user.coins += total_value
@@ -396,6 +415,7 @@ class InventoryService:
         # 5. 执行数据库删除操作
         for rarity in unique_rarities:
             self.inventory_repo.clear_fish_inventory(user_id, rarity=rarity)
+        self.event_bus.publish(FISH_INVENTORY_CHANGED, user_id)
 
         # 6. 更新用户金币
         user.coins += total_value
@@ -447,6 +467,7 @@ class InventoryService:
         
         # 清空所有鱼类
         self.inventory_repo.clear_fish_inventory(user_id)
+        self.event_bus.publish(FISH_INVENTORY_CHANGED, user_id)
 
         # 2. 卖出所有未锁定且未装备的鱼竿
         rod_instances = self.inventory_repo.get_user_rod_instances(user_id)
@@ -809,6 +830,7 @@ class InventoryService:
         )
         # 更新用户表
         self.user_repo.update(user)
+        self._notify_equipment_changed(user_id)
 
         return {"success": True, "message": f"💫 装备 【{equip_item_name}】 成功！"}
 
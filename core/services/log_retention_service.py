@@ -0,0 +1,98 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from astrbot.api import logger
+
+from ..repositories.abstract_repository import AbstractLogRepository
+
+
+class LogRetentionService:
+    """
+    日志保留策略服务
+
+    钓鱼记录写入时不再做清理，由后台线程定期分批压缩：
+    每个用户只保留最近 N 条记录，并删除超过保留天数的记录。
+    """
+
+    def __init__(self, log_repo: AbstractLogRepository, config: Dict[str, Any]):
+        self.log_repo = log_repo
+        retention_config = config.get("retention", {})
+        self.interval_seconds = retention_config.get("interval_minutes", 10) * 60
+        self.records_per_user = retention_config.get("fishing_records_per_user", 50)
+        self.max_age_days = retention_config.get("fishing_records_days", 30)
+        self.batch_size = retention_config.get("batch_size", 1000)
+        # 定义UTC+8时区
+        self.UTC8 = timezone(timedelta(hours=8))
+
+        self.retention_thread: Optional[threading.Thread] = None
+        self.retention_running = False
+        self._stop_event = threading.Event()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "passes": 0,
+            "errors": 0,
+            "trimmed_total": 0,
+            "expired_total": 0,
+            "last_trimmed": 0,
+            "last_expired": 0,
+            "last_duration_ms": 0.0,
+            "last_run_at": None,
+        }
+
+    def start_retention_task(self):
+        """启动日志压缩的后台线程。"""
+        if self.retention_thread and self.retention_thread.is_alive():
+            return
+        self.retention_running = True
+        self._stop_event.clear()
+        self.retention_thread = threading.Thread(target=self._retention_loop, daemon=True)
+        self.retention_thread.start()
+
+    def stop_retention_task(self):
+        """停止日志压缩的后台线程。"""
+        self.retention_running = False
+        self._stop_event.set()
+        if self.retention_thread:
+            self.retention_thread.join(timeout=1.0)
+
+    def _retention_loop(self):
+        """日志压缩循环任务。"""
+        while self.retention_running:
+            try:
+                self.run_compaction()
+                self._stop_event.wait(self.interval_seconds)
+            except Exception as e:
+                with self._stats_lock:
+                    self._stats["errors"] += 1
+                logger.error(f"日志压缩任务出错: {e}")
+                logger.error("堆栈信息:", exc_info=True)
+                self._stop_event.wait(60)
+
+    def run_compaction(self) -> Dict[str, int]:
+        """执行一轮压缩，返回本轮删除的行数"""
+        started = time.perf_counter()
+        cutoff = datetime.now(self.UTC8) - timedelta(days=self.max_age_days)
+        # 先删过期记录，剩余的再按用户裁剪
+        expired = self.log_repo.delete_fishing_records_before(cutoff, self.batch_size)
+        trimmed = self.log_repo.trim_fishing_records_per_user(self.records_per_user)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        with self._stats_lock:
+            self._stats["passes"] += 1
+            self._stats["trimmed_total"] += trimmed
+            self._stats["expired_total"] += expired
+            self._stats["last_trimmed"] = trimmed
+            self._stats["last_expired"] = expired
+            self._stats["last_duration_ms"] = round(duration_ms, 2)
+            self._stats["last_run_at"] = datetime.now(self.UTC8).isoformat()
+
+        if trimmed or expired:
+            logger.info(f"钓鱼记录压缩完成: 过期删除 {expired} 条，超额裁剪 {trimmed} 条，耗时 {duration_ms:.1f}ms")
+        return {"expired": expired, "trimmed": trimmed}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self._stats)
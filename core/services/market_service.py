@@ -1,7 +1,10 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
+from contextlib import nullcontext
 import random
 import math
+import threading
+import time
 
 from astrbot.api import logger
 # 导入仓储接口和领域模型
@@ -14,6 +17,8 @@ from ..repositories.abstract_repository import (
     AbstractExchangeRepository,
 )
 from ..domain.models import MarketListing, TaxRecord
+from ..database.connection_manager import DatabaseConnectionManager
+from .event_bus import EventBus, EQUIPMENT_ACQUIRED, FISH_INVENTORY_CHANGED
 
 
 class MarketService:
@@ -28,7 +33,9 @@ class MarketService:
         log_repo: AbstractLogRepository,
         item_template_repo: AbstractItemTemplateRepository,
         exchange_repo: AbstractExchangeRepository,
-        config: Dict[str, Any]
+        config: Dict[str, Any],
+        event_bus: Optional[EventBus] = None,
+        connection_manager: Optional[DatabaseConnectionManager] = None,
     ):
         self.market_repo = market_repo
         self.inventory_repo = inventory_repo
@@ -37,6 +44,35 @@ class MarketService:
         self.item_template_repo = item_template_repo
         self.exchange_repo = exchange_repo
         self.config = config
+        self.event_bus = event_bus or EventBus()
+        self.connection_manager = connection_manager
+
+        # 过期挂单由后台线程分批清理，查看市场时不再清理
+        market_config = config.get("market", {})
+        self.expiry_interval_seconds = market_config.get("expiry_sweep_interval_minutes", 10) * 60
+        self.expiry_batch_size = market_config.get("expiry_sweep_batch_size", 200)
+        self.listing_max_age = timedelta(days=5)
+        # 市场分页结果缓存：筛选条件 -> (过期时间, 结果)，挂单变化时整体清空
+        self.page_size = market_config.get("page_size", 10)
+        self.page_cache_seconds = market_config.get("page_cache_seconds", 30)
+        self._page_cache_lock = threading.Lock()
+        self._page_cache: Dict[tuple, tuple] = {}
+        self.expiry_thread: Optional[threading.Thread] = None
+        self.expiry_running = False
+        self._expiry_stop_event = threading.Event()
+        self._expiry_stats_lock = threading.Lock()
+        self._expiry_stats = {
+            "passes": 0,
+            "errors": 0,
+            "rotten_removed_total": 0,
+            "returned_total": 0,
+            "failed_total": 0,
+            "last_rotten_removed": 0,
+            "last_returned": 0,
+            "last_failed": 0,
+            "last_duration_ms": 0.0,
+            "last_run_at": None,
+        }
         
         # 确保虚拟市场用户存在（用于托管上架的装备）
         self._ensure_market_user_exists()
@@ -59,62 +95,162 @@ class MarketService:
             self.user_repo.add(market_user)
             logger.info("创建虚拟市场用户(MARKET)用于托管上架装备")
 
-    def cleanup_expired_listings(self):
+    def _transaction(self):
+        if self.connection_manager is None:
+            return nullcontext()
+        return self.connection_manager.transaction()
+
+    def start_expiry_task(self):
+        """启动过期挂单清理的后台线程。"""
+        if self.expiry_thread and self.expiry_thread.is_alive():
+            return
+        self.expiry_running = True
+        self._expiry_stop_event.clear()
+        self.expiry_thread = threading.Thread(target=self._expiry_loop, daemon=True)
+        self.expiry_thread.start()
+
+    def stop_expiry_task(self):
+        """停止过期挂单清理的后台线程。"""
+        self.expiry_running = False
+        self._expiry_stop_event.set()
+        if self.expiry_thread:
+            self.expiry_thread.join(timeout=1.0)
+
+    def _expiry_loop(self):
+        """过期挂单清理循环任务。"""
+        while self.expiry_running:
+            try:
+                self.cleanup_expired_listings()
+                self._expiry_stop_event.wait(self.expiry_interval_seconds)
+            except Exception as e:
+                with self._expiry_stats_lock:
+                    self._expiry_stats["errors"] += 1
+                logger.error(f"市场清理任务失败: {e}")
+                logger.error("堆栈信息:", exc_info=True)
+                self._expiry_stop_event.wait(60)
+
+    def cleanup_expired_listings(self) -> Dict[str, int]:
         """
-        清理过期的市场挂单。
-        - 挂单超过5天的将返还给物主。
+        清理过期的市场挂单，返回本轮处理的数量。
         - 在市场上腐败的大宗商品将被直接移除。
+        - 挂单超过5天的将返还给物主，同一卖家的挂单在一个事务中返还。
         """
-        try:
-            listings, _ = self.market_repo.get_all_listings()
-            now = datetime.now()
-            five_days_ago = now - timedelta(days=5)
-
-            for listing in listings:
-                # 检查1: 大宗商品是否在市场上腐败
-                if listing.item_type == "commodity" and listing.expires_at and listing.expires_at < now:
-                    self.market_repo.remove_listing(listing.market_id)
-                    logger.info(f"市场上的腐败商品已被清除: Market ID {listing.market_id}")
-                    continue  # 继续处理下一个
-
-                # 检查2: 挂单是否超过5天
-                if listing.listed_at < five_days_ago:
-                    try:
-                        self._return_listing_to_seller(listing)
-                        self.market_repo.remove_listing(listing.market_id)
-                        logger.info(f"过期挂单已自动下架并返还: Market ID {listing.market_id} -> User {listing.user_id}")
-                    except Exception as e:
-                        logger.error(f"自动下架 Market ID {listing.market_id} 失败: {e}")
-        except Exception as e:
-            logger.error(f"市场清理任务失败: {e}")
-
-    def get_market_listings(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        now = datetime.now()
+
+        # 1. 先删除腐败的大宗商品（腐败商品即使超期也不返还）
+        rotten = 0
+        while True:
+            deleted = self.market_repo.delete_rotten_commodity_listings(now, self.expiry_batch_size)
+            rotten += deleted
+            if deleted < self.expiry_batch_size:
+                break
+
+        # 2. 分批返还超期挂单；返还失败的挂单留在市场上，后续批次跳过它们
+        cutoff = now - self.listing_max_age
+        returned = failed = 0
+        while True:
+            batch = self.market_repo.get_listings_listed_before(cutoff, self.expiry_batch_size, offset=failed)
+            by_seller: Dict[str, List[MarketListing]] = {}
+            for listing in batch:
+                by_seller.setdefault(listing.user_id, []).append(listing)
+            for seller_id, listings in by_seller.items():
+                try:
+                    claimed = 0
+                    with self._transaction():
+                        for listing in listings:
+                            # 读取批次后挂单可能已被购买或下架，只返还本次抢占成功的挂单
+                            if self.market_repo.claim_listing(listing.market_id):
+                                self._return_listing_to_seller(listing)
+                                claimed += 1
+                    returned += claimed
+                    if claimed:
+                        logger.info(f"过期挂单已自动下架并返还: {claimed} 件 -> User {seller_id}")
+                except Exception as e:
+                    failed += len(listings)
+                    logger.error(f"自动下架 User {seller_id} 的过期挂单失败: {e}")
+            if len(batch) < self.expiry_batch_size:
+                break
+
+        if rotten or returned:
+            self._invalidate_market_pages()
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        with self._expiry_stats_lock:
+            self._expiry_stats["passes"] += 1
+            self._expiry_stats["rotten_removed_total"] += rotten
+            self._expiry_stats["returned_total"] += returned
+            self._expiry_stats["failed_total"] += failed
+            self._expiry_stats["last_rotten_removed"] = rotten
+            self._expiry_stats["last_returned"] = returned
+            self._expiry_stats["last_failed"] = failed
+            self._expiry_stats["last_duration_ms"] = round(duration_ms, 2)
+            self._expiry_stats["last_run_at"] = datetime.now().isoformat()
+
+        if rotten or returned or failed:
+            logger.info(f"市场清理完成: 腐败移除 {rotten} 件，过期返还 {returned} 件，失败 {failed} 件，耗时 {duration_ms:.1f}ms")
+        return {"rotten_removed": rotten, "returned": returned, "failed": failed}
+
+    def get_expiry_stats(self) -> Dict[str, Any]:
+        with self._expiry_stats_lock:
+            return dict(self._expiry_stats)
+
+    def get_market_page(self, item_type: Optional[str] = None, page: int = 1,
+                        rarity: Optional[int] = None, min_price: Optional[int] = None,
+                        max_price: Optional[int] = None, quality_level: Optional[int] = None) -> Dict[str, Any]:
         """
-        提供查看市场所有商品的功能。
+        分页查看市场商品，支持按类型、稀有度、价格区间和品质筛选。
+        同一筛选条件的结果在短时间内复用，挂单变化时失效。
         """
+        page = max(1, page)
+        key = (item_type, page, rarity, min_price, max_price, quality_level)
+        now = time.monotonic()
+        with self._page_cache_lock:
+            cached = self._page_cache.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
+
         try:
-            # 每次查看市场前，先执行清理
-            self.cleanup_expired_listings()
-
-            # 获取所有商品（不分页）
-            listings, _ = self.market_repo.get_all_listings()
-            # 按物品类型分组，便于前端展示
-            rods = [item for item in listings if item.item_type == "rod"]
-            accessories = [item for item in listings if item.item_type == "accessory"]
-            items = [item for item in listings if item.item_type == "item"]
-            fish = [item for item in listings if item.item_type == "fish"]
-            commodities = [item for item in listings if item.item_type == "commodity"]
-            return {
+            filters = dict(item_type=item_type, min_price=min_price, max_price=max_price,
+                           rarity=rarity, quality_level=quality_level)
+            listings, total_items = self.market_repo.get_all_listings(page=page, per_page=self.page_size, **filters)
+            total_pages = max(1, math.ceil(total_items / self.page_size))
+            if page > total_pages:
+                page = total_pages
+                listings, total_items = self.market_repo.get_all_listings(page=page, per_page=self.page_size, **filters)
+            result = {
                 "success": True,
-                "rods": rods,
-                "accessories": accessories,
-                "items": items,
-                "fish": fish,
-                "commodities": commodities
+                "listings": listings,
+                "category_counts": self.market_repo.count_listings_by_type(),
+                "pagination": {
+                    "current_page": page,
+                    "total_pages": total_pages,
+                    "total_items": total_items,
+                    "per_page": self.page_size,
+                },
             }
         except Exception as e:
+            logger.error(f"获取市场分页失败: {e}")
             return {"success": False, "message": f"获取市场列表失败: {e}"}
 
+        if self.page_cache_seconds > 0:
+            with self._page_cache_lock:
+                # 缓存条目很少，写入时顺便清掉过期的
+                self._page_cache = {k: v for k, v in self._page_cache.items() if v[0] > now}
+                self._page_cache[key] = (now + self.page_cache_seconds, result)
+        return result
+
+    def _clear_market_pages(self) -> None:
+        with self._page_cache_lock:
+            self._page_cache.clear()
+
+    def _invalidate_market_pages(self) -> None:
+        """挂单变化后清空分页缓存"""
+        self._clear_market_pages()
+        if self.connection_manager is not None:
+            # 事务内写入时，提交前被其他请求缓存的旧页同样需要失效
+            self.connection_manager.after_commit(self._clear_market_pages)
+
     def _validate_rod_listing(self, user_id: str, item_instance_id: int) -> Dict[str, Any]:
         """验证鱼竿上架"""
         user_items = self.inventory_repo.get_user_rod_instances(user_id)
@@ -242,6 +378,7 @@ class MarketService:
             self.inventory_repo.update_item_quantity(user_id, item_instance_id, -quantity)
         elif item_type == "fish":
             self.inventory_repo.update_fish_quantity(user_id, item_instance_id, -quantity, quality_level)
+            self.event_bus.publish(FISH_INVENTORY_CHANGED, user_id)
         elif item_type == "commodity":
             self.exchange_repo.delete_user_commodity(item_instance_id)
 
@@ -324,6 +461,7 @@ class MarketService:
             is_anonymous=is_anonymous
         )
         self.market_repo.add_listing(new_listing)
+        self._invalidate_market_pages()
 
         # 返回成功消息
         item_name = validation_result["item_name"]
@@ -345,12 +483,7 @@ class MarketService:
             市场ID，如果未找到返回None
         """
         try:
-            listings, _ = self.market_repo.get_all_listings()
-            for listing in listings:
-                if (listing.item_type == item_type and 
-                    listing.item_instance_id == instance_id):
-                    return listing.market_id
-            return None
+            return self.market_repo.find_market_id_by_instance(item_type, instance_id)
         except Exception as e:
             logger.error(f"查找市场ID失败: {e}")
             return None
@@ -366,12 +499,7 @@ class MarketService:
             市场ID，如果未找到返回None
         """
         try:
-            listings, _ = self.market_repo.get_all_listings()
-            for listing in listings:
-                if (listing.item_type == "fish" and 
-                    listing.item_id == fish_id):
-                    return listing.market_id
-            return None
+            return self.market_repo.find_market_id_by_item("fish", fish_id)
         except Exception as e:
             logger.error(f"查找鱼类市场ID失败: {e}")
             return None
@@ -387,12 +515,7 @@ class MarketService:
             市场ID，如果未找到返回None
         """
         try:
-            listings, _ = self.market_repo.get_all_listings()
-            for listing in listings:
-                if (listing.item_type == "item" and 
-                    listing.item_id == item_id):
-                    return listing.market_id
-            return None
+            return self.market_repo.find_market_id_by_item("item", item_id)
         except Exception as e:
             logger.error(f"查找道具市场ID失败: {e}")
             return None
@@ -420,59 +543,69 @@ class MarketService:
         if not buyer.can_afford(listing.price):
             return {"success": False, "message": f"金币不足，需要 {listing.price} 金币"}
 
-        # 使用事务处理确保数据一致性
+        # 检查买家是否有交易所账户
+        if listing.item_type == "commodity" and not buyer.exchange_account_status:
+            return {"success": False, "message": "您需要先开通交易所账户才能购买大宗商品"}
+
         try:
-            # 1. 从买家扣款
-            buyer.coins -= listing.price
-            self.user_repo.update(buyer)
-
-            # 2. 给卖家打款
-            seller.coins += listing.price
-            self.user_repo.update(seller)
-
-            # 3. 将物品发给买家
-            if listing.item_type == "commodity":
-                # 检查买家是否有交易所账户
-                if not buyer.exchange_account_status:
-                    # 回滚交易
-                    buyer.coins += listing.price
-                    seller.coins -= listing.price
-                    self.user_repo.update(buyer)
-                    self.user_repo.update(seller)
-                    return {"success": False, "message": "您需要先开通交易所账户才能购买大宗商品"}
-
-                # 如果没有腐败时间，使用默认值（兼容旧数据）
-                expires_at = listing.expires_at or datetime.now() + timedelta(days=3)
-
-                from ..domain.models import UserCommodity
-                new_commodity = UserCommodity(
-                    instance_id=0,
-                    user_id=buyer_id,
-                    commodity_id=listing.item_id,
-                    quantity=listing.quantity,
-                    purchase_price=listing.price, # Use market price as purchase price
-                    purchased_at=datetime.now(),
-                    expires_at=expires_at # 继承腐败时间
-                )
-                self.exchange_repo.add_user_commodity(new_commodity)
-
-            elif listing.item_type == "rod":
-                # 直接转移鱼竿实例所有权给买家（保留所有属性包括耐久度）
-                self.inventory_repo.transfer_rod_instance_ownership(listing.item_instance_id, buyer_id)
-            elif listing.item_type == "accessory":
-                # 直接转移饰品实例所有权给买家（保留所有属性）
-                self.inventory_repo.transfer_accessory_instance_ownership(listing.item_instance_id, buyer_id)
-            elif listing.item_type == "item":
-                # 给买家添加道具
-                self.inventory_repo.update_item_quantity(buyer_id, listing.item_id, listing.quantity)
-            elif listing.item_type == "fish":
-                # 给买家添加鱼类到水族箱（默认放入水族箱）
-                # 使用市场商品中设置的品质等级
-                quality_level = listing.quality_level
-                self.inventory_repo.add_fish_to_aquarium(buyer_id, listing.item_id, listing.quantity, quality_level)
-
-            # 4. 从市场移除该商品
-            self.market_repo.remove_listing(market_id)
+            # 抢占挂单、扣款、打款和交付物品在同一事务中完成，任一步失败整体回滚
+            with self._transaction():
+                # 1. 先删除挂单：并发购买、下架或过期清理中只有一方能删除成功
+                if not self.market_repo.claim_listing(market_id):
+                    return {"success": False, "message": "该商品不存在或已被购买"}
+
+                # 2. 从买家扣款
+                buyer.coins -= listing.price
+                self.user_repo.update(buyer)
+
+                # 3. 给卖家打款
+                seller.coins += listing.price
+                self.user_repo.update(seller)
+
+                # 4. 将物品发给买家
+                if listing.item_type == "commodity":
+                    # 如果没有腐败时间，使用默认值（兼容旧数据）
+                    expires_at = listing.expires_at or datetime.now() + timedelta(days=3)
+
+                    from ..domain.models import UserCommodity
+                    new_commodity = UserCommodity(
+                        instance_id=0,
+                        user_id=buyer_id,
+                        commodity_id=listing.item_id,
+                        quantity=listing.quantity,
+                        purchase_price=listing.price, # Use market price as purchase price
+                        purchased_at=datetime.now(),
+                        expires_at=expires_at # 继承腐败时间
+                    )
+                    self.exchange_repo.add_user_commodity(new_commodity)
+
+                elif listing.item_type == "rod":
+                    # 直接转移鱼竿实例所有权给买家（保留所有属性包括耐久度）
+                    self.inventory_repo.transfer_rod_instance_ownership(listing.item_instance_id, buyer_id)
+                elif listing.item_type == "accessory":
+                    # 直接转移饰品实例所有权给买家（保留所有属性）
+                    self.inventory_repo.transfer_accessory_instance_ownership(listing.item_instance_id, buyer_id)
+                elif listing.item_type == "item":
+                    # 给买家添加道具
+                    self.inventory_repo.update_item_quantity(buyer_id, listing.item_id, listing.quantity)
+                elif listing.item_type == "fish":
+                    # 给买家添加鱼类到水族箱（默认放入水族箱）
+                    # 使用市场商品中设置的品质等级
+                    quality_level = listing.quality_level
+                    self.inventory_repo.add_fish_to_aquarium(buyer_id, listing.item_id, listing.quantity, quality_level)
+
+            self._invalidate_market_pages()
+
+            if listing.item_type in ("rod", "accessory"):
+                if listing.item_type == "rod":
+                    template = self.item_template_repo.get_rod_by_id(listing.item_id)
+                else:
+                    template = self.item_template_repo.get_accessory_by_id(listing.item_id)
+                if template:
+                    self.event_bus.publish(
+                        EQUIPMENT_ACQUIRED, buyer_id,
+                        item_type=listing.item_type, item_id=listing.item_id, rarity=template.rarity
+                    )
 
             quantity_text = f" x{listing.quantity}" if listing.quantity > 1 else ""
             
@@ -489,15 +622,7 @@ class MarketService:
             return {"success": True, "message": message}
 
         except Exception as e:
-            # 回滚交易
-            try:
-                buyer.coins += listing.price
-                seller.coins -= listing.price
-                self.user_repo.update(buyer)
-                self.user_repo.update(seller)
-            except Exception as rollback_error:
-                logger.error(f"回滚交易失败: {rollback_error}")
-            
+            # 事务已回滚：挂单、金币和物品均保持购买前的状态
             logger.error(f"市场购买失败: {e}")
             return {"success": False, "message": f"购买失败，系统错误: {str(e)}"}
 
@@ -550,10 +675,13 @@ class MarketService:
         if listing.user_id != user_id:
             return {"success": False, "message": "你只能下架自己的商品"}
 
-        # 将物品返还给用户
+        # 将物品返还给用户：先删除挂单，删除成功才返还，避免与购买或过期清理重复处理
         try:
-            self._return_listing_to_seller(listing)
-            self.market_repo.remove_listing(market_id)
+            with self._transaction():
+                if not self.market_repo.claim_listing(market_id):
+                    return {"success": False, "message": "该商品不存在或已被下架"}
+                self._return_listing_to_seller(listing)
+            self._invalidate_market_pages()
 
             quantity_text = f" x{listing.quantity}" if listing.quantity > 1 else ""
 
@@ -569,8 +697,7 @@ class MarketService:
         """
         try:
             # 获取用户所有商品列表
-            all_listings, _ = self.market_repo.get_all_listings()
-            user_listings = [listing for listing in all_listings if listing.user_id == user_id]
+            user_listings = self.market_repo.get_listings_by_user(user_id)
             
             return {
                 "success": True,
@@ -667,6 +794,7 @@ class MarketService:
             old_price = listing.price
             listing.price = new_price
             self.market_repo.update_listing(listing)
+            self._invalidate_market_pages()
             
             return {
                 "success": True, 
@@ -686,17 +814,18 @@ class MarketService:
                 return {"success": False, "message": "商品不存在"}
             
             seller = self.user_repo.get_by_id(listing.user_id)
+            with self._transaction():
+                # 先删除挂单，删除成功才返还，避免与购买或过期清理重复处理
+                if not self.market_repo.claim_listing(market_id):
+                    return {"success": False, "message": "商品不存在"}
+                if seller:
+                    # 将物品返还给卖家
+                    self._return_listing_to_seller(listing)
+            self._invalidate_market_pages()
             if not seller:
                 # 即使卖家不存在，也应该能移除商品，但无法返还
-                self.market_repo.remove_listing(market_id)
                 return {"success": True, "message": "商品已下架（卖家不存在，物品已清除）"}
             
-            # 将物品返还给卖家
-            self._return_listing_to_seller(listing)
-            
-            # 从市场移除
-            self.market_repo.remove_listing(market_id)
-            
             return {
                 "success": True, 
                 "message": f"商品已下架，已返还给卖家 {seller.nickname}"
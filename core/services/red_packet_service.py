@@ -3,6 +3,7 @@
 """
 
 import random
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 
@@ -11,14 +12,17 @@ from astrbot.api import logger
 from ..domain.models import RedPacket, RedPacketRecord
 from ..repositories.sqlite_red_packet_repo import SqliteRedPacketRepository
 from ..repositories.sqlite_user_repo import SqliteUserRepository
+from ..database.connection_manager import DatabaseConnectionManager
 
 
 class RedPacketService:
     """红包服务"""
 
-    def __init__(self, red_packet_repo: SqliteRedPacketRepository, user_repo: SqliteUserRepository):
+    def __init__(self, red_packet_repo: SqliteRedPacketRepository, user_repo: SqliteUserRepository,
+                 connection_manager: Optional[DatabaseConnectionManager] = None):
         self.red_packet_repo = red_packet_repo
         self.user_repo = user_repo
+        self.connection_manager = connection_manager
         self.min_amount = 100  # 最低发红包金额
         self.max_packet_count = 200  # 最多红包个数
         self.expire_hours = 24  # 红包过期时间（小时）
@@ -81,10 +85,6 @@ class RedPacketService:
         if not sender.can_afford(total_amount):
             return {"success": False, "message": f"❌ 余额不足！需要 {total_amount:,} 金币，当前拥有 {sender.coins:,} 金币"}
         
-        # 扣除发送者金币
-        sender.coins -= total_amount
-        self.user_repo.update(sender)
-        
         # 创建红包
         now = datetime.now()
         expires_at = now + timedelta(hours=self.expire_hours)
@@ -104,7 +104,14 @@ class RedPacketService:
             is_expired=False
         )
         
-        packet_id = self.red_packet_repo.create_red_packet(packet)
+        # 扣款、创建红包与预拆分份额在同一个事务中完成
+        with self._transaction():
+            sender.coins -= total_amount
+            self.user_repo.update(sender)
+            packet_id = self.red_packet_repo.create_red_packet(packet)
+            self.red_packet_repo.create_red_packet_slots(
+                packet_id, self._split_amounts(packet_type, total_amount, count)
+            )
         packet.packet_id = packet_id
         
         # 构建返回消息
@@ -159,8 +166,7 @@ class RedPacketService:
             packet_id: 红包ID（可选，指定领取哪个红包）
             password: 口令（用于口令红包）
         """
-        # 先过期旧红包
-        self.red_packet_repo.expire_old_packets(datetime.now())
+        now = datetime.now()
         
         # 如果指定了红包ID，直接获取该红包
         if packet_id is not None:
@@ -171,7 +177,7 @@ class RedPacketService:
             if packet.group_id != group_id:
                 return {"success": False, "message": "❌ 该红包不属于当前群组"}
             
-            if packet.is_expired:
+            if packet.is_expired or packet.expires_at <= now:
                 return {"success": False, "message": "❌ 该红包已过期"}
             
             if packet.remaining_count == 0:
@@ -183,7 +189,7 @@ class RedPacketService:
                     return {"success": False, "message": f"❌ 口令错误！请使用：/领红包 {packet_id} {packet.password}"}
         else:
             # 没有指定ID，获取群组中的活跃红包
-            active_packets = self.red_packet_repo.get_active_red_packets_in_group(group_id)
+            active_packets = self.red_packet_repo.get_active_red_packets_in_group(group_id, now)
             
             if not active_packets:
                 return {"success": False, "message": "❌ 当前没有可领取的红包"}
@@ -206,32 +212,22 @@ class RedPacketService:
         if self.red_packet_repo.has_user_claimed(packet.packet_id, user_id):
             return {"success": False, "message": f"❌ 你已经领取过红包 #{packet.packet_id} 了"}
         
-        # 计算领取金额
-        amount = self._calculate_claim_amount(packet)
-        
-        # 更新红包状态
-        packet.remaining_amount -= amount
-        packet.remaining_count -= 1
-        if packet.remaining_count == 0:
-            packet.is_expired = True
-        
-        self.red_packet_repo.update_red_packet(packet)
-        
-        # 创建领取记录
-        record = RedPacketRecord(
-            record_id=0,
-            packet_id=packet.packet_id,
-            user_id=user_id,
-            amount=amount,
-            claimed_at=datetime.now()
-        )
-        self.red_packet_repo.create_claim_record(record)
+        # 抢占一份并入账，在同一个事务中完成
+        with self._transaction():
+            claimed = self.red_packet_repo.claim_slot(packet.packet_id, user_id, now)
+            if claimed:
+                self.user_repo.increment_counters(user_id, {"coins": claimed[0]})
+        
+        if not claimed:
+            # 并发下已被他人抢光、刚好过期或重复领取
+            if self.red_packet_repo.has_user_claimed(packet.packet_id, user_id):
+                return {"success": False, "message": f"❌ 你已经领取过红包 #{packet.packet_id} 了"}
+            latest = self.red_packet_repo.get_red_packet_by_id(packet.packet_id)
+            if latest and latest.remaining_count == 0 and latest.total_count > 0:
+                return {"success": False, "message": "❌ 该红包已被抢光"}
+            return {"success": False, "message": "❌ 该红包已过期"}
         
-        # 给用户加金币
-        user = self.user_repo.get_by_id(user_id)
-        if user:
-            user.coins += amount
-            self.user_repo.update(user)
+        amount, packet.remaining_count = claimed
         
         # 构建返回消息
         type_name = {
@@ -257,29 +253,27 @@ class RedPacketService:
             "packet_id": packet.packet_id
         }
 
-    def _calculate_claim_amount(self, packet: RedPacket) -> int:
-        """计算领取金额"""
-        if packet.packet_type in ['normal', 'password']:
+    def _transaction(self):
+        if self.connection_manager is None:
+            return nullcontext()
+        return self.connection_manager.transaction()
+
+    def _split_amounts(self, packet_type: str, total_amount: int, count: int) -> List[int]:
+        """发红包时预先拆分每一份的金额，按领取顺序排列"""
+        if packet_type in ['normal', 'password']:
             # 普通红包和口令红包：平均分配（总金额 / 总数量）
-            return packet.total_amount // packet.total_count
+            return [total_amount // count] * count
         
-        elif packet.packet_type == 'lucky':
-            # 拼手气红包：随机分配
-            if packet.remaining_count == 1:
-                # 最后一个红包，把剩余的都给
-                return packet.remaining_amount
-            
-            # 不是最后一个，随机分配
-            # 保证剩余的红包每个至少有1金币
-            max_amount = packet.remaining_amount - (packet.remaining_count - 1)
-            if max_amount < 1:
-                max_amount = 1
-            
-            # 随机金额，至少1金币
+        # 拼手气红包：依次随机分配，保证剩余的红包每个至少有1金币，最后一个拿走剩余的全部
+        amounts = []
+        remaining_amount = total_amount
+        for remaining_count in range(count, 1, -1):
+            max_amount = max(1, remaining_amount - (remaining_count - 1))
             amount = random.randint(1, max_amount)
-            return amount
-        
-        return 0
+            amounts.append(amount)
+            remaining_amount -= amount
+        amounts.append(remaining_amount)
+        return amounts
 
     def get_red_packet_details(self, packet_id: int) -> Dict[str, Any]:
         """获取红包详情"""
@@ -312,7 +306,7 @@ class RedPacketService:
         
         message += f"⏰ 创建时间：{packet.created_at.strftime('%Y-%m-%d %H:%M:%S')}\n"
         
-        if packet.is_expired:
+        if packet.is_expired or packet.expires_at <= datetime.now():
             message += "❌ 状态：已过期\n"
         elif packet.remaining_count == 0:
             message += "✅ 状态：已抢完\n"
@@ -321,8 +315,9 @@ class RedPacketService:
         
         if records:
             message += "\n📋 领取记录：\n"
+            claimers = self.user_repo.get_by_ids([record.user_id for record in records[:10]])
             for idx, record in enumerate(records[:10], 1):
-                claimer = self.user_repo.get_by_id(record.user_id)
+                claimer = claimers.get(record.user_id)
                 claimer_name = claimer.nickname if claimer and claimer.nickname else record.user_id
                 message += f"{idx}. {claimer_name}：{record.amount:,} 金币\n"
             
@@ -418,27 +413,22 @@ class RedPacketService:
             return {"success": False, "message": "❌ 只有红包发送者或管理员才能撤回红包"}
         
         # 检查红包状态
-        if packet.is_expired:
+        if packet.is_expired or packet.expires_at <= datetime.now():
             return {"success": False, "message": "❌ 红包已过期，无法撤回"}
         
         if packet.remaining_count == 0:
             return {"success": False, "message": "❌ 红包已全部领取完毕，无法撤回"}
         
-        # 计算退还金额
-        refund_amount = packet.remaining_amount
-        claimed_count = packet.total_count - packet.remaining_count
+        # 标记过期与退款在同一个事务中完成，退还金额以撤回时数据库中的剩余金额为准
+        with self._transaction():
+            refund_amount = self.red_packet_repo.revoke_red_packet(packet_id)
+            if refund_amount:
+                self.user_repo.increment_counters(packet.sender_id, {"coins": refund_amount})
         
-        # 标记红包为已过期
-        packet.is_expired = True
-        packet.remaining_count = 0
-        packet.remaining_amount = 0
-        self.red_packet_repo.update_red_packet(packet)
+        if refund_amount is None:
+            return {"success": False, "message": "❌ 红包已全部领取完毕，无法撤回"}
         
-        # 退还金额给发送者
-        sender = self.user_repo.get_by_id(packet.sender_id)
-        if sender:
-            sender.coins += refund_amount
-            self.user_repo.update(sender)
+        claimed_count = len(self.red_packet_repo.get_claim_records_by_packet(packet_id))
         
         type_name = {
             'normal': '普通红包',
@@ -470,14 +460,11 @@ class RedPacketService:
         # 1. 先撤回所有未领完的红包并退款
         refund_count, refund_amount, packets_info = self.red_packet_repo.revoke_group_red_packets(group_id)
         
-        # 退款给发送者
+        # 按发送者汇总后一次性退款
         refund_details = {}
         for packet_id, sender_id, amount in packets_info:
-            sender = self.user_repo.get_by_id(sender_id)
-            if sender:
-                sender.coins += amount
-                self.user_repo.update(sender)
-                refund_details[sender_id] = refund_details.get(sender_id, 0) + amount
+            refund_details[sender_id] = refund_details.get(sender_id, 0) + amount
+        self.user_repo.increment_counter_for_users("coins", refund_details)
         
         # 2. 删除所有红包记录
         deleted_count = self.red_packet_repo.delete_group_red_packets(group_id)
@@ -489,8 +476,9 @@ class RedPacketService:
         
         if refund_details:
             message += f"\n💵 退款明细：\n"
+            senders = self.user_repo.get_by_ids(list(refund_details.keys())[:5])
             for sender_id, amount in list(refund_details.items())[:5]:
-                sender = self.user_repo.get_by_id(sender_id)
+                sender = senders.get(sender_id)
                 name = sender.nickname if sender and sender.nickname else sender_id
                 message += f"  • {name}：{amount:,} 金币\n"
             if len(refund_details) > 5:
@@ -512,14 +500,11 @@ class RedPacketService:
         # 1. 先撤回所有未领完的红包并退款
         refund_count, refund_amount, packets_info = self.red_packet_repo.revoke_all_red_packets()
         
-        # 退款给发送者
+        # 按发送者汇总后一次性退款
         refund_details = {}
         for packet_id, sender_id, amount in packets_info:
-            sender = self.user_repo.get_by_id(sender_id)
-            if sender:
-                sender.coins += amount
-                self.user_repo.update(sender)
-                refund_details[sender_id] = refund_details.get(sender_id, 0) + amount
+            refund_details[sender_id] = refund_details.get(sender_id, 0) + amount
+        self.user_repo.increment_counter_for_users("coins", refund_details)
         
         # 2. 删除所有红包记录
         deleted_count = self.red_packet_repo.delete_all_red_packets()
@@ -531,8 +516,9 @@ class RedPacketService:
         
         if refund_details:
             message += f"\n💵 退款明细：\n"
+            senders = self.user_repo.get_by_ids(list(refund_details.keys())[:10])
             for sender_id, amount in list(refund_details.items())[:10]:
-                sender = self.user_repo.get_by_id(sender_id)
+                sender = senders.get(sender_id)
                 name = sender.nickname if sender and sender.nickname else sender_id
                 message += f"  • {name}：{amount:,} 金币\n"
             if len(refund_details) > 10:
@@ -549,8 +535,8 @@ class RedPacketService:
 
     def cleanup_expired_packets(self) -> int:
         """
-        清理所有过期红包
-        返回清理数量
+        标记到期的红包并清理过期较久的红包记录（由定时任务调用，领取时不再扫描过期红包）
+        返回本次过期的红包数量
         """
         result = self.red_packet_repo.cleanup_expired_red_packets()
         return result
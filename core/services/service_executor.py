@@ -0,0 +1,160 @@
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from astrbot.api import logger
+
+
+class ServiceExecutor:
+    """
+    服务调用执行器
+
+    将同步的服务/仓储调用（SQLite 查询）放到专用的有界线程池中执行，
+    避免阻塞 AstrBot 的事件循环。同一用户的调用按提交顺序串行执行，
+    不同用户之间并行。
+    """
+
+    def __init__(self, max_workers: int = 4, latency_window: int = 1000, slow_call_threshold: float = 2.0):
+        self.max_workers = max(1, int(max_workers))
+        self.slow_call_threshold = slow_call_threshold
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="fishing-service"
+        )
+        # 每个用户一把 asyncio.Lock（FIFO 公平），保证同一用户的调用顺序
+        self._user_locks: Dict[str, asyncio.Lock] = {}
+        self._user_waiters: Dict[str, int] = {}
+
+        self._stats_lock = threading.Lock()
+        # 排队与执行中的调用全部完成时通知 shutdown
+        self._idle = threading.Condition(self._stats_lock)
+        self._queued = 0
+        self._running = 0
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "peak_queue_depth": 0,
+            "queue_wait_total": 0.0,
+            "exec_time_total": 0.0,
+            "slow_calls": 0,
+        }
+
+    async def run(self, user_id: Optional[str], func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在线程池中执行同步调用并等待结果。
+
+        Args:
+            user_id: 用于保证顺序的用户ID；为 None 时不做串行化
+            func: 同步可调用对象
+        """
+        if user_id is None:
+            return await self._submit(func, *args, **kwargs)
+
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._user_locks[user_id] = lock
+        self._user_waiters[user_id] = self._user_waiters.get(user_id, 0) + 1
+        try:
+            async with lock:
+                return await self._submit(func, *args, **kwargs)
+        finally:
+            remaining = self._user_waiters[user_id] - 1
+            if remaining <= 0:
+                # 没有其他等待者时回收锁，避免字典无限增长
+                self._user_waiters.pop(user_id, None)
+                self._user_locks.pop(user_id, None)
+            else:
+                self._user_waiters[user_id] = remaining
+
+    async def _submit(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        enqueued_at = time.monotonic()
+        with self._stats_lock:
+            self._queued += 1
+            self._stats["submitted"] += 1
+            if self._queued > self._stats["peak_queue_depth"]:
+                self._stats["peak_queue_depth"] = self._queued
+
+        call = functools.partial(func, *args, **kwargs)
+        try:
+            future = loop.run_in_executor(self._executor, self._run_tracked, call, enqueued_at)
+        except RuntimeError:
+            # 执行器已关闭，调用未被接收
+            with self._stats_lock:
+                self._queued -= 1
+                self._stats["submitted"] -= 1
+                self._idle.notify_all()
+            raise
+        return await future
+
+    def _run_tracked(self, call: Callable[[], Any], enqueued_at: float) -> Any:
+        started_at = time.monotonic()
+        with self._stats_lock:
+            self._queued -= 1
+            self._running += 1
+            self._stats["queue_wait_total"] += started_at - enqueued_at
+        failed = False
+        try:
+            return call()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            finished_at = time.monotonic()
+            elapsed = finished_at - started_at
+            with self._stats_lock:
+                self._running -= 1
+                self._stats["exec_time_total"] += elapsed
+                self._stats["failed" if failed else "completed"] += 1
+                self._latencies.append(finished_at - enqueued_at)
+                if elapsed >= self.slow_call_threshold:
+                    self._stats["slow_calls"] += 1
+                if self._queued == 0 and self._running == 0:
+                    self._idle.notify_all()
+            if elapsed >= self.slow_call_threshold:
+                name = getattr(getattr(call, "func", None), "__qualname__", repr(call))
+                logger.warning(f"服务调用耗时过长: {name} 用时 {elapsed:.2f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回执行器统计信息，包括当前排队深度与延迟分位数"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats["max_workers"] = self.max_workers
+            stats["queue_depth"] = self._queued
+            stats["running"] = self._running
+            latencies = sorted(self._latencies)
+        stats["serialized_users"] = len(self._user_locks)
+        if latencies:
+            stats["p50_latency"] = latencies[len(latencies) // 2]
+            stats["p99_latency"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        else:
+            stats["p50_latency"] = stats["p99_latency"] = 0.0
+        return stats
+
+    def shutdown(self, wait: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        关闭线程池，返回已提交的调用是否全部执行完毕。
+
+        wait=False 时取消排队中的调用并立即返回；
+        wait=True 时不再接收新调用，等待排队与执行中的调用完成，最多等待 timeout 秒，
+        超时后取消仍在排队的调用。
+        """
+        if not wait:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            with self._stats_lock:
+                return self._queued == 0 and self._running == 0
+
+        self._executor.shutdown(wait=False)
+        with self._idle:
+            drained = self._idle.wait_for(lambda: self._queued == 0 and self._running == 0, timeout)
+            pending = self._queued + self._running
+        if not drained:
+            logger.warning(f"服务执行器关闭超时，仍有 {pending} 个调用未完成")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        return drained
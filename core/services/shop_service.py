@@ -12,6 +12,7 @@ from ..repositories.abstract_repository import (
     AbstractShopRepository,
 )
 from ..domain.models import Shop, ShopItem, ShopItemCost, ShopItemReward
+from .event_bus import EventBus, EQUIPMENT_ACQUIRED, FISH_INVENTORY_CHANGED
 
 
 class ShopService:
@@ -25,12 +26,14 @@ class ShopService:
         user_repo: AbstractUserRepository,
         shop_repo: Optional[AbstractShopRepository] = None,
         config: Optional[Dict[str, Any]] = None,
+        event_bus: Optional[EventBus] = None,
     ):
         self.item_template_repo = item_template_repo
         self.inventory_repo = inventory_repo
         self.user_repo = user_repo
         self.shop_repo = shop_repo
         self.config = config or {}
+        self.event_bus = event_bus or EventBus()
 
     def _parse_datetime(self, dt_str: Optional[str]) -> Optional[datetime]:
         """解析时间字符串为 datetime 对象"""
@@ -542,6 +545,7 @@ class ShopService:
                         quantity=need_qty,
                         quality_level=quality_level
                     )
+                    self.event_bus.publish(FISH_INVENTORY_CHANGED, user.user_id)
         
         # 扣除鱼竿（排除上锁和装备中的）
         if costs.get("rods"):
@@ -596,6 +600,9 @@ class ShopService:
                     )
                     if rod_tpl:
                         obtained_items.append(f"🎣 {rod_tpl.name}")
+                        self.event_bus.publish(
+                            EQUIPMENT_ACQUIRED, user_id, item_type="rod", item_id=reward_item_id, rarity=rod_tpl.rarity
+                        )
                 
                 elif reward_type == "accessory" and reward_item_id:
                     accessory_tpl = self.item_template_repo.get_accessory_by_id(reward_item_id)
@@ -604,6 +611,10 @@ class ShopService:
                     )
                     if accessory_tpl:
                         obtained_items.append(f"💍 {accessory_tpl.name}")
+                        self.event_bus.publish(
+                            EQUIPMENT_ACQUIRED, user_id,
+                            item_type="accessory", item_id=reward_item_id, rarity=accessory_tpl.rarity
+                        )
                 
                 elif reward_type == "bait" and reward_item_id:
                     bait_tpl = self.item_template_repo.get_bait_by_id(reward_item_id)
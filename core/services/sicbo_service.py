@@ -5,50 +5,35 @@
 
 import asyncio
 import random
+import threading
+import time
+from contextlib import nullcontext
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Set
 
 from ..utils import get_now
+from ..domain.models import SicboBet, SicboGame
 from ..repositories.abstract_repository import AbstractUserRepository, AbstractLogRepository
+from ..repositories.sqlite_sicbo_repo import SqliteSicboRepository
+from ..database.connection_manager import DatabaseConnectionManager
 from astrbot.api import logger
 
 
-@dataclass
-class SicboBet:
-    """骰宝下注记录"""
-    user_id: str
-    bet_type: str  # 下注类型：大、小、豹子、一点、二点等
-    amount: int  # 下注金额
-    odds: float  # 赔率
-    created_at: datetime = field(default_factory=get_now)
-
-
-@dataclass
-class SicboGame:
-    """骰宝游戏房间"""
-    game_id: str
-    start_time: datetime
-    end_time: datetime
-    bets: List[SicboBet] = field(default_factory=list)
-    total_pot: int = 0  # 总奖池
-    is_active: bool = True
-    is_settled: bool = False
-    dice_result: Optional[List[int]] = None
-    # 保存游戏相关的上下文信息
-    platform: Optional[str] = None  # 平台信息
-    session_id: Optional[str] = None  # 会话ID
-    session_info: Optional[Dict[str, Any]] = None  # 完整会话信息用于主动发送
-    chat_id: Optional[str] = None  # 群聊ID
-
-
 class SicboService:
     """骰宝游戏服务"""
     
-    def __init__(self, user_repo: AbstractUserRepository, log_repo: AbstractLogRepository, config: Dict[str, Any]):
+    def __init__(self, user_repo: AbstractUserRepository, log_repo: AbstractLogRepository, config: Dict[str, Any],
+                 sicbo_repo: Optional[SqliteSicboRepository] = None,
+                 connection_manager: Optional[DatabaseConnectionManager] = None,
+                 executor=None):
         self.user_repo = user_repo
         self.log_repo = log_repo
         self.config = config
+        # 对局与下注持久化，插件重载后可恢复未结算的对局
+        self.sicbo_repo = sicbo_repo
+        self.connection_manager = connection_manager
+        # 结算在服务执行器中进行，避免大量下注的结算阻塞事件循环
+        self.executor = executor
         
         # 游戏配置
         sicbo_config = config.get("sicbo", {})
@@ -56,10 +41,20 @@ class SicboService:
         self.min_bet = sicbo_config.get("min_bet", 100)  # 最小下注
         self.max_bet = sicbo_config.get("max_bet", 1000000)  # 最大下注
         self.message_mode = sicbo_config.get("message_mode", "image")  # 消息模式：image(图片) 或 text(文本)
+        # 结算失败后的重试间隔（秒），连续失败时翻倍，不超过上限
+        self.settle_retry_seconds = sicbo_config.get("settle_retry_seconds", 10)
+        self.max_settle_retry_seconds = sicbo_config.get("max_settle_retry_seconds", 300)
         
         # 多会话游戏支持
         self.games: Dict[str, SicboGame] = {}  # session_id -> SicboGame
         self.countdown_tasks: Dict[str, asyncio.Task] = {}  # session_id -> countdown_task
+        # 已被新对局替换的旧对局的结算重试任务
+        self._retry_tasks: Set[asyncio.Task] = set()
+        self._settle_failures: Dict[str, int] = {}  # game_id -> 连续结算失败次数
+        # 下注与结算互斥：下注在服务执行器线程中进行，结算遍历下注前等待进行中的下注完成
+        self._bet_lock = threading.Lock()
+        # 正在持久化新对局的会话，避免重复开庄
+        self._starting_sessions: Set[str] = set()
         
         # 消息发送回调函数
         self.message_callback = None
@@ -141,8 +136,10 @@ class SicboService:
         """判断是否为图片模式"""
         return self.message_mode == "image"
     
-    def start_new_game(self, session_id: str, session_info: Dict[str, Any] = None) -> Dict[str, Any]:
-        """开启新的骰宝游戏"""
+    async def start_new_game(self, session_id: str, session_info: Dict[str, Any] = None) -> Dict[str, Any]:
+        """开启新的骰宝游戏（对局记录在服务执行器中写入）"""
+        if session_id in self._starting_sessions:
+            return {"success": False, "message": "❌ 当前会话正在开庄，请稍候"}
         # 检查当前会话是否已有游戏
         current_game = self.games.get(session_id)
         if current_game and current_game.is_active:
@@ -170,12 +167,26 @@ class SicboService:
         )
         
         # 保存游戏到会话字典
+        if self.sicbo_repo:
+            self._starting_sessions.add(session_id)
+            try:
+                if self.executor:
+                    await self.executor.run(None, self.sicbo_repo.create_game, new_game)
+                else:
+                    self.sicbo_repo.create_game(new_game)
+            finally:
+                self._starting_sessions.discard(session_id)
+        current_game = self.games.get(session_id)
         self.games[session_id] = new_game
         
-        # 取消旧的倒计时任务（如果存在）
-        old_task = self.countdown_tasks.get(session_id)
+        # 旧对局已结算时取消其倒计时任务；未结算时（结算进行中或等待重试）保留任务，继续完成开奖与公告
+        old_task = self.countdown_tasks.pop(session_id, None)
         if old_task:
-            old_task.cancel()
+            if current_game and not current_game.is_settled:
+                self._retry_tasks.add(old_task)
+                old_task.add_done_callback(self._retry_tasks.discard)
+            else:
+                old_task.cancel()
         
         # 启动新的倒计时任务
         self.countdown_tasks[session_id] = asyncio.create_task(self._countdown_task(session_id))
@@ -198,7 +209,11 @@ class SicboService:
         }
     
     def place_bet(self, user_id: str, bet_type: str, amount: int, session_id: str) -> Dict[str, Any]:
-        """下注"""
+        """下注（在服务执行器中调用，与结算互斥）"""
+        with self._bet_lock:
+            return self._place_bet(user_id, bet_type, amount, session_id)
+
+    def _place_bet(self, user_id: str, bet_type: str, amount: int, session_id: str) -> Dict[str, Any]:
         # 获取当前会话的游戏
         current_game = self.games.get(session_id)
         if not current_game or not current_game.is_active:
@@ -236,9 +251,14 @@ class SicboService:
                 existing_bet = bet
                 break
         
-        # 扣除金币
-        user.coins -= amount
-        self.user_repo.update(user)
+        # 扣除金币与记录下注在同一个事务中完成
+        with self._transaction():
+            user.coins -= amount
+            self.user_repo.update(user)
+            if self.sicbo_repo:
+                self.sicbo_repo.add_bet(current_game.game_id, SicboBet(
+                    user_id=user_id, bet_type=normalized_bet_type, amount=amount, odds=odds
+                ))
         
         if existing_bet:
             # 合并下注：更新金额，保持最新的下注时间
@@ -346,23 +366,40 @@ class SicboService:
             }
         }
     
+    def _transaction(self):
+        if self.connection_manager is None:
+            return nullcontext()
+        return self.connection_manager.transaction()
+
+    def recover_unsettled_games(self) -> int:
+        """启动时恢复未结算的对局：未到时间的继续倒计时，已到时间的立即开奖"""
+        if not self.sicbo_repo:
+            return 0
+        games = self.sicbo_repo.get_unsettled_games()
+        for game in games:
+            previous = self.games.get(game.session_id)
+            if previous and not previous.is_settled:
+                # 同一会话遗留了多局未结算的对局，较早的一局直接开奖
+                asyncio.create_task(self._settle_and_announce(previous))
+            self.games[game.session_id] = game
+            old_task = self.countdown_tasks.get(game.session_id)
+            if old_task:
+                old_task.cancel()
+            self.countdown_tasks[game.session_id] = asyncio.create_task(self._countdown_task(game.session_id))
+        if games:
+            logger.info(f"恢复了 {len(games)} 局未结算的骰宝游戏，共 {sum(len(g.bets) for g in games)} 笔下注")
+        return len(games)
+
     async def _countdown_task(self, session_id: str):
         """倒计时任务"""
         try:
-            await asyncio.sleep(self.countdown_seconds)
-            
-            # 获取对应会话的游戏
+            # 只结算启动倒计时时的对局；会话开启新局后，旧对局的倒计时仍结算旧对局
             game = self.games.get(session_id)
+            if game:
+                await asyncio.sleep(max(0.0, (game.end_time - get_now()).total_seconds()))
+            
             if game and game.is_active:
-                # 结算游戏
-                result = await self._settle_game(session_id)
-                
-                # 使用游戏中保存的会话信息发送结果公告
-                if self.message_callback and result.get("success") and game.session_info:
-                    try:
-                        await self.message_callback(game.session_info, result)
-                    except Exception as e:
-                        logger.error(f"发送骰宝结果公告失败: {e}")
+                await self._settle_and_announce(game)
                 
         except asyncio.CancelledError:
             logger.info(f"骰宝倒计时任务被取消 (会话: {session_id})")
@@ -370,9 +407,19 @@ class SicboService:
             logger.error(f"骰宝倒计时任务错误 (会话: {session_id}): {e}")
         finally:
             # 清理任务引用
-            if session_id in self.countdown_tasks:
+            if self.countdown_tasks.get(session_id) is asyncio.current_task():
                 del self.countdown_tasks[session_id]
     
+    async def _settle_and_announce(self, game: SicboGame) -> Dict[str, Any]:
+        """结算游戏并使用游戏中保存的会话信息发送结果公告"""
+        result = await self._settle_game(game)
+        if self.message_callback and result.get("success") and game.session_info:
+            try:
+                await self.message_callback(game.session_info, result)
+            except Exception as e:
+                logger.error(f"发送骰宝结果公告失败: {e}")
+        return result
+    
     async def force_settle_game(self, session_id: str) -> Dict[str, Any]:
         """管理员强制结算游戏（跳过倒计时）"""
         game = self.games.get(session_id)
@@ -386,28 +433,72 @@ class SicboService:
             del self.countdown_tasks[session_id]
         
         # 直接结算游戏
-        result = await self._settle_game(session_id)
-        
-        # 使用游戏中保存的会话信息发送结果公告
-        if self.message_callback and result.get("success") and game.session_info:
-            try:
-                await self.message_callback(game.session_info, result)
-            except Exception as e:
-                logger.error(f"发送骰宝结果公告失败: {e}")
-        
-        return result
+        return await self._settle_and_announce(game)
     
-    async def _settle_game(self, session_id: str) -> Dict[str, Any]:
+    async def _settle_game(self, game: SicboGame) -> Dict[str, Any]:
         """结算游戏"""
-        game = self.games.get(session_id)
-        if not game or game.is_settled:
+        if not game or game.is_settled or not game.is_active:
             return {"success": False, "message": "游戏已结算或不存在"}
         
+        # 先停止下注，之后的下注请求都会被拒绝
         game.is_active = False
+        try:
+            if self.executor:
+                result = await self.executor.run(None, self._settle_round, game)
+            else:
+                result = self._settle_round(game)
+            self._settle_failures.pop(game.game_id, None)
+            return result
+        except Exception as e:
+            logger.error(f"骰宝游戏结算失败: {game.game_id}: {e}", exc_info=True)
+            if not game.is_settled:
+                # 结算事务已回滚，对局保持未结算，稍后重新开奖
+                game.is_active = True
+                self._schedule_settle_retry(game)
+            return {"success": False, "message": "❌ 骰宝结算失败，请稍后再试"}
+
+    def _schedule_settle_retry(self, game: SicboGame) -> None:
+        """结算失败后安排重试，连续失败时延长间隔"""
+        failures = self._settle_failures.get(game.game_id, 0) + 1
+        self._settle_failures[game.game_id] = failures
+        delay = min(self.settle_retry_seconds * 2 ** (failures - 1), self.max_settle_retry_seconds)
+        task = asyncio.create_task(self._retry_settle_task(game, delay))
+        if self.games.get(game.session_id) is game:
+            # 作为该会话的倒计时任务，强制结算时被取消；开新局时转为后台重试，不会被取消
+            old_task = self.countdown_tasks.get(game.session_id)
+            if old_task and old_task is not asyncio.current_task():
+                old_task.cancel()
+            self.countdown_tasks[game.session_id] = task
+        else:
+            self._retry_tasks.add(task)
+            task.add_done_callback(self._retry_tasks.discard)
+        logger.info(f"骰宝游戏 {game.game_id} 将在 {delay} 秒后重新结算（第 {failures} 次失败）")
+
+    async def _retry_settle_task(self, game: SicboGame, delay: float):
+        """等待后重新结算结算失败的对局"""
+        try:
+            await asyncio.sleep(delay)
+            if game.is_active and not game.is_settled:
+                await self._settle_and_announce(game)
+        except asyncio.CancelledError:
+            logger.info(f"骰宝结算重试任务被取消: {game.game_id}")
+        except Exception as e:
+            logger.error(f"骰宝结算重试任务错误: {game.game_id}: {e}")
+        finally:
+            if self.countdown_tasks.get(game.session_id) is asyncio.current_task():
+                del self.countdown_tasks[game.session_id]
+
+    def _settle_round(self, game: SicboGame) -> Dict[str, Any]:
+        """掷骰并结算一局的所有下注；持有下注锁，进行中的下注写入完成后才开始结算"""
+        with self._bet_lock:
+            return self._settle_round_locked(game)
+
+    def _settle_round_locked(self, game: SicboGame) -> Dict[str, Any]:
+        """掷骰并结算一局的所有下注，派彩按用户汇总后在一个事务中写入"""
+        started = time.perf_counter()
         
         # 投掷三个骰子
         dice = [random.randint(1, 6) for _ in range(3)]
-        game.dice_result = dice
         total = sum(dice)
         
         # 判断各种结果
@@ -416,6 +507,7 @@ class SicboService:
         # 结算所有下注
         settlement_info = []
         total_payout = 0
+        payouts: Dict[str, int] = {}
         
         for bet in game.bets:
             win = self._check_bet_win(bet, results)
@@ -435,15 +527,10 @@ class SicboService:
                     else:
                         payout = bet.amount  # 返还本金
                 else:
-                    payout = bet.amount * (1 + bet.odds)  # 本金 + 奖金
+                    payout = int(bet.amount * (1 + bet.odds))  # 本金 + 奖金
                 
                 total_payout += payout
-                
-                # 给用户加钱
-                user = self.user_repo.get_by_id(bet.user_id)
-                if user:
-                    user.coins += payout
-                    self.user_repo.update(user)
+                payouts[bet.user_id] = payouts.get(bet.user_id, 0) + payout
             
             settlement_info.append({
                 "user_id": bet.user_id,
@@ -454,6 +541,14 @@ class SicboService:
                 "profit": payout - bet.amount if win else -bet.amount
             })
         
+        # 派彩与对局结算标记在同一个事务中提交，中途崩溃时整局保持未结算
+        game.dice_result = dice
+        with self._transaction():
+            self.user_repo.increment_counter_for_users("coins", payouts)
+            if self.sicbo_repo:
+                duration_ms = round((time.perf_counter() - started) * 1000, 2)
+                if not self.sicbo_repo.mark_game_settled(game, total_payout, duration_ms):
+                    raise RuntimeError(f"骰宝对局 {game.game_id} 已被结算")
         game.is_settled = True
         
         # 生成结算消息
@@ -488,8 +583,9 @@ class SicboService:
         winners = []
         losers = []
         break_even = []  # 新增：持平的玩家
+        users = self.user_repo.get_by_ids(list(user_profits.keys()))
         for user_id, total_profit in user_profits.items():
-            user = self.user_repo.get_by_id(user_id)
+            user = users.get(user_id)
             nickname = user.nickname if user and user.nickname else user_id
             
             if total_profit > 0:
@@ -522,14 +618,19 @@ class SicboService:
         if not winners and not losers and not break_even:
             message += f"🤔 本局无人参与\n"
         
-        logger.info(f"骰宝游戏结算完成: {game.game_id}, 结果: {dice}, 总派彩: {total_payout}")
+        settle_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(
+            f"骰宝游戏结算完成: {game.game_id}, 结果: {dice}, 下注 {len(game.bets)} 笔, "
+            f"派彩用户 {len(payouts)} 人, 总派彩: {total_payout}, 耗时 {settle_ms}ms"
+        )
         
         return {
             "success": True,
             "message": message,
             "dice": dice,
             "total": total,
-            "settlement": settlement_info
+            "settlement": settlement_info,
+            "settle_ms": settle_ms
         }
     
     def _normalize_bet_type(self, bet_type: str) -> Optional[str]:
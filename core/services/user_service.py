@@ -893,6 +893,34 @@ class UserService:
         except Exception as e:
             return {"success": False, "message": f"添加物品失败: {str(e)}"}
 
+    def add_item_to_all_users(self, item_type: str, item_id: int, quantity: int = 1) -> Dict[str, Any]:
+        """
+        给所有用户发放物品（管理员操作），在一个事务内批量写入
+
+        Returns:
+            包含操作结果与受影响用户数 (count) 的字典
+        """
+        durability = None
+        if item_type == "rod":
+            template = self.item_template_repo.get_rod_by_id(item_id)
+            durability = template.durability if template else None
+        elif item_type == "accessory":
+            template = self.item_template_repo.get_accessory_by_id(item_id)
+        elif item_type == "bait":
+            template = self.item_template_repo.get_bait_by_id(item_id)
+        elif item_type == "item":
+            template = self.item_template_repo.get_item_by_id(item_id)
+        else:
+            return {"success": False, "message": "不支持的物品类型"}
+        if not template:
+            return {"success": False, "message": "物品不存在"}
+
+        try:
+            count = self.inventory_repo.grant_item_to_all(item_type, item_id, quantity, durability)
+        except Exception as e:
+            return {"success": False, "message": f"发放物品失败: {str(e)}"}
+        return {"success": True, "message": f"成功向 {count} 位用户发放 {template.name} x{quantity}", "count": count}
+
     def remove_item_from_user_inventory(self, user_id: str, item_type: str, item_id: int, quantity: int = 1) -> Dict[str, Any]:
         """
         从用户库存移除物品（管理员操作）
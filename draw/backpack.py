@@ -131,12 +131,12 @@ async def _draw_backpack_image_impl(user_data: Dict[str, Any], data_dir: str) ->
     # 先计算需要的高度
     height = calculate_dynamic_height(user_data)
     
-    # 导入优化的渐变生成函数
-    from .gradient_utils import create_vertical_gradient
+    # 使用缓存的渐变背景模板
+    from .template_cache import new_gradient_canvas, extend_gradient_canvas, paste_rounded_card
 
     bg_top = (174, 214, 241)  # 柔和天蓝色
     bg_bot = (245, 251, 255)  # 温和淡蓝色
-    image = create_vertical_gradient(width, height, bg_top, bg_bot)
+    image = new_gradient_canvas(width, height, bg_top, bg_bot)
     draw = ImageDraw.Draw(image)
 
     # 2. 加载字体
@@ -189,11 +189,8 @@ async def _draw_backpack_image_impl(user_data: Dict[str, Any], data_dir: str) ->
         if needed_height <= height:
             return
         new_h = needed_height
-        new_image = Image.new('RGB', (width, new_h), (255, 255, 255))
-        bg = create_vertical_gradient(width, new_h, bg_top, bg_bot)
-        new_image.paste(bg, (0, 0))
-        new_image.paste(image, (0, 0))
-        image = new_image
+        # 只补画新增部分的渐变条，已绘制内容原样保留
+        image = extend_gradient_canvas(image, new_h, bg_top, bg_bot)
         draw = ImageDraw.Draw(image)
         height = new_h
 
@@ -276,15 +273,8 @@ async def _draw_backpack_image_impl(user_data: Dict[str, Any], data_dir: str) ->
 
     # 5. 绘制圆角矩形
     def draw_rounded_rectangle(draw, bbox, radius, fill=None, outline=None, width=1):
-        x1, y1, x2, y2 = bbox
-        # 绘制主体矩形
-        draw.rectangle([x1 + radius, y1, x2 - radius, y2], fill=fill, outline=outline, width=width)
-        draw.rectangle([x1, y1 + radius, x2, y2 - radius], fill=fill, outline=outline, width=width)
-        # 绘制圆角
-        draw.ellipse([x1, y1, x1 + 2*radius, y1 + 2*radius], fill=fill, outline=outline, width=width)
-        draw.ellipse([x2 - 2*radius, y1, x2, y1 + 2*radius], fill=fill, outline=outline, width=width)
-        draw.ellipse([x1, y2 - 2*radius, x1 + 2*radius, y2], fill=fill, outline=outline, width=width)
-        draw.ellipse([x2 - 2*radius, y2 - 2*radius, x2, y2], fill=fill, outline=outline, width=width)
+        # 粘贴缓存的抗锯齿卡片模板，不再逐次绘制矩形和椭圆
+        paste_rounded_card(image, bbox, radius, fill, outline, width)
 
     # 绘制标题
     title_text = "用户背包"
@@ -831,14 +821,7 @@ async def _draw_backpack_image_impl(user_data: Dict[str, Any], data_dir: str) ->
     needed_height = current_y + footer_h + 30
     if needed_height > height:
         # 扩展画布高度
-        new_image = Image.new('RGB', (width, needed_height), (255, 255, 255))
-        # 重新绘制渐变背景
-        bg = create_vertical_gradient(width, needed_height, bg_top, bg_bot)
-        new_image.paste(bg, (0, 0))
-        new_image.paste(image, (0, 0))
-        image = new_image
-        draw = ImageDraw.Draw(image)
-        height = needed_height
+        ensure_height(needed_height)
     draw.text((footer_x, current_y), footer_text, font=small_font, fill=text_secondary)
 
     # 添加装饰性元素
@@ -157,7 +157,7 @@ def draw_help_image():
         ("出售所有饰品", "一键出售所有\n(非在用/非保护)饰品"),
         ("商店", "查看官方商店"),
         ("商店购买 [商店ID][商品ID][数量]", "从商店购买\n指定商品，数量默认为1"),
-        ("市场", "查看玩家交易市场"),
+        ("市场 [分类] [页码]", "分页查看玩家市场，\n支持星级/价格/品质筛选"),
         ("上架 [ID] [价格] [数量] [匿名]", "将物品上架到市场，支持匿名"),
         ("购买 [ID]", "从市场购买商品"),
         ("我的上架", "查看我上架的商品"),
@@ -0,0 +1,158 @@
+"""
+图片发送管道
+
+渲染结果默认在内存中编码后以 base64 图片组件发送，不落盘，也不会在并发时互相覆盖。
+平台不支持 base64 图片时改用文件模式：每次渲染写入唯一命名的临时文件，
+由后台清理任务删除超过保留时间的文件。
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from astrbot.api import logger
+from astrbot.api.event import AstrMessageEvent, MessageChain
+from astrbot.api.message_components import Image as AstrImage
+
+from .render_service import RenderService
+
+DELIVERY_MEMORY = "memory"
+DELIVERY_FILE = "file"
+
+# 各图片格式的编码参数：PNG 降低压缩级别换取编码速度，WebP 使用有损高质量压缩
+ENCODE_OPTIONS: Dict[str, Dict[str, Any]] = {
+    "PNG": {"compress_level": 3},
+    "WEBP": {"quality": 90, "method": 4},
+}
+
+
+class ImageDelivery:
+    """
+    渲染并发送图片
+
+    memory 模式：在渲染进程中编码为字节，直接构造图片组件发送；
+    file 模式：渲染进程写入 ``{名称}_{uuid}.{扩展名}``，清理任务按 file_ttl_seconds 删除旧文件。
+    """
+
+    def __init__(
+        self,
+        render_service: RenderService,
+        image_dir: str,
+        mode: str = DELIVERY_MEMORY,
+        file_ttl_seconds: float = 600.0,
+        janitor_interval_seconds: float = 300.0,
+        extra_sweep_dirs: Iterable[str] = (),
+    ):
+        self.render_service = render_service
+        self.image_dir = image_dir
+        os.makedirs(self.image_dir, exist_ok=True)
+        self.mode = mode if mode in (DELIVERY_MEMORY, DELIVERY_FILE) else DELIVERY_MEMORY
+        self.file_ttl_seconds = float(file_ttl_seconds)
+        self.janitor_interval_seconds = float(janitor_interval_seconds)
+        # 旧版本遗留的临时图片目录，一并清理
+        self.sweep_dirs = [self.image_dir] + [d for d in extra_sweep_dirs if d]
+        self._janitor_task: Optional[asyncio.Task] = None
+        self._stats = {"memory_sent": 0, "file_sent": 0, "files_removed": 0}
+
+    @property
+    def extension(self) -> str:
+        return "webp" if self.render_service.image_format.upper() == "WEBP" else "png"
+
+    def new_file_path(self, name: str) -> str:
+        """生成唯一的临时图片路径"""
+        return os.path.join(self.image_dir, f"{name}_{uuid.uuid4().hex}.{self.extension}")
+
+    # --- 渲染与发送 ---
+    async def render_component(
+        self, name: str, renderer: Callable[..., Any], *args, **kwargs
+    ) -> Optional[AstrImage]:
+        """渲染并返回图片组件；超时或失败时返回 None"""
+        if self.mode == DELIVERY_MEMORY:
+            data = await self.render_service.render(name, renderer, *args, **kwargs)
+            if data is None:
+                return None
+            self._stats["memory_sent"] += 1
+            return AstrImage.fromBytes(data)
+        path = await self.render_service.render_to_file(
+            name, self.new_file_path(name), renderer, *args, **kwargs
+        )
+        if path is None:
+            return None
+        self._stats["file_sent"] += 1
+        return AstrImage.fromFileSystem(path)
+
+    async def render_result(
+        self, event: AstrMessageEvent, name: str, renderer: Callable[..., Any], *args, **kwargs
+    ):
+        """渲染并返回可直接 yield 的消息结果；超时或失败时返回 None，由调用方回退到文字"""
+        component = await self.render_component(name, renderer, *args, **kwargs)
+        if component is None:
+            return None
+        return event.chain_result([component])
+
+    async def render_chain(
+        self, name: str, renderer: Callable[..., Any], *args, **kwargs
+    ) -> Optional[MessageChain]:
+        """渲染并返回用于主动发送的消息链；超时或失败时返回 None"""
+        component = await self.render_component(name, renderer, *args, **kwargs)
+        if component is None:
+            return None
+        return MessageChain(chain=[component])
+
+    def cached_result(self, event: AstrMessageEvent, data: bytes, path: str):
+        """发送渲染缓存中的图片：memory 模式使用缓存字节，file 模式使用缓存文件"""
+        if self.mode == DELIVERY_MEMORY:
+            self._stats["memory_sent"] += 1
+            return event.chain_result([AstrImage.fromBytes(data)])
+        self._stats["file_sent"] += 1
+        return event.image_result(path)
+
+    # --- 临时文件清理 ---
+    def sweep_expired_files(self, now: Optional[float] = None) -> int:
+        """删除超过保留时间的临时图片，返回删除数量"""
+        cutoff = (time.time() if now is None else now) - self.file_ttl_seconds
+        removed = 0
+        for directory in self.sweep_dirs:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    # 文件可能正在被发送或已被删除，下一轮再处理
+                    continue
+        self._stats["files_removed"] += removed
+        return removed
+
+    async def _janitor_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.sleep(self.janitor_interval_seconds)
+                removed = await loop.run_in_executor(None, self.sweep_expired_files)
+                if removed:
+                    logger.info(f"清理了 {removed} 个过期临时图片")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"临时图片清理任务出错: {e}")
+
+    def start_janitor(self) -> None:
+        """启动临时图片清理任务（需在事件循环中调用）"""
+        if self._janitor_task is None or self._janitor_task.done():
+            self._janitor_task = asyncio.create_task(self._janitor_loop())
+
+    def stop_janitor(self) -> None:
+        if self._janitor_task is not None:
+            self._janitor_task.cancel()
+            self._janitor_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回发送模式、图片格式与发送/清理次数"""
+        return {"mode": self.mode, "format": self.render_service.image_format, **self._stats}
@@ -1,6 +1,6 @@
 import os
 from PIL import Image, ImageDraw
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from astrbot.api import logger
 from datetime import datetime
 
@@ -30,42 +30,13 @@ FISH_CARD_MARGIN = 8    # 减小间距
 FISH_PER_PAGE = 20      # 每页显示20个
 
 
-# 导入优化的渐变生成函数
-from .gradient_utils import create_vertical_gradient
-
-def draw_rounded_rectangle(draw, bbox, radius, fill=None, outline=None, width=1):
-    """优化的圆角矩形绘制 - 避免边框重叠问题"""
-    x1, y1, x2, y2 = bbox
-    
-    # 首先绘制填充区域（无边框）
-    if fill is not None:
-        # 主体矩形
-        draw.rectangle([x1 + radius, y1, x2 - radius, y2], fill=fill)
-        draw.rectangle([x1, y1 + radius, x2, y2 - radius], fill=fill)
-        # 四个圆角
-        draw.ellipse([x1, y1, x1 + 2*radius, y1 + 2*radius], fill=fill)
-        draw.ellipse([x2 - 2*radius, y1, x2, y1 + 2*radius], fill=fill)
-        draw.ellipse([x1, y2 - 2*radius, x1 + 2*radius, y2], fill=fill)
-        draw.ellipse([x2 - 2*radius, y2 - 2*radius, x2, y2], fill=fill)
-    
-    # 然后绘制边框（仅在外围）
-    if outline is not None and width > 0:
-        # 四条直线边框
-        draw.line([x1 + radius, y1, x2 - radius, y1], fill=outline, width=width)  # 上边
-        draw.line([x1 + radius, y2, x2 - radius, y2], fill=outline, width=width)  # 下边
-        draw.line([x1, y1 + radius, x1, y2 - radius], fill=outline, width=width)  # 左边
-        draw.line([x2, y1 + radius, x2, y2 - radius], fill=outline, width=width)  # 右边
-        
-        # 四个圆角边框
-        draw.arc([x1, y1, x1 + 2*radius, y1 + 2*radius], 180, 270, fill=outline, width=width)  # 左上角
-        draw.arc([x2 - 2*radius, y1, x2, y1 + 2*radius], 270, 360, fill=outline, width=width)  # 右上角
-        draw.arc([x1, y2 - 2*radius, x1 + 2*radius, y2], 90, 180, fill=outline, width=width)   # 左下角
-        draw.arc([x2 - 2*radius, y2 - 2*radius, x2, y2], 0, 90, fill=outline, width=width)     # 右下角
+# 渐变背景与卡片使用缓存模板
+from .template_cache import new_gradient_canvas, paste_rounded_card, get_rounded_mask
 
 
-async def draw_pokedex(pokedex_data: Dict[str, Any], user_info: Dict[str, Any], output_path: str, page: int = 1, data_dir: str = None):
+async def draw_pokedex(pokedex_data: Dict[str, Any], user_info: Dict[str, Any], output_path: Optional[str] = None, page: int = 1, data_dir: str = None):
     """
-    绘制图鉴图片
+    绘制图鉴图片，返回图片；指定 output_path 时同时保存到该路径
     """
     pokedex_list = pokedex_data.get("pokedex", [])
     total_pages = (len(pokedex_list) + FISH_PER_PAGE - 1) // FISH_PER_PAGE
@@ -81,7 +52,7 @@ async def draw_pokedex(pokedex_data: Dict[str, Any], user_info: Dict[str, Any],
     # 创建渐变背景 - 参考背包设计
     bg_top = (174, 214, 241)  # 柔和天蓝色
     bg_bot = (245, 251, 255)  # 温和淡蓝色
-    img = create_vertical_gradient(IMG_WIDTH, img_height, bg_top, bg_bot)
+    img = new_gradient_canvas(IMG_WIDTH, img_height, bg_top, bg_bot)
     draw = ImageDraw.Draw(img)
     
     # 背包风格的颜色定义
@@ -94,7 +65,7 @@ async def draw_pokedex(pokedex_data: Dict[str, Any], user_info: Dict[str, Any],
     card_bg = (255, 255, 255, 240)   # 高透明度白色
 
     # 绘制头部 - 使用背包风格
-    draw_rounded_rectangle(draw, (PADDING, PADDING, IMG_WIDTH - PADDING, PADDING + HEADER_HEIGHT), CORNER_RADIUS, fill=card_bg)
+    paste_rounded_card(img, (PADDING, PADDING, IMG_WIDTH - PADDING, PADDING + HEADER_HEIGHT), CORNER_RADIUS, fill=card_bg)
     
     # 用户头像和标题区域
     avatar_size = 60
@@ -121,7 +92,7 @@ async def draw_pokedex(pokedex_data: Dict[str, Any], user_info: Dict[str, Any],
         card_y1 = current_y
         card_y2 = card_y1 + FISH_CARD_HEIGHT
         # 绘制鱼卡片 - 使用背包风格
-        draw_rounded_rectangle(draw, (PADDING, card_y1, IMG_WIDTH - PADDING, card_y2), CORNER_RADIUS, fill=card_bg, outline=COLOR_CARD_BORDER)
+        paste_rounded_card(img, (PADDING, card_y1, IMG_WIDTH - PADDING, card_y2), CORNER_RADIUS, fill=card_bg, outline=COLOR_CARD_BORDER)
         # 左侧内容区域
         left_pane_x = PADDING + 30
         
@@ -190,10 +161,8 @@ async def draw_pokedex(pokedex_data: Dict[str, Any], user_info: Dict[str, Any],
     # 应用整个图片的圆角遮罩
     def apply_rounded_corners(image, corner_radius=20):
         """为整个图片应用圆角"""
-        # 创建圆角遮罩
-        mask = Image.new("L", image.size, 0)
-        mask_draw = ImageDraw.Draw(mask)
-        mask_draw.rounded_rectangle([0, 0, image.size[0], image.size[1]], corner_radius, fill=255)
+        # 使用缓存的圆角遮罩
+        mask = get_rounded_mask(image.size, corner_radius)
         
         # 创建带透明通道的输出图片
         output = Image.new("RGBA", image.size, (0, 0, 0, 0))
@@ -202,12 +171,15 @@ async def draw_pokedex(pokedex_data: Dict[str, Any], user_info: Dict[str, Any],
         
         return output
 
+    # 应用圆角遮罩
+    rounded_img = apply_rounded_corners(img, 20)
+    if output_path is None:
+        return rounded_img
     try:
         logger.info(f"准备将图鉴图片保存至: {output_path}")
-        # 应用圆角遮罩
-        rounded_img = apply_rounded_corners(img, 20)
         rounded_img.save(output_path)
         logger.info(f"图鉴图片已成功保存至 {output_path}")
     except Exception as e:
         logger.error(f"保存图鉴图片失败: {e}", exc_info=True)
         raise
+    return rounded_img
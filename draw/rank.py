@@ -1,7 +1,5 @@
-import os
-
 from PIL import Image, ImageDraw, ImageFont
-from typing import List, Dict
+from typing import List, Dict, Optional
 from astrbot.api import logger
 from .styles import (
     IMG_WIDTH, PADDING, CORNER_RADIUS,
@@ -11,6 +9,7 @@ from .styles import (
     COLOR_ACCENT, COLOR_TEXT_GOLD, COLOR_TEXT_SILVER, COLOR_TEXT_BRONZE,
     COLOR_FISH_COUNT, COLOR_COINS, load_font
 )
+from .resource_registry import get_image, get_text_bbox
 
 def draw_rounded_rectangle(draw, xy, radius=10, fill=None, outline=None, width=1):
     """绘制圆角矩形"""
@@ -34,7 +33,7 @@ def draw_rounded_rectangle(draw, xy, radius=10, fill=None, outline=None, width=1
 
 def get_text_metrics(text, font, draw):
     """获取文本指标，返回边界框和大小"""
-    bbox = draw.textbbox((0, 0), text, font=font)
+    bbox = get_text_bbox(font, text)
     text_width = bbox[2] - bbox[0]
     text_height = bbox[3] - bbox[1]
     return bbox, (text_width, text_height)
@@ -71,13 +70,13 @@ def format_weight(grams):
 # --- 新增结束 ---
 
 
-def draw_fishing_ranking(user_data: List[Dict], output_path: str, ranking_type: str = "coins"):
+def draw_fishing_ranking(user_data: List[Dict], output_path: Optional[str] = None, ranking_type: str = "coins"):
     """
-    绘制钓鱼排行榜图片
+    绘制钓鱼排行榜图片，返回图片
 
     参数:
     user_data: 用户数据列表，每个用户是一个字典，包含昵称、称号、金币、钓鱼数量、总重量、鱼竿、饰品等信息
-    output_path: 输出图片路径
+    output_path: 输出图片路径，为 None 时只返回图片不保存
     ranking_type: 排行榜类型 ('coins', 'max_coins', 'fish_count', 'total_weight_caught')
     """
     # 准备字体
@@ -129,9 +128,9 @@ def draw_fishing_ranking(user_data: List[Dict], output_path: str, ranking_type:
     # 奖杯符号
     trophy_symbols = []
     try:
-        gold_trophy = Image.open(os.path.join(os.path.dirname(__file__),"resource", "gold.png") ).resize((40, 40))
-        silver_trophy = Image.open(os.path.join(os.path.dirname(__file__),"resource", "silver.png")).resize((35, 35))
-        bronze_trophy = Image.open(os.path.join(os.path.dirname(__file__),"resource", "bronze.png")).resize((35, 35))
+        gold_trophy = get_image("gold.png", (40, 40))
+        silver_trophy = get_image("silver.png", (35, 35))
+        bronze_trophy = get_image("bronze.png", (35, 35))
         trophy_symbols = [gold_trophy, silver_trophy, bronze_trophy]
     except Exception as e:
         logger.warning(f"加载奖杯图片失败: {e}")
@@ -252,9 +251,12 @@ def draw_fishing_ranking(user_data: List[Dict], output_path: str, ranking_type:
         current_y = card_y2 + USER_CARD_MARGIN
 
     # 保存图片
+    if output_path is None:
+        return img
     try:
         img.save(output_path)
         logger.info(f"排行榜图片已保存到 {output_path}")
     except Exception as e:
         logger.error(f"保存排行榜图片失败: {e}")
-        raise e
\ No newline at end of file
+        raise e
+    return img
\ No newline at end of file
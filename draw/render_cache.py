@@ -0,0 +1,145 @@
+"""
+渲染产物缓存
+
+帮助图、骰宝帮助/赔率图等静态图片只取决于插件版本、配置和少量参数，
+首次渲染后把编码好的 PNG 字节保存在内存和磁盘上，之后直接发送文件，不再重新绘制。
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from PIL import Image
+from astrbot.api import logger
+
+
+def read_plugin_version(plugin_dir: str) -> str:
+    """从 metadata.yaml 读取插件版本号，读取失败时返回 "unknown" """
+    try:
+        with open(os.path.join(plugin_dir, "metadata.yaml"), encoding="utf-8-sig") as f:
+            for line in f:
+                match = re.match(r"\s*version\s*:\s*['\"]?([^'\"\s]+)", line)
+                if match:
+                    return match.group(1)
+    except OSError:
+        pass
+    return "unknown"
+
+
+class RenderCache:
+    """
+    静态图片渲染缓存
+
+    缓存键为 (渲染名称, 插件版本, 配置哈希, 渲染参数)，文件名形如
+    ``{名称}_{版本与配置指纹}_{参数摘要}.png``。
+    版本或配置变化后指纹随之改变，旧文件在创建缓存时清理。
+    """
+
+    def __init__(self, cache_dir: str, version: str, config: Dict[str, Any]):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        config_json = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+        self.fingerprint = hashlib.sha1(f"{version}|{config_json}".encode("utf-8")).hexdigest()[:12]
+
+        self._lock = threading.Lock()
+        # 缓存键 -> (PNG 字节, 文件路径)
+        self._entries: Dict[str, Tuple[bytes, str]] = {}
+        self._stats = {"hits": 0, "disk_hits": 0, "renders": 0, "render_ms_total": 0.0}
+        self._prune_stale_files()
+
+    def _key(self, name: str, args: tuple) -> str:
+        args_digest = hashlib.sha1(repr(args).encode("utf-8")).hexdigest()[:8]
+        return f"{name}_{self.fingerprint}_{args_digest}"
+
+    def _prune_stale_files(self) -> None:
+        """删除其他版本或配置下渲染的缓存文件"""
+        for filename in os.listdir(self.cache_dir):
+            if f"_{self.fingerprint}_" in filename:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except OSError as e:
+                logger.warning(f"清理过期渲染缓存失败: {filename}, {e}")
+
+    def _write_file(self, path: str, data: bytes) -> None:
+        # 先写临时文件再替换，避免并发读取到半个文件
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _get_entry(self, name: str, renderer: Callable[..., Image.Image], args: tuple) -> Tuple[bytes, str]:
+        key = self._key(name, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                data, path = entry
+                if not os.path.exists(path):
+                    self._write_file(path, data)
+                self._stats["hits"] += 1
+                return entry
+
+            path = os.path.join(self.cache_dir, f"{key}.png")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                self._stats["disk_hits"] += 1
+            else:
+                # 渲染只在首次请求或预热时发生，持锁渲染避免同一图片被并发重复绘制
+                start = time.perf_counter()
+                buffer = io.BytesIO()
+                renderer(*args).save(buffer, format="PNG", optimize=True)
+                data = buffer.getvalue()
+                self._write_file(path, data)
+                self._stats["renders"] += 1
+                self._stats["render_ms_total"] += (time.perf_counter() - start) * 1000
+            entry = self._entries[key] = (data, path)
+            return entry
+
+    def get_path(self, name: str, renderer: Callable[..., Image.Image], *args) -> str:
+        """获取渲染结果的文件路径，未缓存时调用 renderer(*args) 渲染一次"""
+        return self._get_entry(name, renderer, args)[1]
+
+    def get_bytes(self, name: str, renderer: Callable[..., Image.Image], *args) -> bytes:
+        """获取渲染结果的 PNG 字节，未缓存时调用 renderer(*args) 渲染一次"""
+        return self._get_entry(name, renderer, args)[0]
+
+    def get_entry(self, name: str, renderer: Callable[..., Image.Image], *args) -> Tuple[bytes, str]:
+        """获取渲染结果的 (PNG 字节, 文件路径)，由调用方按发送方式选用"""
+        return self._get_entry(name, renderer, args)
+
+    def warm(self, renders: Iterable[Tuple[str, Callable[..., Image.Image], tuple]]) -> int:
+        """预热缓存，返回成功准备的图片数量；单个渲染失败不影响其他图片"""
+        count = 0
+        for name, renderer, args in renders:
+            try:
+                self._get_entry(name, renderer, tuple(args))
+                count += 1
+            except Exception as e:
+                logger.error(f"预渲染 {name} 失败: {e}")
+        return count
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """清空缓存（含磁盘文件）；指定 name 时只清除该渲染名称下的图片"""
+        with self._lock:
+            keys = [k for k in self._entries if name is None or k.startswith(f"{name}_{self.fingerprint}_")]
+            for key in keys:
+                self._entries.pop(key, None)
+            for filename in os.listdir(self.cache_dir):
+                if name is None or filename.startswith(f"{name}_{self.fingerprint}_"):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, filename))
+                    except OSError:
+                        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回缓存命中与渲染统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        return stats
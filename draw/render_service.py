@@ -0,0 +1,166 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Optional
+
+from astrbot.api import logger
+
+from .render_worker import render_image, warm_up
+
+
+class RenderService:
+    """
+    图片渲染服务
+
+    draw/* 的绘图函数是 CPU 密集的 PIL 操作，在独立的进程池中执行，避免阻塞事件循环。
+    同时进行的渲染数不超过进程数，其余请求在事件循环中排队；
+    排队加渲染超过超时时间时返回 None，由调用方回退到文本输出。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        timeout_seconds: float = 30.0,
+        use_process_pool: bool = True,
+        latency_window: int = 200,
+        image_format: str = "PNG",
+        encode_options: Optional[Dict[str, Any]] = None,
+    ):
+        self.max_workers = max(1, int(max_workers))
+        self.timeout_seconds = float(timeout_seconds)
+        self.use_process_pool = use_process_pool
+        self.latency_window = latency_window
+        self.image_format = image_format
+        self.encode_options = dict(encode_options or {})
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._mode = "stopped"
+        # 限制同时提交到进程池的任务数，超时的请求在排队阶段即可取消，不会占用进程
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    # --- 执行器管理 ---
+    def start(self) -> None:
+        """创建渲染进程池并预热；进程池不可用时退回线程池"""
+        with self._executor_lock:
+            if self._executor is not None:
+                return
+            if self.use_process_pool:
+                try:
+                    # 插件进程中有多个后台线程，使用 spawn 避免 fork 继承锁状态
+                    executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                    for _ in range(self.max_workers):
+                        executor.submit(warm_up)
+                    self._executor, self._mode = executor, "process"
+                    return
+                except Exception as e:
+                    logger.warning(f"渲染进程池启动失败，改用线程池渲染: {e}")
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="fishing-render"
+            )
+            self._mode = "thread"
+
+    def shutdown(self) -> None:
+        """关闭渲染执行器，未开始的渲染任务直接取消"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+            self._mode = "stopped"
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _restart_broken_pool(self, broken: Executor) -> None:
+        with self._executor_lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        logger.warning("渲染进程池异常退出，正在重建")
+        self.start()
+
+    # --- 渲染 ---
+    async def render(self, name: str, renderer: Callable[..., Any], *args, **kwargs) -> Optional[bytes]:
+        """渲染并返回按 image_format 编码的图片字节；超时或失败时返回 None"""
+        return await self._run(name, None, renderer, args, kwargs)
+
+    async def render_to_file(
+        self, name: str, output_path: str, renderer: Callable[..., Any], *args, **kwargs
+    ) -> Optional[str]:
+        """渲染并在渲染进程中写入 output_path，返回路径；超时或失败时返回 None"""
+        return await self._run(name, output_path, renderer, args, kwargs)
+
+    async def _run(
+        self,
+        name: str,
+        output_path: Optional[str],
+        renderer: Callable[..., Any],
+        args: tuple,
+        kwargs: Dict[str, Any],
+    ) -> Any:
+        if self._executor is None:
+            self.start()
+        started_at = time.monotonic()
+        executor = self._executor
+        try:
+            result = await asyncio.wait_for(
+                self._submit(executor, renderer, args, kwargs, output_path),
+                timeout=self.timeout_seconds,
+            )
+        except asyncio.TimeoutError:
+            self._record(name, time.monotonic() - started_at, "timeouts")
+            logger.warning(f"渲染 {name} 超时（{self.timeout_seconds:g}s），改用文本输出")
+            return None
+        except BrokenProcessPool as e:
+            self._record(name, time.monotonic() - started_at, "failed")
+            logger.error(f"渲染 {name} 失败，渲染进程异常退出: {e}")
+            self._restart_broken_pool(executor)
+            return None
+        except Exception as e:
+            self._record(name, time.monotonic() - started_at, "failed")
+            logger.error(f"渲染 {name} 失败: {e}", exc_info=True)
+            return None
+        self._record(name, time.monotonic() - started_at, "completed")
+        return result
+
+    async def _submit(self, executor: Executor, renderer, args, kwargs, output_path) -> Any:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            return await loop.run_in_executor(
+                executor, render_image, renderer, args, kwargs, output_path,
+                self.image_format, self.encode_options,
+            )
+
+    # --- 统计 ---
+    def _record(self, name: str, elapsed: float, outcome: str) -> None:
+        with self._stats_lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {"completed": 0, "failed": 0, "timeouts": 0, "time_total": 0.0}
+                self._latencies[name] = deque(maxlen=self.latency_window)
+            stats[outcome] += 1
+            if outcome == "completed":
+                stats["time_total"] += elapsed
+                self._latencies[name].append(elapsed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回执行模式与各渲染器的次数、超时数和延迟分位数（毫秒）"""
+        renderers = {}
+        with self._stats_lock:
+            for name, stats in self._stats.items():
+                latencies = sorted(self._latencies[name])
+                entry = {k: stats[k] for k in ("completed", "failed", "timeouts")}
+                if latencies:
+                    entry["avg_ms"] = round(stats["time_total"] / stats["completed"] * 1000, 1)
+                    entry["p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 1)
+                    entry["p99_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1)
+                renderers[name] = entry
+        return {"mode": self._mode, "max_workers": self.max_workers, "renderers": renderers}
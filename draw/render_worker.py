@@ -0,0 +1,53 @@
+"""
+渲染进程入口
+
+在渲染进程中执行 draw/* 下的绘图函数，并把结果编码为图片字节。
+绘图函数须为模块级函数、参数须为可 pickle 的普通数据（字典、列表等），
+异步绘图函数（需要下载头像/图标）在进程内用独立的事件循环执行。
+"""
+
+import asyncio
+import inspect
+import io
+import os
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def render_image(
+    renderer: Callable[..., Any],
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+    output_path: Optional[str] = None,
+    image_format: str = "PNG",
+    encode_options: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """
+    执行绘图函数并编码图片，encode_options 原样传给 Image.save（如 PNG 压缩级别、WebP 质量）。
+
+    Returns:
+        未指定 output_path 时返回图片字节；否则写入该路径并返回路径
+    """
+    image = renderer(*args, **kwargs)
+    if inspect.isawaitable(image):
+        image = asyncio.run(image)
+    buffer = io.BytesIO()
+    if image_format.upper() == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    image.save(buffer, format=image_format, **(encode_options or {}))
+    data = buffer.getvalue()
+    if output_path is None:
+        return data
+    # 先写临时文件再替换，避免发送时读到写了一半的图片
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def warm_up() -> int:
+    """预先导入绘图模块并加载字体、装饰图片，避免首个渲染请求承担准备开销；返回进程号"""
+    from . import backpack, pokedex, rank, sicbo, state  # noqa: F401
+    from .resource_registry import warm_up_resources
+    warm_up_resources()
+    return os.getpid()
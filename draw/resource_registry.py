@@ -0,0 +1,139 @@
+"""
+绘图资源注册表
+
+字体、CJK 回退字体、缩放好的装饰图片和文本尺寸测量结果在进程内只加载/计算一次，
+所有绘图函数共享同一份。渲染进程池中的每个进程各自持有一份注册表，
+进程预热时调用 warm_up_resources，首张图片之后的渲染几乎没有准备开销。
+
+注册表返回的字体和图片是共享对象，调用方只能读取或粘贴，不能原地修改。
+"""
+
+import functools
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+RESOURCE_DIR = os.path.join(os.path.dirname(__file__), "resource")
+DEFAULT_FONT_NAME = "DouyinSansBold.otf"
+
+# CJK 回退字体（按优先级排序），仅使用项目资源目录中的字体，不查询系统
+CJK_FONT_NAMES = (
+    "NotoSansTC-Bold.ttf",  # Noto Sans 繁体中文（优先）
+    "NotoSansJP-Bold.ttf",  # Noto Sans 日文（后备）
+)
+
+# 文本测量缓存上限；排行榜、背包等文本量有限，足以覆盖常见文本
+TEXT_METRICS_CACHE_SIZE = 8192
+
+# 只用于测量的画布，textbbox 不会在画布上绘制
+_MEASURE_DRAW = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+
+def resource_path(name: str) -> str:
+    """资源目录下文件的完整路径"""
+    return os.path.join(RESOURCE_DIR, name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(path: str, size: int) -> ImageFont.ImageFont:
+    """按 (路径, 字号) 加载字体，加载失败时返回 PIL 默认字体"""
+    try:
+        return ImageFont.truetype(path, size)
+    except (IOError, OSError):
+        return ImageFont.load_default()
+
+
+def get_resource_font(size: int, name: str = DEFAULT_FONT_NAME) -> ImageFont.ImageFont:
+    """加载资源目录中的字体"""
+    return get_font(resource_path(name), size)
+
+
+@functools.lru_cache(maxsize=1)
+def get_cjk_font_path() -> Optional[str]:
+    """查找 CJK 回退字体路径（只探测一次文件系统），找不到时返回 None"""
+    for font_name in CJK_FONT_NAMES:
+        font_path = resource_path(font_name)
+        if os.path.exists(font_path):
+            return font_path
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_fallback_font(path: str, size: int):
+    """
+    按 (路径, 字号) 获取带 CJK 回退的字体。
+
+    同一字号共享一个 FontWithFallback，其字符到字体的映射缓存也在渲染之间复用。
+    """
+    from .text_utils import FontWithFallback
+
+    primary_font = get_font(path, size)
+    fallback_font = None
+    cjk_font_path = get_cjk_font_path()
+    if cjk_font_path:
+        fallback_font = get_font(cjk_font_path, size)
+        if not isinstance(fallback_font, ImageFont.FreeTypeFont):
+            # 回退字体加载失败，不使用默认字体充当回退
+            fallback_font = None
+    return FontWithFallback(primary_font, fallback_font)
+
+
+@functools.lru_cache(maxsize=None)
+def get_image(name: str, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """
+    加载资源目录中的图片，可按 size 缩放。
+
+    图片在返回前已完成解码，不持有文件句柄。加载失败时抛出异常，不缓存失败结果。
+    """
+    with Image.open(resource_path(name)) as image:
+        image.load()
+        if size is not None:
+            return image.resize(size)
+        return image.copy()
+
+
+@functools.lru_cache(maxsize=TEXT_METRICS_CACHE_SIZE)
+def get_text_bbox(font: Any, text: str) -> Tuple[int, int, int, int]:
+    """按 (字体, 文本) 缓存的文本边界框，字体对象应来自本注册表以保证键稳定"""
+    return _MEASURE_DRAW.textbbox((0, 0), text, font=font)
+
+
+def get_text_size(font: Any, text: str) -> Tuple[int, int]:
+    """按 (字体, 文本) 缓存的文本尺寸 (宽, 高)"""
+    left, top, right, bottom = get_text_bbox(font, text)
+    return right - left, bottom - top
+
+
+def warm_up_resources() -> None:
+    """预加载绘图函数常用的字体和装饰图片"""
+    for size in (12, 14, 16, 18, 20, 22, 24, 28, 32, 36, 42, 48):
+        get_resource_font(size)
+    get_fallback_font(resource_path(DEFAULT_FONT_NAME), 16)
+    for name, size in (("gold.png", (40, 40)), ("silver.png", (35, 35)), ("bronze.png", (35, 35))):
+        try:
+            get_image(name, size)
+        except Exception:
+            # 缺失的图片在实际渲染时由调用方处理
+            pass
+
+
+def resource_cache_stats() -> Dict[str, Dict[str, int]]:
+    """各缓存的命中统计"""
+    caches = {
+        "fonts": get_font,
+        "fallback_fonts": get_fallback_font,
+        "images": get_image,
+        "text_metrics": get_text_bbox,
+    }
+    stats = {}
+    for name, cached in caches.items():
+        info = cached.cache_info()
+        stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+    return stats
+
+
+def clear_resource_caches() -> None:
+    """清空所有资源缓存（资源文件更新或测试时使用）"""
+    for cached in (get_font, get_cjk_font_path, get_fallback_font, get_image, get_text_bbox):
+        cached.cache_clear()
@@ -482,16 +482,19 @@ def draw_sicbo_countdown_setting(seconds: int, admin_name: str) -> Image.Image:
     return image
 
 
-def save_image_to_temp(image: Image.Image, filename: str, data_dir: str) -> str:
-    """将图片保存到临时目录并返回路径"""
+def get_temp_image_path(filename: str, data_dir: str) -> str:
+    """生成临时图片路径（使用时间戳确保文件名唯一）"""
     temp_dir = os.path.join(data_dir, "temp_images")
     os.makedirs(temp_dir, exist_ok=True)
     
-    # 使用时间戳确保文件名唯一
     import time
     timestamp = int(time.time() * 1000)
-    image_path = os.path.join(temp_dir, f"{filename}_{timestamp}.png")
-    
+    return os.path.join(temp_dir, f"{filename}_{timestamp}.png")
+
+
+def save_image_to_temp(image: Image.Image, filename: str, data_dir: str) -> str:
+    """将图片保存到临时目录并返回路径"""
+    image_path = get_temp_image_path(filename, data_dir)
     image.save(image_path, "PNG")
     return image_path
 
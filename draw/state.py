@@ -12,6 +12,7 @@ from .styles import (
     COLOR_REFINE_RED, COLOR_REFINE_ORANGE, COLOR_CORNER, load_font
 )
 from .text_utils import load_font_with_cjk_fallback, draw_text_smart
+from .resource_registry import get_resource_font, get_text_size as measure_text_size
 
 def format_rarity_display(rarity: int) -> str:
     """格式化稀有度显示，支持显示到10星，10星以上显示为★★★★★★★★★★+"""
@@ -62,21 +63,17 @@ async def draw_state_image(user_data: Dict[str, Any], data_dir: str) -> Image.Im
     # 画布尺寸 
     width, height = 620, 540
     
-    # 导入优化的渐变生成函数
-    from .gradient_utils import create_vertical_gradient
+    # 使用缓存的渐变背景模板
+    from .template_cache import new_gradient_canvas, paste_rounded_card
 
     bg_top = (174, 214, 241)  # 柔和天蓝色
     bg_bot = (245, 251, 255)  # 温和淡蓝色
-    image = create_vertical_gradient(width, height, bg_top, bg_bot)
+    image = new_gradient_canvas(width, height, bg_top, bg_bot)
     draw = ImageDraw.Draw(image)
 
     # 2. 加载字体（称号字体使用CJK回退支持）
     def load_font(name, size):
-        path = os.path.join(os.path.dirname(__file__), "resource", name)
-        try:
-            return ImageFont.truetype(path, size)
-        except Exception as e:
-            return ImageFont.load_default()
+        return get_resource_font(size, name)
 
     font_path = os.path.join(os.path.dirname(__file__), "resource", "DouyinSansBold.otf")
     title_font = load_font("DouyinSansBold.otf", 28)
@@ -113,20 +110,12 @@ async def draw_state_image(user_data: Dict[str, Any], data_dir: str) -> Image.Im
     def get_text_size(text, font):
         # 如果是FontWithFallback类型，使用主字体测量（简化处理）
         actual_font = font.primary_font if hasattr(font, 'primary_font') else font
-        bbox = draw.textbbox((0, 0), text, font=actual_font)
-        return bbox[2] - bbox[0], bbox[3] - bbox[1]
+        return measure_text_size(actual_font, text)
 
     # 5. 绘制圆角矩形
     def draw_rounded_rectangle(draw, bbox, radius, fill=None, outline=None, width=1):
-        x1, y1, x2, y2 = bbox
-        # 绘制主体矩形
-        draw.rectangle([x1 + radius, y1, x2 - radius, y2], fill=fill, outline=outline, width=width)
-        draw.rectangle([x1, y1 + radius, x2, y2 - radius], fill=fill, outline=outline, width=width)
-        # 绘制圆角
-        draw.ellipse([x1, y1, x1 + 2*radius, y1 + 2*radius], fill=fill, outline=outline, width=width)
-        draw.ellipse([x2 - 2*radius, y1, x2, y1 + 2*radius], fill=fill, outline=outline, width=width)
-        draw.ellipse([x1, y2 - 2*radius, x1 + 2*radius, y2], fill=fill, outline=outline, width=width)
-        draw.ellipse([x2 - 2*radius, y2 - 2*radius, x2, y2], fill=fill, outline=outline, width=width)
+        # 粘贴缓存的抗锯齿卡片模板，不再逐次绘制矩形和椭圆
+        paste_rounded_card(image, bbox, radius, fill, outline, width)
 
     # 绘制标题
     title_text = "用户状态面板"
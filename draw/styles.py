@@ -1,6 +1,7 @@
 # draw/styles.py
 import os
-from PIL import ImageFont
+
+from .resource_registry import get_font
 
 # --- 基础配置 ---
 IMG_WIDTH = 800
@@ -72,10 +73,8 @@ FONT_PATH_BOLD = os.path.join(os.path.dirname(__file__), "resource", "DouyinSans
 
 # --- 字体加载 ---
 def load_font(size):
-    try:
-        return ImageFont.truetype(FONT_PATH_BOLD, size)
-    except IOError:
-        return ImageFont.load_default()
+    """按字号获取共享的粗体字体，同一字号只加载一次"""
+    return get_font(FONT_PATH_BOLD, size)
 
 FONT_HEADER = load_font(36)    # 标题字体
 FONT_SUBHEADER = load_font(24) # 收集进度字体
@@ -0,0 +1,135 @@
+"""
+背景与卡片模板缓存
+
+状态、背包、图鉴等图片的渐变背景和圆角卡片在不同用户之间完全相同，
+这里按参数缓存生成好的图片，绘制时只需复制或粘贴：
+
+- 渐变背景按 (宽, 高, 颜色) 缓存，由单列渐变横向拉伸得到，不再分配 H×W×3 的数组
+- 圆角遮罩按 (尺寸, 圆角半径) 缓存，只对四个角做超采样抗锯齿
+- 卡片按 (尺寸, 圆角半径, 填充色, 边框) 缓存为带透明通道的图片，直接粘贴到画布
+
+缓存中的图片是共享对象，调用方需要绘制时先 copy()。
+"""
+
+import functools
+from typing import Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+from .gradient_utils import create_vertical_gradient
+
+Color = Tuple[int, ...]
+
+# 圆角超采样倍数
+SUPERSAMPLE = 4
+
+
+@functools.lru_cache(maxsize=256)
+def _get_gradient_column(height: int, top_color: Color, bottom_color: Color) -> Image.Image:
+    """1 像素宽的垂直渐变列，像素值与 create_vertical_gradient 一致"""
+    return create_vertical_gradient(1, height, top_color, bottom_color)
+
+
+@functools.lru_cache(maxsize=16)
+def get_vertical_gradient(width: int, height: int, top_color: Color, bottom_color: Color) -> Image.Image:
+    """按 (宽, 高, 颜色) 缓存的垂直渐变背景（共享对象，勿直接绘制）"""
+    return _get_gradient_column(height, top_color, bottom_color).resize((width, height), Image.Resampling.NEAREST)
+
+
+def new_gradient_canvas(width: int, height: int, top_color: Color, bottom_color: Color) -> Image.Image:
+    """以缓存的渐变背景创建一张可绘制的画布"""
+    return get_vertical_gradient(width, height, tuple(top_color), tuple(bottom_color)).copy()
+
+
+def extend_gradient_canvas(image: Image.Image, new_height: int, top_color: Color, bottom_color: Color) -> Image.Image:
+    """
+    把渐变画布加高到 new_height。
+
+    原有内容保持不变，新增部分取高度为 new_height 的渐变在对应位置的颜色，
+    只生成新增的渐变条，不重建整张背景。
+    """
+    width, old_height = image.size
+    if new_height <= old_height:
+        return image
+    column = _get_gradient_column(new_height, tuple(top_color), tuple(bottom_color))
+    strip = column.crop((0, old_height, 1, new_height)).resize(
+        (width, new_height - old_height), Image.Resampling.NEAREST
+    )
+    extended = Image.new(image.mode, (width, new_height))
+    extended.paste(image, (0, 0))
+    extended.paste(strip, (0, old_height))
+    return extended
+
+
+@functools.lru_cache(maxsize=32)
+def _get_corner_mask(radius: int) -> Image.Image:
+    """左上角的抗锯齿四分之一圆遮罩"""
+    large = radius * SUPERSAMPLE
+    corner = Image.new("L", (large, large), 0)
+    ImageDraw.Draw(corner).pieslice((0, 0, large * 2 - 1, large * 2 - 1), 180, 270, fill=255)
+    return corner.resize((radius, radius), Image.Resampling.LANCZOS)
+
+
+@functools.lru_cache(maxsize=128)
+def get_rounded_mask(size: Tuple[int, int], radius: int) -> Image.Image:
+    """按 (尺寸, 圆角半径) 缓存的圆角矩形遮罩（共享对象，勿直接修改）"""
+    width, height = size
+    mask = Image.new("L", (width, height), 255)
+    radius = max(0, min(radius, width // 2, height // 2))
+    if radius == 0:
+        return mask
+    corner = _get_corner_mask(radius)
+    mask.paste(corner, (0, 0))
+    mask.paste(corner.transpose(Image.Transpose.FLIP_LEFT_RIGHT), (width - radius, 0))
+    mask.paste(corner.transpose(Image.Transpose.FLIP_TOP_BOTTOM), (0, height - radius))
+    mask.paste(corner.transpose(Image.Transpose.ROTATE_180), (width - radius, height - radius))
+    return mask
+
+
+@functools.lru_cache(maxsize=128)
+def get_rounded_card(
+    size: Tuple[int, int],
+    radius: int,
+    fill: Color,
+    outline: Optional[Color] = None,
+    outline_width: int = 1,
+) -> Image.Image:
+    """按 (尺寸, 圆角半径, 填充色, 边框) 缓存的 RGBA 圆角卡片（共享对象，勿直接修改）"""
+    width, height = size
+    outer_mask = get_rounded_mask(size, radius)
+    card = Image.new("RGBA", size, tuple(outline or fill)[:3] + (0,))
+    card.putalpha(outer_mask)
+    if outline is not None and outline_width > 0:
+        inner_size = (width - 2 * outline_width, height - 2 * outline_width)
+        if inner_size[0] > 0 and inner_size[1] > 0:
+            inner_mask = get_rounded_mask(inner_size, max(0, radius - outline_width))
+            card.paste(tuple(fill)[:3] + (255,), (outline_width, outline_width), inner_mask)
+    return card
+
+
+def paste_rounded_card(
+    image: Image.Image,
+    bbox: Tuple[int, int, int, int],
+    radius: int,
+    fill: Color,
+    outline: Optional[Color] = None,
+    width: int = 1,
+) -> None:
+    """
+    在画布上粘贴圆角卡片。
+
+    bbox 与 ImageDraw.rounded_rectangle 相同，为包含两端的 (x1, y1, x2, y2)。
+    填充色的透明度分量被忽略，卡片按不透明处理，与在 RGB 画布上直接绘制的效果一致。
+    """
+    x1, y1, x2, y2 = (int(v) for v in bbox)
+    size = (x2 - x1 + 1, y2 - y1 + 1)
+    if size[0] <= 0 or size[1] <= 0:
+        return
+    card = get_rounded_card(
+        size,
+        int(radius),
+        tuple(fill)[:3],
+        tuple(outline)[:3] if outline is not None else None,
+        width,
+    )
+    image.paste(card, (x1, y1), card)
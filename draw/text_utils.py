@@ -2,45 +2,35 @@
 文本处理工具函数
 优化文本测量、换行和渲染性能
 """
-import os
 import platform
 from PIL import Image, ImageDraw, ImageFont
 from typing import List, Tuple, Optional
 
+from .resource_registry import get_cjk_font_path, get_fallback_font, get_text_bbox, get_text_size
+
 
 def get_text_size_cached(text: str, font: ImageFont.FreeTypeFont, cache: dict = None) -> Tuple[int, int]:
     """
     带缓存的文本尺寸测量，避免重复计算
     
+    测量结果保存在进程级的 LRU 缓存中（按字体和文本），在多次渲染之间复用。
+    
     Args:
         text: 要测量的文本
         font: 字体对象
-        cache: 可选的缓存字典
+        cache: 可选的缓存字典，保留以兼容旧调用，测量结果不再依赖它
     
     Returns:
         (width, height): 文本尺寸
     """
-    if cache is None:
-        # 如果没有提供缓存，直接测量
-        return _measure_text_size(text, font)
-    
-    # 使用缓存
-    cache_key = f"{text}_{font.size}"
-    if cache_key not in cache:
-        cache[cache_key] = _measure_text_size(text, font)
-    
-    return cache[cache_key]
+    return get_text_size(font, text)
 
 
 def _measure_text_size(text: str, font: ImageFont.FreeTypeFont) -> Tuple[int, int]:
     """
     测量文本尺寸的内部函数
     """
-    # 创建临时图像进行测量
-    temp_img = Image.new('RGB', (1, 1), (255, 255, 255))
-    temp_draw = ImageDraw.Draw(temp_img)
-    bbox = temp_draw.textbbox((0, 0), text, font=font)
-    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+    return get_text_size(font, text)
 
 
 def wrap_text_by_width_optimized(text: str, font: ImageFont.FreeTypeFont, max_width: int, cache: dict = None) -> List[str]:
@@ -186,20 +176,7 @@ def _find_cjk_font() -> Optional[str]:
     Returns:
         字体文件路径，如果找不到则返回None
     """
-    resource_dir = os.path.join(os.path.dirname(__file__), "resource")
-    
-    # 使用项目资源目录中的字体（按优先级排序）
-    cjk_fonts = [
-        "NotoSansTC-Bold.ttf",  # Noto Sans 繁体中文（优先）
-        "NotoSansJP-Bold.ttf",  # Noto Sans 日文（后备）
-    ]
-    
-    for font_name in cjk_fonts:
-        font_path = os.path.join(resource_dir, font_name)
-        if os.path.exists(font_path):
-            return font_path
-    
-    return None
+    return get_cjk_font_path()
 
 
 class FontWithFallback:
@@ -297,6 +274,8 @@ def load_font_with_cjk_fallback(font_path: str, size: int) -> FontWithFallback:
     """
     加载字体，自动添加CJK回退支持
     
+    同一 (路径, 字号) 返回共享的字体对象，不要修改其属性。
+    
     Args:
         font_path: 主字体文件路径
         size: 字体大小
@@ -304,23 +283,7 @@ def load_font_with_cjk_fallback(font_path: str, size: int) -> FontWithFallback:
     Returns:
         FontWithFallback: 带回退的字体对象
     """
-    # 加载主字体
-    try:
-        primary_font = ImageFont.truetype(font_path, size)
-    except Exception:
-        primary_font = ImageFont.load_default()
-    
-    # 加载CJK字体作为回退（仅使用项目资源中的字体，不查询系统）
-    fallback_font = None
-    cjk_font_path = _find_cjk_font()
-    if cjk_font_path:
-        try:
-            fallback_font = ImageFont.truetype(cjk_font_path, size)
-        except Exception as e:
-            # 如果加载失败，记录错误但不抛出异常
-            pass
-    
-    return FontWithFallback(primary_font, fallback_font)
+    return get_fallback_font(font_path, size)
 
 
 def draw_text_smart(
@@ -367,14 +330,10 @@ def draw_text_smart(
         x, y = position
         current_x = x
         
-        # 创建临时图像用于测量（复用以提高效率）
-        temp_img = Image.new('RGB', (200, 100), (255, 255, 255))
-        temp_draw = ImageDraw.Draw(temp_img)
-        
         # 计算中线对齐：使用主字体的标准字符的垂直中心作为参考
         # 这确保无论使用哪个字体渲染，字符都在同一水平视觉中心线上
         # 使用"A"作为参考字符（标准拉丁字母大写，所有字体都支持）
-        reference_bbox = temp_draw.textbbox((0, 0), "A", font=font.primary_font)
+        reference_bbox = get_text_bbox(font.primary_font, "A")
         reference_center_y = (reference_bbox[1] + reference_bbox[3]) / 2  # 垂直中心
         
         for i, char in enumerate(text):
@@ -382,7 +341,7 @@ def draw_text_smart(
             char_font = font._get_font_for_char(char)
             
             # 获取当前字符的bbox
-            char_bbox = temp_draw.textbbox((0, 0), char, font=char_font)
+            char_bbox = get_text_bbox(char_font, char)
             char_center_y = (char_bbox[1] + char_bbox[3]) / 2  # 当前字符的垂直中心
             
             # 计算y坐标：让所有字符的垂直中心对齐到参考中心
@@ -397,7 +356,7 @@ def draw_text_smart(
                 if hasattr(font.primary_font, 'getlength'):
                     char_width = int(font.primary_font.getlength(char))
                 else:
-                    bbox = temp_draw.textbbox((0, 0), char, font=font.primary_font)
+                    bbox = get_text_bbox(font.primary_font, char)
                     char_width = bbox[2] - bbox[0]
                     
                     # 如果主字体无法测量（宽度为0），使用实际字符字体测量
@@ -405,7 +364,7 @@ def draw_text_smart(
                         if hasattr(char_font, 'getlength'):
                             char_width = int(char_font.getlength(char))
                         else:
-                            bbox = temp_draw.textbbox((0, 0), char, font=char_font)
+                            bbox = get_text_bbox(char_font, char)
                             char_width = bbox[2] - bbox[0]
                             if char_width <= 0:
                                 char_width = font.primary_font.size
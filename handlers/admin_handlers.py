@@ -156,18 +156,11 @@ async def reward_all_coins(plugin: "FishingPlugin", event: AstrMessageEvent):
     except ValueError as e:
         yield event.plain_result(f"❌ 数量格式错误：{str(e)}")
         return
-    user_ids = plugin.user_repo.get_all_user_ids()
-    if not user_ids:
+    # 单条 UPDATE 批量发放，在线程池中执行避免阻塞事件循环
+    updated = await plugin.service_executor.run(None, plugin.user_repo.add_currency_to_all, "coins", amount_int)
+    if not updated:
         yield event.plain_result("❌ 当前没有注册用户。")
         return
-    updated = 0
-    for uid in user_ids:
-        user = plugin.user_repo.get_by_id(uid)
-        if not user:
-            continue
-        user.coins += amount_int
-        plugin.user_repo.update(user)
-        updated += 1
     yield event.plain_result(f"✅ 已向 {updated} 位用户每人发放 {amount_int} 金币")
 
 
@@ -184,18 +177,12 @@ async def reward_all_premium(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("❌ 奖励数量必须是正整数，请检查后重试。")
         return
     amount_int = int(amount)
-    user_ids = plugin.user_repo.get_all_user_ids()
-    if not user_ids:
+    updated = await plugin.service_executor.run(
+        None, plugin.user_repo.add_currency_to_all, "premium_currency", amount_int
+    )
+    if not updated:
         yield event.plain_result("❌ 当前没有注册用户。")
         return
-    updated = 0
-    for uid in user_ids:
-        user = plugin.user_repo.get_by_id(uid)
-        if not user:
-            continue
-        user.premium_currency += amount_int
-        plugin.user_repo.update(user)
-        updated += 1
     yield event.plain_result(f"✅ 已向 {updated} 位用户每人发放 {amount_int} 高级货币")
 
 
@@ -210,25 +197,10 @@ async def deduct_all_coins(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("❌ 扣除数量必须是正整数，请检查后重试。")
         return
     amount_int = int(amount)
-    user_ids = plugin.user_repo.get_all_user_ids()
-    if not user_ids:
-        yield event.plain_result("❌ 当前没有注册用户。")
-        return
-    affected = 0
-    total_deducted = 0
-    for uid in user_ids:
-        user = plugin.user_repo.get_by_id(uid)
-        if not user:
-            continue
-        if user.coins <= 0:
-            continue
-        deduct = min(user.coins, amount_int)
-        if deduct <= 0:
-            continue
-        user.coins -= deduct
-        plugin.user_repo.update(user)
-        affected += 1
-        total_deducted += deduct
+    # 单个事务内统计并扣除，每人至多扣除 amount_int，不低于0
+    affected, total_deducted = await plugin.service_executor.run(
+        None, plugin.user_repo.deduct_currency_from_all, "coins", amount_int
+    )
     yield event.plain_result(
         f"✅ 已从 {affected} 位用户总计扣除 {total_deducted} 金币（每人至多 {amount_int}）"
     )
@@ -247,25 +219,10 @@ async def deduct_all_premium(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("❌ 扣除数量必须是正整数，请检查后重试。")
         return
     amount_int = int(amount)
-    user_ids = plugin.user_repo.get_all_user_ids()
-    if not user_ids:
-        yield event.plain_result("❌ 当前没有注册用户。")
-        return
-    affected = 0
-    total_deducted = 0
-    for uid in user_ids:
-        user = plugin.user_repo.get_by_id(uid)
-        if not user:
-            continue
-        if user.premium_currency <= 0:
-            continue
-        deduct = min(user.premium_currency, amount_int)
-        if deduct <= 0:
-            continue
-        user.premium_currency -= deduct
-        plugin.user_repo.update(user)
-        affected += 1
-        total_deducted += deduct
+    # 单个事务内统计并扣除，每人至多扣除 amount_int，不低于0
+    affected, total_deducted = await plugin.service_executor.run(
+        None, plugin.user_repo.deduct_currency_from_all, "premium_currency", amount_int
+    )
     yield event.plain_result(
         f"✅ 已从 {affected} 位用户总计扣除 {total_deducted} 高级货币（每人至多 {amount_int}）"
     )
@@ -512,32 +469,21 @@ async def reward_all_items(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result(f"❌ 道具不存在，请检查道具ID和类型。")
         return
 
-    # 获取所有用户ID
-    user_ids = plugin.user_repo.get_all_user_ids()
-    if not user_ids:
+    # 集合操作一次性给所有用户发放，在线程池中执行避免阻塞事件循环
+    result = await plugin.service_executor.run(
+        None, plugin.user_service.add_item_to_all_users, item_type, item_id, quantity
+    )
+    if not result.get("success"):
+        logger.error(f"全体发放道具失败: {result.get('message')}")
+        yield event.plain_result(f"❌ {result.get('message')}")
+        return
+    if not result["count"]:
         yield event.plain_result("❌ 当前没有注册用户。")
         return
 
-    # 给所有用户发放道具
-    success_count = 0
-    failed_count = 0
-
-    for user_id in user_ids:
-        try:
-            result = plugin.user_service.add_item_to_user_inventory(
-                user_id, item_type, item_id, quantity
-            )
-            if result.get("success", False):
-                success_count += 1
-            else:
-                failed_count += 1
-        except Exception as e:
-            failed_count += 1
-            logger.error(f"给用户 {user_id} 发放道具失败: {e}")
-
     item_name = getattr(item_template, "name", f"ID:{item_id}")
     yield event.plain_result(
-        f"✅ 全体发放道具完成！\n📦 道具：{item_name} x{quantity}\n✅ 成功：{success_count} 位用户\n❌ 失败：{failed_count} 位用户"
+        f"✅ 全体发放道具完成！\n📦 道具：{item_name} x{quantity}\n✅ 成功：{result['count']} 位用户"
     )
 
 
@@ -18,7 +18,7 @@ async def aquarium(self: "FishingPlugin", event: AstrMessageEvent):
         return
 
     user_id = self._get_effective_user_id(event)
-    result = self.aquarium_service.get_user_aquarium(user_id)
+    result = await self.service_executor.run(user_id, self.aquarium_service.get_user_aquarium, user_id)
 
     if not result["success"]:
         yield event.plain_result(f"❌ {result['message']}")
@@ -100,7 +100,7 @@ async def add_to_aquarium(self: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("❌ 鱼ID格式错误！请使用F开头的短码（如F3、F3H）或纯数字ID")
         return
 
-    result = self.aquarium_service.add_fish_to_aquarium(user_id, fish_id, quantity, quality_level)
+    result = await self.service_executor.run(user_id, self.aquarium_service.add_fish_to_aquarium, user_id, fish_id, quantity, quality_level)
     
     if result["success"]:
         yield event.plain_result(f"✅ {result['message']}")
@@ -142,7 +142,7 @@ async def remove_from_aquarium(self: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("❌ 鱼ID格式错误！请使用F开头的短码（如F3、F3H）或纯数字ID")
         return
 
-    result = self.aquarium_service.remove_fish_from_aquarium(user_id, fish_id, quantity, quality_level)
+    result = await self.service_executor.run(user_id, self.aquarium_service.remove_fish_from_aquarium, user_id, fish_id, quantity, quality_level)
     
     if result["success"]:
         yield event.plain_result(f"✅ {result['message']}")
@@ -154,7 +154,7 @@ async def upgrade_aquarium(self: "FishingPlugin", event: AstrMessageEvent):
     """升级水族箱容量"""
     user_id = self._get_effective_user_id(event)
     # 直接尝试升级，失败时会返回具体原因（包含所需费用）
-    result = self.aquarium_service.upgrade_aquarium(user_id)
+    result = await self.service_executor.run(user_id, self.aquarium_service.upgrade_aquarium, user_id)
     
     if result["success"]:
         yield event.plain_result(f"✅ {result['message']}")
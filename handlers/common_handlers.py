@@ -1,4 +1,3 @@
-import os
 from astrbot.api.event import filter, AstrMessageEvent
 from ..draw.help import draw_help_image
 from ..draw.state import draw_state_image, get_user_state_data
@@ -14,7 +13,7 @@ async def register_user(self: "FishingPlugin", event: AstrMessageEvent):
     """注册用户命令"""
     user_id = self._get_effective_user_id(event)
     nickname = event.get_sender_name() if event.get_sender_name() is not None else user_id
-    if result := self.user_service.register(user_id, nickname):
+    if result := await self.service_executor.run(user_id, self.user_service.register, user_id, nickname):
         yield event.plain_result(result["message"])
     else:
         yield event.plain_result("❌ 出错啦！请稍后再试。")
@@ -22,7 +21,7 @@ async def register_user(self: "FishingPlugin", event: AstrMessageEvent):
 async def sign_in(self: "FishingPlugin", event: AstrMessageEvent):
     """签到"""
     user_id = self._get_effective_user_id(event)
-    result = self.user_service.daily_sign_in(user_id)
+    result = await self.service_executor.run(user_id, self.user_service.daily_sign_in, user_id)
     if result["success"]:
         yield event.plain_result(result["message"])
 
@@ -31,7 +30,9 @@ async def state(self: "FishingPlugin", event: AstrMessageEvent):
     user_id = self._get_effective_user_id(event)
 
     # 调用新的数据获取函数
-    user_data = get_user_state_data(
+    user_data = await self.service_executor.run(
+        user_id,
+        get_user_state_data,
         self.user_repo,
         self.inventory_repo,
         self.item_template_repo,
@@ -44,17 +45,42 @@ async def state(self: "FishingPlugin", event: AstrMessageEvent):
     if not user_data:
         yield event.plain_result('❌ 用户不存在，请先发送"注册"来开始游戏')
         return
-    # 生成状态图像
-    image = await draw_state_image(user_data, self.data_dir)
-    # 保存图像到临时文件
-    image_path = os.path.join(self.tmp_dir, "user_status.png")
-    image.save(image_path)
-    yield event.image_result(image_path)
+    # 在渲染进程中生成状态图像，按配置以内存字节或唯一临时文件发送
+    image_result = await self.image_delivery.render_result(
+        event, "state", draw_state_image, user_data, self.data_dir
+    )
+    if image_result:
+        yield image_result
+    else:
+        yield event.plain_result(_format_state_text(user_data))
+
+
+def _format_state_text(user_data) -> str:
+    """状态图片生成失败时的文字版状态"""
+    rod = user_data.get("current_rod") or {}
+    accessory = user_data.get("current_accessory") or {}
+    bait = user_data.get("current_bait") or {}
+    zone = user_data.get("fishing_zone") or {}
+    pond_info = user_data.get("pond_info") or {}
+    lines = [
+        f"【📊 {user_data.get('nickname')} 的状态】",
+        f"💰 金币：{user_data.get('coins', 0):,}",
+        f"💎 高级货币：{user_data.get('premium_currency', 0):,}",
+        f"🎣 鱼竿：{rod.get('name', '无')}",
+        f"💍 饰品：{accessory.get('name', '无')}",
+        f"🪱 鱼饵：{bait.get('name', '无')}",
+        f"🗺️ 钓鱼区域：{zone.get('name', '未知')}",
+        f"🐟 鱼塘：{pond_info.get('total_count', 0)} 条，价值 {pond_info.get('total_value', 0):,} 金币",
+        f"🤖 自动钓鱼：{'已开启' if user_data.get('auto_fishing_enabled') else '已关闭'}",
+        f"📅 今日签到：{'已签到' if user_data.get('signed_in_today') else '未签到'}",
+        "⚠️ 状态图片生成超时，已改为文字显示",
+    ]
+    return "\n".join(lines)
 
 async def fishing_log(self: "FishingPlugin", event: AstrMessageEvent):
     """查看钓鱼记录"""
     user_id = self._get_effective_user_id(event)
-    if result := self.fishing_service.get_user_fish_log(user_id):
+    if result := await self.service_executor.run(user_id, self.fishing_service.get_user_fish_log, user_id):
         if result["success"]:
             records = result["records"]
             if not records:
@@ -74,10 +100,11 @@ async def fishing_log(self: "FishingPlugin", event: AstrMessageEvent):
 
 async def fishing_help(self: "FishingPlugin", event: AstrMessageEvent):
     """显示钓鱼插件帮助信息"""
-    image = draw_help_image()
-    output_path = os.path.join(self.tmp_dir, "fishing_help.png")
-    image.save(output_path)
-    yield event.image_result(output_path)
+    # 帮助图只随版本与配置变化，直接发送缓存的渲染结果
+    image_data, image_path = await self.service_executor.run(
+        None, self.render_cache.get_entry, "fishing_help", draw_help_image
+    )
+    yield self.image_delivery.cached_result(event, image_data, image_path)
 
 async def transfer_coins(self: "FishingPlugin", event: AstrMessageEvent):
     """转账金币"""
@@ -108,7 +135,7 @@ async def transfer_coins(self: "FishingPlugin", event: AstrMessageEvent):
     from_user_id = self._get_effective_user_id(event)
     
     # 调用转账服务
-    result = self.user_service.transfer_coins(from_user_id, target_user_id, amount)
+    result = await self.service_executor.run(from_user_id, self.user_service.transfer_coins, from_user_id, target_user_id, amount)
     yield event.plain_result(result["message"])
 
 
@@ -133,5 +160,5 @@ async def update_nickname(self: "FishingPlugin", event: AstrMessageEvent):
     user_id = self._get_effective_user_id(event)
     
     # 调用用户服务更新昵称
-    result = self.user_service.update_nickname(user_id, new_nickname)
+    result = await self.service_executor.run(user_id, self.user_service.update_nickname, user_id, new_nickname)
     yield event.plain_result(result["message"])
\ No newline at end of file
@@ -263,7 +263,7 @@ class ExchangeHandlers:
                     days = max(1, min(30, int(args[3])))
 
         # 获取历史数据
-        hist = self.exchange_service.get_price_history(days=days)
+        hist = await self.plugin.service_executor.run(None, self.exchange_service.get_price_history, days=days)
         if not hist.get("success"):
             yield event.plain_result(f"❌ 获取历史失败: {hist.get('message','未知错误')}")
             return
@@ -359,7 +359,7 @@ class ExchangeHandlers:
                 if len(args) >= 4 and args[3].isdigit():
                     days = max(1, min(30, int(args[3])))
 
-        hist = self.exchange_service.get_price_history(days=days)
+        hist = await self.plugin.service_executor.run(None, self.exchange_service.get_price_history, days=days)
         if not hist.get("success"):
             yield event.plain_result(f"❌ 获取历史失败: {hist.get('message','未知错误')}")
             return
@@ -713,7 +713,7 @@ class ExchangeHandlers:
     async def open_exchange_account(self, event: AstrMessageEvent):
         """开通交易所账户"""
         user_id = self._get_effective_user_id(event)
-        result = self.exchange_service.open_exchange_account(user_id)
+        result = await self.plugin.service_executor.run(user_id, self.exchange_service.open_exchange_account, user_id)
         yield event.plain_result(
             f"✅ {result['message']}"
             if result["success"]
@@ -888,8 +888,8 @@ class ExchangeHandlers:
             yield event.plain_result(f"❌ 商品 {commodity_name} 价格异常")
             return
 
-        result = self.exchange_service.purchase_commodity(
-            user_id, commodity_id, quantity, current_price
+        result = await self.plugin.service_executor.run(
+            user_id, self.exchange_service.purchase_commodity, user_id, commodity_id, quantity, current_price
         )
         yield event.plain_result(
             f"✅ {result['message']}"
@@ -939,8 +939,8 @@ class ExchangeHandlers:
 
                 total_quantity = sum(item.quantity for item in commodity_items)
 
-                result = self.exchange_service.sell_commodity(
-                    user_id, commodity_id, total_quantity, current_price
+                result = await self.plugin.service_executor.run(
+                    user_id, self.exchange_service.sell_commodity, user_id, commodity_id, total_quantity, current_price
                 )
                 yield event.plain_result(
                     f"✅ {result['message']}"
@@ -979,8 +979,8 @@ class ExchangeHandlers:
                     yield event.plain_result(f"❌ 商品价格异常")
                     return
 
-                result = self.exchange_service.sell_commodity_by_instance(
-                    user_id, instance_id, quantity, current_price
+                result = await self.plugin.service_executor.run(
+                    user_id, self.exchange_service.sell_commodity_by_instance, user_id, instance_id, quantity, current_price
                 )
                 yield event.plain_result(
                     f"✅ {result['message']}"
@@ -1000,7 +1000,7 @@ class ExchangeHandlers:
         args = event.message_str.split()
 
         if len(args) == 1 or (len(args) == 2 and args[1].lower() == "all"):
-            result = self.exchange_service.clear_all_inventory(user_id)
+            result = await self.plugin.service_executor.run(user_id, self.exchange_service.clear_all_inventory, user_id)
             yield event.plain_result(
                 f"✅ {result['message']}"
                 if result["success"]
@@ -1026,8 +1026,8 @@ class ExchangeHandlers:
                 yield event.plain_result(f"❌ 找不到商品: {commodity_name}")
                 return
 
-            result = self.exchange_service.clear_commodity_inventory(
-                user_id, commodity_id
+            result = await self.plugin.service_executor.run(
+                user_id, self.exchange_service.clear_commodity_inventory, user_id, commodity_id
             )
             yield event.plain_result(
                 f"✅ {result['message']}"
@@ -1,7 +1,7 @@
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api import logger
 from ..core.utils import get_now
-from ..utils import safe_datetime_handler, to_percentage, safe_get_file_path
+from ..utils import safe_datetime_handler, to_percentage
 from ..draw.pokedex import draw_pokedex
 from astrbot.api.message_components import Image as AstrImage
 from typing import TYPE_CHECKING
@@ -70,13 +70,14 @@ class FishingHandlers:
     async def fish(self, event: AstrMessageEvent):
         """钓鱼"""
         user_id = self.plugin._get_effective_user_id(event)
-        user = self.plugin.user_repo.get_by_id(user_id)
+        executor = self.plugin.service_executor
+        user = await executor.run(user_id, self.plugin.user_repo.get_by_id, user_id)
         if not user:
             yield event.plain_result("❌ 您还没有注册，请先使用 /注册 命令注册。")
             return
         # 检查用户钓鱼CD
         lst_time = user.last_fishing_time
-        info = self.user_service.get_user_current_accessory(user_id)
+        info = await executor.run(user_id, self.user_service.get_user_current_accessory, user_id)
         if info["success"] is False:
             yield event.plain_result(f"❌ 获取用户饰品信息失败：{info['message']}")
             return
@@ -89,8 +90,8 @@ class FishingHandlers:
             wait_time = cooldown_seconds - (now - lst_time).total_seconds()
             yield event.plain_result(f"⏳ 您还需要等待 {int(wait_time)} 秒才能再次钓鱼。")
             return
-        fishing_cost = self._get_fishing_cost(user)
-        result = self.fishing_service.go_fish(user_id)
+        fishing_cost = await executor.run(user_id, self._get_fishing_cost, user)
+        result = await executor.run(user_id, self.fishing_service.go_fish, user_id)
         if not result:
             yield event.plain_result("❌ 出错啦！请稍后再试。")
             return
@@ -99,7 +100,9 @@ class FishingHandlers:
     async def auto_fish(self, event: AstrMessageEvent):
         """自动钓鱼"""
         user_id = self.plugin._get_effective_user_id(event)
-        result = self.fishing_service.toggle_auto_fishing(user_id)
+        result = await self.plugin.service_executor.run(
+            user_id, self.fishing_service.toggle_auto_fishing, user_id
+        )
         yield event.plain_result(result["message"])
 
     async def fishing_area(self, event: AstrMessageEvent):
@@ -172,7 +175,9 @@ class FishingHandlers:
             return
 
         # 切换用户的钓鱼区域
-        result = self.fishing_service.set_user_fishing_zone(user_id, zone_id)
+        result = await self.plugin.service_executor.run(
+            user_id, self.fishing_service.set_user_fishing_zone, user_id, zone_id
+        )
         yield event.plain_result(result["message"] if result else "❌ 出错啦！请稍后再试。")
 
     async def fish_pokedex(self, event: AstrMessageEvent):
@@ -183,7 +188,7 @@ class FishingHandlers:
         if len(args) > 1 and args[1].isdigit():
             page = int(args[1])
 
-        pokedex_data = self.fishing_service.get_user_pokedex(user_id)
+        pokedex_data = await self.plugin.service_executor.run(user_id, self.fishing_service.get_user_pokedex, user_id)
         if not pokedex_data or not pokedex_data.get("success"):
             yield event.plain_result(
                 f"❌ 查看图鉴失败: {pokedex_data.get('message', '未知错误')}"
@@ -195,20 +200,23 @@ class FishingHandlers:
             yield event.plain_result("❌ 您还没有捕捉到任何鱼类，快去钓鱼吧！")
             return
 
-        user_info = self.plugin.user_repo.get_by_id(user_id)
+        user_info = await self.plugin.service_executor.run(user_id, self.plugin.user_repo.get_by_id, user_id)
 
         # 绘制图片
-        output_path = safe_get_file_path(self.plugin, f"pokedex_{user_id}_page_{page}.png")
-
         try:
-            await draw_pokedex(
+            image_result = await self.plugin.image_delivery.render_result(
+                event,
+                "pokedex",
+                draw_pokedex,
                 pokedex_data,
                 {"nickname": user_info.nickname, "user_id": user_id},
-                output_path,
                 page=page,
                 data_dir=self.plugin.data_dir,
             )
-            yield event.image_result(output_path)
+            if not image_result:
+                yield event.plain_result("❌ 绘制图鉴超时，请稍后再试。")
+                return
+            yield image_result
         except Exception as e:
             logger.error(f"绘制图鉴图片失败: {e}", exc_info=e)
             yield event.plain_result("❌ 绘制图鉴时发生错误，请稍后再试或联系管理员。")
\ No newline at end of file
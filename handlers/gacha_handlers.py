@@ -73,7 +73,7 @@ async def gacha(self: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("❌ 抽奖池 ID 必须是数字，请检查后重试。")
         return
     pool_id = int(pool_id)
-    if result := self.gacha_service.perform_draw(user_id, pool_id, num_draws=1):
+    if result := await self.service_executor.run(user_id, self.gacha_service.perform_draw, user_id, pool_id, num_draws=1):
         if result["success"]:
             items = result.get("results", [])
             message = f"🎉 抽卡成功！您抽到了 {len(items)} 件物品：\n"
@@ -127,7 +127,7 @@ async def ten_gacha(self: "FishingPlugin", event: AstrMessageEvent):
         return
     
     # 单次十连抽卡
-    if result := self.gacha_service.perform_draw(user_id, pool_id, num_draws=10):
+    if result := await self.service_executor.run(user_id, self.gacha_service.perform_draw, user_id, pool_id, num_draws=10):
         if result["success"]:
             items = result.get("results", [])
             message = f"🎉 十连抽卡成功！您抽到了 {len(items)} 件物品：\n"
@@ -173,38 +173,36 @@ async def multi_ten_gacha(self: "FishingPlugin", event: AstrMessageEvent, pool_i
     rarity_counts = {i: 0 for i in range(1, 11)}  # 稀有度统计，支持1-10星
     coin_total = 0
     
-    # 执行多次十连抽卡
-    for i in range(times):
-        if result := self.gacha_service.perform_draw(user_id, pool_id, num_draws=10):
-            if result["success"]:
-                items = result.get("results", [])
-                total_items += len(items)
-                
-                for item in items:
-                    if item.get("type") == "coins":
-                        coin_total += item['quantity']
-                    else:
-                        item_name = item['name']
-                        rarity = item.get('rarity', 1)
-                        
-                        # 统计物品数量
-                        if item_name in item_counts:
-                            item_counts[item_name] += 1
-                        else:
-                            item_counts[item_name] = 1
-                        
-                        # 统计稀有度
-                        if rarity in rarity_counts:
-                            rarity_counts[rarity] += 1
-                        elif rarity > 10:
-                            # 超过10星的物品归类到10星
-                            rarity_counts[10] += 1
-            else:
-                yield event.plain_result(f"❌ 第{i+1}次十连抽卡失败：{result['message']}")
-                return
+    # 一次性抽取全部次数，扣费与发奖在同一事务中完成
+    result = await self.service_executor.run(user_id, self.gacha_service.perform_draw, user_id, pool_id, num_draws=total_draws)
+    if not result:
+        yield event.plain_result("❌ 多次十连抽卡出错！")
+        return
+    if not result["success"]:
+        yield event.plain_result(f"❌ 多次十连抽卡失败：{result['message']}")
+        return
+
+    items = result.get("results", [])
+    total_items += len(items)
+    for item in items:
+        if item.get("type") == "coins":
+            coin_total += item['quantity']
         else:
-            yield event.plain_result(f"❌ 第{i+1}次十连抽卡出错！")
-            return
+            item_name = item['name']
+            rarity = item.get('rarity', 1)
+
+            # 统计物品数量
+            if item_name in item_counts:
+                item_counts[item_name] += 1
+            else:
+                item_counts[item_name] = 1
+
+            # 统计稀有度
+            if rarity in rarity_counts:
+                rarity_counts[rarity] += 1
+            elif rarity > 10:
+                # 超过10星的物品归类到10星
+                rarity_counts[10] += 1
     
     # 生成合并统计报告
     message = f"🎉 {times}次十连抽卡完成！共获得 {total_items} 件物品：\n\n"
@@ -261,7 +259,7 @@ async def view_gacha_pool(self: "FishingPlugin", event: AstrMessageEvent):
 async def gacha_history(self: "FishingPlugin", event: AstrMessageEvent):
     """查看抽卡记录"""
     user_id = self._get_effective_user_id(event)
-    if result := self.gacha_service.get_user_gacha_history(user_id):
+    if result := await self.service_executor.run(user_id, self.gacha_service.get_user_gacha_history, user_id):
         if result["success"]:
             history = result.get("records", [])
             if not history:
@@ -305,8 +303,8 @@ async def wipe_bomb(self: "FishingPlugin", event: AstrMessageEvent):
     if not contribution_amount.isdigit():
         yield event.plain_result("❌ 擦弹数量必须是数字，请检查后重试。")
         return
-    if result := self.game_mechanics_service.perform_wipe_bomb(
-        user_id, int(contribution_amount)
+    if result := await self.service_executor.run(
+        user_id, self.game_mechanics_service.perform_wipe_bomb, user_id, int(contribution_amount)
     ):
         if result["success"]:
             message = ""
@@ -346,7 +344,7 @@ async def wipe_bomb(self: "FishingPlugin", event: AstrMessageEvent):
 async def wipe_bomb_history(self: "FishingPlugin", event: AstrMessageEvent):
     """查看擦弹记录"""
     user_id = self._get_effective_user_id(event)
-    if result := self.game_mechanics_service.get_wipe_bomb_history(user_id):
+    if result := await self.service_executor.run(user_id, self.game_mechanics_service.get_wipe_bomb_history, user_id):
         if result["success"]:
             history = result.get("logs", [])
             if not history:
@@ -404,7 +402,7 @@ async def start_wheel_of_fate(self: "FishingPlugin", event: AstrMessageEvent):
         return
 
     entry_fee = int(entry_fee_str)
-    result = self.game_mechanics_service.start_wheel_of_fate(user_id, entry_fee)
+    result = await self.service_executor.run(user_id, self.game_mechanics_service.start_wheel_of_fate, user_id, entry_fee)
     
     if result and result.get("message"):
         user = self.user_repo.get_by_id(user_id)
@@ -416,7 +414,7 @@ async def continue_wheel_of_fate(self: "FishingPlugin", event: AstrMessageEvent)
     """处理命运之轮的“继续”指令"""
     user_id = self._get_effective_user_id(event)
     # 直接将请求交给 Service 层，它会处理所有逻辑
-    result = self.game_mechanics_service.continue_wheel_of_fate(user_id)
+    result = await self.service_executor.run(user_id, self.game_mechanics_service.continue_wheel_of_fate, user_id)
     if result and result.get("message"):
         user = self.user_repo.get_by_id(user_id)
         user_nickname = user.nickname if user and user.nickname else user_id
@@ -427,7 +425,7 @@ async def stop_wheel_of_fate(self: "FishingPlugin", event: AstrMessageEvent):
     """处理命运之轮的“放弃”指令"""
     user_id = self._get_effective_user_id(event)
     # 直接将请求交给 Service 层，它会处理所有逻辑
-    result = self.game_mechanics_service.cash_out_wheel_of_fate(user_id)
+    result = await self.service_executor.run(user_id, self.game_mechanics_service.cash_out_wheel_of_fate, user_id)
     if result and result.get("message"):
         user = self.user_repo.get_by_id(user_id)
         user_nickname = user.nickname if user and user.nickname else user_id
@@ -466,7 +464,7 @@ async def sicbo(self: "FishingPlugin", event: AstrMessageEvent):
     amount = int(amount_str)
 
     # 调用核心服务逻辑
-    result = self.game_mechanics_service.play_sicbo(user_id, bet_type, amount)
+    result = await self.service_executor.run(user_id, self.game_mechanics_service.play_sicbo, user_id, bet_type, amount)
 
     # 根据服务返回的结果，构建回复消息
     if not result["success"]:
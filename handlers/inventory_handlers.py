@@ -1,4 +1,3 @@
-import os
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.core.message.components import At
 from ..utils import to_percentage, format_accessory_or_rod, format_rarity_display, parse_amount
@@ -7,6 +6,18 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from ..main import FishingPlugin
 
+# 背包图片生成失败或超时时的文字提示
+_BACKPACK_IMAGE_ERROR = (
+    "❌ 生成背包图片时发生错误。\n\n"
+    "💡 可能的原因：\n"
+    "1. 背包物品过多导致处理超时\n"
+    "2. 内存不足\n\n"
+    "🔧 建议操作：\n"
+    "• 使用「鱼竿」「饰品」「鱼饵」「道具」命令分类查看\n"
+    "• 清理不需要的物品（出售低品质装备、使用道具等）\n"
+    "• 如果问题持续存在，请联系管理员"
+)
+
 
 async def user_backpack(plugin: "FishingPlugin", event: AstrMessageEvent):
     """查看用户背包"""
@@ -36,12 +47,14 @@ async def user_backpack(plugin: "FishingPlugin", event: AstrMessageEvent):
                     "⏳ 正在生成背包图片，请稍候..."
                 )
 
-            # 生成背包图像
-            image = await draw_backpack_image(backpack_data, plugin.data_dir)
-            # 保存图像到临时文件
-            image_path = os.path.join(plugin.tmp_dir, "user_backpack.png")
-            image.save(image_path)
-            yield event.image_result(image_path)
+            # 在渲染进程中生成背包图像，按配置以内存字节或唯一临时文件发送
+            image_result = await plugin.image_delivery.render_result(
+                event, "backpack", draw_backpack_image, backpack_data, plugin.data_dir,
+            )
+            if not image_result:
+                yield event.plain_result(_BACKPACK_IMAGE_ERROR)
+                return
+            yield image_result
             
             # 如果内容被截断或过滤，额外发送提示
             if backpack_data.get('is_truncated', False):
@@ -73,16 +86,7 @@ async def user_backpack(plugin: "FishingPlugin", event: AstrMessageEvent):
             logger.error(f"生成背包图片时发生错误: {e}", exc_info=True)
 
             # 返回错误信息
-            yield event.plain_result(
-                "❌ 生成背包图片时发生错误。\n\n"
-                "💡 可能的原因：\n"
-                "1. 背包物品过多导致处理超时\n"
-                "2. 内存不足\n\n"
-                "🔧 建议操作：\n"
-                "• 使用「鱼竿」「饰品」「鱼饵」「道具」命令分类查看\n"
-                "• 清理不需要的物品（出售低品质装备、使用道具等）\n"
-                "• 如果问题持续存在，请联系管理员"
-            )
+            yield event.plain_result(_BACKPACK_IMAGE_ERROR)
     else:
         yield event.plain_result("❌ 您还没有注册，请先使用 /注册 命令注册。")
 
@@ -90,7 +94,7 @@ async def user_backpack(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def pond(plugin: "FishingPlugin", event: AstrMessageEvent):
     """查看用户鱼塘内的鱼"""
     user_id = plugin._get_effective_user_id(event)
-    if pond_fish := plugin.inventory_service.get_user_fish_pond(user_id):
+    if pond_fish := await plugin.service_executor.run(user_id, plugin.inventory_service.get_user_fish_pond, user_id):
         fishes = pond_fish["fishes"]
         # 把fishes按稀有度分组
         fished_by_rarity = {}
@@ -164,7 +168,7 @@ async def peek_pond(plugin: "FishingPlugin", event: AstrMessageEvent):
         return
 
     # 获取目标用户的鱼塘信息
-    if pond_fish := plugin.inventory_service.get_user_fish_pond(target_user_id):
+    if pond_fish := await plugin.service_executor.run(None, plugin.inventory_service.get_user_fish_pond, target_user_id):
         fishes = pond_fish["fishes"]
         # 把fishes按稀有度分组
         fished_by_rarity = {}
@@ -205,7 +209,7 @@ async def peek_pond(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def pond_capacity(plugin: "FishingPlugin", event: AstrMessageEvent):
     """查看用户鱼塘容量"""
     user_id = plugin._get_effective_user_id(event)
-    pond_capacity = plugin.inventory_service.get_user_fish_pond_capacity(user_id)
+    pond_capacity = await plugin.service_executor.run(user_id, plugin.inventory_service.get_user_fish_pond_capacity, user_id)
     if pond_capacity["success"]:
         message = f"🐠 您的鱼塘容量为 {pond_capacity['current_fish_count']} / {pond_capacity['fish_pond_capacity']} 条鱼。"
         yield event.plain_result(message)
@@ -216,7 +220,7 @@ async def pond_capacity(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def upgrade_pond(plugin: "FishingPlugin", event: AstrMessageEvent):
     """升级鱼塘容量"""
     user_id = plugin._get_effective_user_id(event)
-    result = plugin.inventory_service.upgrade_fish_pond(user_id)
+    result = await plugin.service_executor.run(user_id, plugin.inventory_service.upgrade_fish_pond, user_id)
     if result["success"]:
         yield event.plain_result(
             f"🐠 鱼塘升级成功！新容量为 {result['new_capacity']} 条鱼。"
@@ -228,7 +232,7 @@ async def upgrade_pond(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def rod(plugin: "FishingPlugin", event: AstrMessageEvent):
     """查看用户鱼竿信息"""
     user_id = plugin._get_effective_user_id(event)
-    rod_info = plugin.inventory_service.get_user_rod_inventory(user_id)
+    rod_info = await plugin.service_executor.run(user_id, plugin.inventory_service.get_user_rod_inventory, user_id)
     if rod_info and rod_info["rods"]:
         all_rods = rod_info["rods"]
         total_count = len(all_rods)
@@ -287,7 +291,7 @@ async def rod(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def bait(plugin: "FishingPlugin", event: AstrMessageEvent):
     """查看用户鱼饵信息"""
     user_id = plugin._get_effective_user_id(event)
-    bait_info = plugin.inventory_service.get_user_bait_inventory(user_id)
+    bait_info = await plugin.service_executor.run(user_id, plugin.inventory_service.get_user_bait_inventory, user_id)
     if bait_info and bait_info["baits"]:
         # 构造输出信息,附带emoji
         message = "【🐟 鱼饵】：\n"
@@ -309,7 +313,7 @@ async def bait(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def items(plugin: "FishingPlugin", event: AstrMessageEvent):
     """查看用户道具信息（文本版）"""
     user_id = plugin._get_effective_user_id(event)
-    item_info = plugin.inventory_service.get_user_item_inventory(user_id)
+    item_info = await plugin.service_executor.run(user_id, plugin.inventory_service.get_user_item_inventory, user_id)
     if item_info and item_info.get("items"):
         message = "【📦 道具】：\n"
         for it in item_info["items"]:
@@ -351,7 +355,7 @@ async def use_item(plugin: "FishingPlugin", event: AstrMessageEvent):
             yield event.plain_result(f"❌ 无法解析数量：{str(e)}。示例：1 或 五 或 一千")
             return
 
-    result = plugin.inventory_service.use_item(user_id, item_id, quantity)
+    result = await plugin.service_executor.run(user_id, plugin.inventory_service.use_item, user_id, item_id, quantity)
 
     if result and result.get("success"):
         yield event.plain_result(f"✅ {result['message']}")
@@ -364,7 +368,7 @@ async def open_all_money_bags(plugin: "FishingPlugin", event: AstrMessageEvent):
     """开启全部钱袋：/开启全部钱袋"""
     user_id = plugin._get_effective_user_id(event)
 
-    result = plugin.inventory_service.open_all_money_bags(user_id)
+    result = await plugin.service_executor.run(user_id, plugin.inventory_service.open_all_money_bags, user_id)
 
     if result and result.get("success"):
         yield event.plain_result(f"✅ {result['message']}")
@@ -376,7 +380,7 @@ async def open_all_money_bags(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def accessories(plugin: "FishingPlugin", event: AstrMessageEvent):
     """查看用户饰品信息"""
     user_id = plugin._get_effective_user_id(event)
-    accessories_info = plugin.inventory_service.get_user_accessory_inventory(user_id)
+    accessories_info = await plugin.service_executor.run(user_id, plugin.inventory_service.get_user_accessory_inventory, user_id)
     if accessories_info and accessories_info["accessories"]:
         all_accessories = accessories_info["accessories"]
         total_count = len(all_accessories)
@@ -567,10 +571,12 @@ async def use_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equipm
     # 处理不同类型的物品
     if target_type in ["rod", "accessory"]:
         # 装备类物品
-        equipment_info = (
-            plugin.inventory_service.get_user_rod_inventory(user_id)
+        equipment_info = await plugin.service_executor.run(
+            user_id,
+            plugin.inventory_service.get_user_rod_inventory
             if target_type == "rod"
-            else plugin.inventory_service.get_user_accessory_inventory(user_id)
+            else plugin.inventory_service.get_user_accessory_inventory,
+            user_id,
         )
 
         if not equipment_info or not equipment_info.get(
@@ -581,10 +587,12 @@ async def use_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equipm
 
         # 解析实例ID
         if target_type == "rod":
-            instance_id = plugin.inventory_service.resolve_rod_instance_id(user_id, token)
+            instance_id = await plugin.service_executor.run(
+                user_id, plugin.inventory_service.resolve_rod_instance_id, user_id, token
+            )
         else:
-            instance_id = plugin.inventory_service.resolve_accessory_instance_id(
-                user_id, token
+            instance_id = await plugin.service_executor.run(
+                user_id, plugin.inventory_service.resolve_accessory_instance_id, user_id, token
             )
 
         if instance_id is None:
@@ -592,8 +600,8 @@ async def use_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equipm
             return
 
         # 装备物品
-        if result := plugin.inventory_service.equip_item(
-            user_id, int(instance_id), target_type
+        if result := await plugin.service_executor.run(
+            user_id, plugin.inventory_service.equip_item, user_id, int(instance_id), target_type
         ):
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -619,7 +627,7 @@ async def use_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equipm
                 return
 
         # 使用道具
-        if result := plugin.inventory_service.use_item(user_id, int(item_id), quantity):
+        if result := await plugin.service_executor.run(user_id, plugin.inventory_service.use_item, user_id, int(item_id), quantity):
             if result["success"]:
                 yield event.plain_result(result["message"])
             else:
@@ -636,7 +644,7 @@ async def use_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equipm
             return
 
         # 使用鱼饵
-        if result := plugin.inventory_service.use_bait(user_id, int(bait_id)):
+        if result := await plugin.service_executor.run(user_id, plugin.inventory_service.use_bait, user_id, int(bait_id)):
             if result["success"]:
                 yield event.plain_result(result["message"])
             else:
@@ -648,7 +656,7 @@ async def use_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equipm
 async def use_bait(plugin: "FishingPlugin", event: AstrMessageEvent):
     """使用鱼饵"""
     user_id = plugin._get_effective_user_id(event)
-    bait_info = plugin.inventory_service.get_user_bait_inventory(user_id)
+    bait_info = await plugin.service_executor.run(user_id, plugin.inventory_service.get_user_bait_inventory, user_id)
     if not bait_info or not bait_info["baits"]:
         yield event.plain_result("❌ 您还没有鱼饵，请先购买或抽奖获得。")
         return
@@ -660,7 +668,7 @@ async def use_bait(plugin: "FishingPlugin", event: AstrMessageEvent):
     if not bait_instance_id.isdigit():
         yield event.plain_result("❌ 鱼饵 ID 必须是数字，请检查后重试。")
         return
-    if result := plugin.inventory_service.use_bait(user_id, int(bait_instance_id)):
+    if result := await plugin.service_executor.run(user_id, plugin.inventory_service.use_bait, user_id, int(bait_instance_id)):
         if result["success"]:
             yield event.plain_result(result["message"])
         else:
@@ -706,10 +714,12 @@ async def refine_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equ
 
     # 解析实例ID
     if target_type == "rod":
-        instance_id = plugin.inventory_service.resolve_rod_instance_id(user_id, token)
+        instance_id = await plugin.service_executor.run(
+            user_id, plugin.inventory_service.resolve_rod_instance_id, user_id, token
+        )
     else:
-        instance_id = plugin.inventory_service.resolve_accessory_instance_id(
-            user_id, token
+        instance_id = await plugin.service_executor.run(
+            user_id, plugin.inventory_service.resolve_accessory_instance_id, user_id, token
         )
 
     if instance_id is None:
@@ -717,7 +727,7 @@ async def refine_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equ
         return
 
     # 精炼物品
-    if result := plugin.inventory_service.refine(user_id, int(instance_id), target_type):
+    if result := await plugin.service_executor.run(user_id, plugin.inventory_service.refine, user_id, int(instance_id), target_type):
         if result["success"]:
             yield event.plain_result(result["message"])
         else:
@@ -788,7 +798,7 @@ async def sell_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equip
                 return
 
         # 出售道具
-        if result := plugin.inventory_service.sell_item(user_id, item_id, quantity):
+        if result := await plugin.service_executor.run(user_id, plugin.inventory_service.sell_item, user_id, item_id, quantity):
             if result["success"]:
                 yield event.plain_result(result["message"])
             else:
@@ -800,10 +810,12 @@ async def sell_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equip
     # 处理装备（鱼竿和饰品）
     # 解析实例ID
     if target_type == "rod":
-        instance_id = plugin.inventory_service.resolve_rod_instance_id(user_id, token)
+        instance_id = await plugin.service_executor.run(
+            user_id, plugin.inventory_service.resolve_rod_instance_id, user_id, token
+        )
     else:
-        instance_id = plugin.inventory_service.resolve_accessory_instance_id(
-            user_id, token
+        instance_id = await plugin.service_executor.run(
+            user_id, plugin.inventory_service.resolve_accessory_instance_id, user_id, token
         )
 
     if instance_id is None:
@@ -811,8 +823,8 @@ async def sell_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equip
         return
 
     # 出售物品
-    if result := plugin.inventory_service.sell_equipment(
-        user_id, int(instance_id), target_type
+    if result := await plugin.service_executor.run(
+        user_id, plugin.inventory_service.sell_equipment, user_id, int(instance_id), target_type
     ):
         if result["success"]:
             yield event.plain_result(result["message"])
@@ -859,10 +871,12 @@ async def lock_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equip
 
     # 解析实例ID
     if target_type == "rod":
-        instance_id = plugin.inventory_service.resolve_rod_instance_id(user_id, token)
+        instance_id = await plugin.service_executor.run(
+            user_id, plugin.inventory_service.resolve_rod_instance_id, user_id, token
+        )
     else:
-        instance_id = plugin.inventory_service.resolve_accessory_instance_id(
-            user_id, token
+        instance_id = await plugin.service_executor.run(
+            user_id, plugin.inventory_service.resolve_accessory_instance_id, user_id, token
         )
 
     if instance_id is None:
@@ -871,9 +885,9 @@ async def lock_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equip
 
     # 锁定物品
     if target_type == "rod":
-        result = plugin.inventory_service.lock_rod(user_id, int(instance_id))
+        result = await plugin.service_executor.run(user_id, plugin.inventory_service.lock_rod, user_id, int(instance_id))
     else:
-        result = plugin.inventory_service.lock_accessory(user_id, int(instance_id))
+        result = await plugin.service_executor.run(user_id, plugin.inventory_service.lock_accessory, user_id, int(instance_id))
 
     if result["success"]:
         yield event.plain_result(result["message"])
@@ -918,10 +932,12 @@ async def unlock_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equ
 
     # 解析实例ID
     if target_type == "rod":
-        instance_id = plugin.inventory_service.resolve_rod_instance_id(user_id, token)
+        instance_id = await plugin.service_executor.run(
+            user_id, plugin.inventory_service.resolve_rod_instance_id, user_id, token
+        )
     else:
-        instance_id = plugin.inventory_service.resolve_accessory_instance_id(
-            user_id, token
+        instance_id = await plugin.service_executor.run(
+            user_id, plugin.inventory_service.resolve_accessory_instance_id, user_id, token
         )
 
     if instance_id is None:
@@ -930,9 +946,9 @@ async def unlock_equipment(plugin: "FishingPlugin", event: AstrMessageEvent, equ
 
     # 解锁物品
     if target_type == "rod":
-        result = plugin.inventory_service.unlock_rod(user_id, int(instance_id))
+        result = await plugin.service_executor.run(user_id, plugin.inventory_service.unlock_rod, user_id, int(instance_id))
     else:
-        result = plugin.inventory_service.unlock_accessory(user_id, int(instance_id))
+        result = await plugin.service_executor.run(user_id, plugin.inventory_service.unlock_accessory, user_id, int(instance_id))
 
     if result["success"]:
         yield event.plain_result(result["message"])
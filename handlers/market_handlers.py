@@ -9,7 +9,9 @@ if TYPE_CHECKING:
 async def sell_all(plugin: "FishingPlugin", event: AstrMessageEvent):
     """卖出用户所有鱼"""
     user_id = plugin._get_effective_user_id(event)
-    if result := plugin.inventory_service.sell_all_fish(user_id):
+    if result := await plugin.service_executor.run(
+        user_id, plugin.inventory_service.sell_all_fish, user_id
+    ):
         yield event.plain_result(result["message"])
     else:
         yield event.plain_result("❌ 出错啦！请稍后再试。")
@@ -18,7 +20,9 @@ async def sell_all(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def sell_keep(plugin: "FishingPlugin", event: AstrMessageEvent):
     """卖出用户鱼，但保留每种鱼一条"""
     user_id = plugin._get_effective_user_id(event)
-    if result := plugin.inventory_service.sell_all_fish(user_id, keep_one=True):
+    if result := await plugin.service_executor.run(
+        user_id, plugin.inventory_service.sell_all_fish, user_id, keep_one=True
+    ):
         yield event.plain_result(result["message"])
     else:
         yield event.plain_result("❌ 出错啦！请稍后再试。")
@@ -27,7 +31,9 @@ async def sell_keep(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def sell_everything(plugin: "FishingPlugin", event: AstrMessageEvent):
     """砸锅卖铁：出售所有未锁定且未装备的鱼竿、饰品和全部鱼类"""
     user_id = plugin._get_effective_user_id(event)
-    if result := plugin.inventory_service.sell_everything_except_locked(user_id):
+    if result := await plugin.service_executor.run(
+        user_id, plugin.inventory_service.sell_everything_except_locked, user_id
+    ):
         if result["success"]:
             yield event.plain_result(result["message"])
         else:
@@ -60,12 +66,14 @@ async def sell_by_rarity(plugin: "FishingPlugin", event: AstrMessageEvent):
         # 根据解析出的稀有度数量，调用不同的服务
         if len(rarities) == 1:
             # 只有一个稀有度，调用单稀有度出售方法
-            result = plugin.inventory_service.sell_fish_by_rarity(
-                user_id, rarities[0]
+            result = await plugin.service_executor.run(
+                user_id, plugin.inventory_service.sell_fish_by_rarity, user_id, rarities[0]
             )
         else:
             # 有多个稀有度，调用多稀有度出售方法
-            result = plugin.inventory_service.sell_fish_by_rarities(user_id, rarities)
+            result = await plugin.service_executor.run(
+                user_id, plugin.inventory_service.sell_fish_by_rarities, user_id, rarities
+            )
 
         # 统一处理返回结果
         if result:
@@ -82,7 +90,9 @@ async def sell_by_rarity(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def sell_all_rods(plugin: "FishingPlugin", event: AstrMessageEvent):
     """出售用户所有鱼竿"""
     user_id = plugin._get_effective_user_id(event)
-    result = plugin.inventory_service.sell_all_rods(user_id)
+    result = await plugin.service_executor.run(
+        user_id, plugin.inventory_service.sell_all_rods, user_id
+    )
     if result:
         yield event.plain_result(result["message"])
     else:
@@ -92,7 +102,9 @@ async def sell_all_rods(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def sell_all_accessories(plugin: "FishingPlugin", event: AstrMessageEvent):
     """出售用户所有饰品"""
     user_id = plugin._get_effective_user_id(event)
-    result = plugin.inventory_service.sell_all_accessories(user_id)
+    result = await plugin.service_executor.run(
+        user_id, plugin.inventory_service.sell_all_accessories, user_id
+    )
     if result:
         yield event.plain_result(result["message"])
     else:
@@ -530,7 +542,7 @@ async def buy_in_shop(plugin: "FishingPlugin", event: AstrMessageEvent):
         except Exception as e:
             yield event.plain_result(f"❌ 无法解析数量：{str(e)}。示例：1 或 五 或 一千")
             return
-    result = plugin.shop_service.purchase_item(user_id, int(item_id), qty)
+    result = await plugin.service_executor.run(user_id, plugin.shop_service.purchase_item, user_id, int(item_id), qty)
     if result.get("success"):
         yield event.plain_result(result["message"])
     else:
@@ -542,118 +554,143 @@ async def buy_in_shop(plugin: "FishingPlugin", event: AstrMessageEvent):
             yield event.plain_result(f"❌ {error_message}")
 
 
+# 市场分类：指令关键字 -> 物品类型，以及各类型的展示标题
+_MARKET_CATEGORY_ALIASES = {
+    "鱼竿": "rod", "rod": "rod",
+    "饰品": "accessory", "accessory": "accessory",
+    "大宗商品": "commodity", "商品": "commodity", "commodity": "commodity",
+    "道具": "item", "item": "item",
+    "鱼": "fish", "鱼类": "fish", "fish": "fish",
+}
+_MARKET_CATEGORY_TITLES = {
+    "rod": ("🎣", "鱼竿"),
+    "accessory": ("💍", "饰品"),
+    "commodity": ("📦", "大宗商品"),
+    "item": ("🎁", "道具"),
+    "fish": ("🐟", "鱼类"),
+}
+
+
+def _parse_market_args(args):
+    """解析 /市场 的参数：[分类] [页码] [N星] [最低价-最高价] [高品质]"""
+    filters = {"item_type": None, "page": 1, "rarity": None,
+               "min_price": None, "max_price": None, "quality_level": None}
+    for raw in args:
+        token = raw.strip()
+        if not token:
+            continue
+        lowered = token.lower()
+        if lowered in _MARKET_CATEGORY_ALIASES:
+            filters["item_type"] = _MARKET_CATEGORY_ALIASES[lowered]
+        elif token.isdigit():
+            filters["page"] = int(token)
+        elif token.endswith("星") and token[:-1].isdigit():
+            filters["rarity"] = int(token[:-1])
+        elif token in ("高品质", "✨"):
+            filters["quality_level"] = 1
+        elif "-" in token:
+            low, _, high = token.removeprefix("价格").partition("-")
+            filters["min_price"] = parse_amount(low) if low else None
+            filters["max_price"] = parse_amount(high) if high else None
+        else:
+            raise ValueError(f"无法识别的参数「{token}」")
+    return filters
+
+
+def _format_market_listing(item) -> str:
+    """格式化单个市场商品"""
+    display_code = _get_display_code_for_market_item(item)
+    seller_display = "🎭 匿名卖家" if item.is_anonymous else item.seller_nickname
+    refine_level_str = f" 精{item.refine_level}" if item.refine_level and item.refine_level > 1 else ""
+    quantity_text = f" x{item.quantity}" if item.quantity and item.quantity > 1 else ""
+
+    # 为鱼类添加品质显示
+    quality_str = ""
+    if item.item_type == "fish" and getattr(item, "quality_level", 0) == 1:
+        quality_str = " ✨高品质"
+
+    msg = f" - {item.item_name}{quality_str}{refine_level_str}{quantity_text} (ID: {display_code}) - 价格: {item.price} 金币\n"
+    msg += f" - 售卖人： {seller_display}"
+
+    # 为大宗商品添加腐败时间显示
+    if item.item_type == "commodity" and item.expires_at:
+        from datetime import datetime
+
+        time_left = item.expires_at - datetime.now()
+        if time_left.total_seconds() <= 0:
+            msg += f"\n - 状态: 💀 已腐败"
+        elif time_left.total_seconds() <= 86400:  # 24小时内
+            hours = int(time_left.total_seconds() // 3600)
+            minutes = int((time_left.total_seconds() % 3600) // 60)
+            msg += f"\n - 腐败倒计时: ⚠️ {hours}小时{minutes}分钟"
+        else:
+            days = time_left.days
+            hours = int(time_left.seconds // 3600)
+            msg += f"\n - 腐败倒计时: ⏰ {days}天{hours}小时"
+    return msg
+
+
 async def market(plugin: "FishingPlugin", event: AstrMessageEvent):
-    """查看市场"""
-    result = plugin.market_service.get_market_listings()
+    """查看市场：/市场 [分类] [页码] [N星] [最低价-最高价] [高品质]"""
+    args = [a for a in event.message_str.split(" ")[1:] if a.strip()]
+    try:
+        filters = _parse_market_args(args)
+    except Exception as e:
+        yield event.plain_result(
+            f"❌ {e}\n用法：/市场 [分类] [页码] [N星] [最低价-最高价] [高品质]\n"
+            "示例：/市场 鱼竿 2、/市场 鱼类 5星 高品质、/市场 道具 1000-5万"
+        )
+        return
+
+    result = await plugin.service_executor.run(None, plugin.market_service.get_market_page, **filters)
     if not result.get("success"):
         yield event.plain_result(
             f"❌ 查看市场失败：{result.get('message', '未知错误')}"
         )
         return
 
-    # 将所有商品分类
-    grouped_items = {
-        "rod": result.get("rods", []),
-        "accessory": result.get("accessories", []),
-        "commodity": result.get("commodities", []),
-        "item": result.get("items", []),
-        "fish": result.get("fish", []),
-    }
-
-    if not any(grouped_items.values()):
+    counts = result.get("category_counts", {})
+    if not any(counts.values()):
         yield event.plain_result("🛒 市场中没有商品可供购买。")
         return
 
-    # --- 帮助函数：用于格式化单个分区 ---
-    def format_section(title_emoji, title_text, listings):
-        if not listings:
-            return ""
-
-        msg = f"【{title_emoji} 市场 - {title_text}】\n\n"
-        for item in listings[:15]:  # 每个分区最多显示15个
-            display_code = _get_display_code_for_market_item(item)
-            seller_display = (
-                "🎭 匿名卖家" if item.is_anonymous else item.seller_nickname
-            )
-            refine_level_str = (
-                f" 精{item.refine_level}"
-                if hasattr(item, "refine_level") and item.refine_level > 1
-                else ""
-            )
-            quantity_text = (
-                f" x{item.quantity}"
-                if hasattr(item, "quantity") and item.quantity > 1
-                else ""
-            )
-
-            # 为鱼类添加品质显示
-            quality_str = ""
-            if item.item_type == "fish" and hasattr(item, "quality_level") and item.quality_level == 1:
-                quality_str = " ✨高品质"
-            
-            msg += f" - {item.item_name}{quality_str}{refine_level_str}{quantity_text} (ID: {display_code}) - 价格: {item.price} 金币\n"
-            msg += f" - 售卖人： {seller_display}"
-
-            # 为大宗商品添加腐败时间显示
-            if (
-                item.item_type == "commodity"
-                and hasattr(item, "expires_at")
-                and item.expires_at
-            ):
-                from datetime import datetime
-
-                time_left = item.expires_at - datetime.now()
-                if time_left.total_seconds() <= 0:
-                    msg += f"\n - 状态: 💀 已腐败"
-                elif time_left.total_seconds() <= 86400:  # 24小时内
-                    hours = int(time_left.total_seconds() // 3600)
-                    minutes = int((time_left.total_seconds() % 3600) // 60)
-                    msg += f"\n - 腐败倒计时: ⚠️ {hours}小时{minutes}分钟"
-                else:
-                    days = time_left.days
-                    hours = int(time_left.seconds // 3600)
-                    msg += f"\n - 腐败倒计时: ⏰ {days}天{hours}小时"
-
-            msg += "\n\n"
-        return msg
-
-    # --- 构建并发送消息 ---
-    final_message_parts = []
-    final_message_parts.append(format_section("🎣", "鱼竿", grouped_items["rod"]))
-    final_message_parts.append(format_section("💍", "饰品", grouped_items["accessory"]))
-    final_message_parts.append(
-        format_section("📦", "大宗商品", grouped_items["commodity"])
+    item_type = filters["item_type"]
+    emoji, title = _MARKET_CATEGORY_TITLES.get(item_type, ("🛒", "全部"))
+    pagination = result["pagination"]
+    message = (
+        f"【{emoji} 市场 - {title}】第 {pagination['current_page']}/{pagination['total_pages']} 页"
+        f"（共 {pagination['total_items']} 件）\n"
     )
-    final_message_parts.append(format_section("🎁", "道具", grouped_items["item"]))
-    final_message_parts.append(format_section("🐟", "鱼类", grouped_items["fish"]))
-
-    full_message = "".join([part for part in final_message_parts if part])
-
-    if not full_message.strip():
-        yield event.plain_result("🛒 市场中没有商品可供购买。")
-        return
-
-    full_message += "💡 挂单有效期为5天，过期将自动下架返还\n"
-    full_message += "💡 使用「购买 ID」购买，例如：购买 C5"
-
-    # 为避免消息过长，进行分割发送
-    if len(full_message) > 1800:
-        # 简单的按分区（双换行）分割
-        parts = full_message.split("\n\n")
-        current_part = ""
-        for part in parts:
-            # 如果当前部分加上新部分超过长度限制，就先发送当前部分
-            if len(current_part) + len(part) + 2 > 1800 and current_part:
-                yield event.plain_result(current_part)
-                current_part = part + "\n\n"
-            else:
-                current_part += part + "\n\n"
-
-        # 发送最后剩余的部分
-        if current_part.strip():
-            yield event.plain_result(current_part.strip())
-    else:
-        yield event.plain_result(full_message)
+    message += " | ".join(
+        f"{e}{t} {counts.get(t_key, 0)}" for t_key, (e, t) in _MARKET_CATEGORY_TITLES.items()
+    ) + "\n"
+
+    active_filters = []
+    if filters["rarity"] is not None:
+        active_filters.append(f"{filters['rarity']}星")
+    if filters["min_price"] is not None or filters["max_price"] is not None:
+        active_filters.append(f"价格 {filters['min_price'] or 0}-{filters['max_price'] or '∞'}")
+    if filters["quality_level"]:
+        active_filters.append("高品质")
+    if active_filters:
+        message += f"筛选：{' '.join(active_filters)}\n"
+    message += "\n"
+
+    listings = result.get("listings", [])
+    if not listings:
+        message += "没有符合条件的商品。\n\n"
+    for item in listings:
+        message += _format_market_listing(item) + "\n\n"
+
+    next_page = pagination["current_page"] + 1
+    if next_page <= pagination["total_pages"]:
+        # 保留原有筛选条件，只替换页码
+        next_args = [a for a in args if not a.strip().isdigit()] + [str(next_page)]
+        message += f"💡 下一页：市场 {' '.join(next_args)}\n"
+    message += "💡 分类：鱼竿/饰品/大宗商品/道具/鱼类，筛选：5星、1000-5万、高品质\n"
+    message += "💡 挂单有效期为5天，过期将自动下架返还\n"
+    message += "💡 使用「购买 ID」购买，例如：购买 C5"
+    yield event.plain_result(message)
 
 
 async def list_any(
@@ -730,11 +767,15 @@ async def list_any(
     # 判别类型并解析
     result = None
     if token.startswith("R"):
-        instance_id = plugin.inventory_service.resolve_rod_instance_id(user_id, token)
+        instance_id = await plugin.service_executor.run(
+            user_id, plugin.inventory_service.resolve_rod_instance_id, user_id, token
+        )
         if instance_id is None:
             yield event.plain_result("❌ 无效的鱼竿ID，请检查后重试。")
             return
-        result = plugin.market_service.put_item_on_sale(
+        result = await plugin.service_executor.run(
+            user_id,
+            plugin.market_service.put_item_on_sale,
             user_id,
             "rod",
             int(instance_id),
@@ -743,13 +784,15 @@ async def list_any(
             quantity=quantity,
         )
     elif token.startswith("A"):
-        instance_id = plugin.inventory_service.resolve_accessory_instance_id(
-            user_id, token
+        instance_id = await plugin.service_executor.run(
+            user_id, plugin.inventory_service.resolve_accessory_instance_id, user_id, token
         )
         if instance_id is None:
             yield event.plain_result("❌ 无效的饰品ID，请检查后重试。")
             return
-        result = plugin.market_service.put_item_on_sale(
+        result = await plugin.service_executor.run(
+            user_id,
+            plugin.market_service.put_item_on_sale,
             user_id,
             "accessory",
             int(instance_id),
@@ -763,7 +806,9 @@ async def list_any(
         except Exception:
             yield event.plain_result("❌ 无效的道具ID，请检查后重试。")
             return
-        result = plugin.market_service.put_item_on_sale(
+        result = await plugin.service_executor.run(
+            user_id,
+            plugin.market_service.put_item_on_sale,
             user_id,
             "item",
             int(item_id),
@@ -783,7 +828,9 @@ async def list_any(
         except Exception:
             yield event.plain_result("❌ 无效的鱼类ID，请检查后重试。\n💡 支持格式：F3（普通品质）、F3H（✨高品质）")
             return
-        result = plugin.market_service.put_item_on_sale(
+        result = await plugin.service_executor.run(
+            user_id,
+            plugin.market_service.put_item_on_sale,
             user_id,
             "fish",
             int(fish_id),
@@ -798,7 +845,9 @@ async def list_any(
         except Exception:
             yield event.plain_result("❌ 无效的大宗商品ID，请检查后重试。")
             return
-        result = plugin.market_service.put_item_on_sale(
+        result = await plugin.service_executor.run(
+            user_id,
+            plugin.market_service.put_item_on_sale,
             user_id,
             "commodity",
             instance_id,
@@ -838,7 +887,9 @@ async def buy_item(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result(f"❌ {e}\n💡 使用「市场」命令查看商品列表")
         return
 
-    result = plugin.market_service.buy_market_item(user_id, market_id)
+    result = await plugin.service_executor.run(
+        user_id, plugin.market_service.buy_market_item, user_id, market_id
+    )
     if result:
         if result["success"]:
             yield event.plain_result(result["message"])
@@ -851,7 +902,9 @@ async def buy_item(plugin: "FishingPlugin", event: AstrMessageEvent):
 async def my_listings(plugin: "FishingPlugin", event: AstrMessageEvent):
     """查看我在市场上架的商品"""
     user_id = plugin._get_effective_user_id(event)
-    result = plugin.market_service.get_user_listings(user_id)
+    result = await plugin.service_executor.run(
+        user_id, plugin.market_service.get_user_listings, user_id
+    )
     if result["success"]:
         listings = result["listings"]
         if not listings:
@@ -911,7 +964,9 @@ async def delist_item(plugin: "FishingPlugin", event: AstrMessageEvent):
         except ValueError as e:
             yield event.plain_result(f"❌ {e}\n💡 使用「我的上架」命令查看您的商品列表")
             return
-    result = plugin.market_service.delist_item(user_id, market_id)
+    result = await plugin.service_executor.run(
+        user_id, plugin.market_service.delist_item, user_id, market_id
+    )
     if result:
         if result["success"]:
             yield event.plain_result(result["message"])
@@ -108,7 +108,9 @@ async def send_red_packet(plugin: "FishingPlugin", event: AstrMessageEvent):
             password = ' '.join(args[4:])  # 口令可能包含空格
     
     # 发送红包
-    result = plugin.red_packet_service.send_red_packet(
+    result = await plugin.service_executor.run(
+        user_id,
+        plugin.red_packet_service.send_red_packet,
         sender_id=user_id,
         group_id=group_id,
         packet_type=packet_type,
@@ -154,7 +156,9 @@ async def claim_red_packet(plugin: "FishingPlugin", event: AstrMessageEvent):
             password = args[1]
     
     # 领取红包
-    result = plugin.red_packet_service.claim_red_packet(
+    result = await plugin.service_executor.run(
+        user_id,
+        plugin.red_packet_service.claim_red_packet,
         user_id=user_id,
         group_id=group_id,
         packet_id=packet_id,
@@ -181,7 +185,7 @@ async def red_packet_details(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("❌ 红包ID必须是数字")
         return
     
-    result = plugin.red_packet_service.get_red_packet_details(packet_id)
+    result = await plugin.service_executor.run(None, plugin.red_packet_service.get_red_packet_details, packet_id)
     yield event.plain_result(result["message"])
 
 
@@ -196,7 +200,7 @@ async def list_red_packets(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("❌ 红包功能只能在群聊中使用")
         return
     
-    result = plugin.red_packet_service.list_group_red_packets(group_id)
+    result = await plugin.service_executor.run(None, plugin.red_packet_service.list_group_red_packets, group_id)
     yield event.plain_result(result["message"])
 
 
@@ -222,7 +226,7 @@ async def revoke_red_packet(plugin: "FishingPlugin", event: AstrMessageEvent):
     # 检查是否为机器人管理员
     is_admin = event.is_admin()
     
-    result = plugin.red_packet_service.revoke_red_packet(packet_id, user_id, is_admin)
+    result = await plugin.service_executor.run(user_id, plugin.red_packet_service.revoke_red_packet, packet_id, user_id, is_admin)
     yield event.plain_result(result["message"])
 
 
@@ -246,7 +250,7 @@ async def cleanup_red_packets(plugin: "FishingPlugin", event: AstrMessageEvent):
     # 带参数"所有"：清理全局所有红包
     if len(args) >= 2 and args[1] in ["所有", "all"]:
         # 清理全局所有红包
-        result = plugin.red_packet_service.clean_all_red_packets()
+        result = await plugin.service_executor.run(None, plugin.red_packet_service.clean_all_red_packets)
         yield event.plain_result(result["message"])
         return
     
@@ -255,5 +259,5 @@ async def cleanup_red_packets(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("❌ 此命令只能在群聊中使用\n提示：如需清理全局红包，请使用 /清理红包 所有")
         return
     
-    result = plugin.red_packet_service.clean_group_red_packets(group_id)
+    result = await plugin.service_executor.run(None, plugin.red_packet_service.clean_group_red_packets, group_id)
     yield event.plain_result(result["message"])
@@ -9,7 +9,7 @@ from typing import TYPE_CHECKING
 from ..draw.sicbo import (
     draw_sicbo_game_start, draw_sicbo_bet_confirmation, draw_sicbo_bet_merged, draw_sicbo_status,
     draw_sicbo_result, draw_sicbo_user_bets, draw_sicbo_countdown_setting, draw_sicbo_help,
-    draw_sicbo_odds, save_image_to_temp
+    draw_sicbo_odds
 )
 from ..utils import parse_amount
 
@@ -17,6 +17,11 @@ if TYPE_CHECKING:
     from ..main import FishingPlugin
 
 
+async def _render_sicbo_image(plugin: "FishingPlugin", event: AstrMessageEvent, name: str, renderer, *args):
+    """在渲染进程中绘制骰宝图片，返回图片消息结果；超时或失败时返回 None"""
+    return await plugin.image_delivery.render_result(event, name, renderer, *args)
+
+
 def _get_game_session_id(event: AstrMessageEvent) -> str:
     """
     获取骰宝游戏的会话ID
@@ -52,15 +57,17 @@ async def start_sicbo_game(plugin: "FishingPlugin", event: AstrMessageEvent):
         if group_id:
             session_info['group_id'] = group_id
         
-        result = plugin.sicbo_service.start_new_game(game_session_id, session_info)
+        result = await plugin.sicbo_service.start_new_game(game_session_id, session_info)
         
         if result["success"]:
             if plugin.sicbo_service.is_image_mode():
                 # 图片模式：生成开庄成功图片
                 countdown_seconds = plugin.sicbo_service.get_countdown_seconds()
-                image = draw_sicbo_game_start(countdown_seconds)
-                image_path = save_image_to_temp(image, "sicbo_start", plugin.data_dir)
-                yield event.image_result(image_path)
+                image_result = await _render_sicbo_image(plugin, event, "sicbo_start", draw_sicbo_game_start, countdown_seconds)
+                if image_result:
+                    yield image_result
+                else:
+                    yield event.plain_result(result["message"])
             else:
                 # 文本模式：发送文本消息
                 yield event.plain_result(result["message"])
@@ -93,31 +100,40 @@ async def place_bet(plugin: "FishingPlugin", event: AstrMessageEvent, bet_type:
         return
     
     try:
-        result = plugin.sicbo_service.place_bet(user_id, bet_type, amount, game_session_id)
+        result = await plugin.service_executor.run(
+            user_id, plugin.sicbo_service.place_bet, user_id, bet_type, amount, game_session_id
+        )
         
         if result["success"]:
             if plugin.sicbo_service.is_image_mode():
                 # 图片模式：生成下注图片
-                user = plugin.user_repo.get_by_id(user_id)
+                user = await plugin.service_executor.run(user_id, plugin.user_repo.get_by_id, user_id)
                 username = user.nickname if user else "未知玩家"
                 
                 # 根据是否合并选择不同的图片
                 if result.get("merged", False):
                     # 合并下注的图片
-                    image = draw_sicbo_bet_merged(
+                    image_result = await _render_sicbo_image(
+                        plugin,
+                        event,
+                        "sicbo_bet_merged",
+                        draw_sicbo_bet_merged,
                         bet_type, 
                         amount, 
                         result.get("original_amount", 0), 
                         result.get("new_total", 0), 
                         username
                     )
-                    image_path = save_image_to_temp(image, "sicbo_bet_merged", plugin.data_dir)
                 else:
                     # 普通下注的图片
-                    image = draw_sicbo_bet_confirmation(bet_type, amount, username)
-                    image_path = save_image_to_temp(image, "sicbo_bet", plugin.data_dir)
+                    image_result = await _render_sicbo_image(
+                        plugin, event, "sicbo_bet", draw_sicbo_bet_confirmation, bet_type, amount, username
+                    )
                 
-                yield event.image_result(image_path)
+                if image_result:
+                    yield image_result
+                else:
+                    yield event.plain_result(result["message"])
             else:
                 # 文本模式：发送文本消息
                 yield event.plain_result(result["message"])
@@ -294,35 +310,35 @@ async def sicbo_status(plugin: "FishingPlugin", event: AstrMessageEvent):
             if plugin.sicbo_service.is_image_mode():
                 # 图片模式：生成状态图片
                 game_data = result.get("game_data", {})
-                image = draw_sicbo_status(game_data)
-                image_path = save_image_to_temp(image, "sicbo_status", plugin.data_dir)
-                yield event.image_result(image_path)
+                image_result = await _render_sicbo_image(plugin, event, "sicbo_status", draw_sicbo_status, game_data)
+                if image_result:
+                    yield image_result
+                    return
+            # 文本模式（或图片生成失败）：生成文本状态消息
+            game_data = result.get("game_data", {})
+            remaining_time = game_data.get("remaining_time", 0)
+            total_bets = game_data.get("total_bets", 0)
+            total_amount = game_data.get("total_amount", 0)
+            unique_players = game_data.get("unique_players", 0)
+            bets = game_data.get("bets", {})
+
+            message = f"🎲 骰宝游戏进行中\n"
+            message += f"⏰ 剩余时间：{remaining_time} 秒\n"
+            message += f"💰 总奖池：{total_amount:,} 金币\n"
+            message += f"👥 参与人数：{unique_players} 人\n"
+            message += f"📊 总下注：{total_bets} 笔\n\n"
+
+            if bets:
+                message += "📋 下注详情：\n"
+                for bet_type, bet_info in bets.items():
+                    count = bet_info.get('count', 0)
+                    amount = bet_info.get('amount', 0)
+                    if count > 0:
+                        message += f"  • {bet_type}：{count} 笔，{amount:,} 金币\n"
             else:
-                # 文本模式：生成文本状态消息
-                game_data = result.get("game_data", {})
-                remaining_time = game_data.get("remaining_time", 0)
-                total_bets = game_data.get("total_bets", 0)
-                total_amount = game_data.get("total_amount", 0)
-                unique_players = game_data.get("unique_players", 0)
-                bets = game_data.get("bets", {})
-                
-                message = f"🎲 骰宝游戏进行中\n"
-                message += f"⏰ 剩余时间：{remaining_time} 秒\n"
-                message += f"💰 总奖池：{total_amount:,} 金币\n"
-                message += f"👥 参与人数：{unique_players} 人\n"
-                message += f"📊 总下注：{total_bets} 笔\n\n"
-                
-                if bets:
-                    message += "📋 下注详情：\n"
-                    for bet_type, bet_info in bets.items():
-                        count = bet_info.get('count', 0)
-                        amount = bet_info.get('amount', 0)
-                        if count > 0:
-                            message += f"  • {bet_type}：{count} 笔，{amount:,} 金币\n"
-                else:
-                    message += "💭 暂无下注"
-                
-                yield event.plain_result(message)
+                message += "💭 暂无下注"
+
+            yield event.plain_result(message)
         else:
             yield event.plain_result(result["message"])
     except Exception as e:
@@ -337,32 +353,32 @@ async def my_bets(plugin: "FishingPlugin", event: AstrMessageEvent):
         result = plugin.sicbo_service.get_user_bets(user_id, game_session_id)
         
         if result["success"]:
-            user = plugin.user_repo.get_by_id(user_id)
+            user = await plugin.service_executor.run(user_id, plugin.user_repo.get_by_id, user_id)
             username = user.nickname if user else "未知玩家"
             
             if plugin.sicbo_service.is_image_mode():
                 # 图片模式：生成用户下注图片
                 user_bets = result.get("bets", [])
-                image = draw_sicbo_user_bets(user_bets, username)
-                image_path = save_image_to_temp(image, "sicbo_user_bets", plugin.data_dir)
-                yield event.image_result(image_path)
+                image_result = await _render_sicbo_image(plugin, event, "sicbo_user_bets", draw_sicbo_user_bets, user_bets, username)
+                if image_result:
+                    yield image_result
+                    return
+            # 文本模式（或图片生成失败）：生成文本下注消息
+            user_bets = result.get("bets", [])
+            total_bet = result.get("total_bet", 0)
+
+            if user_bets:
+                message = f"📋 {username} 的下注情况：\n\n"
+                for i, bet in enumerate(user_bets, 1):
+                    bet_type = bet.get('bet_type', '未知')
+                    amount = bet.get('amount', 0)
+                    odds = bet.get('odds', 0)
+                    message += f"{i}. {bet_type}：{amount:,} 金币 (1:{odds})\n"
+                message += f"\n💰 总下注：{total_bet:,} 金币"
             else:
-                # 文本模式：生成文本下注消息
-                user_bets = result.get("bets", [])
-                total_bet = result.get("total_bet", 0)
-                
-                if user_bets:
-                    message = f"📋 {username} 的下注情况：\n\n"
-                    for i, bet in enumerate(user_bets, 1):
-                        bet_type = bet.get('bet_type', '未知')
-                        amount = bet.get('amount', 0)
-                        odds = bet.get('odds', 0)
-                        message += f"{i}. {bet_type}：{amount:,} 金币 (1:{odds})\n"
-                    message += f"\n💰 总下注：{total_bet:,} 金币"
-                else:
-                    message = f"💭 {username} 还没有下注"
-                
-                yield event.plain_result(message)
+                message = f"💭 {username} 还没有下注"
+
+            yield event.plain_result(message)
         else:
             yield event.plain_result(result["message"])
     except Exception as e:
@@ -375,9 +391,10 @@ async def sicbo_help(plugin: "FishingPlugin", event: AstrMessageEvent):
         if plugin.sicbo_service.is_image_mode():
             # 图片模式：生成帮助图片
             countdown_seconds = plugin.sicbo_service.get_countdown_seconds()
-            image = draw_sicbo_help(countdown_seconds)
-            image_path = save_image_to_temp(image, "sicbo_help", plugin.data_dir)
-            yield event.image_result(image_path)
+            image_data, image_path = await plugin.service_executor.run(
+                None, plugin.render_cache.get_entry, "sicbo_help", draw_sicbo_help, countdown_seconds
+            )
+            yield plugin.image_delivery.cached_result(event, image_data, image_path)
         else:
             # 文本模式：发送简化的帮助文本
             help_message = f"""🎲 骰宝游戏帮助
@@ -414,9 +431,10 @@ async def sicbo_odds(plugin: "FishingPlugin", event: AstrMessageEvent):
     try:
         if plugin.sicbo_service.is_image_mode():
             # 图片模式：生成赔率图片
-            image = draw_sicbo_odds()
-            image_path = save_image_to_temp(image, "sicbo_odds", plugin.data_dir)
-            yield event.image_result(image_path)
+            image_data, image_path = await plugin.service_executor.run(
+                None, plugin.render_cache.get_entry, "sicbo_odds", draw_sicbo_odds
+            )
+            yield plugin.image_delivery.cached_result(event, image_data, image_path)
         else:
             # 文本模式：发送详细赔率文本
             odds_message = """💰 骰宝赔率详情
@@ -471,13 +489,17 @@ async def set_sicbo_countdown(plugin: "FishingPlugin", event: AstrMessageEvent):
         if result["success"]:
             # 获取管理员信息
             user_id = plugin._get_effective_user_id(event)
-            user = plugin.user_repo.get_by_id(user_id)
+            user = await plugin.service_executor.run(user_id, plugin.user_repo.get_by_id, user_id)
             admin_name = user.nickname if user else "管理员"
             
             # 生成设置成功图片
-            image = draw_sicbo_countdown_setting(seconds, admin_name)
-            image_path = save_image_to_temp(image, "sicbo_countdown_setting", plugin.data_dir)
-            yield event.image_result(image_path)
+            image_result = await _render_sicbo_image(
+                plugin, event, "sicbo_countdown_setting", draw_sicbo_countdown_setting, seconds, admin_name
+            )
+            if image_result:
+                yield image_result
+            else:
+                yield event.plain_result(result["message"])
         else:
             yield event.plain_result(result["message"])
     except ValueError:
@@ -1,5 +1,3 @@
-import os
-import time
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.core.message.components import At
 from astrbot.api import logger
@@ -83,17 +81,31 @@ async def ranking(plugin: "FishingPlugin", event: AstrMessageEvent):
         user_dict["total_weight_caught"] = user_dict.get("total_weight_caught", 0)
 
     # 3. 绘制并发送图片
-    user_id_for_filename = plugin._get_effective_user_id(event)
-    unique_id = getattr(
-        event, "message_id", f"{user_id_for_filename}_{int(time.time())}"
+    image_result = await plugin.image_delivery.render_result(
+        event, "ranking", draw_fishing_ranking, user_data, ranking_type=ranking_type
     )
-    # 安全化文件名，移除特殊字符
-    from ..utils import sanitize_filename
-    safe_unique_id = sanitize_filename(str(unique_id))
-    output_path = os.path.join(plugin.tmp_dir, f"fishing_ranking_{safe_unique_id}.png")
+    if image_result:
+        yield image_result
+    else:
+        yield event.plain_result(_format_ranking_text(user_data, ranking_type))
+
+
+# 排行榜文字版的标题与数值字段
+_RANKING_TEXT_COLUMNS = {
+    "coins": ("💰 金币排行榜", "coins", "金币"),
+    "max_coins": ("🏆 历史最高金币排行榜", "max_coins", "金币"),
+    "fish_count": ("🐟 钓获数量排行榜", "fish_count", "条"),
+    "total_weight_caught": ("⚖️ 钓获重量排行榜", "total_weight_caught", "克"),
+}
+
 
-    draw_fishing_ranking(user_data, output_path=output_path, ranking_type=ranking_type)
-    yield event.image_result(output_path)
+def _format_ranking_text(user_data, ranking_type: str) -> str:
+    """排行榜图片生成失败时的文字版排行榜"""
+    title, field, unit = _RANKING_TEXT_COLUMNS.get(ranking_type, _RANKING_TEXT_COLUMNS["coins"])
+    lines = [f"【{title}】"]
+    for rank, user_dict in enumerate(user_data, 1):
+        lines.append(f"{rank}. {user_dict.get('nickname') or '未知'}：{user_dict.get(field, 0) or 0:,} {unit}")
+    return "\n".join(lines)
 
 
 async def steal_fish(plugin: "FishingPlugin", event: AstrMessageEvent):
@@ -122,7 +134,7 @@ async def steal_fish(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("不能偷自己的鱼哦！")
         return
 
-    result = plugin.game_mechanics_service.steal_fish(user_id, target_id)
+    result = await plugin.service_executor.run(user_id, plugin.game_mechanics_service.steal_fish, user_id, target_id)
     if result:
         yield event.plain_result(result["message"])
     else:
@@ -160,7 +172,7 @@ async def electric_fish(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("不能电自己的鱼哦！")
         return
 
-    result = plugin.game_mechanics_service.electric_fish(user_id, target_id)
+    result = await plugin.service_executor.run(user_id, plugin.game_mechanics_service.electric_fish, user_id, target_id)
     if result:
         yield event.plain_result(result["message"])
     else:
@@ -195,18 +207,21 @@ async def dispel_protection(plugin: "FishingPlugin", event: AstrMessageEvent):
         yield event.plain_result("❌ 系统错误：找不到驱灵香道具")
         return
     
-    # 检查用户是否持有驱灵香
-    item_inventory = plugin.inventory_repo.get_user_item_inventory(user_id)
-    if item_inventory.get(dispel_item.item_id, 0) < 1:
+    def use_dispel_item():
+        # 检查持有、驱散与消耗道具在服务执行器中按该用户的指令顺序执行
+        item_inventory = plugin.inventory_repo.get_user_item_inventory(user_id)
+        if item_inventory.get(dispel_item.item_id, 0) < 1:
+            return None
+        dispel_result = plugin.game_mechanics_service.dispel_steal_protection(target_id)
+        if dispel_result.get("success"):
+            # 成功驱散，消耗道具
+            plugin.inventory_repo.decrease_item_quantity(user_id, dispel_item.item_id, 1)
+        return dispel_result
+
+    result = await plugin.service_executor.run(user_id, use_dispel_item)
+    if result is None:
         yield event.plain_result(f"❌ 你没有【{dispel_item.name}】道具！")
-        return
-    
-    # 尝试驱散
-    result = plugin.game_mechanics_service.dispel_steal_protection(target_id)
-    
-    if result.get("success"):
-        # 成功驱散，消耗道具
-        plugin.inventory_repo.decrease_item_quantity(user_id, dispel_item.item_id, 1)
+    elif result.get("success"):
         yield event.plain_result(f"✅ 使用了【{dispel_item.name}】！{result['message']}")
     else:
         yield event.plain_result(result["message"])
@@ -237,7 +252,7 @@ async def use_title(plugin: "FishingPlugin", event: AstrMessageEvent):
     if not title_id_str.isdigit():
         yield event.plain_result("❌ 称号 ID 必须是数字，请检查后重试。")
         return
-    result = plugin.user_service.use_title(user_id, int(title_id_str))
+    result = await plugin.service_executor.run(user_id, plugin.user_service.use_title, user_id, int(title_id_str))
     yield event.plain_result(result["message"])
 
 
@@ -271,7 +286,7 @@ async def tax_record(plugin: "FishingPlugin", event: AstrMessageEvent):
     from ..utils import safe_datetime_handler
 
     user_id = plugin._get_effective_user_id(event)
-    result = plugin.user_service.get_tax_record(user_id)
+    result = await plugin.service_executor.run(user_id, plugin.user_service.get_tax_record, user_id)
     if result and result["success"]:
         records = result.get("records", [])
         if not records:
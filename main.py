@@ -9,10 +9,10 @@ from astrbot.core.star.filter.permission import PermissionType
 # ==========================================================
 # 导入所有仓储层 & 服务层（与旧版保持一致的精确导入）
 # ==========================================================
-from .core.repositories.sqlite_user_repo import SqliteUserRepository
-from .core.repositories.sqlite_item_template_repo import SqliteItemTemplateRepository
+from .core.repositories.cached_user_repo import CachedUserRepository
+from .core.repositories.cached_item_template_repo import CachedItemTemplateRepository
 from .core.repositories.sqlite_inventory_repo import SqliteInventoryRepository
-from .core.repositories.sqlite_gacha_repo import SqliteGachaRepository
+from .core.repositories.cached_gacha_repo import CachedGachaRepository
 from .core.repositories.sqlite_market_repo import SqliteMarketRepository
 from .core.repositories.sqlite_shop_repo import SqliteShopRepository
 from .core.repositories.sqlite_log_repo import SqliteLogRepository
@@ -20,6 +20,7 @@ from .core.repositories.sqlite_achievement_repo import SqliteAchievementReposito
 from .core.repositories.sqlite_user_buff_repo import SqliteUserBuffRepository
 from .core.repositories.sqlite_exchange_repo import SqliteExchangeRepository # 新增交易所Repo
 from .core.repositories.sqlite_red_packet_repo import SqliteRedPacketRepository # 新增红包Repo
+from .core.repositories.sqlite_sicbo_repo import SqliteSicboRepository
 
 from .core.services.data_setup_service import DataSetupService
 from .core.services.item_template_service import ItemTemplateService
@@ -36,8 +37,17 @@ from .core.services.fishing_zone_service import FishingZoneService
 from .core.services.exchange_service import ExchangeService # 新增交易所Service
 from .core.services.sicbo_service import SicboService # 新增骰宝Service
 from .core.services.red_packet_service import RedPacketService # 新增红包Service
+from .core.services.service_executor import ServiceExecutor
+from .core.services.log_retention_service import LogRetentionService
+from .core.services.event_bus import EventBus
 
 from .core.database.migration import run_migrations
+from .core.database.connection_manager import DatabaseConnectionManager
+from .draw.render_cache import RenderCache, read_plugin_version
+from .draw.render_service import RenderService
+from .draw.image_delivery import ENCODE_OPTIONS, ImageDelivery
+from .draw.help import draw_help_image
+from .draw.sicbo import draw_sicbo_help, draw_sicbo_odds
 
 # ==========================================================
 # 导入所有指令函数
@@ -133,7 +143,8 @@ class FishingPlugin(Star):
         self.game_config = {
             "fishing": {
                 "cost": config.get("fish_cost", 10), 
-                "cooldown_seconds": fishing_config.get("cooldown_seconds", 180)
+                "cooldown_seconds": fishing_config.get("cooldown_seconds", 180),
+                "auto_batch_size": config.get("performance", {}).get("auto_fishing_batch_size", 50)
             },
             "quality_bonus_max_chance": fishing_config.get("quality_bonus_max_chance", 0.35),
             "steal": {
@@ -154,7 +165,11 @@ class FishingPlugin(Star):
                 "initial_coins": user_config.get("initial_coins", 200)
             },
             "market": {
-                "listing_tax_rate": market_config.get("listing_tax_rate", 0.05)
+                "listing_tax_rate": market_config.get("listing_tax_rate", 0.05),
+                "expiry_sweep_interval_minutes": market_config.get("expiry_sweep_interval_minutes", 10),
+                "expiry_sweep_batch_size": market_config.get("expiry_sweep_batch_size", 200),
+                "page_size": market_config.get("page_size", 10),
+                "page_cache_seconds": market_config.get("page_cache_seconds", 30)
             },
             "tax": {
                 "is_tax": self.is_tax,
@@ -200,7 +215,8 @@ class FishingPlugin(Star):
                     "6": 25.0, "7": 55.0, "8": 125.0, "9": 280.0, "10": 660.0
                 }
             },
-            "exchange": exchange_config  # 直接使用框架的配置
+            "exchange": exchange_config,  # 直接使用框架的配置
+            "retention": config.get("retention", {})
         }
         
         # 初始化数据库模式
@@ -208,27 +224,73 @@ class FishingPlugin(Star):
         migrations_path = os.path.join(plugin_root_dir, "core", "database", "migrations")
         run_migrations(db_path, migrations_path)
 
-        # --- 2. 组合根：实例化所有仓储层 ---
-        self.user_repo = SqliteUserRepository(db_path)
-        self.item_template_repo = SqliteItemTemplateRepository(db_path)
-        self.inventory_repo = SqliteInventoryRepository(db_path)
-        self.gacha_repo = SqliteGachaRepository(db_path)
-        self.market_repo = SqliteMarketRepository(db_path)
-        self.shop_repo = SqliteShopRepository(db_path)
-        self.log_repo = SqliteLogRepository(db_path)
-        self.achievement_repo = SqliteAchievementRepository(db_path)
-        self.buff_repo = SqliteUserBuffRepository(db_path)
-        self.exchange_repo = SqliteExchangeRepository(db_path)
+        # --- 2. 组合根：实例化共享连接池与所有仓储层 ---
+        database_config = config.get("database", {})
+        self.db_manager = DatabaseConnectionManager(
+            db_path,
+            timeout=database_config.get("busy_timeout", 30),
+            pool_size=database_config.get("pool_size", 8),
+        )
+        performance_config = config.get("performance", {})
+        # 用户数据写回缓存：热点用户的多次读写在内存中合并，按间隔批量写库
+        self.user_repo = CachedUserRepository(
+            db_path,
+            self.db_manager,
+            flush_interval_seconds=performance_config.get("user_cache_flush_seconds", 2),
+            max_cached_users=performance_config.get("user_cache_size", 10000),
+        )
+        self.item_template_repo = CachedItemTemplateRepository(db_path, self.db_manager)
+        self.inventory_repo = SqliteInventoryRepository(db_path, self.db_manager)
+        self.gacha_repo = CachedGachaRepository(db_path, self.db_manager)
+        self.market_repo = SqliteMarketRepository(db_path, self.db_manager)
+        self.shop_repo = SqliteShopRepository(db_path, self.db_manager)
+        self.log_repo = SqliteLogRepository(db_path, self.db_manager)
+        self.achievement_repo = SqliteAchievementRepository(db_path, self.db_manager)
+        self.buff_repo = SqliteUserBuffRepository(db_path, self.db_manager)
+        self.exchange_repo = SqliteExchangeRepository(db_path, self.db_manager)
+
+        # 服务调用执行器：指令处理中的同步数据库操作在专用线程池中执行，避免阻塞事件循环
+        self.service_executor = ServiceExecutor(
+            max_workers=performance_config.get("service_workers", 4)
+        )
+        self.service_shutdown_timeout = performance_config.get("service_shutdown_timeout_seconds", 10)
+        # 图片渲染服务：绘图在独立进程池中执行，超时后由指令回退到文字输出
+        image_format = str(performance_config.get("image_format", "PNG")).upper()
+        if image_format not in ENCODE_OPTIONS:
+            image_format = "PNG"
+        self.render_service = RenderService(
+            max_workers=performance_config.get("render_workers", 2),
+            timeout_seconds=performance_config.get("render_timeout_seconds", 30),
+            use_process_pool=performance_config.get("render_use_process_pool", True),
+            image_format=image_format,
+            encode_options=ENCODE_OPTIONS[image_format],
+        )
+        # 图片发送管道：默认在内存中发送，文件模式下写唯一命名的临时文件并定期清理
+        self.image_delivery = ImageDelivery(
+            self.render_service,
+            os.path.join(self.tmp_dir, "images"),
+            mode=performance_config.get("image_delivery", "memory"),
+            file_ttl_seconds=performance_config.get("image_file_ttl_seconds", 600),
+            extra_sweep_dirs=[os.path.join(self.data_dir, "temp_images")],
+        )
 
         # --- 3. 组合根：实例化所有服务层，并注入依赖 ---
+        # 领域事件总线：各服务发布事件，成就系统订阅后即时检查
+        self.event_bus = EventBus()
         # 3.1 核心服务必须在效果管理器之前实例化，以解决依赖问题
         self.fishing_zone_service = FishingZoneService(self.item_template_repo, self.inventory_repo, self.game_config)
+        # 鱼类模板变更时清空钓鱼抽样表
+        self.item_template_repo.register_invalidation_listener(self.fishing_zone_service.fish_sampler.invalidate)
         self.game_mechanics_service = GameMechanicsService(self.user_repo, self.log_repo, self.inventory_repo,
-                                                          self.item_template_repo, self.buff_repo, self.game_config)
+                                                          self.item_template_repo, self.buff_repo, self.game_config,
+                                                          event_bus=self.event_bus)
 
         # 3.3 实例化其他核心服务
         self.gacha_service = GachaService(self.gacha_repo, self.user_repo, self.inventory_repo, self.item_template_repo,
-                                         self.log_repo, self.achievement_repo)
+                                         self.log_repo, self.achievement_repo, event_bus=self.event_bus,
+                                         connection_manager=self.db_manager)
+        # 后台编辑卡池后清除对应的抽样表
+        self.gacha_repo.register_invalidation_listener(self.gacha_service.invalidate_pool_samplers)
         # UserService 依赖 GachaService，因此在 GachaService 之后实例化
         self.user_service = UserService(self.user_repo, self.log_repo, self.inventory_repo, self.item_template_repo, self.gacha_service, self.game_config, self.achievement_repo)
         self.inventory_service = InventoryService(
@@ -238,13 +300,19 @@ class FishingPlugin(Star):
             None,  # 先设为None，稍后设置
             self.game_mechanics_service,
             self.game_config,
+            event_bus=self.event_bus,
         )
-        self.shop_service = ShopService(self.item_template_repo, self.inventory_repo, self.user_repo, self.shop_repo, self.game_config)
+        self.shop_service = ShopService(self.item_template_repo, self.inventory_repo, self.user_repo, self.shop_repo, self.game_config,
+                                        event_bus=self.event_bus)
         # MarketService 依赖 exchange_repo
         self.market_service = MarketService(self.market_repo, self.inventory_repo, self.user_repo, self.log_repo,
-                                           self.item_template_repo, self.exchange_repo, self.game_config)
+                                           self.item_template_repo, self.exchange_repo, self.game_config,
+                                           event_bus=self.event_bus, connection_manager=self.db_manager)
         self.achievement_service = AchievementService(self.achievement_repo, self.user_repo, self.inventory_repo,
-                                                     self.item_template_repo, self.log_repo)
+                                                     self.item_template_repo, self.log_repo, event_bus=self.event_bus,
+                                                     connection_manager=self.db_manager)
+        # 钓鱼记录保留策略：后台分批清理超额与过期记录
+        self.log_retention_service = LogRetentionService(self.log_repo, self.game_config)
         self.fishing_service = FishingService(
             self.user_repo,
             self.inventory_repo,
@@ -253,28 +321,50 @@ class FishingPlugin(Star):
             self.buff_repo,
             self.fishing_zone_service,
             self.game_config,
+            connection_manager=self.db_manager,
+            event_bus=self.event_bus,
         )
+        # 更换装备后重新计算自动钓鱼冷却（如海洋之心）
+        self.inventory_service.register_equipment_listener(self.fishing_service.on_equipment_changed)
         
         # 导入并初始化水族箱服务
         from .core.services.aquarium_service import AquariumService
         self.aquarium_service = AquariumService(
             self.inventory_repo,
             self.user_repo,
-            self.item_template_repo
+            self.item_template_repo,
+            event_bus=self.event_bus,
         )
         
         # 初始化交易所服务
         self.exchange_service = ExchangeService(self.user_repo, self.exchange_repo, self.game_config, self.log_repo, self.market_service)
         
         # 初始化骰宝服务
-        self.sicbo_service = SicboService(self.user_repo, self.log_repo, self.game_config)
+        self.sicbo_repo = SqliteSicboRepository(db_path, self.db_manager)
+        self.sicbo_service = SicboService(
+            self.user_repo,
+            self.log_repo,
+            self.game_config,
+            sicbo_repo=self.sicbo_repo,
+            connection_manager=self.db_manager,
+            executor=self.service_executor,
+        )
         
         # 设置骰宝服务的消息发送回调
         self.sicbo_service.set_message_callback(self._send_sicbo_announcement)
+        # 恢复重载前未结算的对局
+        self.sicbo_service.recover_unsettled_games()
+
+        # 静态图片（帮助、赔率）渲染缓存，按插件版本与配置区分，配置变化后重新渲染
+        self.render_cache = RenderCache(
+            os.path.join(self.tmp_dir, "render_cache"),
+            read_plugin_version(os.path.dirname(os.path.abspath(__file__))),
+            dict(config),
+        )
         
         # 初始化红包服务
-        self.red_packet_repo = SqliteRedPacketRepository(db_path)
-        self.red_packet_service = RedPacketService(self.red_packet_repo, self.user_repo)
+        self.red_packet_repo = SqliteRedPacketRepository(db_path, self.db_manager)
+        self.red_packet_service = RedPacketService(self.red_packet_repo, self.user_repo, connection_manager=self.db_manager)
         
         # 初始化交易所处理器
         self.exchange_handlers = ExchangeHandlers(self)
@@ -303,11 +393,14 @@ class FishingPlugin(Star):
         self.item_template_service = ItemTemplateService(self.item_template_repo, self.gacha_repo)
 
         # --- 4. 启动后台任务 ---
+        self.user_repo.start_flush_task()
         self.fishing_service.start_auto_fishing_task()
         if self.is_tax:
             self.fishing_service.start_daily_tax_task()  # 启动独立的税收线程
         self.achievement_service.start_achievement_check_task()
         self.exchange_service.start_daily_price_update_task() # 启动交易所后台任务
+        self.log_retention_service.start_retention_task()
+        self.market_service.start_expiry_task()  # 启动过期挂单清理任务
         
         # 启动红包清理任务
         self._red_packet_cleanup_task = asyncio.create_task(self._red_packet_cleanup_scheduler())
@@ -348,7 +441,7 @@ class FishingPlugin(Star):
                 try:
                     if self.sicbo_service.is_image_mode():
                         # 图片模式：生成骰宝结果图片
-                        from .draw.sicbo import draw_sicbo_result, save_image_to_temp
+                        from .draw.sicbo import draw_sicbo_result
                         
                         dice = result_data.get("dice", [1, 1, 1])
                         settlement = result_data.get("settlement", [])
@@ -372,12 +465,16 @@ class FishingPlugin(Star):
                                 "profit": total_profit
                             })
                         
-                        # 生成图片
-                        image = draw_sicbo_result(dice[0], dice[1], dice[2], [], player_results)
-                        image_path = save_image_to_temp(image, "sicbo_result", self.data_dir)
+                        # 生成图片（渲染超时或失败时抛出异常，回退到文本消息）
+                        message_chain = await self.image_delivery.render_chain(
+                            "sicbo_result",
+                            draw_sicbo_result, dice[0], dice[1], dice[2], [], player_results,
+                        )
+                        if message_chain is None:
+                            raise RuntimeError("骰宝结果图片生成失败")
                         
                         # 发送图片消息
-                        success = await self._send_initiative_image(session_info, image_path)
+                        success = await self._send_initiative_image(session_info, message_chain)
                         if success:
                             logger.info(f"🎲 骰宝结果公告图片已主动发送")
                             return
@@ -402,8 +499,8 @@ class FishingPlugin(Star):
         except Exception as e:
             logger.error(f"发送骰宝公告失败: {e}")
 
-    async def _send_initiative_image(self, session_info: dict, image_path: str) -> bool:
-        """主动发送图片消息到指定会话"""
+    async def _send_initiative_image(self, session_info: dict, message_chain: MessageChain) -> bool:
+        """主动发送图片消息链到指定会话"""
         try:
             # 获取保存的 unified_msg_origin
             umo = session_info.get('unified_msg_origin')
@@ -412,12 +509,9 @@ class FishingPlugin(Star):
                 logger.error("缺少 unified_msg_origin，无法发送主动图片消息")
                 return False
             
-            # 构造图片消息链
-            message_chain = MessageChain().file_image(image_path)
-            
             # 使用 context.send_message 发送消息
             await self.context.send_message(umo, message_chain)
-            logger.info(f"主动发送图片消息成功: {image_path}")
+            logger.info("主动发送图片消息成功")
             return True
                 
         except Exception as e:
@@ -447,13 +541,13 @@ class FishingPlugin(Star):
             return False
     
     async def _red_packet_cleanup_scheduler(self):
-        """红包清理调度器 - 每小时清理一次过期红包"""
+        """红包清理调度器 - 定期标记到期红包，并清理过期较久的红包记录"""
         while True:
             try:
-                await asyncio.sleep(3600)  # 每小时执行一次
-                cleaned_count = self.red_packet_service.cleanup_expired_packets()
-                if cleaned_count > 0:
-                    logger.info(f"定时清理了 {cleaned_count} 个过期红包")
+                await asyncio.sleep(600)  # 每10分钟执行一次
+                expired_count = await self.service_executor.run(None, self.red_packet_service.cleanup_expired_packets)
+                if expired_count > 0:
+                    logger.info(f"定时标记了 {expired_count} 个过期红包")
             except asyncio.CancelledError:
                 logger.info("红包清理任务已取消")
                 break
@@ -469,8 +563,22 @@ class FishingPlugin(Star):
         admin_id = event.get_sender_id()
         return self.impersonation_map.get(admin_id, admin_id)
 
+    def _get_static_renders(self):
+        """需要预热的静态图片：(渲染名称, 渲染函数, 参数)"""
+        renders = [("fishing_help", draw_help_image, ())]
+        if self.sicbo_service.is_image_mode():
+            renders.append(("sicbo_help", draw_sicbo_help, (self.sicbo_service.get_countdown_seconds(),)))
+            renders.append(("sicbo_odds", draw_sicbo_odds, ()))
+        return renders
+
     async def initialize(self):
         """可选择实现异步的插件初始化方法，当实例化该插件类之后会自动调用该方法。"""
+        # 启动渲染进程池，进程在后台导入绘图模块
+        self.render_service.start()
+        self.image_delivery.start_janitor()
+        # 在线程池中预热静态图片，之后的帮助类指令直接发送缓存文件
+        warmed = await self.service_executor.run(None, self.render_cache.warm, self._get_static_renders())
+        logger.info(f"静态图片预热完成: {warmed} 张, 统计: {self.render_cache.get_stats()}")
         logger.info("""
     _____ _     _     _
     |  ___(_)___| |__ (_)_ __   __ _
@@ -730,7 +838,7 @@ class FishingPlugin(Star):
 
     @filter.command("市场")
     async def market(self, event: AstrMessageEvent):
-        """查看玩家市场中的所有上架商品"""
+        """分页查看玩家市场中的上架商品。用法：市场 [分类] [页码] [N星] [最低价-最高价] [高品质]"""
         async for r in market_handlers.market(self, event):
             yield r
 
@@ -1287,6 +1395,10 @@ class FishingPlugin(Star):
         self.fishing_service.stop_daily_tax_task()  # 终止独立的税收线程
         self.achievement_service.stop_achievement_check_task()
         self.exchange_service.stop_daily_price_update_task() # 终止交易所后台任务
+        self.log_retention_service.stop_retention_task()
+        logger.info(f"日志压缩统计: {self.log_retention_service.get_stats()}")
+        self.market_service.stop_expiry_task()
+        logger.info(f"市场清理统计: {self.market_service.get_expiry_stats()}")
         
         # 取消红包清理任务
         if hasattr(self, '_red_packet_cleanup_task') and self._red_packet_cleanup_task:
@@ -1294,4 +1406,19 @@ class FishingPlugin(Star):
             
         if self.web_admin_task:
             self.web_admin_task.cancel()
+
+        self.image_delivery.stop_janitor()
+        logger.info(f"图片发送统计: {self.image_delivery.get_stats()}")
+        logger.info(f"图片渲染统计: {self.render_service.get_stats()}")
+        self.render_service.shutdown()
+
+        # 等待进行中的服务调用完成（有超时），再写回用户缓存并关闭共享连接池
+        await asyncio.to_thread(
+            self.service_executor.shutdown, True, self.service_shutdown_timeout
+        )
+        logger.info(f"服务执行器统计: {self.service_executor.get_stats()}")
+        self.user_repo.stop_flush_task()
+        logger.info(f"用户缓存统计: {self.user_repo.get_stats()}")
+        logger.info(f"数据库连接池统计: {self.db_manager.get_stats()}")
+        self.db_manager.close_all()
         logger.info("钓鱼插件已成功终止。")
\ No newline at end of file
@@ -0,0 +1,26 @@
+import sys
+import types
+
+
+# 为单元测试提供轻量的 astrbot.api.logger 替身
+class _DummyLogger:
+    def info(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        pass
+
+    def debug(self, *args, **kwargs):
+        pass
+
+
+if "astrbot.api" not in sys.modules:
+    astrbot_module = types.ModuleType("astrbot")
+    api_module = types.ModuleType("astrbot.api")
+    api_module.logger = _DummyLogger()
+    astrbot_module.api = api_module
+    sys.modules["astrbot"] = astrbot_module
+    sys.modules["astrbot.api"] = api_module
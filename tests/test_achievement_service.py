@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import dataclasses
+from datetime import datetime
+
+import pytest
+
+from core.achievements.base import BaseAchievement
+from core.database.connection_manager import DatabaseConnectionManager
+from core.domain.models import User
+from core.repositories.cached_user_repo import CachedUserRepository
+from core.repositories.sqlite_achievement_repo import SqliteAchievementRepository
+from core.services.achievement_service import AchievementService
+from core.services.event_bus import FISH_CAUGHT, WIPE_BOMB_PLAYED
+
+
+class FirstFishAchievement(BaseAchievement):
+    id = 1
+    name = "第一条鱼"
+    target_value = 1
+    description = "钓到第一条鱼"
+    reward = ("coins", 100, 1)
+    trigger_events = (FISH_CAUGHT,)
+
+    def get_progress(self, context):
+        return context.unique_fish_count
+
+    def check(self, context):
+        if context.user.user_id == "broken":
+            raise RuntimeError("boom")
+        return context.unique_fish_count >= self.target_value
+
+
+class AchievementRepo(SqliteAchievementRepository):
+    """全量检查的统计只用到鱼种数，其余统计为空"""
+
+    unique_fish_counts = {}
+
+    def get_all_unique_fish_counts(self):
+        return dict(self.unique_fish_counts)
+
+    def get_all_garbage_counts(self):
+        return {}
+
+    def get_all_owned_rarities(self, item_type):
+        return {}
+
+    def get_heavy_fish_user_ids(self, weight):
+        return set()
+
+    def get_user_unique_fish_count(self, user_id):
+        return self.unique_fish_counts.get(user_id, 0)
+
+    def get_user_garbage_count(self, user_id):
+        return 0
+
+    def has_caught_heavy_fish(self, user_id, weight):
+        return False
+
+
+class FakeInventoryRepo:
+    def get_user_rod_instances(self, user_id):
+        return []
+
+    def get_user_accessory_instances(self, user_id):
+        return []
+
+    def get_fish_inventory(self, user_id):
+        return []
+
+
+class TestAchievementService(AchievementService):
+    __test__ = False
+
+    def _load_achievements(self):
+        return [FirstFishAchievement()]
+
+
+def _make_service(tmp_path, user_ids=("u1",)):
+    db_path = str(tmp_path / "achievements.db")
+    manager = DatabaseConnectionManager(db_path)
+    columns = ", ".join(
+        f"{f.name} TEXT PRIMARY KEY" if f.name == "user_id" else f.name
+        for f in dataclasses.fields(User)
+    )
+    with manager.get_connection() as conn:
+        conn.execute(f"CREATE TABLE users ({columns})")
+        conn.execute(
+            """
+            CREATE TABLE user_achievement_progress (
+                user_id TEXT NOT NULL, achievement_id INTEGER NOT NULL, current_progress INTEGER DEFAULT 0,
+                completed_at DATETIME, claimed_at DATETIME,
+                PRIMARY KEY (user_id, achievement_id)
+            )
+            """
+        )
+
+    user_repo = CachedUserRepository(db_path, manager)
+    for user_id in user_ids:
+        user_repo.add(User(user_id=user_id, created_at=datetime.now(), nickname=user_id, coins=0))
+    achievement_repo = AchievementRepo(db_path, manager)
+    achievement_repo.unique_fish_counts = {user_id: 1 for user_id in user_ids}
+    service = TestAchievementService(
+        achievement_repo, user_repo, FakeInventoryRepo(), None, None, connection_manager=manager,
+    )
+    return manager, user_repo, achievement_repo, service
+
+
+def _catch_fish(service, user_id, fish_id):
+    service.event_bus.publish(FISH_CAUGHT, user_id, fish_id=fish_id, rarity=3, base_value=50, weight=1000)
+
+
+def _process_queued_events(service):
+    while not service._event_queue.empty():
+        service._process_events(service._drain_events(service._event_queue.get_nowait()))
+
+
+def _completed(achievement_repo, user_id):
+    return {
+        achievement_id
+        for achievement_id, progress in achievement_repo.get_user_progress(user_id).items()
+        if progress.get("completed_at")
+    }
+
+
+def test_full_scan_writes_rewards_and_completions_together(tmp_path):
+    manager, user_repo, achievement_repo, service = _make_service(tmp_path, ("u1", "u2"))
+
+    service._run_full_scan()
+
+    for user_id in ("u1", "u2"):
+        assert user_repo.get_by_id(user_id).coins == 100
+        assert _completed(achievement_repo, user_id) == {1}
+    manager.close_all()
+
+
+def test_full_scan_rolls_back_rewards_when_completions_cannot_be_written(tmp_path):
+    manager, user_repo, achievement_repo, service = _make_service(tmp_path)
+
+    def fail(records):
+        raise RuntimeError("disk full")
+
+    achievement_repo.complete_achievements = fail
+    with pytest.raises(RuntimeError):
+        service._run_full_scan()
+
+    assert user_repo.get_by_id("u1").coins == 0
+    assert _completed(achievement_repo, "u1") == set()
+    manager.close_all()
+
+
+def test_full_scan_rolls_back_only_the_failing_user(tmp_path):
+    manager, user_repo, achievement_repo, service = _make_service(tmp_path, ("u1", "broken"))
+
+    service._run_full_scan()
+
+    assert user_repo.get_by_id("u1").coins == 100
+    assert _completed(achievement_repo, "u1") == {1}
+    assert user_repo.get_by_id("broken").coins == 0
+    assert _completed(achievement_repo, "broken") == set()
+    manager.close_all()
+
+
+def test_event_unlocks_an_achievement_once_and_grants_its_reward(tmp_path):
+    manager, user_repo, achievement_repo, service = _make_service(tmp_path)
+    achievement_repo.unique_fish_counts = {"u1": 0}
+    service._remember_state("u1", service._build_state("u1"))
+
+    _catch_fish(service, "u1", 7)
+    _process_queued_events(service)
+
+    assert service._states["u1"].context.unique_fish_count == 1
+    assert user_repo.get_by_id("u1").coins == 100
+    assert _completed(achievement_repo, "u1") == {1}
+
+    _catch_fish(service, "u1", 8)
+    _process_queued_events(service)
+
+    assert user_repo.get_by_id("u1").coins == 100
+    manager.close_all()
+
+
+def test_events_are_grouped_per_user_up_to_the_batch_limit(tmp_path):
+    manager, user_repo, achievement_repo, service = _make_service(tmp_path)
+    service.max_events_per_batch = 3
+    for user_id in ("u1", "u2", "u1", "u2", "u1"):
+        _catch_fish(service, user_id, 1)
+    # 未被任何成就订阅的事件不会入队
+    service.event_bus.publish(WIPE_BOMB_PLAYED, "u1", multiplier=2.0)
+
+    grouped = service._drain_events(service._event_queue.get_nowait())
+
+    assert {user_id: len(events) for user_id, events in grouped.items()} == {"u1": 2, "u2": 1}
+    assert service._event_queue.qsize() == 2
+    manager.close_all()
+
+
+def test_full_scan_invalidates_cached_states(tmp_path):
+    manager, user_repo, achievement_repo, service = _make_service(tmp_path)
+    achievement_repo.unique_fish_counts = {"u1": 0}
+    service._remember_state("u1", service._build_state("u1"))
+
+    achievement_repo.unique_fish_counts = {"u1": 1}
+    service._run_full_scan()
+
+    assert service._states == {}
+    # 重建的状态包含全量检查写入的完成记录，之后的事件不会重复发放奖励
+    _catch_fish(service, "u1", 9)
+    _process_queued_events(service)
+    assert service._states["u1"].completed == {1}
+    assert user_repo.get_by_id("u1").coins == 100
+    manager.close_all()
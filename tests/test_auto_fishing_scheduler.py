@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from core.services.auto_fishing_scheduler import AutoFishingScheduler
+
+
+def test_pop_due_returns_only_due_users_in_order():
+    scheduler = AutoFishingScheduler()
+    scheduler.schedule("late", 300.0)
+    scheduler.schedule("early", 100.0)
+    scheduler.schedule("mid", 200.0)
+
+    assert scheduler.pop_due(250.0) == ["early", "mid"]
+    assert "late" in scheduler and len(scheduler) == 1
+    assert scheduler.next_due_in(250.0) == 50.0
+
+
+def test_reschedule_and_remove_drop_stale_entries():
+    scheduler = AutoFishingScheduler()
+    scheduler.schedule("a", 100.0)
+    scheduler.schedule("b", 100.0)
+    scheduler.schedule("a", 500.0)  # 例如装备变化后冷却变长
+    scheduler.remove("b")
+
+    assert scheduler.pop_due(400.0) == []
+    assert scheduler.pop_due(500.0) == ["a"]
+    assert scheduler.next_due_in(500.0) is None
+
+
+def test_heap_is_compacted_after_many_reschedules():
+    scheduler = AutoFishingScheduler()
+    for i in range(1000):
+        scheduler.schedule("u", float(i))
+    assert len(scheduler._heap) <= 2 * len(scheduler) + 64
+    assert scheduler.pop_due(10_000.0) == ["u"]
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from core.database.connection_manager import (
+    ConnectionPoolTimeoutError,
+    DatabaseConnectionManager,
+)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    mgr = DatabaseConnectionManager(str(tmp_path / "fish.db"), timeout=1, pool_size=2)
+    with mgr.get_connection() as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v INTEGER)")
+    yield mgr
+    mgr.close_all()
+
+
+def test_pragmas_applied_once_per_connection(manager):
+    with manager.get_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1000
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    with manager.get_connection(foreign_keys=False) as conn:
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 0
+
+
+def test_nested_checkout_reuses_connection(manager):
+    with manager.get_connection() as outer:
+        with manager.get_connection(row_factory=None) as inner:
+            assert inner is outer
+            assert isinstance(inner.execute("SELECT 1").fetchone(), tuple)
+        assert isinstance(outer.execute("SELECT 1").fetchone(), sqlite3.Row)
+    stats = manager.get_stats()
+    assert stats["created"] == 1
+    assert stats["in_use"] == 0 and stats["idle"] == 1
+
+
+def test_exception_rolls_back_and_releases(manager):
+    with pytest.raises(ValueError):
+        with manager.get_connection() as conn:
+            conn.execute("INSERT INTO t (v) VALUES (1)")
+            raise ValueError("boom")
+    with manager.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    assert manager.get_stats()["in_use"] == 0
+
+
+def test_pool_is_bounded(manager):
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with manager.get_connection():
+            holding.set()
+            release.wait(5)
+
+    workers = [threading.Thread(target=hold) for _ in range(2)]
+    for w in workers:
+        w.start()
+    holding.wait(5)
+    while manager.get_stats()["in_use"] < 2:
+        time.sleep(0.01)
+
+    with pytest.raises(ConnectionPoolTimeoutError):
+        with manager.get_connection():
+            pass
+
+    release.set()
+    for w in workers:
+        w.join()
+    stats = manager.get_stats()
+    assert stats["total"] == 2
+    assert stats["timeouts"] == 1
+    assert manager.health_check()
+
+
+def test_transaction_defers_repository_commits(manager):
+    def insert(v):
+        # 模拟仓储方法：自行借出连接并提交
+        with manager.get_connection() as conn:
+            conn.execute("INSERT INTO t (v) VALUES (?)", (v,))
+            conn.commit()
+
+    with pytest.raises(ValueError):
+        with manager.transaction():
+            insert(1)
+            raise ValueError("boom")
+    with manager.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+    with manager.transaction():
+        insert(1)
+        with pytest.raises(ValueError):
+            with manager.transaction():
+                insert(2)
+                raise ValueError("inner")
+        insert(3)
+    with manager.get_connection() as conn:
+        assert [r[0] for r in conn.execute("SELECT v FROM t ORDER BY v")] == [1, 3]
+    assert manager.get_stats()["in_use"] == 0
+
+
+class SlowCreateManager(DatabaseConnectionManager):
+    """创建连接时等待放行，或按需抛出异常"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.creating = threading.Event()
+        self.allow_create = threading.Event()
+        self.allow_create.set()
+        self.fail_next = False
+
+    def _create_connection(self):
+        if self.fail_next:
+            self.fail_next = False
+            raise sqlite3.OperationalError("unable to open database file")
+        self.creating.set()
+        self.allow_create.wait(5)
+        return super()._create_connection()
+
+
+def checkout_once(manager):
+    with manager.get_connection():
+        pass
+
+
+def test_connection_setup_does_not_block_other_checkouts(tmp_path):
+    manager = SlowCreateManager(str(tmp_path / "fish.db"), timeout=5, pool_size=2)
+    with manager.get_connection():
+        pass  # 池中留下一个空闲连接
+    manager.allow_create.clear()
+    manager.creating.clear()
+
+    with manager.get_connection():
+        # 空闲连接已被借出，另一个线程需要新建连接并卡在创建过程中
+        creator = threading.Thread(target=checkout_once, args=(manager,))
+        creator.start()
+        assert manager.creating.wait(5)
+        release_started = time.monotonic()
+    assert time.monotonic() - release_started < 1
+
+    # 归还与再次借出空闲连接不必等待新连接创建完成
+    reuser = threading.Thread(target=checkout_once, args=(manager,))
+    reuser.start()
+    reuser.join(1)
+    assert not reuser.is_alive()
+    assert not manager.allow_create.is_set()
+
+    manager.allow_create.set()
+    creator.join(5)
+    assert manager.get_stats()["total"] == 2
+    manager.close_all()
+
+
+def test_failed_connection_setup_returns_the_reserved_slot(tmp_path):
+    manager = SlowCreateManager(str(tmp_path / "fish.db"), timeout=1, pool_size=1)
+    manager.fail_next = True
+
+    with pytest.raises(sqlite3.OperationalError):
+        with manager.get_connection():
+            pass
+    assert manager.get_stats()["total"] == 0
+
+    with manager.get_connection() as conn:
+        assert conn.execute("SELECT 1").fetchone()[0] == 1
+    manager.close_all()
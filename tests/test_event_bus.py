@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from core.services.event_bus import FISH_CAUGHT, WIPE_BOMB_PLAYED, DomainEvent, EventBus
+
+
+def test_publish_delivers_events_to_subscribers_of_that_name_only():
+    bus = EventBus()
+    caught, played = [], []
+    bus.subscribe(FISH_CAUGHT, caught.append)
+    bus.subscribe(WIPE_BOMB_PLAYED, played.append)
+
+    bus.publish(FISH_CAUGHT, "u1", fish_id=3, quantity=2)
+
+    assert caught == [DomainEvent(FISH_CAUGHT, "u1", {"fish_id": 3, "quantity": 2})]
+    assert played == []
+
+
+def test_failing_subscriber_does_not_stop_the_others():
+    bus = EventBus()
+    received = []
+
+    def broken(event):
+        raise RuntimeError("boom")
+
+    bus.subscribe(FISH_CAUGHT, broken)
+    bus.subscribe(FISH_CAUGHT, received.append)
+
+    bus.publish(FISH_CAUGHT, "u1", fish_id=1)
+
+    assert [event.user_id for event in received] == ["u1"]
+
+
+def test_publish_without_subscribers_is_a_no_op():
+    EventBus().publish(FISH_CAUGHT, "u1", fish_id=1)
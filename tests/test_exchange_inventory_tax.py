@@ -1,32 +1,7 @@
 from __future__ import annotations
 
-import sys
-import types
 from datetime import datetime, timedelta
 
-# Provide a lightweight astrbot.api.logger stub for unit tests.
-class _DummyLogger:
-    def info(self, *args, **kwargs):
-        pass
-
-    def error(self, *args, **kwargs):
-        pass
-
-    def warning(self, *args, **kwargs):
-        pass
-
-    def debug(self, *args, **kwargs):
-        pass
-
-
-if "astrbot.api" not in sys.modules:
-    astrbot_module = types.ModuleType("astrbot")
-    api_module = types.ModuleType("astrbot.api")
-    api_module.logger = _DummyLogger()
-    astrbot_module.api = api_module
-    sys.modules["astrbot"] = astrbot_module
-    sys.modules["astrbot.api"] = api_module
-
 from core.domain.models import Exchange, User, UserCommodity
 from core.services.exchange_inventory_service import ExchangeInventoryService
 
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from core.database.connection_manager import DatabaseConnectionManager
+from core.domain.models import Exchange
+from core.repositories.sqlite_exchange_repo import SqliteExchangeRepository
+from core.services.exchange_price_service import ExchangePriceService
+
+INITIAL_PRICES = {"dried_fish": 6000, "fish_roe": 12000, "fish_oil": 10000}
+
+
+def _make_service(tmp_path):
+    db_path = str(tmp_path / "exchange.db")
+    manager = DatabaseConnectionManager(db_path)
+    with manager.get_connection() as conn:
+        conn.execute(
+            """
+            CREATE TABLE exchange_prices (
+                price_id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL, time TEXT NOT NULL,
+                commodity_id TEXT NOT NULL, price INTEGER NOT NULL, update_type TEXT DEFAULT 'auto',
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+    repo = SqliteExchangeRepository(db_path, manager)
+    service = ExchangePriceService(repo, {"exchange": {"initial_prices": INITIAL_PRICES}})
+    return manager, repo, service
+
+
+def _seed(repo, rows):
+    for date, time, commodity_id, price in rows:
+        repo.add_exchange_price(Exchange(date, time, commodity_id, price, created_at=f"{date}T{time}"))
+
+
+def test_history_forward_fills_and_merges_updates_at_the_same_time(tmp_path):
+    manager, repo, service = _make_service(tmp_path)
+    _seed(repo, [
+        ("2024-03-02", "20:00:00", "dried_fish", 100),
+        ("2024-03-03", "09:00", "dried_fish", 5000),
+        ("2024-03-03", "09:00", "fish_roe", 9000),
+        ("2024-03-03", "09:00", "dried_fish", 5100),
+        ("2024-03-04", "12:30:00", "fish_oil", 8000),
+        ("2024-03-04", "12:30", "fish_roe", 9200),
+        ("2024-03-05", "08:15", "fish_roe", 9500),
+    ])
+
+    result = service._build_price_history(3, datetime(2024, 3, 5, 23, 0))
+
+    assert result["labels"] == ["03-03 09:00:00", "03-04 12:30:00", "03-05 08:15:00"]
+    assert result["history"] == {
+        "dried_fish": [5100, 5100, 5100],
+        "fish_roe": [9000, 9200, 9500],
+        "fish_oil": [10000, 8000, 8000],
+    }
+    assert len(result["updates"]) == 6
+    assert result["updates"][0]["datetime"] == "2024-03-03 09:00"
+    manager.close_all()
+
+
+def test_history_without_prices_is_empty(tmp_path):
+    manager, _, service = _make_service(tmp_path)
+
+    result = service._build_price_history(7, datetime(2024, 3, 5))
+
+    assert result["labels"] == []
+    assert result["history"] == {cid: [] for cid in INITIAL_PRICES}
+    manager.close_all()
+
+
+def test_adding_and_resetting_prices_invalidate_the_history_cache(tmp_path):
+    manager, repo, service = _make_service(tmp_path)
+    today = datetime.now().strftime("%Y-%m-%d")
+    _seed(repo, [(today, "00:00:01", "dried_fish", 5000)])
+    assert service.get_price_history(days=2)["history"]["dried_fish"] == [5000]
+
+    # 绕过服务直接写库不会使缓存失效，确认此时命中的是缓存
+    _seed(repo, [(today, "00:00:02", "dried_fish", 5200)])
+    assert service.get_price_history(days=2)["history"]["dried_fish"] == [5000]
+
+    service._add_price(Exchange(today, "00:00:03", "fish_roe", 9000))
+    history = service.get_price_history(days=2)["history"]
+    assert history["dried_fish"] == [5000, 5200, 5200]
+    assert history["fish_roe"] == [12000, 12000, 9000]
+
+    assert service.reset_prices_to_initial()["success"]
+    result = service.get_price_history(days=2)
+    assert len(result["labels"]) == 1
+    assert {cid: series[-1] for cid, series in result["history"].items()} == INITIAL_PRICES
+    manager.close_all()
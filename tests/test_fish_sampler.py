@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import random
+from collections import Counter
+
+import pytest
+
+from core.domain.models import Fish
+from core.services.fish_sampler import AliasTable, FishSampler
+
+
+def test_alias_table_matches_weights():
+    random.seed(7)
+    table = AliasTable([0.6, 0.3, 0.1, 0.0])
+    counts = Counter(table.sample() for _ in range(20000))
+    assert counts[3] == 0
+    assert abs(counts[0] / 20000 - 0.6) < 0.02
+    assert abs(counts[2] / 20000 - 0.1) < 0.01
+    assert all(0 <= i < 3 for i in table.sample_many(500))
+
+
+def test_alias_table_rejects_empty_weights():
+    with pytest.raises(ValueError):
+        AliasTable([0.0, 0.0])
+
+
+class _FakeTemplateRepo:
+    def __init__(self, fish):
+        self.fish = fish
+        self.calls = 0
+
+    def get_fishes_by_rarity(self, rarity):
+        self.calls += 1
+        return [f for f in self.fish if f.rarity == rarity]
+
+    def get_zone_fishes(self, fish_ids, rarity=None):
+        self.calls += 1
+        return [f for f in self.fish if f.fish_id in fish_ids and (rarity is None or f.rarity == rarity)]
+
+    def get_all_fish(self):
+        self.calls += 1
+        return list(self.fish)
+
+
+def test_fish_tables_are_built_once_until_invalidated():
+    repo = _FakeTemplateRepo([
+        Fish(1, "小鱼", 1, 10, 1, 5),
+        Fish(2, "大鱼", 1, 30, 1, 5),
+        Fish(3, "龙鱼", 6, 900, 1, 5),
+        Fish(4, "神鱼", 7, 999, 1, 5),
+    ])
+    sampler = FishSampler(repo)
+    for _ in range(50):
+        assert sampler.sample_fish(1).rarity == 1
+        assert sampler.sample_fish(1, [2, 3]).fish_id == 2
+    assert sampler.sample_fish(5) is None
+    assert sampler.get_high_rarities() == [6, 7]
+    assert sampler.get_high_rarities([1, 3]) == [6]
+    calls = repo.calls
+
+    assert len(sampler.sample_fish_many(1, 10)) == 10
+    assert repo.calls == calls
+
+    sampler.invalidate()
+    sampler.sample_fish(1)
+    assert repo.calls == calls + 1
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import dataclasses
+from datetime import datetime
+from types import SimpleNamespace
+
+from core.database.connection_manager import DatabaseConnectionManager
+from core.domain.models import User
+from core.repositories.cached_user_repo import CachedUserRepository
+from core.services.event_bus import EventBus, DomainEvent, FISH_CAUGHT
+from core.services.fishing_service import FishingService
+
+
+class ScriptedFishingService(FishingService):
+    """每次钓鱼扣费并记一条渔获，指定用户在写入之后出错"""
+
+    def __init__(self, *args, failing_user, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failing_user = failing_user
+
+    def _go_fish_with_context(self, user_id, context):
+        user = self.user_repo.get_by_id(user_id)
+        user.coins -= 10
+        self.user_repo.update(user)
+        self.user_repo.increment_counters(user_id, {"total_fishing_count": 1})
+        with self.connection_manager.get_connection() as conn:
+            conn.execute("INSERT INTO catches (user_id) VALUES (?)", (user_id,))
+            conn.commit()
+        context.zones[1] = object()
+        context.events.append(DomainEvent(FISH_CAUGHT, user_id))
+        if user_id == self.failing_user:
+            raise RuntimeError("写入渔获失败")
+        return {"success": True}
+
+
+def _make_service(tmp_path, failing_user):
+    db_path = str(tmp_path / "fishing.db")
+    manager = DatabaseConnectionManager(db_path)
+    columns = ", ".join(
+        f"{f.name} TEXT PRIMARY KEY" if f.name == "user_id" else f.name
+        for f in dataclasses.fields(User)
+    )
+    with manager.get_connection() as conn:
+        conn.execute(f"CREATE TABLE users ({columns})")
+        conn.execute("CREATE TABLE catches (user_id TEXT)")
+
+    user_repo = CachedUserRepository(db_path, manager)
+    for user_id in ("u1", "u2", "u3"):
+        user_repo.add(User(user_id=user_id, created_at=datetime.now(), nickname=user_id, coins=100))
+    event_bus = EventBus()
+    service = ScriptedFishingService(
+        user_repo, None, None, None, None, None, {},
+        connection_manager=manager, event_bus=event_bus, failing_user=failing_user,
+    )
+    return manager, user_repo, event_bus, service
+
+
+def test_batch_rolls_back_only_the_failing_user(tmp_path):
+    manager, user_repo, event_bus, service = _make_service(tmp_path, failing_user="u2")
+    caught = []
+    event_bus.subscribe(FISH_CAUGHT, lambda event: caught.append(event.user_id))
+    context = SimpleNamespace(zones={}, events=[])
+
+    results = service.go_fish_batch(["u1", "u2", "u3"], context)
+
+    assert results["u1"]["success"] and results["u3"]["success"]
+    assert not results["u2"]["success"]
+    assert caught == ["u1", "u3"]
+    assert context.events == []
+
+    user_repo.flush()
+    with manager.get_connection() as conn:
+        rows = conn.execute("SELECT user_id, coins, total_fishing_count FROM users ORDER BY user_id").fetchall()
+        catches = [row[0] for row in conn.execute("SELECT user_id FROM catches ORDER BY rowid")]
+    assert [(row[0], int(row[1]), int(row[2])) for row in rows] == [("u1", 90, 1), ("u2", 100, 0), ("u3", 90, 1)]
+    assert catches == ["u1", "u3"]
+    assert user_repo.get_by_id("u2").coins == 100
+    assert user_repo.get_by_id("u1").coins == 90
+    manager.close_all()
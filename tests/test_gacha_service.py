@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import dataclasses
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from core.database.connection_manager import DatabaseConnectionManager
+from core.domain.models import User
+from core.repositories.cached_gacha_repo import CachedGachaRepository
+from core.repositories.cached_user_repo import CachedUserRepository
+from core.services.gacha_service import GachaService
+
+
+class SqlInventoryRepo:
+    """把鱼饵、道具写入测试库，写入随事务一起提交或回滚"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.calls = []
+
+    def _add(self, user_id, item_type, item_id, delta):
+        self.calls.append((item_type, item_id, delta))
+        with self.manager.get_connection() as conn:
+            conn.execute(
+                "INSERT INTO user_items (user_id, item_type, item_id, quantity) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id, item_type, item_id) DO UPDATE SET quantity = quantity + excluded.quantity",
+                (user_id, item_type, item_id, delta),
+            )
+            conn.commit()
+
+    def update_bait_quantity(self, user_id, bait_id, delta):
+        self._add(user_id, "bait", bait_id, delta)
+
+    def update_item_quantity(self, user_id, item_id, delta):
+        self._add(user_id, "item", item_id, delta)
+
+
+class FakeTemplateRepo:
+    def _template(self, item_id):
+        return SimpleNamespace(name=f"奖品{item_id}", rarity=2)
+
+    get_bait_by_id = get_by_id = get_title_by_id = _template
+
+
+class FakeAchievementRepo:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.titles = []
+
+    def grant_title_to_user(self, user_id, title_id):
+        if self.fail:
+            raise RuntimeError("称号写入失败")
+        self.titles.append(title_id)
+
+
+class FakeLogRepo:
+    def __init__(self):
+        self.records = []
+
+    def get_gacha_records_count_today(self, user_id, pool_id):
+        return 0
+
+    def add_gacha_records(self, records):
+        self.records.extend(records)
+
+
+def _make_service(tmp_path, achievement_repo=None, coins=1000):
+    db_path = str(tmp_path / "gacha.db")
+    manager = DatabaseConnectionManager(db_path)
+    columns = ", ".join(
+        f"{f.name} TEXT PRIMARY KEY" if f.name == "user_id" else f.name
+        for f in dataclasses.fields(User)
+    )
+    with manager.get_connection() as conn:
+        conn.execute(f"CREATE TABLE users ({columns})")
+        conn.execute(
+            """
+            CREATE TABLE gacha_pools (
+                gacha_pool_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, description TEXT,
+                cost_coins INTEGER DEFAULT 0, cost_premium_currency INTEGER DEFAULT 0,
+                is_limited_time INTEGER DEFAULT 0, open_until TEXT
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE gacha_pool_items (
+                gacha_pool_item_id INTEGER PRIMARY KEY AUTOINCREMENT, gacha_pool_id INTEGER NOT NULL,
+                item_type TEXT NOT NULL, item_id INTEGER NOT NULL, quantity INTEGER DEFAULT 1, weight INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE TABLE user_items (user_id TEXT, item_type TEXT, item_id INTEGER, quantity INTEGER, "
+            "PRIMARY KEY (user_id, item_type, item_id))"
+        )
+        conn.execute("INSERT INTO gacha_pools (name, cost_coins) VALUES ('常驻池', 100)")
+        conn.executemany(
+            "INSERT INTO gacha_pool_items (gacha_pool_id, item_type, item_id, quantity, weight) VALUES (1, ?, ?, ?, ?)",
+            [("bait", 1, 5, 10), ("item", 2, 1, 10), ("coins", 0, 30, 10), ("titles", 3, 1, 10)],
+        )
+
+    user_repo = CachedUserRepository(db_path, manager)
+    user_repo.add(User(user_id="u1", created_at=datetime.now(), nickname="玩家", coins=coins))
+    gacha_repo = CachedGachaRepository(db_path, manager)
+    inventory_repo = SqlInventoryRepo(manager)
+    log_repo = FakeLogRepo()
+    service = GachaService(
+        gacha_repo, user_repo, inventory_repo, FakeTemplateRepo(), log_repo,
+        achievement_repo or FakeAchievementRepo(), connection_manager=manager,
+    )
+    gacha_repo.register_invalidation_listener(service.invalidate_pool_samplers)
+    return manager, user_repo, gacha_repo, inventory_repo, log_repo, service
+
+
+class FixedTable:
+    """按给定顺序返回奖品下标的抽样表"""
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+
+    def sample_many(self, n):
+        return self.indexes[:n]
+
+
+def _fix_draws(service, indexes):
+    pool, _ = service._get_pool_sampler(1)
+    service._pool_samplers[1] = (pool, FixedTable(indexes))
+
+
+def _inventory(manager):
+    with manager.get_connection() as conn:
+        rows = conn.execute("SELECT item_type, item_id, quantity FROM user_items").fetchall()
+    return {(row["item_type"], row["item_id"]): row["quantity"] for row in rows}
+
+
+def test_multi_pull_charges_once_and_merges_rewards(tmp_path):
+    achievement_repo = FakeAchievementRepo()
+    manager, user_repo, _, inventory_repo, log_repo, service = _make_service(tmp_path, achievement_repo)
+    _fix_draws(service, [0, 0, 1, 2, 3, 1, 2, 3, 0, 2])
+
+    result = service.perform_draw("u1", 1, num_draws=10)
+
+    assert result["success"] and len(result["results"]) == 10
+    assert user_repo.get_by_id("u1").coins == 1000 - 10 * 100 + 3 * 30
+    assert sorted(inventory_repo.calls) == [("bait", 1, 15), ("item", 2, 2)]
+    assert _inventory(manager) == {("bait", 1): 15, ("item", 2): 2}
+    assert achievement_repo.titles == [3]
+    assert len(log_repo.records) == 10
+    manager.close_all()
+
+
+def test_failure_while_granting_rolls_back_the_charge(tmp_path):
+    manager, user_repo, _, _, log_repo, service = _make_service(tmp_path, FakeAchievementRepo(fail=True))
+    _fix_draws(service, [0, 1, 3])
+
+    with pytest.raises(RuntimeError):
+        service.perform_draw("u1", 1, num_draws=3)
+
+    assert user_repo.get_by_id("u1").coins == 1000
+    assert _inventory(manager) == {}
+    assert log_repo.records == []
+    manager.close_all()
+
+
+def test_pool_item_edits_invalidate_repo_cache_and_alias_tables(tmp_path):
+    manager, _, gacha_repo, _, _, service = _make_service(tmp_path)
+    pool, table = service._get_pool_sampler(1)
+    assert [item.weight for item in pool.items] == [10, 10, 10, 10]
+
+    gacha_repo.update_pool_item(2, {"weight": 40})
+    assert [item.weight for item in gacha_repo.get_pool_by_id(1).items] == [10, 40, 10, 10]
+    assert 1 not in service._pool_samplers
+    pool, new_table = service._get_pool_sampler(1)
+    assert new_table is not table
+    assert [item.weight for item in pool.items] == [10, 40, 10, 10]
+
+    gacha_repo.delete_pool_item(4)
+    assert [item.item_type for item in gacha_repo.get_pool_by_id(1).items] == ["bait", "item", "coins"]
+    assert 1 not in service._pool_samplers
+    pool, _ = service._get_pool_sampler(1)
+    assert len(pool.items) == 3
+    manager.close_all()
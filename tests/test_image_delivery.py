@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import io
+import os
+import sys
+import time
+import types
+
+from PIL import Image
+
+
+class _StubImage:
+    def __init__(self, file):
+        self.file = file
+
+    @staticmethod
+    def fromBytes(data):
+        return _StubImage("base64://" + base64.b64encode(data).decode())
+
+    @staticmethod
+    def fromFileSystem(path):
+        return _StubImage(f"file:///{os.path.abspath(path)}")
+
+
+class _StubMessageChain:
+    def __init__(self, chain=None):
+        self.chain = chain or []
+
+
+class _StubEvent:
+    def chain_result(self, chain):
+        return ("chain", chain)
+
+    def image_result(self, path):
+        return ("path", path)
+
+
+if "astrbot.api.event" not in sys.modules:
+    event_module = types.ModuleType("astrbot.api.event")
+    event_module.AstrMessageEvent = _StubEvent
+    event_module.MessageChain = _StubMessageChain
+    sys.modules["astrbot.api.event"] = event_module
+if "astrbot.api.message_components" not in sys.modules:
+    components_module = types.ModuleType("astrbot.api.message_components")
+    components_module.Image = _StubImage
+    sys.modules["astrbot.api.message_components"] = components_module
+
+from draw.image_delivery import ENCODE_OPTIONS, ImageDelivery
+from draw.render_service import RenderService
+
+
+def _draw_square(size):
+    return Image.new("RGB", (size, size), "red")
+
+
+def _make_delivery(tmp_path, mode, image_format="PNG"):
+    service = RenderService(
+        max_workers=2,
+        use_process_pool=False,
+        image_format=image_format,
+        encode_options=ENCODE_OPTIONS[image_format],
+    )
+    return service, ImageDelivery(service, str(tmp_path / "images"), mode=mode, file_ttl_seconds=60)
+
+
+def test_memory_mode_sends_encoded_bytes_without_writing_files(tmp_path):
+    service, delivery = _make_delivery(tmp_path, "memory", "WEBP")
+    try:
+        kind, chain = asyncio.run(delivery.render_result(_StubEvent(), "square", _draw_square, 8))
+    finally:
+        service.shutdown()
+
+    assert kind == "chain"
+    data = base64.b64decode(chain[0].file[len("base64://"):])
+    image = Image.open(io.BytesIO(data))
+    assert image.format == "WEBP"
+    assert image.size == (8, 8)
+    assert os.listdir(delivery.image_dir) == []
+
+
+def test_file_mode_writes_unique_files_for_concurrent_renders(tmp_path):
+    service, delivery = _make_delivery(tmp_path, "file")
+
+    async def main():
+        return await asyncio.gather(
+            delivery.render_component("square", _draw_square, 4),
+            delivery.render_component("square", _draw_square, 6),
+        )
+
+    try:
+        first, second = asyncio.run(main())
+    finally:
+        service.shutdown()
+
+    assert first.file != second.file
+    sizes = sorted(Image.open(os.path.join(delivery.image_dir, name)).size for name in os.listdir(delivery.image_dir))
+    assert sizes == [(4, 4), (6, 6)]
+
+
+def test_render_failure_returns_none(tmp_path):
+    service, delivery = _make_delivery(tmp_path, "memory")
+
+    def broken():
+        raise ValueError("boom")
+
+    try:
+        assert asyncio.run(delivery.render_result(_StubEvent(), "broken", broken)) is None
+    finally:
+        service.shutdown()
+
+
+def test_sweep_removes_only_expired_files(tmp_path):
+    legacy_dir = tmp_path / "temp_images"
+    legacy_dir.mkdir()
+    service = RenderService(use_process_pool=False)
+    delivery = ImageDelivery(
+        service, str(tmp_path / "images"), mode="file", file_ttl_seconds=60, extra_sweep_dirs=[str(legacy_dir)]
+    )
+    old_file = legacy_dir / "sicbo_result_1.png"
+    new_file = tmp_path / "images" / "state_new.png"
+    old_file.write_bytes(b"old")
+    new_file.write_bytes(b"new")
+    past = time.time() - 120
+    os.utime(old_file, (past, past))
+
+    assert delivery.sweep_expired_files() == 1
+    assert not old_file.exists()
+    assert new_file.exists()
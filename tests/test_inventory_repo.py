@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from core.database.connection_manager import DatabaseConnectionManager
+from core.repositories.sqlite_inventory_repo import SqliteInventoryRepository
+
+
+def _make_repo(tmp_path):
+    db_path = str(tmp_path / "inventory.db")
+    manager = DatabaseConnectionManager(db_path)
+    with manager.get_connection() as conn:
+        conn.execute(
+            """
+            CREATE TABLE user_fish_inventory (
+                user_id TEXT NOT NULL, fish_id INTEGER NOT NULL,
+                quality_level INTEGER DEFAULT 0 CHECK (quality_level IN (0, 1)),
+                quantity INTEGER DEFAULT 0 CHECK (quantity >= 0),
+                no_sell_until DATETIME,
+                PRIMARY KEY (user_id, fish_id, quality_level)
+            )
+            """
+        )
+        conn.execute("CREATE TABLE users (user_id TEXT PRIMARY KEY)")
+        conn.execute(
+            """
+            CREATE TABLE user_items (
+                user_id TEXT NOT NULL, item_id INTEGER NOT NULL,
+                quantity INTEGER DEFAULT 0 CHECK (quantity >= 0),
+                PRIMARY KEY (user_id, item_id)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE user_bait_inventory (
+                user_id TEXT NOT NULL, bait_id INTEGER NOT NULL,
+                quantity INTEGER DEFAULT 0 CHECK (quantity >= 0),
+                PRIMARY KEY (user_id, bait_id)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE user_rods (
+                rod_instance_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL,
+                rod_id INTEGER NOT NULL, obtained_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                current_durability INTEGER, is_equipped INTEGER DEFAULT 0,
+                refine_level INTEGER DEFAULT 1, is_locked INTEGER DEFAULT 0
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE user_accessories (
+                accessory_instance_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL,
+                accessory_id INTEGER NOT NULL, obtained_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                is_equipped INTEGER DEFAULT 0, refine_level INTEGER DEFAULT 1, is_locked INTEGER DEFAULT 0
+            )
+            """
+        )
+    return manager, SqliteInventoryRepository(db_path, manager)
+
+
+def _add_fish(manager, user_id, fish_id, quality_level, quantity):
+    with manager.get_connection() as conn:
+        conn.execute(
+            "INSERT INTO user_fish_inventory (user_id, fish_id, quality_level, quantity) VALUES (?, ?, ?, ?)",
+            (user_id, fish_id, quality_level, quantity),
+        )
+
+
+def _fish_rows(manager, user_id):
+    with manager.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT fish_id, quality_level, quantity FROM user_fish_inventory WHERE user_id = ?", (user_id,)
+        ).fetchall()
+    return {(row["fish_id"], row["quality_level"]): row["quantity"] for row in rows}
+
+
+def _make_pond(manager):
+    _add_fish(manager, "u1", 1, 0, 3)
+    _add_fish(manager, "u1", 1, 1, 1)
+    _add_fish(manager, "u1", 2, 0, 2)
+    _add_fish(manager, "u2", 1, 0, 5)
+
+
+def test_remove_random_fish_removes_the_requested_count_across_stacks(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    _make_pond(manager)
+    before = _fish_rows(manager, "u1")
+
+    random.seed(7)
+    assert repo.remove_random_fish("u1", 4) == 4
+
+    after = _fish_rows(manager, "u1")
+    assert sum(after.values()) == 2
+    assert all(0 < after[key] <= before[key] for key in after)
+    assert sum(before[key] - after.get(key, 0) for key in before) == 4
+    assert _fish_rows(manager, "u2") == {(1, 0): 5}
+    manager.close_all()
+
+
+def test_remove_random_fish_clamps_to_what_the_user_owns(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    _make_pond(manager)
+
+    assert repo.remove_random_fish("u1", 100) == 6
+
+    # 清空的堆叠被删除，不留下数量为 0 的行
+    assert _fish_rows(manager, "u1") == {}
+    assert _fish_rows(manager, "u2") == {(1, 0): 5}
+    assert repo.remove_random_fish("u1", 1) == 0
+    manager.close_all()
+
+
+def test_remove_random_fish_ignores_non_positive_counts(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    _make_pond(manager)
+
+    assert repo.remove_random_fish("u1", 0) == 0
+    assert repo.remove_random_fish("u1", -3) == 0
+    assert sum(_fish_rows(manager, "u1").values()) == 6
+    manager.close_all()
+
+
+def _add_users(manager, *user_ids):
+    with manager.get_connection() as conn:
+        conn.executemany("INSERT INTO users (user_id) VALUES (?)", [(user_id,) for user_id in user_ids])
+
+
+def _query(manager, sql):
+    with manager.get_connection() as conn:
+        return [tuple(row) for row in conn.execute(sql).fetchall()]
+
+
+def test_grant_item_to_all_adds_to_existing_stacks(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    _add_users(manager, "u1", "u2", "u3")
+    with manager.get_connection() as conn:
+        conn.execute("INSERT INTO user_items (user_id, item_id, quantity) VALUES ('u1', 5, 2)")
+        conn.execute("INSERT INTO user_items (user_id, item_id, quantity) VALUES ('u2', 6, 1)")
+        conn.execute("INSERT INTO user_bait_inventory (user_id, bait_id, quantity) VALUES ('u3', 9, 4)")
+
+    assert repo.grant_item_to_all("item", 5, 3) == 3
+    assert repo.grant_item_to_all("bait", 9, 10) == 3
+
+    assert _query(manager, "SELECT user_id, item_id, quantity FROM user_items ORDER BY user_id, item_id") == [
+        ("u1", 5, 5), ("u2", 5, 3), ("u2", 6, 1), ("u3", 5, 3),
+    ]
+    assert _query(manager, "SELECT user_id, quantity FROM user_bait_inventory ORDER BY user_id") == [
+        ("u1", 10), ("u2", 10), ("u3", 14),
+    ]
+    manager.close_all()
+
+
+def test_grant_item_to_all_creates_equipment_instances_per_user(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    _add_users(manager, "u1", "u2")
+    repo.add_rod_instance("u1", 3, 50)
+
+    assert repo.grant_item_to_all("rod", 3, 2, durability=80) == 2
+    assert repo.grant_item_to_all("accessory", 4, 1) == 2
+
+    rods = _query(
+        manager,
+        "SELECT user_id, rod_id, current_durability, refine_level, is_equipped, is_locked FROM user_rods "
+        "ORDER BY rod_instance_id",
+    )
+    assert rods[0] == ("u1", 3, 50, 1, 0, 0)
+    assert sorted(rods[1:]) == [("u1", 3, 80, 1, 0, 0)] * 2 + [("u2", 3, 80, 1, 0, 0)] * 2
+    assert sorted(_query(manager, "SELECT user_id, accessory_id, refine_level FROM user_accessories")) == [
+        ("u1", 4, 1), ("u2", 4, 1),
+    ]
+    manager.close_all()
+
+
+def test_grant_item_to_all_rejects_unknown_types_without_writing(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    _add_users(manager, "u1")
+
+    with pytest.raises(ValueError):
+        repo.grant_item_to_all("fish", 1, 1)
+    assert _query(manager, "SELECT COUNT(*) FROM user_items") == [(0,)]
+    manager.close_all()
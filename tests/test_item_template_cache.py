@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from core.database.connection_manager import DatabaseConnectionManager
+from core.repositories.cached_item_template_repo import CachedItemTemplateRepository
+
+
+def _make_repo(tmp_path):
+    manager = DatabaseConnectionManager(str(tmp_path / "fish.db"))
+    with manager.get_connection() as conn:
+        conn.execute(
+            """
+            CREATE TABLE fish (
+                fish_id INTEGER PRIMARY KEY, name TEXT, description TEXT, rarity INTEGER,
+                base_value INTEGER, min_weight INTEGER, max_weight INTEGER, icon_url TEXT
+            )
+            """
+        )
+        conn.executemany(
+            "INSERT INTO fish (name, rarity, base_value, min_weight, max_weight) VALUES (?, ?, ?, ?, ?)",
+            [("小鱼", 1, 10, 1, 5), ("大鱼", 3, 100, 10, 50), ("怪鱼", 3, 300, 10, 50)],
+        )
+    return manager, CachedItemTemplateRepository(str(tmp_path / "fish.db"), manager)
+
+
+def test_lookups_are_served_from_memory(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    assert repo.get_fish_by_id(2).name == "大鱼"
+    checkouts = manager.get_stats()["checkouts"]
+
+    assert [f.name for f in repo.get_fishes_by_rarity(3)] == ["怪鱼", "大鱼"]
+    assert [f.fish_id for f in repo.get_zone_fishes([1, 3], 3)] == [3]
+    assert repo.get_random_fish(1).fish_id == 1
+    assert manager.get_stats()["checkouts"] == checkouts
+    manager.close_all()
+
+
+def test_template_writes_invalidate_cache(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    assert len(repo.get_zone_fishes([1, 2, 3])) == 3
+
+    repo.update_fish_template(2, {
+        "name": "巨鱼", "description": None, "rarity": 4,
+        "base_value": 500, "min_weight": 10, "max_weight": 50,
+    })
+    assert repo.get_fish_by_id(2).name == "巨鱼"
+    assert [f.fish_id for f in repo.get_zone_fishes([1, 2, 3], 4)] == [2]
+
+    repo.delete_fish_template(1)
+    assert repo.get_fish_by_id(1) is None
+    assert len(repo.get_all_fish()) == 2
+    manager.close_all()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from core.database.connection_manager import DatabaseConnectionManager
+from core.repositories.sqlite_log_repo import SqliteLogRepository
+from core.services.log_retention_service import LogRetentionService
+
+
+def _make_repo(tmp_path):
+    manager = DatabaseConnectionManager(str(tmp_path / "logs.db"))
+    with manager.get_connection() as conn:
+        conn.execute(
+            """
+            CREATE TABLE fishing_records (
+                record_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, fish_id INTEGER,
+                weight INTEGER, value INTEGER, rod_instance_id INTEGER, accessory_instance_id INTEGER,
+                bait_id INTEGER, timestamp TIMESTAMP, is_king_size INTEGER DEFAULT 0
+            )
+            """
+        )
+        conn.commit()
+    return manager, SqliteLogRepository(str(tmp_path / "logs.db"), manager)
+
+
+def test_compaction_trims_per_user_and_expires_old_records(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    now = datetime.now(repo.UTC8)
+    rows = [("heavy", now - timedelta(minutes=i)) for i in range(8)]
+    rows += [("light", now), ("light", now - timedelta(days=40))]
+    with manager.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO fishing_records (user_id, fish_id, weight, value, timestamp) VALUES (?, 1, 1, 1, ?)",
+            rows,
+        )
+        conn.commit()
+
+    service = LogRetentionService(
+        repo, {"retention": {"fishing_records_per_user": 5, "fishing_records_days": 30, "batch_size": 1}}
+    )
+    assert service.run_compaction() == {"expired": 1, "trimmed": 3}
+
+    with manager.get_connection() as conn:
+        counts = dict(conn.execute("SELECT user_id, COUNT(*) FROM fishing_records GROUP BY user_id").fetchall())
+    assert counts == {"heavy": 5, "light": 1}
+    assert service.get_stats()["trimmed_total"] == 3
+    assert service.run_compaction() == {"expired": 0, "trimmed": 0}
@@ -0,0 +1,34 @@
+import pytest
+
+market_handlers = pytest.importorskip("astrbot_plugin_fishing.handlers.market_handlers")
+_parse_market_args = market_handlers._parse_market_args
+
+
+def test_parse_defaults():
+    assert _parse_market_args([]) == {
+        "item_type": None, "page": 1, "rarity": None,
+        "min_price": None, "max_price": None, "quality_level": None,
+    }
+
+
+def test_parse_category_page_rarity_and_quality():
+    filters = _parse_market_args(["鱼", "3", "5星", "高品质"])
+    assert filters["item_type"] == "fish"
+    assert filters["page"] == 3
+    assert filters["rarity"] == 5
+    assert filters["quality_level"] == 1
+    assert _parse_market_args(["ROD", "✨"])["item_type"] == "rod"
+
+
+def test_parse_price_ranges():
+    filters = _parse_market_args(["价格1万-2万"])
+    assert (filters["min_price"], filters["max_price"]) == (10000, 20000)
+    filters = _parse_market_args(["500-"])
+    assert (filters["min_price"], filters["max_price"]) == (500, None)
+    filters = _parse_market_args(["-1000"])
+    assert (filters["min_price"], filters["max_price"]) == (None, 1000)
+
+
+def test_parse_rejects_unknown_tokens():
+    with pytest.raises(ValueError):
+        _parse_market_args(["鱼竿", "便宜"])
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import dataclasses
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from core.database.connection_manager import DatabaseConnectionManager
+from core.domain.models import User
+from core.repositories.cached_user_repo import CachedUserRepository
+from core.repositories.sqlite_market_repo import SqliteMarketRepository
+from core.services.market_service import MarketService
+
+
+class FakeInventoryRepo:
+    """记录交付与返还的物品"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.items = {}
+
+    def update_item_quantity(self, user_id, item_id, delta):
+        with self._lock:
+            self.items[(user_id, item_id)] = self.items.get((user_id, item_id), 0) + delta
+
+    def get_user_item_inventory(self, user_id):
+        with self._lock:
+            return {item_id: quantity for (owner, item_id), quantity in self.items.items() if owner == user_id}
+
+
+class FakeLogRepo:
+    def add_tax_record(self, record):
+        pass
+
+
+class FakeTemplateRepo:
+    def get_item_by_id(self, item_id):
+        return SimpleNamespace(name="鱼饵礼包", description="")
+
+
+class SlowMarketRepo(SqliteMarketRepository):
+    """读取挂单后停顿，让并发请求都读到同一条挂单"""
+
+    read_delay = 0.05
+
+    def get_listing_by_id(self, market_id):
+        listing = super().get_listing_by_id(market_id)
+        time.sleep(self.read_delay)
+        return listing
+
+
+def _make_service(tmp_path, seller_coins=0, buyer_coins=1000, buyers=4):
+    db_path = str(tmp_path / "market.db")
+    manager = DatabaseConnectionManager(db_path, pool_size=buyers + 2)
+    columns = ", ".join(
+        f"{f.name} TEXT PRIMARY KEY" if f.name == "user_id" else f.name
+        for f in dataclasses.fields(User)
+    )
+    with manager.get_connection() as conn:
+        conn.execute(f"CREATE TABLE users ({columns})")
+        conn.execute(
+            """
+            CREATE TABLE market (
+                market_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, item_type TEXT, item_id INTEGER,
+                item_name TEXT, item_description TEXT,
+                item_instance_id INTEGER, quantity INTEGER, price INTEGER, refine_level INTEGER DEFAULT 1,
+                listed_at TIMESTAMP, expires_at TIMESTAMP, is_anonymous INTEGER DEFAULT 0,
+                quality_level INTEGER DEFAULT 0
+            )
+            """
+        )
+        for table, key in (("rods", "rod_id"), ("accessories", "accessory_id"), ("items", "item_id"),
+                           ("fish", "fish_id"), ("commodities", "commodity_id")):
+            conn.execute(f"CREATE TABLE {table} ({key} INTEGER PRIMARY KEY, name TEXT, description TEXT, rarity INTEGER)")
+        conn.execute("INSERT INTO items (item_id, name, description, rarity) VALUES (1, '鱼饵礼包', '', 2)")
+        conn.execute("INSERT INTO fish (fish_id, name, description, rarity) VALUES (1, '金鱼', '', 3)")
+
+    user_repo = CachedUserRepository(db_path, manager)
+    user_repo.add(User(user_id="seller", created_at=datetime.now(), nickname="卖家", coins=seller_coins))
+    for i in range(buyers):
+        user_repo.add(User(user_id=f"buyer{i}", created_at=datetime.now(), nickname=f"买家{i}", coins=buyer_coins))
+
+    market_repo = SlowMarketRepo(db_path, manager)
+    inventory_repo = FakeInventoryRepo()
+    service = MarketService(
+        market_repo, inventory_repo, user_repo, FakeLogRepo(), FakeTemplateRepo(), None, {},
+        connection_manager=manager,
+    )
+    return manager, user_repo, service, inventory_repo
+
+
+def _add_listing(manager, listed_at=None, item_type="item", quality_level=0):
+    with manager.get_connection() as conn:
+        cursor = conn.execute(
+            "INSERT INTO market (user_id, item_type, item_id, quantity, price, listed_at, quality_level) "
+            "VALUES ('seller', ?, 1, 1, 300, ?, ?)",
+            (item_type, listed_at or datetime.now(), quality_level),
+        )
+        return cursor.lastrowid
+
+
+def _run_concurrently(targets):
+    barrier = threading.Barrier(len(targets))
+    results = [None] * len(targets)
+
+    def run(index, target):
+        barrier.wait()
+        results[index] = target()
+
+    threads = [threading.Thread(target=run, args=(i, t)) for i, t in enumerate(targets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_buyers_get_a_single_listing_only_once(tmp_path):
+    manager, user_repo, service, inventory_repo = _make_service(tmp_path)
+    market_id = _add_listing(manager)
+
+    results = _run_concurrently(
+        [lambda i=i: service.buy_market_item(f"buyer{i}", market_id) for i in range(4)]
+    )
+
+    assert sum(result["success"] for result in results) == 1
+    assert all(r["message"] == "该商品不存在或已被购买" for r in results if not r["success"])
+    assert sum(inventory_repo.items.values()) == 1
+    assert user_repo.get_by_id("seller").coins == 300
+    assert sum(user_repo.get_by_id(f"buyer{i}").coins for i in range(4)) == 4000 - 300
+    manager.close_all()
+
+
+def test_buy_and_delist_race_hands_the_item_over_once(tmp_path):
+    manager, user_repo, service, inventory_repo = _make_service(tmp_path, buyers=1)
+    market_id = _add_listing(manager)
+
+    bought, delisted = _run_concurrently([
+        lambda: service.buy_market_item("buyer0", market_id),
+        lambda: service.delist_item("seller", market_id),
+    ])
+
+    assert bought["success"] != delisted["success"]
+    assert sum(inventory_repo.items.values()) == 1
+    assert user_repo.get_by_id("seller").coins == (300 if bought["success"] else 0)
+    manager.close_all()
+
+
+def test_expiry_sweep_skips_listings_bought_after_the_batch_was_read(tmp_path):
+    manager, user_repo, service, inventory_repo = _make_service(tmp_path, buyers=1)
+    market_id = _add_listing(manager, datetime.now() - timedelta(days=6))
+
+    original_get_batch = service.market_repo.get_listings_listed_before
+
+    def get_batch_then_buy(*args, **kwargs):
+        batch = original_get_batch(*args, **kwargs)
+        if batch:
+            assert service.buy_market_item("buyer0", market_id)["success"]
+        return batch
+
+    service.market_repo.get_listings_listed_before = get_batch_then_buy
+    result = service.cleanup_expired_listings()
+
+    assert result["returned"] == 0
+    assert inventory_repo.items == {("buyer0", 1): 1}
+    manager.close_all()
+
+
+def test_market_page_past_the_end_is_clamped_to_the_last_page(tmp_path):
+    manager, _, service, _ = _make_service(tmp_path, buyers=1)
+    for _ in range(12):
+        _add_listing(manager)
+
+    result = service.get_market_page(page=9)
+
+    assert result["pagination"] == {"current_page": 2, "total_pages": 2, "total_items": 12, "per_page": 10}
+    assert len(result["listings"]) == 2
+    assert service.get_market_page(page=0)["pagination"]["current_page"] == 1
+    manager.close_all()
+
+
+def test_listings_filter_by_rarity_and_quality(tmp_path):
+    manager, _, service, _ = _make_service(tmp_path, buyers=1)
+    item_id = _add_listing(manager)
+    plain_fish_id = _add_listing(manager, item_type="fish")
+    fine_fish_id = _add_listing(manager, item_type="fish", quality_level=1)
+    market_repo = service.market_repo
+
+    def ids(**filters):
+        return sorted(listing.market_id for listing in market_repo.get_all_listings(**filters)[0])
+
+    assert ids(rarity=2) == [item_id]
+    assert ids(rarity=3) == [plain_fish_id, fine_fish_id]
+    assert ids(rarity=3, quality_level=1) == [fine_fish_id]
+    assert ids(rarity=4) == []
+    page = service.get_market_page(item_type="fish", quality_level=1)
+    assert [listing.market_id for listing in page["listings"]] == [fine_fish_id]
+    assert page["category_counts"] == {"item": 1, "fish": 2}
+    manager.close_all()
+
+
+def test_page_cache_is_cleared_by_listing_buying_and_delisting(tmp_path):
+    manager, _, service, inventory_repo = _make_service(tmp_path, seller_coins=100, buyers=1)
+    inventory_repo.items[("seller", 1)] = 1
+
+    def total_items():
+        return service.get_market_page()["pagination"]["total_items"]
+
+    assert total_items() == 0
+    # 绕过服务直接写库不会使缓存失效，确认此时命中的是缓存
+    direct_id = _add_listing(manager)
+    assert total_items() == 0
+
+    assert service.put_item_on_sale("seller", "item", 1, 300)["success"]
+    assert total_items() == 2
+
+    assert service.buy_market_item("buyer0", direct_id)["success"]
+    assert total_items() == 1
+
+    listed_id = service.get_market_page()["listings"][0].market_id
+    assert service.delist_item("seller", listed_id)["success"]
+    assert total_items() == 0
+    manager.close_all()
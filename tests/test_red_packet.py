@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import dataclasses
+import importlib.util
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from core.database.connection_manager import DatabaseConnectionManager
+from core.domain.models import RedPacket, User
+from core.repositories.cached_user_repo import CachedUserRepository
+from core.repositories.sqlite_red_packet_repo import SqliteRedPacketRepository
+from core.services.red_packet_service import RedPacketService
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "core" / "database" / "migrations"
+
+
+def _load_migration(filename):
+    spec = importlib.util.spec_from_file_location(f"migration_{filename[:3]}", MIGRATIONS_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _create_red_packet_tables(manager, with_slots=True):
+    with manager.get_connection() as conn:
+        cursor = conn.cursor()
+        _load_migration("040_add_red_packet_system.py").up(cursor)
+        if with_slots:
+            _load_migration("043_add_red_packet_slots.py").up(cursor)
+        conn.commit()
+
+
+def _make_service(tmp_path, users=4, coins=10000):
+    db_path = str(tmp_path / "red_packet.db")
+    manager = DatabaseConnectionManager(db_path, pool_size=users + 2)
+    columns = ", ".join(
+        f"{f.name} TEXT PRIMARY KEY" if f.name == "user_id" else f.name
+        for f in dataclasses.fields(User)
+    )
+    with manager.get_connection() as conn:
+        conn.execute(f"CREATE TABLE users ({columns})")
+    _create_red_packet_tables(manager)
+
+    user_repo = CachedUserRepository(db_path, manager)
+    user_repo.add(User(user_id="sender", created_at=datetime.now(), nickname="发送者", coins=coins))
+    for i in range(users):
+        user_repo.add(User(user_id=f"user{i}", created_at=datetime.now(), nickname=f"用户{i}", coins=0))
+
+    red_packet_repo = SqliteRedPacketRepository(db_path, manager)
+    service = RedPacketService(red_packet_repo, user_repo, connection_manager=manager)
+    return manager, user_repo, red_packet_repo, service
+
+
+def _slots(manager, packet_id):
+    with manager.get_connection() as conn:
+        return conn.execute(
+            "SELECT slot_index, amount, claimed_by FROM red_packet_slots WHERE packet_id = ? ORDER BY slot_index",
+            (packet_id,),
+        ).fetchall()
+
+
+def _insert_packet(repo, packet_type, total_amount, total_count, remaining_amount, remaining_count,
+                   expires_at=None, is_expired=False):
+    now = datetime.now()
+    return repo.create_red_packet(RedPacket(
+        packet_id=0, sender_id="sender", group_id="g", packet_type=packet_type,
+        total_amount=total_amount, total_count=total_count,
+        remaining_amount=remaining_amount, remaining_count=remaining_count,
+        password=None, created_at=now, expires_at=expires_at or now + timedelta(hours=1),
+        is_expired=is_expired,
+    ))
+
+
+def test_send_splits_slots_that_sum_to_the_total(tmp_path):
+    manager, user_repo, _, service = _make_service(tmp_path)
+
+    lucky = service.send_red_packet("sender", "g", "lucky", 1000, 7)
+    normal = service.send_red_packet("sender", "g", "normal", 150, 4)
+
+    lucky_slots = _slots(manager, lucky["packet_id"])
+    assert [row["slot_index"] for row in lucky_slots] == list(range(7))
+    assert all(row["amount"] >= 1 for row in lucky_slots)
+    assert sum(row["amount"] for row in lucky_slots) == 1000
+    assert [row["amount"] for row in _slots(manager, normal["packet_id"])] == [150] * 4
+    assert user_repo.get_by_id("sender").coins == 10000 - 1000 - 600
+    manager.close_all()
+
+
+def test_each_user_claims_a_packet_only_once(tmp_path):
+    manager, user_repo, red_packet_repo, service = _make_service(tmp_path)
+    packet_id = service.send_red_packet("sender", "g", "normal", 100, 3)["packet_id"]
+
+    first = service.claim_red_packet("user0", "g", packet_id)
+    second = service.claim_red_packet("user0", "g", packet_id)
+
+    assert first["success"] and first["amount"] == 100
+    assert not second["success"]
+    assert red_packet_repo.claim_slot(packet_id, "user0", datetime.now()) is None
+    assert user_repo.get_by_id("user0").coins == 100
+    assert red_packet_repo.get_red_packet_by_id(packet_id).remaining_count == 2
+    manager.close_all()
+
+
+def test_concurrent_claims_never_over_allocate(tmp_path):
+    manager, user_repo, red_packet_repo, service = _make_service(tmp_path, users=6)
+    packet_id = service.send_red_packet("sender", "g", "lucky", 500, 4)["packet_id"]
+
+    barrier = threading.Barrier(6)
+    results = [None] * 6
+
+    def claim(index):
+        barrier.wait()
+        results[index] = service.claim_red_packet(f"user{index}", "g", packet_id)
+
+    threads = [threading.Thread(target=claim, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [result for result in results if result["success"]]
+    assert len(winners) == 4
+    assert sum(result["amount"] for result in winners) == 500
+    assert sum(user_repo.get_by_id(f"user{i}").coins for i in range(6)) == 500
+    packet = red_packet_repo.get_red_packet_by_id(packet_id)
+    assert (packet.remaining_count, packet.remaining_amount, packet.is_expired) == (0, 0, True)
+    assert len(red_packet_repo.get_claim_records_by_packet(packet_id)) == 4
+    manager.close_all()
+
+
+def test_expired_packet_rejects_claims(tmp_path):
+    manager, user_repo, red_packet_repo, service = _make_service(tmp_path)
+    packet_id = service.send_red_packet("sender", "g", "normal", 100, 2)["packet_id"]
+    later = datetime.now() + timedelta(hours=service.expire_hours, minutes=1)
+
+    assert red_packet_repo.claim_slot(packet_id, "user0", later) is None
+
+    with manager.get_connection() as conn:
+        conn.execute(
+            "UPDATE red_packets SET expires_at = ? WHERE packet_id = ?",
+            (datetime.now() - timedelta(minutes=1), packet_id),
+        )
+    result = service.claim_red_packet("user0", "g", packet_id)
+
+    assert not result["success"] and "过期" in result["message"]
+    assert user_repo.get_by_id("user0").coins == 0
+    assert all(row["claimed_by"] is None for row in _slots(manager, packet_id))
+    manager.close_all()
+
+
+def test_revoke_refunds_only_the_unclaimed_slots(tmp_path):
+    manager, user_repo, red_packet_repo, service = _make_service(tmp_path)
+    packet_id = service.send_red_packet("sender", "g", "lucky", 900, 3)["packet_id"]
+    claimed = service.claim_red_packet("user0", "g", packet_id)["amount"]
+
+    result = service.revoke_red_packet(packet_id, "sender")
+
+    assert result["success"] and result["refund_amount"] == 900 - claimed
+    assert user_repo.get_by_id("sender").coins == 10000 - claimed
+    assert [row["claimed_by"] for row in _slots(manager, packet_id)] == ["user0"]
+    assert not service.claim_red_packet("user1", "g", packet_id)["success"]
+    assert red_packet_repo.revoke_red_packet(packet_id) is None
+    manager.close_all()
+
+
+def test_migration_043_backfills_slots_for_packets_in_progress(tmp_path):
+    db_path = str(tmp_path / "migration.db")
+    manager = DatabaseConnectionManager(db_path)
+    _create_red_packet_tables(manager, with_slots=False)
+    repo = SqliteRedPacketRepository(db_path, manager)
+    normal_id = _insert_packet(repo, "normal", 500, 5, 300, 3)
+    lucky_id = _insert_packet(repo, "lucky", 1000, 4, 640, 3)
+    expired_id = _insert_packet(repo, "normal", 200, 2, 200, 2, is_expired=True)
+    finished_id = _insert_packet(repo, "lucky", 300, 2, 0, 0)
+
+    with manager.get_connection() as conn:
+        cursor = conn.cursor()
+        _load_migration("043_add_red_packet_slots.py").up(cursor)
+        conn.commit()
+
+    normal_slots = _slots(manager, normal_id)
+    assert [(row["slot_index"], row["amount"]) for row in normal_slots] == [(2, 100), (3, 100), (4, 100)]
+    lucky_slots = _slots(manager, lucky_id)
+    assert [row["slot_index"] for row in lucky_slots] == [1, 2, 3]
+    assert all(row["amount"] >= 1 for row in lucky_slots)
+    assert sum(row["amount"] for row in lucky_slots) == 640
+    assert _slots(manager, expired_id) == []
+    assert _slots(manager, finished_id) == []
+
+    assert repo.claim_slot(normal_id, "user0", datetime.now()) == (100, 2)
+    manager.close_all()
@@ -0,0 +1,80 @@
+import os
+
+from PIL import Image
+
+from draw.render_cache import RenderCache
+
+
+class CountingRenderer:
+    def __init__(self, color=(10, 20, 30)):
+        self.color = color
+        self.calls = []
+
+    def __call__(self, *args):
+        self.calls.append(args)
+        return Image.new("RGB", (8, 8), self.color)
+
+
+def test_fingerprint_change_prunes_old_files(tmp_path):
+    cache_dir = str(tmp_path / "renders")
+    old = RenderCache(cache_dir, "1.0.0", {"theme": "blue"})
+    old_path = old.get_path("help", CountingRenderer())
+    assert os.path.exists(old_path)
+
+    same = RenderCache(cache_dir, "1.0.0", {"theme": "blue"})
+    assert same.fingerprint == old.fingerprint
+    assert os.path.exists(old_path)
+
+    for version, config in (("1.0.1", {"theme": "blue"}), ("1.0.1", {"theme": "red"})):
+        cache = RenderCache(cache_dir, version, config)
+        new_path = cache.get_path("help", CountingRenderer())
+        assert os.listdir(cache_dir) == [os.path.basename(new_path)]
+    assert not os.path.exists(old_path)
+
+
+def test_get_entry_renders_once_then_hits_memory_or_disk(tmp_path):
+    cache_dir = str(tmp_path / "renders")
+    renderer = CountingRenderer()
+    cache = RenderCache(cache_dir, "1.0.0", {})
+
+    data, path = cache.get_entry("odds", renderer, 3)
+    assert cache.get_entry("odds", renderer, 3) == (data, path)
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert renderer.calls == [(3,)]
+    assert cache.get_stats()["hits"] == 1
+
+    # 文件被删除时从内存重新写回
+    os.remove(path)
+    assert cache.get_bytes("odds", renderer, 3) == data
+    assert os.path.exists(path)
+
+    # 新进程从磁盘读取，不再渲染
+    restarted = RenderCache(cache_dir, "1.0.0", {})
+    assert restarted.get_entry("odds", renderer, 3) == (data, path)
+    assert renderer.calls == [(3,)]
+    assert restarted.get_stats()["disk_hits"] == 1
+
+    cache.get_entry("odds", renderer, 4)
+    assert renderer.calls == [(3,), (4,)]
+
+
+def test_invalidate_name_removes_only_that_render(tmp_path):
+    cache = RenderCache(str(tmp_path / "renders"), "1.0.0", {})
+    help_renderer, odds_renderer = CountingRenderer(), CountingRenderer()
+    help_path = cache.get_path("help", help_renderer)
+    odds_path = cache.get_path("odds", odds_renderer, 1)
+
+    cache.invalidate("help")
+
+    assert not os.path.exists(help_path)
+    assert os.path.exists(odds_path)
+    assert cache.get_stats()["entries"] == 1
+    cache.get_path("help", help_renderer)
+    cache.get_path("odds", odds_renderer, 1)
+    assert len(help_renderer.calls) == 2
+    assert len(odds_renderer.calls) == 1
+
+    cache.invalidate()
+    assert os.listdir(cache.cache_dir) == []
+    assert cache.get_stats()["entries"] == 0
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import time
+
+from PIL import Image
+
+
+from draw.render_service import RenderService
+
+
+def _draw_square(size, color="red"):
+    return Image.new("RGB", (size, size), color)
+
+
+async def _draw_square_async(size):
+    await asyncio.sleep(0)
+    return Image.new("RGB", (size, size), "blue")
+
+
+def _draw_slowly(seconds):
+    time.sleep(seconds)
+    return Image.new("RGB", (4, 4))
+
+
+def _draw_broken():
+    raise ValueError("boom")
+
+
+def test_render_returns_png_bytes_for_sync_and_async_renderers():
+    service = RenderService(max_workers=2, use_process_pool=False)
+
+    async def main():
+        return await asyncio.gather(
+            service.render("square", _draw_square, 8, color="green"),
+            service.render("async_square", _draw_square_async, 6),
+        )
+
+    try:
+        sync_bytes, async_bytes = asyncio.run(main())
+    finally:
+        service.shutdown()
+
+    assert Image.open(io.BytesIO(sync_bytes)).size == (8, 8)
+    assert Image.open(io.BytesIO(async_bytes)).size == (6, 6)
+    assert service.get_stats()["renderers"]["square"]["completed"] == 1
+
+
+def test_render_to_file_writes_image(tmp_path):
+    service = RenderService(max_workers=1, use_process_pool=False)
+    output_path = str(tmp_path / "square.png")
+    try:
+        result = asyncio.run(service.render_to_file("square", output_path, _draw_square, 5))
+    finally:
+        service.shutdown()
+
+    assert result == output_path
+    assert Image.open(output_path).size == (5, 5)
+
+
+def test_timeouts_and_failures_return_none_and_are_counted():
+    service = RenderService(max_workers=1, timeout_seconds=0.05, use_process_pool=False)
+
+    async def main():
+        broken = await service.render("broken", _draw_broken)
+        slow = await service.render("slow", _draw_slowly, 0.3)
+        return broken, slow
+
+    try:
+        assert asyncio.run(main()) == (None, None)
+    finally:
+        service.shutdown()
+
+    renderers = service.get_stats()["renderers"]
+    assert renderers["slow"]["timeouts"] == 1
+    assert renderers["broken"]["failed"] == 1
@@ -0,0 +1,40 @@
+from PIL import Image, ImageDraw
+
+from draw import resource_registry
+from draw.resource_registry import (
+    get_fallback_font,
+    get_image,
+    get_resource_font,
+    get_text_size,
+    resource_cache_stats,
+    resource_path,
+)
+from draw.text_utils import get_text_size_cached, load_font_with_cjk_fallback
+
+
+def test_fonts_and_fallback_fonts_are_loaded_once_per_size():
+    assert get_resource_font(20) is get_resource_font(20)
+    assert get_resource_font(20) is not get_resource_font(22)
+
+    font_path = resource_path(resource_registry.DEFAULT_FONT_NAME)
+    fallback = load_font_with_cjk_fallback(font_path, 16)
+    assert fallback is get_fallback_font(font_path, 16)
+    assert fallback.primary_font is get_resource_font(16)
+
+
+def test_trophy_images_are_resized_once_and_shared():
+    gold = get_image("gold.png", (40, 40))
+    assert gold.size == (40, 40)
+    assert get_image("gold.png", (40, 40)) is gold
+    assert get_image("silver.png", (35, 35)).size == (35, 35)
+
+
+def test_text_metrics_match_direct_measurement_and_hit_the_cache():
+    font = get_resource_font(18)
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    left, top, right, bottom = draw.textbbox((0, 0), "钓鱼排行榜 TOP10", font=font)
+
+    before = resource_cache_stats()["text_metrics"]["hits"]
+    assert get_text_size(font, "钓鱼排行榜 TOP10") == (right - left, bottom - top)
+    assert get_text_size_cached("钓鱼排行榜 TOP10", font, {}) == (right - left, bottom - top)
+    assert resource_cache_stats()["text_metrics"]["hits"] >= before + 1
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+from core.services.service_executor import ServiceExecutor
+
+
+def test_calls_run_off_the_event_loop_thread():
+    executor = ServiceExecutor(max_workers=2)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        worker_thread = await executor.run("u1", threading.get_ident)
+        return loop_thread, worker_thread
+
+    loop_thread, worker_thread = asyncio.run(main())
+    executor.shutdown(wait=True)
+    assert loop_thread != worker_thread
+
+
+def test_same_user_calls_keep_submission_order():
+    executor = ServiceExecutor(max_workers=4)
+    order = []
+
+    def work(tag, delay):
+        time.sleep(delay)
+        order.append(tag)
+        return tag
+
+    async def main():
+        # 先提交的调用耗时更长，但同一用户必须按提交顺序完成
+        return await asyncio.gather(
+            executor.run("u1", work, "first", 0.05),
+            executor.run("u1", work, "second", 0.0),
+            executor.run("u1", work, "third", 0.0),
+        )
+
+    results = asyncio.run(main())
+    stats = executor.get_stats()
+    executor.shutdown(wait=True)
+    assert results == ["first", "second", "third"]
+    assert order == ["first", "second", "third"]
+    assert stats["completed"] == 3
+    assert stats["queue_depth"] == 0
+    assert stats["serialized_users"] == 0
+
+
+def test_failures_propagate_and_are_counted():
+    executor = ServiceExecutor(max_workers=1)
+
+    def boom():
+        raise RuntimeError("boom")
+
+    async def main():
+        try:
+            await executor.run(None, boom)
+        except RuntimeError as e:
+            return str(e)
+
+    assert asyncio.run(main()) == "boom"
+    assert executor.get_stats()["failed"] == 1
+    executor.shutdown(wait=True)
+
+
+def test_shutdown_waits_for_in_flight_calls():
+    executor = ServiceExecutor(max_workers=1)
+    finished = []
+
+    def slow(value):
+        time.sleep(0.05)
+        finished.append(value)
+
+    async def main():
+        tasks = [asyncio.ensure_future(executor.run(None, slow, i)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        drained = await asyncio.to_thread(executor.shutdown, True, 5)
+        await asyncio.gather(*tasks)
+        return drained
+
+    assert asyncio.run(main()) is True
+    assert finished == [0, 1, 2]
+
+
+def test_shutdown_timeout_cancels_queued_calls():
+    executor = ServiceExecutor(max_workers=1)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(None, release.wait))
+        queued = asyncio.ensure_future(executor.run(None, time.sleep, 0))
+        await asyncio.sleep(0.01)
+        drained = executor.shutdown(wait=True, timeout=0.05)
+        release.set()
+        await running
+        results = await asyncio.gather(queued, return_exceptions=True)
+        return drained, results
+
+    drained, results = asyncio.run(main())
+    assert drained is False
+    assert isinstance(results[0], asyncio.CancelledError)
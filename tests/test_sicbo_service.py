@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from datetime import timedelta
+
+from core.domain.models import User
+from core.services.sicbo_service import SicboService
+from core.utils import get_now
+
+
+class FlakySicboService(SicboService):
+    """前 failures 次结算抛出异常，之后结算成功"""
+
+    def __init__(self, failures):
+        super().__init__(None, None, {"sicbo": {"settle_retry_seconds": 0.01, "countdown_seconds": 60}})
+        self.failures = failures
+        self.attempts = 0
+
+    def _settle_round(self, game):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise RuntimeError("database is locked")
+        game.is_settled = True
+        return {"success": True, "message": f"开奖 {game.game_id}"}
+
+
+class ThreadExecutor:
+    """在线程中执行结算，模拟服务执行器"""
+
+    async def run(self, user_id, func, *args):
+        return await asyncio.to_thread(func, *args)
+
+
+async def _wait_until(predicate):
+    for _ in range(200):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+
+
+def test_failed_settlement_is_retried_and_announced():
+    service = FlakySicboService(failures=2)
+    announcements = []
+
+    async def announce(session_info, result):
+        announcements.append(result["message"])
+
+    service.set_message_callback(announce)
+
+    async def main():
+        await service.start_new_game("s1", {"group": "g1"})
+        game = service.games["s1"]
+        first = await service.force_settle_game("s1")
+        # 失败后重新开放下注，并安排了重试任务
+        assert first["success"] is False
+        assert game.is_active
+        assert "s1" in service.countdown_tasks
+        for _ in range(100):
+            if game.is_settled:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0)
+        return game
+
+    game = asyncio.run(main())
+
+    assert game.is_settled
+    assert service.attempts == 3
+    assert announcements == [f"开奖 {game.game_id}"]
+    assert service.countdown_tasks == {}
+    assert service._settle_failures == {}
+
+
+def test_settlement_retry_is_cancelled_by_a_forced_settlement():
+    service = FlakySicboService(failures=1)
+    service.settle_retry_seconds = 60
+
+    async def main():
+        await service.start_new_game("s1")
+        await service.force_settle_game("s1")
+        retry_task = service.countdown_tasks["s1"]
+        second = await service.force_settle_game("s1")
+        await asyncio.sleep(0)
+        return retry_task, second
+
+    retry_task, second = asyncio.run(main())
+
+    assert second["success"] is True
+    assert retry_task.cancelled() or retry_task.done()
+    assert service.attempts == 2
+
+
+def test_new_round_after_failed_settlement_still_pays_out_the_old_round():
+    service = FlakySicboService(failures=1)
+    announcements = []
+
+    async def announce(session_info, result):
+        announcements.append(result["message"])
+
+    service.set_message_callback(announce)
+
+    async def main():
+        await service.start_new_game("s1", {"group": "g1"})
+        old_game = service.games["s1"]
+        await service.force_settle_game("s1")
+        # 下注时间已过，但结算失败，对局仍在等待重试
+        old_game.end_time -= timedelta(seconds=120)
+        assert (await service.start_new_game("s1", {"group": "g1"}))["success"]
+        new_game = service.games["s1"]
+        await _wait_until(lambda: old_game.is_settled)
+        return old_game, new_game
+
+    old_game, new_game = asyncio.run(main())
+
+    assert old_game.is_settled
+    assert announcements == [f"开奖 {old_game.game_id}"]
+    assert new_game.is_active and not new_game.is_settled
+
+
+def test_new_round_during_settlement_keeps_the_announcement():
+    release = threading.Event()
+
+    class BlockingSicboService(FlakySicboService):
+        def _settle_round(self, game):
+            release.wait(5)
+            return super()._settle_round(game)
+
+    service = BlockingSicboService(failures=0)
+    service.executor = ThreadExecutor()
+    service.countdown_seconds = 0
+    announcements = []
+
+    async def announce(session_info, result):
+        announcements.append(result["message"])
+
+    service.set_message_callback(announce)
+
+    async def main():
+        await service.start_new_game("s1", {"group": "g1"})
+        old_game = service.games["s1"]
+        # 倒计时结束后结算在执行器中进行，此时开启新局
+        await _wait_until(lambda: not old_game.is_active)
+        service.countdown_seconds = 60
+        assert (await service.start_new_game("s1", {"group": "g1"}))["success"]
+        release.set()
+        await _wait_until(lambda: announcements)
+        return old_game, service.games["s1"]
+
+    old_game, new_game = asyncio.run(main())
+
+    assert old_game.is_settled
+    assert announcements == [f"开奖 {old_game.game_id}"]
+    assert new_game.is_active
+
+
+class BlockingUserRepo:
+    """下注扣款时停住，模拟执行器线程中尚未完成的下注"""
+
+    def __init__(self):
+        self.user = User(user_id="u1", created_at=get_now(), nickname="玩家", coins=1000)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.payouts = {}
+
+    def get_by_id(self, user_id):
+        return self.user if user_id == "u1" else None
+
+    def get_by_ids(self, user_ids):
+        return {user_id: self.user for user_id in user_ids if user_id == "u1"}
+
+    def update(self, user):
+        self.entered.set()
+        self.release.wait(5)
+
+    def increment_counter_for_users(self, field, deltas):
+        self.payouts.update(deltas)
+
+
+def test_settlement_waits_for_a_bet_being_placed():
+    user_repo = BlockingUserRepo()
+    service = SicboService(user_repo, None, {"sicbo": {"countdown_seconds": 60}}, executor=ThreadExecutor())
+
+    async def main():
+        await service.start_new_game("s1")
+        game = service.games["s1"]
+        bet = asyncio.ensure_future(asyncio.to_thread(service.place_bet, "u1", "大", 100, "s1"))
+        await asyncio.to_thread(user_repo.entered.wait, 5)
+        settle = asyncio.ensure_future(service.force_settle_game("s1"))
+        await asyncio.sleep(0.05)
+        # 结算等待进行中的下注写入完成
+        assert not settle.done()
+        user_repo.release.set()
+        return game, await bet, await settle
+
+    game, bet_result, settle_result = asyncio.run(main())
+
+    assert bet_result["success"]
+    assert settle_result["success"]
+    assert [bet.user_id for bet in game.bets] == ["u1"]
+    assert "参与人数：1 人" in settle_result["message"]
@@ -0,0 +1,59 @@
+from PIL import Image
+
+from draw.gradient_utils import create_vertical_gradient
+from draw.template_cache import (
+    extend_gradient_canvas,
+    get_rounded_card,
+    get_rounded_mask,
+    get_vertical_gradient,
+    new_gradient_canvas,
+    paste_rounded_card,
+)
+
+TOP = (174, 214, 241)
+BOTTOM = (245, 251, 255)
+
+
+def test_gradient_matches_direct_generation_and_is_shared():
+    cached = get_vertical_gradient(120, 90, TOP, BOTTOM)
+    assert cached.tobytes() == create_vertical_gradient(120, 90, TOP, BOTTOM).tobytes()
+    assert get_vertical_gradient(120, 90, TOP, BOTTOM) is cached
+
+    canvas = new_gradient_canvas(120, 90, TOP, BOTTOM)
+    canvas.putpixel((0, 0), (0, 0, 0))
+    assert cached.getpixel((0, 0)) == TOP
+
+
+def test_extend_keeps_drawn_content_and_fills_the_new_strip():
+    canvas = new_gradient_canvas(40, 50, TOP, BOTTOM)
+    canvas.putpixel((5, 5), (1, 2, 3))
+
+    extended = extend_gradient_canvas(canvas, 80, TOP, BOTTOM)
+
+    assert extended.size == (40, 80)
+    assert extended.getpixel((5, 5)) == (1, 2, 3)
+    full = create_vertical_gradient(40, 80, TOP, BOTTOM)
+    assert extended.crop((0, 50, 40, 80)).tobytes() == full.crop((0, 50, 40, 80)).tobytes()
+    assert extend_gradient_canvas(extended, 60, TOP, BOTTOM) is extended
+
+
+def test_rounded_mask_and_card_are_cached_and_transparent_at_corners():
+    mask = get_rounded_mask((60, 40), 10)
+    assert get_rounded_mask((60, 40), 10) is mask
+    assert mask.getpixel((0, 0)) == 0
+    assert mask.getpixel((59, 39)) == 0
+    assert mask.getpixel((30, 20)) == 255
+
+    card = get_rounded_card((60, 40), 10, (255, 255, 255), (230, 230, 230), 2)
+    assert card.getpixel((30, 0)) == (230, 230, 230, 255)
+    assert card.getpixel((30, 20)) == (255, 255, 255, 255)
+
+
+def test_paste_rounded_card_uses_inclusive_bbox():
+    image = Image.new("RGB", (50, 50), (0, 0, 0))
+    paste_rounded_card(image, (10, 10, 39, 29), 5, (255, 255, 255, 240))
+
+    assert image.getpixel((25, 10)) == (255, 255, 255)
+    assert image.getpixel((25, 29)) == (255, 255, 255)
+    assert image.getpixel((25, 30)) == (0, 0, 0)
+    assert max(image.getpixel((10, 10))) < 32
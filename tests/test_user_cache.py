@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import dataclasses
+from datetime import datetime
+
+import pytest
+
+from core.database.connection_manager import DatabaseConnectionManager
+from core.domain.models import User
+from core.repositories.cached_user_repo import CachedUserRepository
+
+
+def _make_repo(tmp_path):
+    manager = DatabaseConnectionManager(str(tmp_path / "fish.db"))
+    columns = ", ".join(
+        f"{f.name} TEXT PRIMARY KEY" if f.name == "user_id" else f.name
+        for f in dataclasses.fields(User)
+    )
+    with manager.get_connection() as conn:
+        conn.execute(f"CREATE TABLE users ({columns})")
+    repo = CachedUserRepository(str(tmp_path / "fish.db"), manager)
+    repo.add(User(user_id="u1", created_at=datetime.now(), nickname="鱼", coins=100, max_coins=100))
+    return manager, repo
+
+
+def _db_row(manager, user_id):
+    with manager.get_connection() as conn:
+        return conn.execute("SELECT coins, max_coins, nickname FROM users WHERE user_id = ?", (user_id,)).fetchone()
+
+
+def test_updates_are_merged_and_flushed_together(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    first = repo.get_by_id("u1")
+    second = repo.get_by_id("u1")
+    first.coins += 50
+    first.nickname = "大鱼"
+    second.coins -= 30
+    repo.update(first)
+    repo.update(second)
+
+    assert tuple(_db_row(manager, "u1")) == (100, 100, "鱼")
+    assert repo.get_by_id("u1").coins == 120
+    assert repo.flush() == 1
+    assert tuple(_db_row(manager, "u1")) == (120, 150, "大鱼")
+    assert repo.get_stats()["dirty_users"] == 0
+    manager.close_all()
+
+
+def test_rolled_back_write_through_reloads_from_database(tmp_path):
+    manager, repo = _make_repo(tmp_path)
+    with pytest.raises(RuntimeError):
+        with manager.transaction():
+            user = repo.get_by_id("u1")
+            user.coins -= 40
+            repo.update(user)
+            assert repo.get_by_id("u1").coins == 60
+            raise RuntimeError("rollback")
+
+    assert repo.get_by_id("u1").coins == 100
+    assert tuple(_db_row(manager, "u1"))[0] == 100
+    manager.close_all()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import dataclasses
+from datetime import datetime
+
+import pytest
+
+from core.database.connection_manager import DatabaseConnectionManager
+from core.domain.models import User
+from core.repositories.cached_user_repo import CachedUserRepository
+from core.repositories.sqlite_user_repo import SqliteUserRepository
+
+
+def _make_manager(tmp_path):
+    manager = DatabaseConnectionManager(str(tmp_path / "users.db"))
+    columns = ", ".join(
+        f"{f.name} TEXT PRIMARY KEY" if f.name == "user_id" else f.name
+        for f in dataclasses.fields(User)
+    )
+    with manager.get_connection() as conn:
+        conn.execute(f"CREATE TABLE users ({columns})")
+    return manager
+
+
+def _add_users(repo, balances):
+    for user_id, (coins, premium) in balances.items():
+        repo.add(User(
+            user_id=user_id, created_at=datetime.now(), nickname=user_id,
+            coins=coins, max_coins=coins, premium_currency=premium,
+        ))
+
+
+def _balances(manager):
+    with manager.get_connection() as conn:
+        rows = conn.execute("SELECT user_id, coins, max_coins, premium_currency FROM users ORDER BY user_id")
+        return {row["user_id"]: (row["coins"], row["max_coins"], row["premium_currency"]) for row in rows}
+
+
+def test_add_currency_to_all_updates_every_user_and_max_coins(tmp_path):
+    manager = _make_manager(tmp_path)
+    repo = SqliteUserRepository(str(tmp_path / "users.db"), manager)
+    _add_users(repo, {"u1": (0, 0), "u2": (500, 3)})
+    with manager.get_connection() as conn:
+        conn.execute("UPDATE users SET max_coins = 1000 WHERE user_id = 'u2'")
+
+    assert repo.add_currency_to_all("coins", 200) == 2
+    assert repo.add_currency_to_all("premium_currency", 5) == 2
+
+    assert _balances(manager) == {"u1": (200, 200, 5), "u2": (700, 1000, 8)}
+    manager.close_all()
+
+
+def test_deduct_currency_from_all_never_goes_below_zero(tmp_path):
+    manager = _make_manager(tmp_path)
+    repo = SqliteUserRepository(str(tmp_path / "users.db"), manager)
+    _add_users(repo, {"u1": (0, 0), "u2": (50, 0), "u3": (300, 2)})
+
+    # 只统计余额大于 0 的用户，每人至多扣除 amount
+    assert repo.deduct_currency_from_all("coins", 100) == (2, 150)
+    assert repo.deduct_currency_from_all("premium_currency", 5) == (1, 2)
+
+    assert _balances(manager) == {"u1": (0, 0, 0), "u2": (0, 50, 0), "u3": (200, 300, 0)}
+    manager.close_all()
+
+
+def test_bulk_currency_operations_reject_unknown_columns(tmp_path):
+    manager = _make_manager(tmp_path)
+    repo = SqliteUserRepository(str(tmp_path / "users.db"), manager)
+
+    with pytest.raises(ValueError):
+        repo.add_currency_to_all("nickname", 1)
+    with pytest.raises(ValueError):
+        repo.deduct_currency_from_all("user_id", 1)
+    manager.close_all()
+
+
+def test_cached_bulk_currency_operations_include_pending_changes(tmp_path):
+    manager = _make_manager(tmp_path)
+    repo = CachedUserRepository(str(tmp_path / "users.db"), manager)
+    _add_users(repo, {"u1": (100, 0), "u2": (0, 0)})
+    user = repo.get_by_id("u2")
+    user.coins = 80
+    repo.update(user)
+
+    assert repo.deduct_currency_from_all("coins", 50) == (2, 100)
+    assert repo.get_by_id("u1").coins == 50
+    assert repo.get_by_id("u2").coins == 30
+    assert repo.add_currency_to_all("coins", 10) == 2
+    assert repo.get_by_id("u2").coins == 40
+    manager.close_all()
+
+
+class RecordingUserRepository(SqliteUserRepository):
+    """记录 update 发出的 SQL"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = []
+
+    def _execute_update(self, user, sql, values):
+        self.statements.append((sql, list(values)))
+        super()._execute_update(user, sql, values)
+
+
+def _make_recording_repo(tmp_path):
+    manager = _make_manager(tmp_path)
+    repo = RecordingUserRepository(str(tmp_path / "users.db"), manager)
+    _add_users(repo, {"u1": (100, 0)})
+    return manager, repo
+
+
+def _row(manager, user_id, *columns):
+    with manager.get_connection() as conn:
+        row = conn.execute(f"SELECT {', '.join(columns)} FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    return tuple(row)
+
+
+def test_update_writes_only_changed_columns(tmp_path):
+    manager, repo = _make_recording_repo(tmp_path)
+    user = repo.get_by_id("u1")
+    user.nickname = "大鱼"
+    user.total_fishing_count += 2
+
+    repo.update(user)
+
+    assert repo.statements == [(
+        "UPDATE users SET nickname = ?, total_fishing_count = total_fishing_count + ? WHERE user_id = ?",
+        ["大鱼", 2, "u1"],
+    )]
+    assert user.get_dirty_fields() == {}
+    assert _row(manager, "u1", "nickname", "total_fishing_count") == ("大鱼", 2)
+    manager.close_all()
+
+
+def test_update_of_an_unchanged_user_does_not_write(tmp_path):
+    manager, repo = _make_recording_repo(tmp_path)
+    user = repo.get_by_id("u1")
+
+    repo.update(user)
+    # 赋回原值也不算修改
+    user.nickname = user.nickname
+    user.coins += 0
+    repo.update(user)
+
+    assert repo.statements == []
+    manager.close_all()
+
+
+def test_concurrent_updates_to_different_columns_both_survive(tmp_path):
+    manager, repo = _make_recording_repo(tmp_path)
+    first = repo.get_by_id("u1")
+    second = repo.get_by_id("u1")
+
+    first.nickname = "大鱼"
+    first.coins += 30
+    second.current_title_id = 7
+    second.coins -= 20
+    repo.update(first)
+    repo.update(second)
+
+    # 第二个写入者的旧快照不会覆盖第一个写入者修改的列，金币按增量合并
+    assert _row(manager, "u1", "nickname", "current_title_id", "coins", "max_coins") == ("大鱼", 7, 110, 130)
+    manager.close_all()
+
+
+def test_update_of_an_untracked_user_writes_the_whole_row(tmp_path):
+    manager, repo = _make_recording_repo(tmp_path)
+    user = User(user_id="u1", created_at=datetime.now(), nickname="新名字", coins=5, max_coins=100)
+
+    repo.update(user)
+
+    assert len(repo.statements) == 1
+    assert repo.statements[0][0].count("= ?") == len(dataclasses.fields(User))
+    assert _row(manager, "u1", "nickname", "coins") == ("新名字", 5)
+    manager.close_all()